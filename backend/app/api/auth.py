@@ -4,6 +4,7 @@
 from starlette.routing import Route
 from starlette.requests import Request
 from starlette.responses import Response
+import asyncio
 import json
 from datetime import datetime, timedelta
 import jwt as pyjwt  # 重命名以确保使用正确的PyJWT库
@@ -14,8 +15,7 @@ from app.core.config import settings
 from app.utils.logging import mcp_logger
 from app.utils.response import success_response, error_response
 
-# JWT密钥
-SECRET_KEY = settings.JWT_SECRET_KEY
+# JWT密钥在签发时读取 settings.JWT_SECRET_KEY，多进程部署时可能被替换为共享密钥
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24小时
 
@@ -48,7 +48,8 @@ async def login(request: Request):
             "is_admin": user.is_admin,
             "exp": access_token_expires
         }
-        token = pyjwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+        token = pyjwt.encode(payload, settings.JWT_SECRET_KEY,
+                           algorithm=ALGORITHM)
         
         # 获取用户关联的租户
         tenants = TenantService.get_user_tenants(user.id)
@@ -604,7 +605,9 @@ async def import_platform_user(request: Request):
             return error_response("暂不支持该平台类型", code=400, http_status_code=400)
         
         # 导入用户
-        user_data = UserService.import_user_from_egovakb(authorization, tenant_ids)
+        # 读写共享状态缓存并调用外部平台接口，放到线程中执行
+        user_data = await asyncio.to_thread(
+            UserService.import_user_from_egovakb, authorization, tenant_ids)
         
         if not user_data:
             return error_response("导入用户失败", code=500, http_status_code=500)
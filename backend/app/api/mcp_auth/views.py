@@ -250,8 +250,7 @@ async def get_auth_config(request: Request) -> JSONResponse:
 async def update_auth_config(request: Request) -> JSONResponse:
     """更新服务鉴权配置"""
     try:
-        from app.models.engine import get_db
-        from app.models.modules.published_service import McpService
+        from app.services.published_service import service_manager
 
         service_id = int(request.path_params.get('service_id'))
 
@@ -265,33 +264,21 @@ async def update_auth_config(request: Request) -> JSONResponse:
         if auth_mode not in valid_modes:
             return error_response("无效的鉴权模式", status_code=400)
 
-        with get_db() as db:
-            service = db.query(McpService).filter(
-                McpService.id == service_id
-            ).first()
+        # 简化权限检查
+        # 实际应用中应该检查用户权限
 
-            if not service:
-                return error_response("服务不存在", status_code=404)
+        # 更新配置（同步刷新服务解析索引）
+        config = service_manager.update_auth_config(
+            service_id, auth_required, auth_mode)
+        if config is None:
+            return error_response("服务不存在", status_code=404)
 
-            # 简化权限检查
-            # 实际应用中应该检查用户权限
-
-            # 更新配置
-            service.auth_required = auth_required
-            service.auth_mode = auth_mode if auth_required else ""
-
-            db.commit()
+        mcp_logger.info(f"更新服务 {service_id} 鉴权配置")
 
-            mcp_logger.info(f"更新服务 {service_id} 鉴权配置")
-
-            return success_response(
-                data={
-                    "service_id": service.id,
-                    "auth_required": service.auth_required,
-                    "auth_mode": service.auth_mode
-                },
-                message="鉴权配置更新成功"
-            )
+        return success_response(
+            data=config,
+            message="鉴权配置更新成功"
+        )
 
     except Exception as e:
         mcp_logger.error(f"更新鉴权配置失败: {str(e)}")
@@ -1,4 +1,6 @@
 """MCP 模板广场相关 API。"""
+import asyncio
+
 from starlette.routing import Route
 from starlette.requests import Request
 from app.utils.response import success_response, error_response
@@ -85,8 +87,15 @@ async def get_tool(request: Request):
 
 
 async def scan_repository_modules(request: Request):
-    """扫描仓库中的MCP模块并更新数据库"""
-    result = mcp_template_service.scan_repository_modules()
+    """扫描仓库中的MCP模块并更新数据库
+
+    查询参数 force=true 时忽略代码摘要，重新扫描全部模块
+    """
+    force = request.query_params.get("force", "").lower() in ("1", "true")
+    # 扫描会等待进程池解析和数据库写入，不阻塞事件循环
+    result = await asyncio.to_thread(
+        mcp_template_service.scan_repository_modules, force
+    )
     return success_response(result)
 
 
@@ -165,8 +174,9 @@ async def publish_module(request: Request):
 
         from app.services.published_service import service_manager
 
-        # 发布服务
-        service = service_manager.publish_service(
+        # 发布服务（会同步等待工作进程加载，放到线程中执行）
+        service = await asyncio.to_thread(
+            service_manager.publish_service,
             module_id,
             user_id=user_id,
             is_admin=is_admin,
@@ -1,6 +1,7 @@
 from starlette.routing import Route
 from starlette.requests import Request
 from pydantic import BaseModel, ValidationError
+import asyncio
 import importlib
 
 from app.utils.response import success_response, error_response
@@ -197,13 +198,16 @@ async def create_third_party_service(request: Request):
         # 验证必填字段
         name = data.get("service_name", None)
         sse_url = data.get("sse_url", None)
+        upstream_urls = data.get("upstream_urls") or []
         proxy_enabled = data.get("proxy_enabled", False)
         custom_proxy_path = data.get("custom_proxy_path", None)
 
         if not name:
             return error_response("服务名称不能为空", code=400, http_status_code=400)
-        if not sse_url:
+        if not sse_url and not upstream_urls:
             return error_response("SSE URL不能为空", code=400, http_status_code=400)
+        if not isinstance(upstream_urls, list):
+            return error_response("上游地址列表格式不正确", code=400, http_status_code=400)
 
         # 验证代理转发配置
         if proxy_enabled:
@@ -217,7 +221,8 @@ async def create_third_party_service(request: Request):
         from app.services.published_service import service_manager
 
         # 创建第三方服务
-        service = service_manager.publish_third_party_service(
+        service = await asyncio.to_thread(
+            service_manager.publish_third_party_service,
             user_id=user_id,
             is_admin=is_admin,
             data=data
@@ -275,7 +280,8 @@ async def get_service(request: Request):
 
     try:
         # 获取服务状态（包含编辑权限信息）
-        service = service_manager.get_service_status(
+        service = await asyncio.to_thread(
+            service_manager.get_service_status,
             service_uuid,
             request=request,  # 传递请求对象
             user_id=user_id,
@@ -348,7 +354,8 @@ async def start_service(request: Request):
 
     try:
         # 启动服务
-        result = service_manager.start_service(
+        result = await asyncio.to_thread(
+            service_manager.start_service,
             service_uuid,
             user_id=user_id,
             is_admin=is_admin
@@ -464,6 +471,43 @@ async def update_service_visibility(request: Request):
         )
 
 
+async def update_service_eager_load(request: Request):
+    """更新服务是否启动时预加载"""
+    id = request.path_params["id"]
+
+    # 获取用户信息
+    user_id, is_admin = get_user_info(request)
+
+    try:
+        data = await request.json()
+        eager_load = data.get("eager_load")
+
+        if eager_load is None:
+            return error_response(
+                "缺少eager_load参数", code=400, http_status_code=400
+            )
+
+        result = service_manager.update_service_eager_load(
+            id=id,
+            eager_load=eager_load,
+            user_id=user_id,
+            is_admin=is_admin
+        )
+
+        return success_response(
+            result,
+            message="预加载设置已更新，下次启动时生效"
+        )
+
+    except ValueError as e:
+        return error_response(str(e), code=400, http_status_code=400)
+    except Exception as e:
+        mcp_logger.error(f"更新服务预加载设置失败: {str(e)}")
+        return error_response(
+            f"更新服务预加载设置失败: {str(e)}", code=500, http_status_code=500
+        )
+
+
 async def list_modules_for_select(request: Request):
     """获取模块列表用于下拉选择器"""
     try:
@@ -529,6 +573,8 @@ def get_router():
               methods=["PUT"]),
         Route("/{id}/visibility", update_service_visibility,
               methods=["PUT"]),
+        Route("/{id}/eager_load", update_service_eager_load,
+              methods=["PUT"]),
         Route("/modules_for_select", list_modules_for_select, methods=["GET"]),
         Route("/users_for_select", list_users_for_select, methods=["GET"]),
         # 第三方服务管理
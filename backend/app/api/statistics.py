@@ -4,6 +4,9 @@
 提供MCP服务和工具调用统计数据的REST接口
 """
 
+import asyncio
+from datetime import datetime
+
 from starlette.routing import Route
 from starlette.requests import Request
 from pydantic import BaseModel
@@ -27,7 +30,9 @@ async def get_service_statistics(request: Request):
                 http_status_code=403
             )
         
-        stats = statistics_service.get_service_statistics()
+        # 缓存过期时需要查库计数，放到线程中执行
+        stats = await asyncio.to_thread(
+            statistics_service.get_service_statistics)
         return success_response(stats)
     except Exception as e:
         return error_response(
@@ -151,7 +156,11 @@ async def get_tool_executions(request: Request):
 
 
 async def refresh_statistics(request: Request):
-    """刷新统计数据"""
+    """刷新统计数据
+
+    默认只汇总上次刷新后新增的记录，查询参数 rebuild=true 时全量重建
+    工具、服务调用和模块调用统计
+    """
     try:
         # 检查管理员权限
         user = request.state.user
@@ -162,7 +171,10 @@ async def refresh_statistics(request: Request):
                 http_status_code=403
             )
         
-        result = statistics_service.refresh_all_statistics()
+        rebuild = request.query_params.get("rebuild", "").lower() in (
+            "1", "true")
+        result = await asyncio.to_thread(
+            statistics_service.refresh_all_statistics, rebuild=rebuild)
         return success_response({
             "message": "统计数据已刷新",
             "details": result
@@ -295,6 +307,97 @@ async def get_statistics_trend(request: Request):
     except Exception as e:
         return error_response(str(e), code=500, http_status_code=500)
 
+
+def _parse_series_time(value: Optional[str]) -> Optional[datetime]:
+    """解析序列查询的时间参数，支持日期或日期时间"""
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"时间格式错误: {value}")
+
+
+async def get_statistics_series(request: Request):
+    """按分钟 / 小时 / 天获取任意时间范围的调用统计序列
+
+    查询参数：granularity（minute / hour / day，默认 hour）、start、end
+    （YYYY-MM-DD [HH:MM[:SS]]，start 含、end 不含）、source（execution /
+    access）、service_id、tool_name、secret_id、status、group_by（service /
+    tool / secret / status）；minute 粒度不区分工具
+    """
+    try:
+        user_id, is_admin = get_user_info(request)
+        if not is_admin:
+            return error_response("需要管理员权限", code=403, http_status_code=403)
+
+        params = request.query_params
+        try:
+            secret_id = params.get("secret_id")
+            kwargs = {
+                "granularity": params.get("granularity", "hour"),
+                "start": _parse_series_time(params.get("start")),
+                "end": _parse_series_time(params.get("end")),
+                "source": params.get("source", "execution"),
+                "service_id": params.get("service_id") or None,
+                "tool_name": params.get("tool_name") or None,
+                "secret_id": int(secret_id) if secret_id else None,
+                "status": params.get("status") or None,
+                "group_by": params.get("group_by") or None,
+            }
+            series = await asyncio.to_thread(
+                statistics_service.get_statistics_series, **kwargs)
+        except ValueError as e:
+            return error_response(str(e), code=400, http_status_code=400)
+        return success_response(series)
+    except Exception as e:
+        mcp_logger.error(f"获取统计序列时出错: {str(e)}")
+        return error_response(str(e), code=500, http_status_code=500)
+
+
+async def get_latency_percentiles(request: Request):
+    """获取工具执行耗时分位数
+
+    查询参数：tool_name、service_id、start、end（YYYY-MM-DD [HH:MM[:SS]]，
+    默认最近 1 天）、granularity（minute / hour / day，默认自动选择）、
+    percentiles（逗号分隔，默认 50,90,95,99）、group_by（tool / service）
+    """
+    try:
+        user_id, is_admin = get_user_info(request)
+        if not is_admin:
+            return error_response("需要管理员权限", code=403, http_status_code=403)
+
+        params = request.query_params
+        try:
+            percentiles = params.get("percentiles")
+            try:
+                percentiles = [
+                    float(item) for item in percentiles.split(",")
+                    if item.strip()
+                ] if percentiles else None
+            except ValueError:
+                raise ValueError(f"分位数格式错误: {params.get('percentiles')}")
+            kwargs = {
+                "start": _parse_series_time(params.get("start")),
+                "end": _parse_series_time(params.get("end")),
+                "tool_name": params.get("tool_name") or None,
+                "service_id": params.get("service_id") or None,
+                "granularity": params.get("granularity") or None,
+                "percentiles": percentiles,
+                "group_by": params.get("group_by") or None,
+            }
+            latency = await asyncio.to_thread(
+                statistics_service.get_latency_percentiles, **kwargs)
+        except ValueError as e:
+            return error_response(str(e), code=400, http_status_code=400)
+        return success_response(latency)
+    except Exception as e:
+        mcp_logger.error(f"获取耗时分位数时出错: {str(e)}")
+        return error_response(str(e), code=500, http_status_code=500)
+
+
 def get_router():
     """获取统计API路由"""
     routes = [
@@ -304,6 +407,8 @@ def get_router():
         Route("/services/rankings", endpoint=get_service_rankings, methods=["GET"]),
         Route("/tools/executions", endpoint=get_tool_executions, methods=["GET"]),
         Route("/refresh", endpoint=refresh_statistics, methods=["POST"]),
+        Route("/series", endpoint=get_statistics_series, methods=["GET"]),
+        Route("/latency", endpoint=get_latency_percentiles, methods=["GET"]),
         Route(
             "/tools/executions/by-module", 
             endpoint=get_tool_executions_by_module, 
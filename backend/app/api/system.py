@@ -150,6 +150,22 @@ async def get_service_status(request: Request):
         return error_response(f"获取服务状态失败: {str(e)}", code=500, http_status_code=500)
 
 
+async def get_service_startup_report(request: Request):
+    """获取已发布服务启动加载报告"""
+    # 获取用户信息
+    user_id, is_admin = get_user_info(request)
+
+    # 检查管理员权限
+    if not is_admin:
+        return error_response("需要管理员权限", code=403, http_status_code=403)
+
+    try:
+        report = await system_service.get_service_startup_report()
+        return success_response(report)
+    except Exception as e:
+        return error_response(f"获取服务启动加载报告失败: {str(e)}", code=500, http_status_code=500)
+
+
 async def restart_service(request: Request):
     """重启服务"""
     # 获取用户信息
@@ -288,6 +304,11 @@ def get_router():
             methods=["DELETE"]
         ),
         Route("/services/status", get_service_status, methods=["GET"]),
+        Route(
+            "/services/startup",
+            get_service_startup_report,
+            methods=["GET"]
+        ),
         Route(
             "/services/{service_name}/restart", 
             restart_service, 
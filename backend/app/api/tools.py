@@ -1,3 +1,5 @@
+import asyncio
+
 from starlette.routing import Route
 from starlette.requests import Request
 from app.utils.response import success_response, error_response
@@ -23,6 +25,12 @@ async def list_tools(request: Request):
     return success_response(result)
 
 
+async def reload_tools(request: Request):
+    """丢弃工具索引并全量重建（扫描工具目录并解析源码，放到线程中执行）"""
+    result = await asyncio.to_thread(tool_service.reload_tools)
+    return success_response(result)
+
+
 async def get_tool_info(request: Request):
     """获取特定工具信息"""
     tool_name = request.path_params["tool_name"]
@@ -89,6 +97,7 @@ def get_router():
         Route("/", endpoint=get_tools, methods=["GET"]),
         Route("/list", endpoint=list_tools, methods=["GET"]),
         Route("/info/{tool_name}", endpoint=get_tool_info, methods=["GET"]),
+        Route("/reload", endpoint=reload_tools, methods=["POST"]),
         Route("/{tool_path:path}", endpoint=get_tool, methods=["GET"]),
         Route("/{tool_path:path}", endpoint=update_tool, methods=["PUT"]),
         Route("/", endpoint=create_tool, methods=["POST"]),
@@ -72,11 +72,161 @@ class Settings:
         self.JWT_SECRET_KEY: str = config.get("jwt", {}).get(
             "secret_key", secrets.token_hex(32)
         )
+        # 未配置时各进程随机生成的密钥不同，共享状态后端会改用共享密钥
+        self.JWT_SECRET_KEY_CONFIGURED: bool = (
+            "secret_key" in config.get("jwt", {})
+        )
         
         # 统计设置
         self.STATISTICS_INTERVAL: int = config.get("schedule", {}).get(
             "statistics_interval", 10
         )
+        # 时间桶汇总（分钟 / 小时 / 天）的保留天数，由每日清理任务删除
+        self.STATISTICS_ROLLUP_MINUTE_RETENTION_DAYS: int = config.get(
+            "statistics", {}).get("rollup_minute_retention_days", 3)
+        self.STATISTICS_ROLLUP_HOUR_RETENTION_DAYS: int = config.get(
+            "statistics", {}).get("rollup_hour_retention_days", 90)
+        self.STATISTICS_ROLLUP_DAY_RETENTION_DAYS: int = config.get(
+            "statistics", {}).get("rollup_day_retention_days", 1095)
+        # 查询时间桶汇总时，距上次汇总超过该秒数则先汇总新增记录，
+        # 0 表示只由定时任务汇总
+        self.STATISTICS_ROLLUP_MAX_STALENESS: float = config.get(
+            "statistics", {}).get("rollup_max_staleness", 60)
+        # 服务统计（概览）在内存中的缓存秒数，超过后查询时重新计数，
+        # 0 表示每次查询都重新计数
+        self.STATISTICS_OVERVIEW_MAX_STALENESS: float = config.get(
+            "statistics", {}).get("overview_max_staleness", 30)
+        # 增量汇总只汇总写入时间早于该秒数的记录，晚提交的小 ID 记录
+        # （MySQL 并发事务）留到下次汇总，0 表示不留余量
+        self.STATISTICS_WATERMARK_LAG: float = config.get(
+            "statistics", {}).get("watermark_lag_seconds", 10)
+
+        # 访问日志批量写入设置
+        self.ACCESS_LOG_QUEUE_SIZE: int = config.get(
+            "access_log", {}).get("queue_size", 10000)
+        self.ACCESS_LOG_BATCH_SIZE: int = config.get(
+            "access_log", {}).get("batch_size", 500)
+        self.ACCESS_LOG_FLUSH_INTERVAL_MS: int = config.get(
+            "access_log", {}).get("flush_interval_ms", 1000)
+
+        # 工具执行记录批量写入设置
+        self.TOOL_EXECUTION_QUEUE_SIZE: int = config.get(
+            "tool_execution", {}).get("queue_size", 10000)
+        self.TOOL_EXECUTION_BATCH_SIZE: int = config.get(
+            "tool_execution", {}).get("batch_size", 200)
+        self.TOOL_EXECUTION_FLUSH_INTERVAL_MS: int = config.get(
+            "tool_execution", {}).get("flush_interval_ms", 1000)
+        # 工具执行中间件读取 tools/call 请求体的上限（字节）
+        self.TOOL_CALL_PEEK_MAX_BYTES: int = config.get(
+            "tool_execution", {}).get("peek_max_bytes", 65536)
+
+        # 内置服务同步工具线程池设置（每个服务一个线程池）
+        self.TOOL_EXECUTOR_MAX_WORKERS: int = config.get(
+            "tool_executor", {}).get("max_workers", 4)
+        # 线程全部占用时排队等待的调用上限，超过后直接返回错误
+        self.TOOL_EXECUTOR_MAX_QUEUE: int = config.get(
+            "tool_executor", {}).get("max_queue", 100)
+
+        # 服务工作进程设置，开启后内置服务运行在独立的工作进程中
+        self.WORKER_ENABLED: bool = config.get(
+            "worker", {}).get("enabled", False)
+        # 工作进程数，0 表示使用 CPU 核数
+        self.WORKER_PROCESSES: int = config.get(
+            "worker", {}).get("processes", 0)
+        # 工作进程 Unix socket 目录，为空时使用临时目录
+        self.WORKER_SOCKET_DIR: str = config.get(
+            "worker", {}).get("socket_dir", "")
+        self.WORKER_RESTART_DELAY: float = config.get(
+            "worker", {}).get("restart_delay", 1)
+        self.WORKER_STARTUP_TIMEOUT: float = config.get(
+            "worker", {}).get("startup_timeout", 60)
+
+        # 模板代码内存加载器缓存的代码条数（按替换配置参数后的代码寻址）
+        self.TEMPLATE_CODE_CACHE_SIZE: int = config.get(
+            "template_loader", {}).get("cache_size", 256)
+
+        # 模板扫描设置：并行解析变更模板的进程数，0 表示使用 CPU 核数，
+        # 1 表示在当前进程中解析
+        self.TEMPLATE_SCAN_PROCESSES: int = config.get(
+            "template_scan", {}).get("processes", 0)
+
+        # 服务启动加载设置
+        # 开启后未标记预加载的内置服务在第一个请求到达时才创建
+        self.STARTUP_LAZY_LOAD: bool = config.get(
+            "startup", {}).get("lazy_load", False)
+        # 启动时并发创建服务的线程数
+        self.STARTUP_CONCURRENCY: int = config.get(
+            "startup", {}).get("concurrency", 4)
+
+        # 多进程/多节点共享状态设置（登录缓存、服务变更通知）
+        # 后端：local（进程内）、sqlite（共享文件）、redis（Redis 协议）
+        self.SHARED_STATE_BACKEND: str = config.get(
+            "shared_state", {}).get("backend", "local")
+        # sqlite 后端文件路径，相对路径基于 backend 目录
+        self.SHARED_STATE_SQLITE_PATH: str = config.get(
+            "shared_state", {}).get("sqlite_path", "shared_state.db")
+        self.SHARED_STATE_REDIS_URL: str = config.get(
+            "shared_state", {}).get("redis_url", "redis://127.0.0.1:6379/0")
+        self.SHARED_STATE_KEY_PREFIX: str = config.get(
+            "shared_state", {}).get("key_prefix", "mcp:")
+        # 事件轮询间隔（秒），即其他进程变更的最大传播延迟
+        self.SHARED_STATE_POLL_INTERVAL: float = config.get(
+            "shared_state", {}).get("poll_interval", 1)
+        # 全量对齐间隔（秒），0 表示不做全量对齐
+        self.SHARED_STATE_RESYNC_INTERVAL: float = config.get(
+            "shared_state", {}).get("resync_interval", 60)
+        self.SHARED_STATE_EVENT_RETENTION: int = config.get(
+            "shared_state", {}).get("event_retention", 10000)
+
+        # SSE 会话跨进程转发设置（需配置共享状态后端）
+        # 其他进程访问本进程的地址，如 http://10.0.0.5:8002；为空时使用
+        # socket_dir 下的 Unix socket，只适用于同一台机器上的多个进程
+        self.CLUSTER_ADVERTISE_URL: str = config.get(
+            "cluster", {}).get("advertise_url", "")
+        self.CLUSTER_SOCKET_DIR: str = config.get(
+            "cluster", {}).get("socket_dir", "")
+        # 会话归属记录的有效期（秒），进程异常退出时残留记录到期清除
+        self.CLUSTER_SESSION_TTL: int = config.get(
+            "cluster", {}).get("session_ttl", 86400)
+
+        # 流式HTTP服务会话设置
+        self.STREAMABLE_HTTP_MAX_SESSIONS: int = config.get(
+            "streamable_http", {}).get("max_sessions", 100)
+        # 空闲会话清理时间（秒），0 表示不清理
+        self.STREAMABLE_HTTP_SESSION_IDLE_TIMEOUT: int = config.get(
+            "streamable_http", {}).get("session_idle_timeout", 1800)
+
+        # 第三方服务代理转发设置
+        self.PROXY_CONNECT_TIMEOUT: float = config.get(
+            "proxy", {}).get("connect_timeout", 5)
+        self.PROXY_READ_TIMEOUT: float = config.get(
+            "proxy", {}).get("read_timeout", 300)
+        self.PROXY_MAX_CONNECTIONS: int = config.get(
+            "proxy", {}).get("max_connections", 100)
+        self.PROXY_MAX_KEEPALIVE_CONNECTIONS: int = config.get(
+            "proxy", {}).get("max_keepalive_connections", 20)
+        self.PROXY_KEEPALIVE_EXPIRY: float = config.get(
+            "proxy", {}).get("keepalive_expiry", 30)
+
+        # 第三方服务上游健康探测和熔断设置
+        self.UPSTREAM_FAILURE_THRESHOLD: int = config.get(
+            "upstream", {}).get("failure_threshold", 5)
+        self.UPSTREAM_RECOVERY_TIMEOUT: float = config.get(
+            "upstream", {}).get("recovery_timeout", 30)
+        # 健康探测间隔（秒），0 表示不探测
+        self.UPSTREAM_PROBE_INTERVAL: float = config.get(
+            "upstream", {}).get("probe_interval", 10)
+        self.UPSTREAM_PROBE_TIMEOUT: float = config.get(
+            "upstream", {}).get("probe_timeout", 3)
+        # 健康探测路径（相对上游基础地址，如 /health），为空时对上游地址
+        # 发 HEAD，不建立 SSE 会话
+        self.UPSTREAM_PROBE_PATH: str = config.get(
+            "upstream", {}).get("probe_path", "")
+
+        # MCP鉴权设置
+        self.SECRET_CACHE_TTL: int = config.get("auth", {}).get(
+            "secret_cache_ttl", 60
+        )
 
         # 平台设置
         self.PLATFORM_EGOVA_KB: str = config.get("platform", {}).get(
@@ -3,15 +3,15 @@
 
 使用Starlette实现的身份验证中间件
 """
-from fastapi import Request
+import asyncio
 import requests
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
 from app.services.user import UserService
 from app.utils.response import error_response
 from app.utils.logging import mcp_logger
 from app.core.config import settings
-from app.utils.cache import memory_cache
+from app.utils.shared_state import shared_state
 # 重命名以确保使用正确的PyJWT库
 import jwt as pyjwt
 import time
@@ -27,11 +27,15 @@ EGOVAKB_TOKEN_CACHE_PREFIX = "egovakb_token:"
 USER_TOKEN_CACHE_PREFIX = "user_token:"
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    """认证中间件，验证用户登录状态和权限"""
+class AuthMiddleware:
+    """认证中间件，验证用户登录状态和权限
+
+    纯 ASGI 实现：非 `/api` 路径直接透传，不包装响应，
+    认证通过后用户数据写入 `request.state.user`。
+    """
     
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
+        self.app = app
         # API相关公开路径
         self.public_api_paths = [
             "/auth/login", 
@@ -60,51 +64,50 @@ class AuthMiddleware(BaseHTTPMiddleware):
             ".woff", ".woff2", ".ttf", ".otf"
         ]
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
         """
         处理请求并验证认证
         
         Args:
-            request: 请求对象
-            call_next: 下一个处理器
-            
-        Returns:
-            响应对象
+            scope: ASGI 连接信息
+            receive: ASGI 接收通道
+            send: ASGI 发送通道
         """
-        path = request.url.path
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
         mcp_logger.debug(f"处理请求: {path}")
         
-        # 首先检查是否为API路径 - API路径的处理优先级高于静态资源
-        if path.startswith("/api"):
-            # 如果是API公开路径，直接放行
-            if self._is_public_api_path(path):
-                return await call_next(request)
-                
-            # 否则需要验证认证
-            return await self._authenticate_api_request(request, call_next)
-        
-        # 处理静态资源文件 - 完全不需要认证
-        if self._is_static_resource(path):
-            mcp_logger.debug(f"允许访问静态资源: {path}")
-            return await call_next(request)
-        
-        # 检查SSE路径
-        if self._is_sse_path(path):
-            return await call_next(request)
-            
-        # 其他路径作为前端路由处理，不需要认证
-        return await call_next(request)
+        # 只有API路径需要认证，静态资源、SSE路径和前端路由直接放行
+        if not path.startswith("/api") or self._is_public_api_path(path):
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
+        if shared_state.shared:
+            # 共享状态后端的读写是同步网络/文件IO，放到线程中执行
+            error = await asyncio.to_thread(
+                self._authenticate_api_request, request)
+        else:
+            error = self._authenticate_api_request(request)
+        if error is not None:
+            await error(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
     
-    async def _authenticate_api_request(self, request: Request, call_next):
+    def _authenticate_api_request(self, request: Request):
         """
-        验证API请求的认证信息
+        验证API请求的认证信息，通过后将用户数据写入 request.state.user
         
         Args:
             request: 请求对象
-            call_next: 下一个处理器
             
         Returns:
-            响应对象
+            认证失败时返回错误响应，认证通过返回None
         """
         # 获取认证令牌
         auth_header = request.headers.get("Authorization")
@@ -118,7 +121,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
             
         # 尝试从缓存获取用户数据
         cache_key = USER_TOKEN_CACHE_PREFIX + token
-        cached_user_data = memory_cache.get(cache_key)
+        cached_user_data = shared_state.get(cache_key)
         
         if cached_user_data:
             # 使用缓存的用户数据
@@ -137,7 +140,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
                     # 生成JWT令牌并缓存用户数据
                     jwt_token = self._generate_jwt_token(user_data)
                     # 使用新生成的JWT令牌缓存用户数据
-                    memory_cache.set(
+                    shared_state.set(
                         USER_TOKEN_CACHE_PREFIX + jwt_token,
                         user_data,
                         expire_seconds=ACCESS_TOKEN_EXPIRE_MINUTES * 60
@@ -145,7 +148,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
             
             # 缓存用户数据
             if is_valid:
-                memory_cache.set(
+                shared_state.set(
                     cache_key, 
                     user_data,
                     expire_seconds=ACCESS_TOKEN_EXPIRE_MINUTES * 60
@@ -162,9 +165,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
             
         # 将用户数据添加到请求中
         request.state.user = user_data
-        
-        # 继续处理请求
-        return await call_next(request)
+        return None
     
     def _is_public_api_path(self, path: str) -> bool:
         """检查路径是否为公开API路径"""
@@ -260,7 +261,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
         try:
             # 首先从缓存中查找，避免重复调用接口
             cache_key = EGOVAKB_TOKEN_CACHE_PREFIX + token
-            cached_user_data = memory_cache.get(cache_key)
+            cached_user_data = shared_state.get(cache_key)
             
             if cached_user_data:
                 mcp_logger.debug("使用缓存的EGova KB令牌数据")
@@ -348,7 +349,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
                 }
             
             # 缓存用户数据
-            memory_cache.set(
+            shared_state.set(
                 cache_key, 
                 result_data,
                 expire_seconds=ACCESS_TOKEN_EXPIRE_MINUTES * 60
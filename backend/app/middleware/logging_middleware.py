@@ -5,37 +5,54 @@
 """
 
 import time
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from ..utils.logging import log_api_call
 
 
-class APILoggingMiddleware(BaseHTTPMiddleware):
-    """API日志中间件，记录所有API请求和响应"""
-    
+class APILoggingMiddleware:
+    """API日志中间件，记录所有API请求和响应
+
+    纯 ASGI 实现，只观察 `http.response.start` 取得状态码，不包装响应体，
+    SSE / 流式 HTTP 长连接在响应头发出时即记录日志。
+    """
+
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
-    
-    async def dispatch(self, request: Request, call_next):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
         """
         处理请求并记录日志
-        
+
         Args:
-            request: 请求对象
-            call_next: 下一个处理器
-            
-        Returns:
-            响应对象
-        """        
+            scope: ASGI 连接信息
+            receive: ASGI 接收通道
+            send: ASGI 发送通道
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         start_time = time.time()
+        logged = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal logged
+            if message["type"] == "http.response.start" and not logged:
+                logged = True
+                # 记录响应日志
+                log_api_call(
+                    Request(scope),
+                    status_code=message["status"],
+                    start_time=start_time
+                )
+            await send(message)
+
         try:
-            # 处理请求
-            response = await call_next(request)
-            # 记录响应日志
-            log_api_call(request, response, start_time=start_time)
-            return response
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            # 记录异常日志
-            log_api_call(request, error=e, start_time=start_time)
-            raise 
\ No newline at end of file
+            if not logged:
+                # 记录异常日志
+                log_api_call(Request(scope), error=e, start_time=start_time)
+            raise
@@ -6,52 +6,72 @@ MCP认证中间件
 
 import re
 from typing import Optional, Dict, Any
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from app.models.engine import get_db
-from app.models.modules.published_service import McpService
-from app.models.auth.published_service_secret import McpServiceSecret
-from app.models.auth.published_service_secret_statistics import McpSecretStatistics
+from app.repositories.published_service_repository import (
+    PublishedServiceRepository
+)
 from app.services.auth.secret_manager import SecretManager
+from app.services.published_service.service_index import service_index
+from app.services.published_service.sse_session_router import (
+    sse_session_router
+)
 from app.utils.logging import mcp_logger
-from sqlalchemy import and_
-from datetime import date
 
 from app.utils.response import error_response
 from app.utils.const.error_code import error_code
 
 
-class McpAuthMiddleware(BaseHTTPMiddleware):
-    """MCP认证中间件"""
+class McpAuthMiddleware:
+    """MCP认证中间件
 
-    def __init__(self, app):
-        super().__init__(app)
+    纯 ASGI 实现，非 MCP 路径直接透传；鉴权通过后不包装响应，
+    SSE / 流式 HTTP 长连接的消息直接发给客户端。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
         # MCP服务路径正则模式
         self.mcp_pattern = re.compile(r'^/mcp-([a-f0-9\-]+)(/|$)')
         self.custom_mcp_pattern = re.compile(
             r'^/mcp(/.*)?(/sse|/stream|/messages)/?$'
         )
 
-    async def dispatch(self, request: Request, call_next) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
         """处理请求拦截"""
-        path = request.url.path
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
 
         # 检查是否为MCP服务请求
         if not self._is_mcp_request(path):
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
+
+        # 其他进程转发来的 SSE 消息，入口进程已完成鉴权和访问日志
+        if sse_session_router.is_forwarded(scope):
+            sse_session_router.apply_forwarded_state(scope)
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
 
         # 提取服务信息
         service_info = self._extract_service_info(path, request)
         if not service_info:
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
         service_id = service_info.get('service_id')
 
         # 检查服务鉴权配置
         auth_result, secret_info = self._check_service_auth(
-            service_id, request)
+            service_info.get('service'), request)
 
         # 记录访问日志
         client_ip = self._get_client_ip(request)
@@ -59,15 +79,19 @@ class McpAuthMiddleware(BaseHTTPMiddleware):
         request_headers = dict(request.headers)
 
         if auth_result == error_code.SUCCESS:
+            secret_id = (
+                secret_info.get('id')
+                if isinstance(secret_info, dict) and secret_info.get('id')
+                else None
+            )
+            if secret_id is not None:
+                # 供 MCP 服务内的工具埋点关联调用方密钥
+                scope.setdefault('state', {})['mcp_secret_id'] = secret_id
+
             # 鉴权成功，记录成功日志
             SecretManager.log_access(
                 service_id=service_id,
-                secret_id=(
-                    secret_info.get('id')
-                    if isinstance(secret_info, dict)
-                    and secret_info.get('id')
-                    else None
-                ),
+                secret_id=secret_id,
                 client_ip=client_ip,
                 user_agent=user_agent,
                 success=True,
@@ -75,7 +99,7 @@ class McpAuthMiddleware(BaseHTTPMiddleware):
             )
 
             # 继续处理请求
-            return await call_next(request)
+            await self.app(scope, receive, send)
         else:
             # 鉴权失败，记录失败日志
             SecretManager.log_access(
@@ -89,7 +113,7 @@ class McpAuthMiddleware(BaseHTTPMiddleware):
             )
 
             # 返回鉴权失败响应
-            return error_response(
+            response = error_response(
                 message=(
                     error_code.to_message(auth_result)
                     if secret_info is None
@@ -99,9 +123,14 @@ class McpAuthMiddleware(BaseHTTPMiddleware):
                 code=auth_result,
                 http_status_code=401
             )
+            await response(scope, receive, send)
 
     def _is_mcp_request(self, path: str) -> bool:
         """检查是否为MCP服务请求"""
+        # API、静态资源等非 /mcp 前缀路径只可能是完全自定义路径
+        if not path.startswith('/mcp'):
+            return self._is_custom_service_path(path)
+
         # 标准MCP路径: /mcp-{uuid}/sse 或 /mcp-{uuid}/stream
         if self.mcp_pattern.match(path):
             return True
@@ -110,17 +139,20 @@ class McpAuthMiddleware(BaseHTTPMiddleware):
         if self.custom_mcp_pattern.match(path):
             return True
 
-        # 检查是否为完全自定义路径（从数据库查询）
+        # 检查是否为完全自定义路径
         return self._is_custom_service_path(path)
 
     def _is_custom_service_path(self, path: str) -> bool:
         """检查是否为完全自定义的服务路径"""
+        # 索引已构建时直接查内存，不访问数据库
+        if service_index.loaded:
+            return service_index.has_path(path)
+
         try:
             with get_db() as db:
                 # 查询是否有服务使用此自定义路径
-                service = db.query(McpService).filter(
-                    McpService.sse_url == path
-                ).first()
+                service = PublishedServiceRepository.get_service_by_path(
+                    db, path)
                 return service is not None
         except Exception:
             return False
@@ -129,94 +161,87 @@ class McpAuthMiddleware(BaseHTTPMiddleware):
                               request: Request) -> Optional[Dict[str, Any]]:
         """提取服务信息"""
         try:
-            with get_db() as db:
-                # 直接通过路径查找服务
-                service = db.query(McpService).filter(
-                    McpService.sse_url == path
-                ).first()
-
+            if service_index.loaded:
+                # 直接通过路径查找服务，再尝试匹配标准路径模式
+                service = service_index.get_by_path(path)
                 if not service:
-                    # 尝试匹配标准路径模式
                     match = self.mcp_pattern.match(path)
                     if match:
-                        service_uuid = match.group(1)
-                        service = db.query(McpService).filter(
-                            McpService.service_uuid == service_uuid
-                        ).first()
-
-                if service:
-                    return {
-                        'service_id': service.id,
-                        'service_uuid': service.service_uuid,
-                        'service': service
-                    }
+                        service = service_index.get_by_uuid(match.group(1))
+            else:
+                service = self._load_service_entry(path)
 
-                return None
+            if service:
+                return {
+                    'service_id': service['service_id'],
+                    'service_uuid': service['service_uuid'],
+                    'service': service
+                }
+
+            return None
         except Exception as e:
             mcp_logger.error(f"提取服务信息失败: {str(e)}")
             return None
 
-    def _check_service_auth(self, service_id: int,
+    def _load_service_entry(self, path: str) -> Optional[Dict[str, Any]]:
+        """索引未构建时从数据库加载服务元数据"""
+        with get_db() as db:
+            service = PublishedServiceRepository.get_service_by_path(db, path)
+
+            if not service:
+                match = self.mcp_pattern.match(path)
+                if match:
+                    service = PublishedServiceRepository.get_service_by_uuid(
+                        db, match.group(1))
+
+            if not service:
+                return None
+            return {
+                'service_id': service.id,
+                'service_uuid': service.service_uuid,
+                'auth_required': bool(service.auth_required),
+                'auth_mode': service.auth_mode or '',
+                'enabled': bool(service.enabled),
+            }
+
+    def _check_service_auth(self, service: Dict[str, Any],
                             request: Request) -> tuple[int, str]:
-        """检查服务鉴权"""
+        """检查服务鉴权
+
+        Args:
+            service: 服务元数据，来自服务解析索引
+            request: 请求对象
+        """
         try:
-            with get_db() as db:
-                service = db.query(McpService).filter(
-                    McpService.id == service_id
-                ).first()
+            if not service:
+                return error_code.HTTP_NOT_FOUND, ''
 
-                if not service:
-                    return error_code.HTTP_NOT_FOUND, ''
-
-                # 如果不需要鉴权或鉴权模式为空，直接通过
-                if not service.auth_required or not service.auth_mode:
-                    return error_code.SUCCESS, ''
-
-                # 提取密钥
-                secret = self._extract_auth_header(request)
-                if not secret:
-                    secret = self._extract_auth_query(request)
-
-                if not secret:
-                    return error_code.AUTH_KEY_REQUIRED, ''
-
-                # 验证密钥
-                result, secret_info = SecretManager.validate_secret(
-                    service_id, secret)
-
-                if result != error_code.SUCCESS:
-                    return result, secret_info
-
-                if not secret_info:
-                    # 检查是否是调用次数超限
-                    secret_record = db.query(McpServiceSecret).filter(
-                        and_(
-                            McpServiceSecret.service_id == service_id,
-                            McpServiceSecret.secret_key == secret,
-                            McpServiceSecret.is_active.is_(True)
-                        )
-                    ).first()
-
-                    if secret_record and secret_record.limit_count > 0:
-                        # 获取今日调用次数
-                        today = date.today()
-                        today_stats = db.query(McpSecretStatistics).filter(
-                            and_(
-                                McpSecretStatistics.secret_id ==
-                                secret_record.id,
-                                McpSecretStatistics.statistics_date == today
-                            )
-                        ).first()
-
-                        current_calls = (today_stats.call_count
-                                         if today_stats else 0)
-
-                        if current_calls >= secret_record.limit_count:
-                            return error_code.AUTH_KEY_LIMIT_EXCEEDED, ''
-
-                    return error_code.AUTH_KEY_INVALID, ''
-
-                return error_code.SUCCESS, secret_info
+            # 如果不需要鉴权或鉴权模式为空，直接通过
+            if not service['auth_required'] or not service['auth_mode']:
+                return error_code.SUCCESS, ''
+
+            service_id = service['service_id']
+
+            # 提取密钥
+            secret = self._extract_auth_header(request)
+            if not secret:
+                secret = self._extract_auth_query(request)
+
+            if not secret:
+                return error_code.AUTH_KEY_REQUIRED, ''
+
+            # 验证密钥
+            result, secret_info = SecretManager.validate_secret(
+                service_id, secret)
+
+            if result != error_code.SUCCESS:
+                return result, secret_info
+
+            if not secret_info:
+                # 密钥不存在或未激活（过期、超限已由 validate_secret 判断）
+                return error_code.AUTH_KEY_INVALID, ''
+
+            return error_code.SUCCESS, secret_info
 
         except Exception as e:
             mcp_logger.error(f"鉴权检查失败: {str(e)}")
@@ -7,122 +7,163 @@ MCP工具执行中间件
 import json
 import time
 import re
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-from starlette.responses import Response
-from starlette.datastructures import MutableHeaders
+from typing import Any, Dict, List, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from ..core.config import settings
 from ..utils.logging import mcp_logger
+from ..models.modules.published_service import ServiceType
 from ..services.history.service import HistoryService
-from ..models.engine import get_db
-from ..models.modules.published_service import McpService
+from ..services.published_service.service_index import service_index
 
 
-class ToolExecutionMiddleware(BaseHTTPMiddleware):
-    """MCP工具执行中间件，拦截MCP工具调用并记录执行信息"""
+class _ToolCallPeek:
+    """旁路观察请求体分片，在上限内保留请求体用于识别 tools/call"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.chunks: List[bytes] = []
+        self.size = 0
+        # 超过上限后不再保留
+        self.active = True
+        self.complete = False
+
+    def feed(self, message: Message) -> None:
+        """处理一个 http.request 消息"""
+        if not self.active or message["type"] != "http.request":
+            return
+        chunk = message.get("body", b"")
+        self.size += len(chunk)
+        if self.size > self.limit:
+            self.active = False
+            self.chunks = []
+            return
+        if chunk:
+            self.chunks.append(chunk)
+        if not message.get("more_body", False):
+            self.complete = True
+
+    def tool_call(self) -> Optional[Dict[str, Any]]:
+        """请求体是 tools/call 调用时返回 JSON-RPC 请求，否则返回None"""
+        if not self.active or not self.complete:
+            return None
+        body_bytes = b"".join(self.chunks)
+        # 先做字节匹配，非 tools/call 消息不解析 JSON
+        if b'"tools/call"' not in body_bytes:
+            return None
+        try:
+            body = json.loads(body_bytes)
+        except ValueError as e:
+            mcp_logger.warning(f"解析请求体时出错: {str(e)}")
+            return None
+        if isinstance(body, dict) and body.get("method") == "tools/call":
+            return body
+        return None
+
+
+class ToolExecutionMiddleware:
+    """MCP工具执行中间件，拦截MCP工具调用并记录执行信息
+
+    纯 ASGI 实现：只旁路观察 `/mcp-{uuid}/messages` 的 POST 请求体，
+    请求体分片原样交给下游，不缓冲、不重复读取；超过
+    `tool_execution.peek_max_bytes` 的请求体不做识别。执行记录放入
+    异步写入队列，不在请求路径上访问数据库。
+
+    内置服务（基于模板）的工具由 `tool_instrumentation.instrument_tool`
+    在服务内部记录真实执行耗时，这里只记录第三方服务和未知服务的调用。
+    """
 
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
+        self.app = app
         self.history_service = HistoryService()
+        self.peek_max_bytes = settings.TOOL_CALL_PEEK_MAX_BYTES
+        self.service_uuid_pattern = re.compile(r'/mcp-([^/]+)')
 
-    async def dispatch(self, request: Request, call_next) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
         """
         处理请求并记录MCP工具执行信息
 
         Args:
-            request: 请求对象
-            call_next: 下一个处理器
-
-        Returns:
-            响应对象
+            scope: ASGI 连接信息
+            receive: ASGI 接收通道
+            send: ASGI 发送通道
         """
         # 检查是否是MCP工具调用路径
-        path = request.url.path
-        # 克隆请求体以便多次读取
-        body_bytes = await request.body()
-        if not self._is_tool_execution_path(path, body_bytes):
-            return await call_next(request)
+        path = scope.get("path", "")
+        if (scope["type"] != "http" or scope["method"] != "POST"
+                or not self._is_message_path(path)):
+            await self.app(scope, receive, send)
+            return
+
+        peek = _ToolCallPeek(self.peek_max_bytes)
+
+        async def peek_receive() -> Message:
+            message = await receive()
+            peek.feed(message)
+            return message
 
         start_time = time.time()
-        tool_name = None
-        parameters = {}
-        result = None
         status = "success"
+        try:
+            # 处理请求
+            await self.app(scope, peek_receive, send)
+        except Exception as e:
+            mcp_logger.error(f"处理MCP工具执行时出错: {str(e)}")
+            status = "error"
+            raise
+        finally:
+            # 计算执行时间
+            execution_time = int((time.time() - start_time) * 1000)  # 转换为毫秒
+            self._record(path, peek, status, execution_time)
+
+    def _is_message_path(self, path: str) -> bool:
+        """检查路径是否为MCP服务消息路径"""
+        return "/messages" in path and "mcp-" in path
+
+    def _record(self, path: str, peek: _ToolCallPeek, status: str,
+                execution_time: int) -> None:
+        """识别 tools/call 调用并提交执行记录"""
+        body = peek.tool_call()
+        if body is None:
+            if not peek.active:
+                mcp_logger.debug(
+                    f"{path} 请求体超过 {self.peek_max_bytes} 字节，"
+                    f"不记录工具执行")
+            return
+
+        params = body.get("params") or {}
+        tool_name = params.get("name")
+        if not tool_name:
+            return
+
+        # 提取 service_id，并从服务解析索引获取关联的模块 ID
         service_id = None
         module_id = None
-
-        # 提取 service_id
-        service_id_match = re.search(r'/mcp-([^/]+)', path)
+        service_id_match = self.service_uuid_pattern.search(path)
         if service_id_match:
             service_id = service_id_match.group(1)
+            service = service_index.get_by_uuid(service_id)
+            if service:
+                # 内置服务的工具在 MCP 服务内埋点记录，这里不再重复记录
+                if service.get("service_type") == ServiceType.LOCAL.value:
+                    return
+                module_id = service.get("module_id")
 
-            # 根据 service_id 查找关联的模块 ID
-            try:
-                with get_db() as db:
-                    service = db.query(McpService).filter(
-                        McpService.service_uuid == service_id
-                    ).first()
-                    if service:
-                        module_id = service.module_id
-            except Exception as e:
-                mcp_logger.warning(f"查询服务关联模块时出错: {str(e)}")
-            try:
-                # 尝试获取请求参数
-                if request.method in ["POST", "PUT"]:
-                    try:
-                        body = json.loads(body_bytes)
-                        mcp_logger.info(f"{path} 请求体: {body}")
-
-                        method = body.get("method")
-                        if method == "tools/call":
-                            params = body.get("params", {})
-                            tool_name = params.get("name")
-                            parameters = params.get("arguments", {})
-                    except Exception as e:
-                        mcp_logger.warning(f"解析请求体时出错: {str(e)}")
-                # 处理请求
-                return await call_next(request)
-            except Exception as e:
-                mcp_logger.error(f"处理MCP工具执行时出错: {str(e)}")
-                status = "error"
-                # 继续处理请求，不中断
-                return await call_next(request)
-            finally:
-                # 计算执行时间
-                execution_time = int((time.time() - start_time) * 1000)  # 转换为毫秒
-
-                # 记录工具执行
-                if tool_name:
-                    try:
-                        self.history_service.record_tool_execution(
-                            tool_name=tool_name,
-                            service_id=service_id,
-                            module_id=module_id,
-                            description=f"执行工具 {tool_name}",
-                            parameters=parameters,
-                            result=None,
-                            status=status,
-                            execution_time=execution_time
-                        )
-                        mcp_logger.info(
-                            f"记录工具执行: {tool_name}, 服务: {service_id}, "
-                            f"模块: {module_id}, 状态: {status}, "
-                            f"执行时间: {execution_time}ms"
-                        )
-                    except Exception as e:
-                        mcp_logger.error(f"记录工具执行时出错: {str(e)}")
-
-    def _is_tool_execution_path(self, path: str, body_bytes: bytes) -> bool:
-        """检查路径是否为MCP工具执行路径"""
-        if "/messages" in path and "mcp-" in path:
-            # 尝试获取请求参数
-            try:
-                body = json.loads(body_bytes)
-                method = body.get("method")
-                if method == "tools/call":
-                    return True
-            except Exception as e:
-                mcp_logger.warning(f"解析请求体时出错: {str(e)}")
-                return False
-        return False
+        # 记录工具执行
+        queued = self.history_service.submit_tool_execution(
+            tool_name=tool_name,
+            service_id=service_id,
+            module_id=module_id,
+            description=f"执行工具 {tool_name}",
+            parameters=params.get("arguments", {}),
+            result=None,
+            status=status,
+            execution_time=execution_time
+        )
+        if queued:
+            mcp_logger.debug(
+                f"记录工具执行: {tool_name}, 服务: {service_id}, "
+                f"模块: {module_id}, 状态: {status}, "
+                f"执行时间: {execution_time}ms"
+            )
@@ -70,6 +70,23 @@ class McpSecretStatistics(Base):
             self.error_count += 1
         self.last_access_at = datetime.now()
 
+    def apply_delta(self, call_count, success_count, error_count,
+                    last_access_at=None):
+        """批量累加调用计数
+
+        Args:
+            call_count: 新增调用次数
+            success_count: 新增成功次数
+            error_count: 新增错误次数
+            last_access_at: 最后访问时间
+        """
+        self.call_count = (self.call_count or 0) + call_count
+        self.success_count = (self.success_count or 0) + success_count
+        self.error_count = (self.error_count or 0) + error_count
+        if last_access_at and (self.last_access_at is None
+                               or last_access_at > self.last_access_at):
+            self.last_access_at = last_access_at
+
     def to_dict(self):
         """转换为字典格式"""
         return {
@@ -49,7 +49,9 @@ def init_db():
     # 导入统计相关模型
     from app.models.statistics import (  # noqa: F401
         ServiceStatistics, ModuleStatistics,
-        ToolStatistics, ServiceCallStatistics
+        ToolStatistics, ServiceCallStatistics, StatisticsWatermark,
+        StatisticsRollupMinute, StatisticsRollupHour, StatisticsRollupDay,
+        LatencyHistogramMinute, LatencyHistogramHour, LatencyHistogramDay
     )
 
     # Seed 初始化统一由服务层编排。
@@ -0,0 +1,31 @@
+"""迁移脚本：为按创建时间统计的表补充 created_at 索引。"""
+from app.models.engine.migrations._helpers import create_index_if_needed
+from app.utils.logging import mcp_logger
+
+
+# (表名, 索引名)，索引名与模型 index=True 生成的名称一致
+CREATED_AT_INDEXES = (
+    ("tool_executions", "ix_tool_executions_created_at"),
+    ("mcp_templates", "ix_mcp_templates_created_at"),
+    ("mcp_template_groups", "ix_mcp_template_groups_created_at"),
+)
+
+
+def run(db):
+    """创建缺失的 created_at 索引；表不存在（新库由建表时创建）或已存在时跳过。"""
+    try:
+        created_indexes = []
+        for table_name, index_name in CREATED_AT_INDEXES:
+            if create_index_if_needed(db, table_name, index_name, "created_at"):
+                created_indexes.append(index_name)
+
+        db.commit()
+
+        if created_indexes:
+            mcp_logger.info("created_at 索引创建完成: " + ", ".join(created_indexes))
+        else:
+            mcp_logger.info("created_at 索引已存在，无需迁移")
+    except Exception as e:
+        db.rollback()
+        mcp_logger.error(f"created_at 索引迁移失败：{str(e)}")
+        raise
@@ -36,3 +36,28 @@ def rename_table_if_needed(db, old_name: str, new_name: str) -> bool:
     new_table = quote_identifier(db, new_name)
     db.execute(text(f"ALTER TABLE {old_table} RENAME TO {new_table}"))
     return True
+
+
+def index_exists(db, table_name: str, index_name: str) -> bool:
+    """检查索引是否存在。"""
+    inspector = inspect(db.get_bind())
+    return any(
+        index["name"] == index_name
+        for index in inspector.get_indexes(table_name)
+    )
+
+
+def create_index_if_needed(
+        db, table_name: str, index_name: str, *columns: str) -> bool:
+    """表存在且索引不存在时创建索引。"""
+    if not table_exists(db, table_name):
+        return False
+    if index_exists(db, table_name, index_name):
+        return False
+
+    column_list = ", ".join(quote_identifier(db, column) for column in columns)
+    db.execute(text(
+        f"CREATE INDEX {quote_identifier(db, index_name)} "
+        f"ON {quote_identifier(db, table_name)} ({column_list})"
+    ))
+    return True
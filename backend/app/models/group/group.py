@@ -9,7 +9,7 @@ from sqlalchemy import (
 )
 
 from app.models.engine import Base
-from app.core.utils import now_beijing
+from app.core.utils import now_beijing, now_beijing_datetime
 
 
 class McpGroup(Base):
@@ -21,7 +21,7 @@ class McpGroup(Base):
     description = Column(Text, nullable=True)  # 分组描述
     icon = Column(String(200), nullable=True)  # 分组图标
     order = Column(Integer, default=0)  # 排序序号
-    created_at = Column(DateTime, default=now_beijing())
+    created_at = Column(DateTime, default=now_beijing_datetime(), index=True)
     updated_at = Column(DateTime, default=now_beijing())
     user_id = Column(Integer, nullable=True, index=True)  # 创建者ID
 
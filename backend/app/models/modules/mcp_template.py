@@ -6,7 +6,7 @@ from sqlalchemy import (
     Column, Integer, String, Text, Boolean, DateTime
 )
 from app.models.engine import Base
-from app.core.utils import now_beijing
+from app.core.utils import now_beijing, now_beijing_datetime
 import json
 
 from app.models.group.group import McpGroup
@@ -28,13 +28,15 @@ class McpModule(Base):
     is_hosted = Column(Boolean, default=False)  # 是否为托管模块
     repository_url = Column(String(200))  # 代码仓库地址
     category_id = Column(Integer, nullable=True, index=True)  # 分组ID
-    created_at = Column(DateTime, default=now_beijing())
+    created_at = Column(DateTime, default=now_beijing_datetime(), index=True)
     updated_at = Column(DateTime, default=now_beijing())
     code = Column(Text)  # 模块代码
     config_schema = Column(Text)  # 配置项模式，用于存储key, secret等字段的配置模式，JSON格式
     markdown_docs = Column(Text)  # 模块的Markdown格式文档内容
     user_id = Column(Integer, nullable=True, index=True)  # 创建者ID
     is_public = Column(Boolean, default=True)  # 是否公开，True为公开，False为私有
+    # 上次扫描工具时的代码摘要（sha256），代码未变化的模块扫描时跳过
+    tools_code_hash = Column(String(64), nullable=True)
 
     def to_dict(self, mcp_template_groups: Dict[int, 'McpGroup'] = None):
         """转换为字典格式"""
@@ -40,6 +40,11 @@ class McpService(Base):
     # 新增代理转发相关字段
     proxy_enabled = Column(Boolean, default=False)  # 是否启用代理转发
     custom_proxy_path = Column(String(255), nullable=True)  # 自定义代理路由路径
+    upstream_urls = Column(Text, nullable=True)  # 代理转发的上游地址列表（JSON），为空时只使用sse_url
+    upstream_strategy = Column(String(20), default='round_robin')  # 上游选择策略: round_robin, least_in_flight
+
+    # 启动时是否预加载，开启 startup.lazy_load 时未预加载的服务在首个请求时创建
+    eager_load = Column(Boolean, default=False)
 
     # 关系定义
     secrets = []
@@ -56,6 +61,17 @@ class McpService(Base):
             result = db.execute(sql).first()
             return result[0] if result else None
 
+    def get_upstream_urls(self):
+        """获取代理转发的上游地址列表，未配置时为 [sse_url]"""
+        if self.upstream_urls:
+            try:
+                urls = json.loads(self.upstream_urls)
+                if isinstance(urls, list) and urls:
+                    return urls
+            except (json.JSONDecodeError, TypeError):
+                pass
+        return [self.sse_url]
+
     def get_user_name(self):
         """获取创建者用户名"""
         if not self.user_id:
@@ -163,5 +179,8 @@ class McpService(Base):
             "active_secrets_count": self.get_active_secrets_count() if show_secret_count else None,
             # 代理转发相关字段
             "proxy_enabled": self.proxy_enabled,
-            "custom_proxy_path": self.custom_proxy_path
+            "custom_proxy_path": self.custom_proxy_path,
+            "upstream_urls": self.get_upstream_urls(),
+            "upstream_strategy": self.upstream_strategy or "round_robin",
+            "eager_load": bool(self.eager_load)
         }
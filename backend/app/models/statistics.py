@@ -4,7 +4,10 @@
 用于存储和查询MCP服务和工具调用统计数据
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Date
+from sqlalchemy import (
+    BigInteger, Column, Integer, String, DateTime, Date, Text,
+    UniqueConstraint
+)
 from datetime import datetime, date
 
 from .engine import Base
@@ -104,6 +107,10 @@ class ModuleStatistics(Base):
     service_count = Column(Integer, default=0)
     user_id = Column(Integer, index=True)
     user_name = Column(String(50))
+    # 模块下工具调用计数（按 tool_executions.module_id 增量累加）
+    call_count = Column(Integer, default=0)
+    success_count = Column(Integer, default=0)
+    error_count = Column(Integer, default=0)
     updated_at = Column(
         DateTime, 
         default=datetime.utcnow, 
@@ -119,6 +126,9 @@ class ModuleStatistics(Base):
             "service_count": self.service_count,
             "user_id": self.user_id,
             "user_name": self.user_name,
+            "call_count": self.call_count or 0,
+            "success_count": self.success_count or 0,
+            "error_count": self.error_count or 0,
             "updated_at": (
                 self.updated_at.strftime("%Y-%m-%d %H:%M:%S")
                 if self.updated_at else None
@@ -137,6 +147,9 @@ class ToolStatistics(Base):
     success_count = Column(Integer, default=0)
     error_count = Column(Integer, default=0)
     avg_execution_time = Column(Integer, default=0)  # 毫秒
+    # 平均执行时间按 总和 / 有耗时的记录数 累加维护
+    execution_time_sum = Column(BigInteger, default=0)  # 毫秒
+    execution_time_count = Column(Integer, default=0)
     last_called_at = Column(DateTime, nullable=True)
     updated_at = Column(
         DateTime, 
@@ -176,6 +189,9 @@ class ServiceCallStatistics(Base):
     call_count = Column(Integer, default=0)
     success_count = Column(Integer, default=0)
     error_count = Column(Integer, default=0)
+    # 访问日志计数（published_service_access_logs，非 success 计为失败）
+    access_count = Column(Integer, default=0)
+    access_error_count = Column(Integer, default=0)
     updated_at = Column(
         DateTime, 
         default=datetime.utcnow, 
@@ -192,8 +208,155 @@ class ServiceCallStatistics(Base):
             "call_count": self.call_count,
             "success_count": self.success_count,
             "error_count": self.error_count,
+            "access_count": self.access_count or 0,
+            "access_error_count": self.access_error_count or 0,
             "updated_at": (
                 self.updated_at.strftime("%Y-%m-%d %H:%M:%S")
                 if self.updated_at else None
             )
-        } 
\ No newline at end of file
+        }
+
+
+class StatisticsWatermark(Base):
+    """统计增量聚合水位
+
+    记录每个数据源（tool_executions、published_service_access_logs）已汇总
+    到统计表的最大记录 ID，定时刷新只处理 ID 大于水位的新记录。
+    """
+
+    __tablename__ = "statistics_watermarks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String(64), unique=True, index=True)
+    last_id = Column(BigInteger, default=0)
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow
+    )
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            "source": self.source,
+            "last_id": self.last_id,
+            "updated_at": (
+                self.updated_at.strftime("%Y-%m-%d %H:%M:%S")
+                if self.updated_at else None
+            )
+        }
+
+
+class _StatisticsRollup:
+    """时间桶汇总的公共字段
+
+    按 (bucket, source, service_id, tool_name, secret_id, status) 汇总工具
+    执行记录（source=execution）和访问日志（source=access）。维度为空时
+    存空字符串 / 0，保证唯一约束生效。
+    """
+
+    id = Column(Integer, primary_key=True)
+    # 时间桶起点（与原始记录相同的北京时间），按时间范围查询走唯一约束
+    # 的前缀索引
+    bucket = Column(DateTime, nullable=False)
+    source = Column(String(20), nullable=False, default="")
+    # 服务 UUID（McpService.service_uuid）
+    service_id = Column(String(100), nullable=False, default="")
+    tool_name = Column(String(100), nullable=False, default="")
+    secret_id = Column(Integer, nullable=False, default=0)
+    status = Column(String(20), nullable=False, default="")
+    call_count = Column(Integer, default=0)
+    error_count = Column(Integer, default=0)
+    # 执行耗时总和 / 有耗时的记录数（毫秒，访问日志为 0）
+    latency_sum = Column(BigInteger, default=0)
+    latency_count = Column(Integer, default=0)
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            "bucket": self.bucket.strftime("%Y-%m-%d %H:%M:%S"),
+            "source": self.source,
+            "service_id": self.service_id,
+            "tool_name": self.tool_name,
+            "secret_id": self.secret_id,
+            "status": self.status,
+            "call_count": self.call_count,
+            "error_count": self.error_count,
+            "latency_sum": self.latency_sum,
+            "latency_count": self.latency_count,
+        }
+
+
+def _rollup_key(table_name: str) -> UniqueConstraint:
+    return UniqueConstraint(
+        "bucket", "source", "service_id", "tool_name", "secret_id", "status",
+        name=f"uq_{table_name}_key"
+    )
+
+
+class StatisticsRollupMinute(_StatisticsRollup, Base):
+    """按分钟汇总的调用统计"""
+
+    __tablename__ = "statistics_rollup_minute"
+    __table_args__ = (_rollup_key(__tablename__),)
+
+
+class StatisticsRollupHour(_StatisticsRollup, Base):
+    """按小时汇总的调用统计"""
+
+    __tablename__ = "statistics_rollup_hour"
+    __table_args__ = (_rollup_key(__tablename__),)
+
+
+class StatisticsRollupDay(_StatisticsRollup, Base):
+    """按天汇总的调用统计"""
+
+    __tablename__ = "statistics_rollup_day"
+    __table_args__ = (_rollup_key(__tablename__),)
+
+
+class _LatencyHistogram:
+    """执行耗时直方图的公共字段
+
+    按 (bucket, service_id, tool_name) 保存工具执行耗时的对数分桶直方图，
+    编码见 `app.services.statistics.latency_histogram`。
+    """
+
+    id = Column(Integer, primary_key=True)
+    bucket = Column(DateTime, nullable=False)
+    # 服务 UUID，直接调用主服务工具时为空字符串
+    service_id = Column(String(100), nullable=False, default="")
+    tool_name = Column(String(100), nullable=False, default="")
+    # 记录数、耗时总和、最大耗时（毫秒）
+    count = Column(Integer, default=0)
+    latency_sum = Column(BigInteger, default=0)
+    max_latency = Column(Integer, default=0)
+    # 非零桶 [[桶序号, 次数], ...]
+    histogram = Column(Text, nullable=False, default="[]")
+
+
+def _histogram_key(table_name: str) -> UniqueConstraint:
+    return UniqueConstraint(
+        "bucket", "service_id", "tool_name", name=f"uq_{table_name}_key"
+    )
+
+
+class LatencyHistogramMinute(_LatencyHistogram, Base):
+    """按分钟的执行耗时直方图"""
+
+    __tablename__ = "latency_histogram_minute"
+    __table_args__ = (_histogram_key(__tablename__),)
+
+
+class LatencyHistogramHour(_LatencyHistogram, Base):
+    """按小时的执行耗时直方图"""
+
+    __tablename__ = "latency_histogram_hour"
+    __table_args__ = (_histogram_key(__tablename__),)
+
+
+class LatencyHistogramDay(_LatencyHistogram, Base):
+    """按天的执行耗时直方图"""
+
+    __tablename__ = "latency_histogram_day"
+    __table_args__ = (_histogram_key(__tablename__),)
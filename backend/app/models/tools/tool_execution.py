@@ -5,7 +5,7 @@ from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
 import json
 
 from app.models.engine import Base
-from app.core.utils import now_beijing
+from app.core.utils import now_beijing, now_beijing_datetime
 
 
 class ToolExecution(Base):
@@ -20,8 +20,15 @@ class ToolExecution(Base):
     parameters = Column(Text)  # JSON格式存储参数
     result = Column(Text)      # JSON格式存储结果
     status = Column(String(20))  # success 或 error
-    created_at = Column(DateTime, default=now_beijing())
+    # 默认值传可调用对象，每条记录取写入时的时间（统计按该列区分今日）
+    created_at = Column(DateTime, default=now_beijing_datetime(), index=True)
     execution_time = Column(Integer)  # 毫秒
+    cpu_time = Column(Integer, nullable=True)  # 工具自身占用的CPU时间（毫秒）
+    args_size = Column(Integer, nullable=True)  # 参数序列化后的字节数
+    result_size = Column(Integer, nullable=True)  # 结果序列化后的字节数
+    session_id = Column(String(100), nullable=True)  # 调用方MCP会话ID
+    secret_id = Column(Integer, nullable=True)  # 调用方使用的密钥ID
+    error_message = Column(Text, nullable=True)  # 执行失败时的异常信息
 
     def to_dict(self):
         """转换为字典格式"""
@@ -35,5 +42,11 @@ class ToolExecution(Base):
             "result": json.loads(self.result) if self.result else None,
             "status": self.status,
             "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-            "execution_time": self.execution_time
+            "execution_time": self.execution_time,
+            "cpu_time": self.cpu_time,
+            "args_size": self.args_size,
+            "result_size": self.result_size,
+            "session_id": self.session_id,
+            "secret_id": self.secret_id,
+            "error_message": self.error_message
         }
@@ -2,13 +2,19 @@
 from .mcp_auth_repository import McpAuthRepository
 from .mcp_template_group_repository import McpTemplateGroupRepository
 from .mcp_template_repository import McpTemplateRepository
+from .published_service_repository import PublishedServiceRepository
+from .statistics_repository import StatisticsRepository
 from .tenant_repository import TenantRepository
+from .tool_execution_repository import ToolExecutionRepository
 from .user_repository import UserRepository
 
 __all__ = [
     "McpAuthRepository",
     "McpTemplateGroupRepository",
     "McpTemplateRepository",
+    "PublishedServiceRepository",
+    "StatisticsRepository",
     "TenantRepository",
+    "ToolExecutionRepository",
     "UserRepository",
 ]
@@ -4,10 +4,12 @@ MCP 鉴权/密钥数据访问层。
 Repository 只负责数据库查询和持久化辅助，不承载业务校验、权限判断
 或响应封装。事务和 Session 生命周期由 Service 层控制。
 """
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import date
 
-from sqlalchemy import and_, bindparam, text
+from sqlalchemy import and_, bindparam, insert, text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
 from app.models.modules.published_service import McpService
@@ -153,6 +155,71 @@ class McpAuthRepository:
             db.flush()
         return stats
 
+    @staticmethod
+    def upsert_statistics_deltas(
+        db: Session, deltas: List[Dict[str, Any]]
+    ) -> None:
+        """按 (secret_id, statistics_date) 累加统计增量（仅执行，不 commit）。
+
+        SQLite / MySQL 使用原生 upsert，每个增量一条语句；其他数据库
+        退化为先查后改。
+
+        参数:
+            deltas: 增量列表，每项包含 secret_id、service_id、statistics_date、
+                call_count、success_count、error_count、last_access_at
+        """
+        if not deltas:
+            return
+        dialect = db.get_bind().dialect.name
+        table = McpSecretStatistics.__table__
+
+        if dialect not in ("sqlite", "mysql"):
+            for delta in deltas:
+                stats = McpAuthRepository.get_or_create_statistics(
+                    db, delta["secret_id"], delta["service_id"],
+                    delta["statistics_date"])
+                stats.apply_delta(
+                    delta["call_count"], delta["success_count"],
+                    delta["error_count"], delta["last_access_at"])
+            db.flush()
+            return
+
+        for delta in deltas:
+            values = {
+                "secret_id": delta["secret_id"],
+                "service_id": delta["service_id"],
+                "statistics_date": delta["statistics_date"],
+                "call_count": delta["call_count"],
+                "success_count": delta["success_count"],
+                "error_count": delta["error_count"],
+                "last_access_at": delta["last_access_at"],
+            }
+            if dialect == "sqlite":
+                stmt = sqlite_insert(table).values(**values)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["secret_id", "statistics_date"],
+                    set_={
+                        "call_count": table.c.call_count
+                        + stmt.excluded.call_count,
+                        "success_count": table.c.success_count
+                        + stmt.excluded.success_count,
+                        "error_count": table.c.error_count
+                        + stmt.excluded.error_count,
+                        "last_access_at": stmt.excluded.last_access_at,
+                    },
+                )
+            else:
+                stmt = mysql_insert(table).values(**values)
+                stmt = stmt.on_duplicate_key_update(
+                    call_count=table.c.call_count + stmt.inserted.call_count,
+                    success_count=table.c.success_count
+                    + stmt.inserted.success_count,
+                    error_count=table.c.error_count
+                    + stmt.inserted.error_count,
+                    last_access_at=stmt.inserted.last_access_at,
+                )
+            db.execute(stmt)
+
     @staticmethod
     def get_statistics_by_secret_id(
         db: Session, secret_id: int, days: int = 30
@@ -183,6 +250,14 @@ class McpAuthRepository:
     # 访问日志查询
     # ------------------------------------------------------------------
 
+    @staticmethod
+    def bulk_insert_access_logs(
+        db: Session, rows: List[Dict[str, Any]]
+    ) -> None:
+        """批量插入访问日志（executemany，仅执行，不 commit）。"""
+        if rows:
+            db.execute(insert(McpAccessLog.__table__), rows)
+
     @staticmethod
     def query_access_logs(
         db: Session,
@@ -0,0 +1,43 @@
+"""
+已发布 MCP 服务数据访问层。
+
+Repository 只负责数据库查询和持久化辅助，不承载业务校验、权限判断
+或运行时路由副作用。事务和 Session 生命周期由 Service 层控制。
+"""
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.modules.published_service import McpService
+
+
+class PublishedServiceRepository:
+    """已发布 MCP 服务 Repository。"""
+
+    @staticmethod
+    def list_all_services(db: Session) -> List[McpService]:
+        """列出全部已发布服务（含已停止、第三方服务）。"""
+        return db.query(McpService).all()
+
+    @staticmethod
+    def get_service_by_id(db: Session, service_id: int) -> Optional[McpService]:
+        """根据 ID 查询已发布服务。"""
+        return db.query(McpService).filter(
+            McpService.id == service_id
+        ).first()
+
+    @staticmethod
+    def get_service_by_uuid(
+        db: Session, service_uuid: str
+    ) -> Optional[McpService]:
+        """根据服务 UUID 查询已发布服务。"""
+        return db.query(McpService).filter(
+            McpService.service_uuid == service_uuid
+        ).first()
+
+    @staticmethod
+    def get_service_by_path(db: Session, path: str) -> Optional[McpService]:
+        """根据服务访问路径（sse_url）查询已发布服务。"""
+        return db.query(McpService).filter(
+            McpService.sse_url == path
+        ).first()
@@ -0,0 +1,807 @@
+"""
+统计数据访问层。
+
+统计刷新以前按工具/服务逐个查询（每个工具 5 条聚合 + 1 条查统计行），
+这里改为 GROUP BY 聚合查询（条件求和），再批量 upsert 到统计表。聚合
+按记录 ID 区间进行，配合 `statistics_watermarks` 水位只汇总新增记录。
+事务和 Session 生命周期由 Service 层控制。
+"""
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import (
+    and_, bindparam, case, delete, func, insert, or_, select, update
+)
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models.auth.published_service_access_log import McpAccessLog
+from app.models.group.group import McpGroup
+from app.models.modules.mcp_template import McpModule
+from app.models.modules.published_service import McpService
+from app.models.statistics import (
+    ModuleStatistics,
+    ServiceCallStatistics,
+    StatisticsWatermark,
+    ToolStatistics,
+)
+from app.models.tools.tool_execution import ToolExecution
+
+# IN 查询每批的键数量
+_IN_BATCH = 500
+
+# 时间桶汇总的维度列和计数列
+ROLLUP_KEY = ["bucket", "source", "service_id", "tool_name", "secret_id",
+              "status"]
+ROLLUP_COUNTERS = ["call_count", "error_count", "latency_sum",
+                   "latency_count"]
+
+# 耗时直方图的维度列和汇总列
+HISTOGRAM_KEY = ["bucket", "service_id", "tool_name"]
+HISTOGRAM_COLUMNS = ["count", "latency_sum", "max_latency", "histogram"]
+# 按键读取直方图时每批的键数量（每个键 3 个参数，不超过 SQLite 旧版本的
+# 999 个参数上限）
+_KEY_BATCH = 300
+# 逐条读取执行耗时时每次查询的 ID 区间长度
+_LATENCY_CHUNK = 100000
+
+# 时间桶截断格式：粒度 -> (SQLite strftime, MySQL DATE_FORMAT)
+_BUCKET_FORMATS = {
+    "minute": ("%Y-%m-%d %H:%M:00", "%Y-%m-%d %H:%i:00"),
+    "hour": ("%Y-%m-%d %H:00:00", "%Y-%m-%d %H:00:00"),
+    "day": ("%Y-%m-%d 00:00:00", "%Y-%m-%d 00:00:00"),
+}
+
+
+def _count_status(condition):
+    """按状态条件计数"""
+    return func.sum(case((condition, 1), else_=0))
+
+
+def _bucket(db: Session, column, granularity: str):
+    """把时间列截断到时间桶起点的 SQL 表达式"""
+    dialect = db.get_bind().dialect.name
+    sqlite_format, mysql_format = _BUCKET_FORMATS[granularity]
+    if dialect == "sqlite":
+        return func.strftime(sqlite_format, column)
+    if dialect == "mysql":
+        return func.date_format(column, mysql_format)
+    return func.date_trunc(granularity, column)
+
+
+@lru_cache(maxsize=4096)
+def _parse_bucket(value) -> datetime:
+    """SQLite / MySQL 的截断结果是字符串（同一时间桶重复出现，结果缓存）"""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+@lru_cache(maxsize=None)
+def _histogram_lookup(model):
+    """按 `_KEY_BATCH` 个键读取直方图的语句（按表缓存）"""
+    return select(
+        model.bucket, model.service_id, model.tool_name,
+        *[getattr(model, name) for name in HISTOGRAM_COLUMNS],
+    ).where(or_(*[
+        and_(
+            model.bucket == bindparam(f"bucket_{index}"),
+            model.service_id == bindparam(f"service_id_{index}"),
+            model.tool_name == bindparam(f"tool_name_{index}"),
+        )
+        for index in range(_KEY_BATCH)
+    ]))
+
+
+class StatisticsRepository:
+    """统计 Repository。"""
+
+    # ------------------------------------------------------------------
+    # 聚合查询
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def aggregate_executions(
+        db: Session, after_id: int, up_to_id: int
+    ) -> List[Dict[str, Any]]:
+        """聚合 ID 在 (after_id, up_to_id] 内的工具执行记录。
+
+        一条 GROUP BY (tool_name, service_id, module_id) 查询，工具、服务、
+        模块三类统计由调用方从结果中分别汇总。ID 区间两端都给出，保证按主键
+        范围扫描，耗时只和区间内的记录数有关。
+
+        返回:
+            每组一项，包含 tool_name、service_id、module_id、call_count、
+            success_count、error_count、time_sum、time_count（有执行耗时的
+            记录数）、last_called_at
+        """
+        rows = db.execute(
+            select(
+                ToolExecution.tool_name,
+                ToolExecution.service_id,
+                ToolExecution.module_id,
+                func.count(ToolExecution.id),
+                _count_status(ToolExecution.status == "success"),
+                _count_status(ToolExecution.status == "error"),
+                func.sum(ToolExecution.execution_time),
+                func.count(ToolExecution.execution_time),
+                func.max(ToolExecution.created_at),
+            )
+            .where(ToolExecution.id > after_id, ToolExecution.id <= up_to_id)
+            .group_by(
+                ToolExecution.tool_name,
+                ToolExecution.service_id,
+                ToolExecution.module_id,
+            )
+        ).all()
+        return [
+            {
+                "tool_name": tool_name,
+                "service_id": service_id,
+                "module_id": module_id,
+                "call_count": call_count,
+                "success_count": int(success_count or 0),
+                "error_count": int(error_count or 0),
+                "time_sum": int(time_sum or 0),
+                "time_count": time_count,
+                "last_called_at": last_called_at,
+            }
+            for (tool_name, service_id, module_id, call_count, success_count,
+                 error_count, time_sum, time_count, last_called_at) in rows
+        ]
+
+    @staticmethod
+    def aggregate_access_logs(
+        db: Session, after_id: int, up_to_id: int
+    ) -> List[Dict[str, Any]]:
+        """按服务聚合 ID 在 (after_id, up_to_id] 内的访问日志。
+
+        返回:
+            每个服务一项，包含 service_id（published_services.id）、
+            access_count、access_error_count（状态不是 success 的记录数）
+        """
+        rows = db.execute(
+            select(
+                McpAccessLog.service_id,
+                func.count(McpAccessLog.id),
+                _count_status(McpAccessLog.status != "success"),
+            )
+            .where(McpAccessLog.id > after_id, McpAccessLog.id <= up_to_id)
+            .group_by(McpAccessLog.service_id)
+        ).all()
+        return [
+            {
+                "service_id": service_id,
+                "access_count": access_count,
+                "access_error_count": int(access_error_count or 0),
+            }
+            for service_id, access_count, access_error_count in rows
+        ]
+
+    @staticmethod
+    def aggregate_execution_buckets(
+        db: Session, after_id: int, up_to_id: int, granularity: str,
+        since: Optional[datetime] = None, until: Optional[datetime] = None,
+        by_tool: bool = True
+    ) -> List[Dict[str, Any]]:
+        """按时间桶聚合 ID 在 (after_id, up_to_id] 内的工具执行记录。
+
+        参数:
+            granularity: minute / hour / day
+            since: 只聚合 created_at 不早于该时间的记录（超出保留期的不汇总）
+            until: 只聚合 created_at 早于该时间的记录（全量重建按天聚合）
+            by_tool: 是否按工具分组，为 False 时 tool_name 为空字符串
+
+        返回:
+            每组一项，包含 ROLLUP_KEY 中除 source 外的维度和 ROLLUP_COUNTERS
+        """
+        bucket = _bucket(db, ToolExecution.created_at, granularity)
+        service_id = func.coalesce(ToolExecution.service_id, "")
+        tool_name = func.coalesce(ToolExecution.tool_name, "")
+        secret_id = func.coalesce(ToolExecution.secret_id, 0)
+        status = func.coalesce(ToolExecution.status, "")
+        dimensions = [bucket, service_id, secret_id, status]
+        if by_tool:
+            dimensions.append(tool_name)
+        query = (
+            select(
+                *dimensions,
+                func.count(ToolExecution.id),
+                _count_status(ToolExecution.status == "error"),
+                func.sum(ToolExecution.execution_time),
+                func.count(ToolExecution.execution_time),
+            )
+            .where(
+                ToolExecution.id > after_id,
+                ToolExecution.id <= up_to_id,
+                ToolExecution.created_at.isnot(None),
+            )
+            .group_by(*dimensions)
+        )
+        if since is not None:
+            query = query.where(ToolExecution.created_at >= since)
+        if until is not None:
+            query = query.where(ToolExecution.created_at < until)
+        return [
+            {
+                "bucket": _parse_bucket(row[0]),
+                "service_id": row[1],
+                "tool_name": row[-5] if by_tool else "",
+                "secret_id": row[2],
+                "status": row[3],
+                "call_count": row[-4],
+                "error_count": int(row[-3] or 0),
+                "latency_sum": int(row[-2] or 0),
+                "latency_count": row[-1],
+            }
+            for row in db.execute(query)
+        ]
+
+    @staticmethod
+    def aggregate_access_log_buckets(
+        db: Session, after_id: int, up_to_id: int, granularity: str,
+        since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """按时间桶聚合 ID 在 (after_id, up_to_id] 内的访问日志，since / until
+        与 `aggregate_execution_buckets` 相同（按 access_time）。
+
+        返回:
+            每组一项，包含 bucket、service_id（published_services.id）、
+            secret_id、status、call_count、error_count（状态不是 success）
+        """
+        bucket = _bucket(db, McpAccessLog.access_time, granularity)
+        secret_id = func.coalesce(McpAccessLog.secret_id, 0)
+        status = func.coalesce(McpAccessLog.status, "")
+        query = (
+            select(
+                bucket, McpAccessLog.service_id, secret_id, status,
+                func.count(McpAccessLog.id),
+                _count_status(McpAccessLog.status != "success"),
+            )
+            .where(
+                McpAccessLog.id > after_id,
+                McpAccessLog.id <= up_to_id,
+                McpAccessLog.access_time.isnot(None),
+            )
+            .group_by(bucket, McpAccessLog.service_id, secret_id, status)
+        )
+        if since is not None:
+            query = query.where(McpAccessLog.access_time >= since)
+        if until is not None:
+            query = query.where(McpAccessLog.access_time < until)
+        return [
+            {
+                "bucket": _parse_bucket(row[0]),
+                "service_id": row[1],
+                "secret_id": row[2],
+                "status": row[3],
+                "call_count": row[4],
+                "error_count": int(row[5] or 0),
+            }
+            for row in db.execute(query)
+        ]
+
+    @staticmethod
+    def iter_execution_latencies(
+        db: Session, after_id: int, up_to_id: int,
+        since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Iterator[List[Tuple[datetime, str, str, int, int]]]:
+        """分批读取 ID 在 (after_id, up_to_id] 内、created_at 在 [since, until)
+        内的执行耗时分布。
+
+        分桶规则在 Python 中实现，需要逐个耗时值；按 ID 区间分批，每批一条
+        GROUP BY (分钟, service_id, tool_name, execution_time)，全量重建时
+        内存占用不随记录总数增长，分钟截断在数据库中完成。
+
+        返回:
+            每批一个列表，每项为 (minute, service_id, tool_name,
+            execution_time, 次数)，service_id / tool_name 为空时为空字符串
+        """
+        minute = _bucket(db, ToolExecution.created_at, "minute")
+        service_id = func.coalesce(ToolExecution.service_id, "")
+        tool_name = func.coalesce(ToolExecution.tool_name, "")
+        minutes: Dict[Any, datetime] = {}
+        for start in range(after_id, up_to_id, _LATENCY_CHUNK):
+            end = min(start + _LATENCY_CHUNK, up_to_id)
+            query = select(
+                minute, service_id, tool_name, ToolExecution.execution_time,
+                func.count(),
+            ).where(
+                ToolExecution.id > start,
+                ToolExecution.id <= end,
+                ToolExecution.created_at.isnot(None),
+                ToolExecution.execution_time.isnot(None),
+            ).group_by(
+                minute, service_id, tool_name, ToolExecution.execution_time
+            )
+            if since is not None:
+                query = query.where(ToolExecution.created_at >= since)
+            if until is not None:
+                query = query.where(ToolExecution.created_at < until)
+            rows = []
+            for bucket, *rest in db.execute(query):
+                parsed = minutes.get(bucket)
+                if parsed is None:
+                    parsed = minutes[bucket] = _parse_bucket(bucket)
+                rows.append((parsed, *rest))
+            if rows:
+                yield rows
+
+    @staticmethod
+    def get_service_module_names(db: Session) -> Dict[str, str]:
+        """一次查询所有服务 UUID 对应的模块名称（模块不存在时为 None）。"""
+        rows = db.execute(
+            select(McpService.service_uuid, McpModule.name)
+            .outerjoin(McpModule, McpModule.id == McpService.module_id)
+        ).all()
+        return {service_uuid: module_name for service_uuid, module_name in rows}
+
+    @staticmethod
+    def get_service_uuids(db: Session) -> Dict[int, str]:
+        """一次查询所有服务 ID 对应的服务 UUID。"""
+        rows = db.execute(
+            select(McpService.id, McpService.service_uuid)
+        ).all()
+        return {service_id: service_uuid for service_id, service_uuid in rows}
+
+    @staticmethod
+    def count_overview(
+        db: Session, day_start: datetime, day_end: datetime
+    ) -> Dict[str, int]:
+        """服务统计（概览）的各项计数，键与 `ServiceStatistics` 列名一致。
+
+        两条查询：一条由标量子查询组成，每个子查询各自走索引（总数按最小
+        索引计数，今日新增按 created_at 索引范围扫描）；今日工具调用按
+        created_at 索引取 [day_start, day_end) 范围后一次条件求和。今日
+        条件不对列套函数，保证能用上索引。
+        """
+
+        def count(model, *conditions):
+            return select(func.count()).select_from(model).where(
+                *conditions).scalar_subquery()
+
+        def created_today(model):
+            return count(model, model.created_at >= day_start,
+                         model.created_at < day_end)
+
+        totals = {
+            "total_template_groups": count(McpGroup),
+            "today_new_template_groups": created_today(McpGroup),
+            "total_templates": count(McpModule),
+            "today_new_templates": created_today(McpModule),
+            "total_tools_calls": count(ToolExecution),
+            "total_service_calls": count(
+                ToolExecution, ToolExecution.service_id.isnot(None)),
+            "total_services": count(McpService),
+            "running_services": count(
+                McpService, McpService.status == "running"),
+            "stopped_services": count(
+                McpService, McpService.status == "stopped"),
+            "error_services": count(McpService, McpService.status == "error"),
+        }
+        row = db.execute(select(*totals.values())).one()
+        counts = dict(zip(totals, row))
+
+        is_service_call = ToolExecution.service_id.isnot(None)
+        today = {
+            "today_new_tools_calls": func.count(),
+            "today_tools_calls_success": _count_status(
+                ToolExecution.status == "success"),
+            "today_tools_calls_error": _count_status(
+                ToolExecution.status == "error"),
+            "today_new_service_calls": _count_status(is_service_call),
+            "today_service_calls_success": _count_status(
+                is_service_call & (ToolExecution.status == "success")),
+            "today_service_calls_error": _count_status(
+                is_service_call & (ToolExecution.status == "error")),
+        }
+        row = db.execute(
+            select(*today.values()).where(
+                ToolExecution.created_at >= day_start,
+                ToolExecution.created_at < day_end,
+            )
+        ).one()
+        counts.update(
+            (name, int(value or 0)) for name, value in zip(today, row))
+        return counts
+
+    @staticmethod
+    def count_services_by_module(db: Session) -> Dict[int, int]:
+        """按模块统计已发布服务数。"""
+        rows = db.execute(
+            select(McpService.module_id, func.count(McpService.id))
+            .group_by(McpService.module_id)
+        ).all()
+        return {module_id: count for module_id, count in rows}
+
+    # ------------------------------------------------------------------
+    # 增量水位
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def get_max_id(db: Session, model) -> int:
+        """数据源当前最大记录 ID，空表为 0。"""
+        return db.execute(select(func.max(model.id))).scalar() or 0
+
+    @staticmethod
+    def get_fold_upper(
+        db: Session, model, time_column, after_id: int, limit: int,
+        before: Optional[datetime] = None
+    ) -> int:
+        """本次汇总的 ID 上界：after_id 之后最多 limit 个 ID 内、写入时间
+        早于 before 的最大记录 ID，没有时返回 after_id。
+
+        区间从 after_id 之后的第一条记录算起，清理过的 ID 空洞不占区间；
+        按主键倒序找第一条足够早的记录，只扫描 before 之后写入的记录。
+        """
+        first_id = db.execute(
+            select(func.min(model.id)).where(model.id > after_id)
+        ).scalar()
+        if first_id is None:
+            return after_id
+        stmt = select(model.id).where(
+            model.id > after_id, model.id < first_id + limit)
+        if before is not None:
+            stmt = stmt.where(time_column < before)
+        last_id = db.execute(
+            stmt.order_by(model.id.desc()).limit(1)).scalar()
+        return last_id or after_id
+
+    @staticmethod
+    def get_id_range(
+        db: Session, model, time_column, since: datetime, until: datetime,
+        up_to_id: int
+    ) -> Optional[Tuple[int, int]]:
+        """写入时间在 [since, until) 内、ID 不超过 up_to_id 的记录的最小和
+        最大 ID（按写入时间索引范围查找），没有记录时返回 None。"""
+        first_id, last_id = db.execute(
+            select(func.min(model.id), func.max(model.id)).where(
+                time_column >= since, time_column < until,
+                model.id <= up_to_id)
+        ).one()
+        if first_id is None:
+            return None
+        return first_id, last_id
+
+    @staticmethod
+    def get_time_range(
+        db: Session, column
+    ) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """时间列的最小值和最大值（走该列的索引），空表为 (None, None)。"""
+        earliest, latest = db.execute(
+            select(func.min(column), func.max(column))).one()
+        return _parse_bucket(earliest), _parse_bucket(latest)
+
+    @staticmethod
+    def get_watermarks(db: Session) -> Dict[str, int]:
+        """所有数据源的水位，数据源 -> 已汇总的最大记录 ID。"""
+        rows = db.execute(
+            select(StatisticsWatermark.source, StatisticsWatermark.last_id)
+        ).all()
+        return {source: last_id for source, last_id in rows}
+
+    @staticmethod
+    def advance_watermark(
+        db: Session, source: str, expected: Optional[int], last_id: int
+    ) -> bool:
+        """把水位从 expected 推进到 last_id（仅执行，不 commit）。
+
+        按 expected 条件更新，同时有两次刷新时只有一次能推进成功，
+        返回 False 的一方应回滚，避免同一批记录被累加两次。
+        expected 为 None 表示水位还不存在，插入新行。
+        """
+        if expected is None:
+            db.execute(
+                insert(StatisticsWatermark.__table__),
+                [{"source": source, "last_id": last_id,
+                  "updated_at": datetime.utcnow()}],
+            )
+            return True
+        result = db.execute(
+            update(StatisticsWatermark)
+            .where(
+                StatisticsWatermark.source == source,
+                StatisticsWatermark.last_id == expected,
+            )
+            .values(last_id=last_id, updated_at=datetime.utcnow())
+        )
+        return result.rowcount == 1
+
+    @staticmethod
+    def get_watermark_updated_at(db: Session) -> Optional[datetime]:
+        """水位最近一次改动的时间（UTC），没有水位时为 None。"""
+        return db.execute(
+            select(func.max(StatisticsWatermark.updated_at))).scalar()
+
+    @staticmethod
+    def reset_watermarks(db: Session) -> None:
+        """删除所有水位（仅执行，不 commit），下次刷新时全量重建统计。"""
+        db.execute(delete(StatisticsWatermark))
+
+    # ------------------------------------------------------------------
+    # 读取 / 清零统计行
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def get_counters(
+        db: Session, model, key: str, keys: Iterable[Any],
+        columns: List[str]
+    ) -> Dict[Any, Dict[str, Any]]:
+        """按唯一键读取统计行的当前计数，键 -> {列名: 值}。"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        key_column = getattr(model, key)
+        selected = [key_column] + [getattr(model, name) for name in columns]
+        counters = {}
+        for offset in range(0, len(keys), _IN_BATCH):
+            rows = db.execute(
+                select(*selected).where(
+                    key_column.in_(keys[offset:offset + _IN_BATCH]))
+            ).all()
+            for row in rows:
+                counters[row[0]] = dict(zip(columns, row[1:]))
+        return counters
+
+    @staticmethod
+    def reset_counters(db: Session, model, values: Dict[str, Any]) -> None:
+        """把统计表所有行的计数列重置为 values（仅执行，不 commit）。"""
+        db.execute(update(model).values(**values))
+
+    # ------------------------------------------------------------------
+    # 批量 upsert
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _bulk_upsert(
+        db: Session, model, key: str, rows: List[Dict[str, Any]]
+    ) -> None:
+        """按唯一键批量写入统计行，已存在的行覆盖 rows 中的字段（仅执行，
+        不 commit）。
+
+        SQLite / MySQL 使用原生 upsert，一条 executemany；其他数据库
+        退化为一次查询已有行后逐行更新/新增。
+        """
+        if not rows:
+            return
+        dialect = db.get_bind().dialect.name
+        table = model.__table__
+        columns = [name for name in rows[0] if name != key]
+
+        if dialect == "sqlite":
+            stmt = sqlite_insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[key],
+                set_={name: stmt.excluded[name] for name in columns},
+            )
+            db.execute(stmt, rows)
+        elif dialect == "mysql":
+            stmt = mysql_insert(table)
+            stmt = stmt.on_duplicate_key_update(
+                {name: stmt.inserted[name] for name in columns}
+            )
+            db.execute(stmt, rows)
+        else:
+            key_column = getattr(model, key)
+            existing = {
+                getattr(item, key): item
+                for item in db.query(model).filter(
+                    key_column.in_([row[key] for row in rows])
+                )
+            }
+            for row in rows:
+                item = existing.get(row[key])
+                if item is None:
+                    db.add(model(**row))
+                else:
+                    for name in columns:
+                        setattr(item, name, row[name])
+            db.flush()
+
+    @staticmethod
+    def upsert_tool_statistics(
+        db: Session, rows: List[Dict[str, Any]]
+    ) -> None:
+        """按 tool_name 批量写入工具统计（仅执行，不 commit）。"""
+        StatisticsRepository._bulk_upsert(
+            db, ToolStatistics, "tool_name", rows)
+
+    @staticmethod
+    def upsert_service_call_statistics(
+        db: Session, rows: List[Dict[str, Any]]
+    ) -> None:
+        """按 service_id 批量写入服务调用统计（仅执行，不 commit）。"""
+        StatisticsRepository._bulk_upsert(
+            db, ServiceCallStatistics, "service_id", rows)
+
+    @staticmethod
+    def upsert_module_statistics(
+        db: Session, rows: List[Dict[str, Any]]
+    ) -> None:
+        """按 module_id 批量写入模块统计（仅执行，不 commit）。"""
+        StatisticsRepository._bulk_upsert(
+            db, ModuleStatistics, "module_id", rows)
+
+    # ------------------------------------------------------------------
+    # 时间桶汇总
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def upsert_rollup_deltas(
+        db: Session, model, rows: List[Dict[str, Any]]
+    ) -> None:
+        """按 ROLLUP_KEY 把增量累加到时间桶汇总表（仅执行，不 commit）。
+
+        SQLite / MySQL 使用原生 upsert，一条 executemany；其他数据库
+        退化为逐行先查后改。
+        """
+        if not rows:
+            return
+        dialect = db.get_bind().dialect.name
+        table = model.__table__
+
+        if dialect == "sqlite":
+            stmt = sqlite_insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=ROLLUP_KEY,
+                set_={name: table.c[name] + stmt.excluded[name]
+                      for name in ROLLUP_COUNTERS},
+            )
+            db.execute(stmt, rows)
+        elif dialect == "mysql":
+            stmt = mysql_insert(table)
+            stmt = stmt.on_duplicate_key_update(
+                {name: table.c[name] + stmt.inserted[name]
+                 for name in ROLLUP_COUNTERS}
+            )
+            db.execute(stmt, rows)
+        else:
+            for row in rows:
+                item = db.query(model).filter_by(
+                    **{name: row[name] for name in ROLLUP_KEY}).first()
+                if item is None:
+                    db.add(model(**row))
+                else:
+                    for name in ROLLUP_COUNTERS:
+                        setattr(item, name, getattr(item, name) + row[name])
+            db.flush()
+
+    @staticmethod
+    def delete_rollups(
+        db: Session, model, before: Optional[datetime] = None,
+        since: Optional[datetime] = None
+    ) -> int:
+        """删除时间桶在 [since, before) 内的汇总行，两端为空时不限
+        （仅执行，不 commit）。时间桶汇总和耗时直方图表通用。"""
+        stmt = delete(model)
+        if before is not None:
+            stmt = stmt.where(model.bucket < before)
+        if since is not None:
+            stmt = stmt.where(model.bucket >= since)
+        return db.execute(stmt).rowcount
+
+    @staticmethod
+    def query_rollups(
+        db: Session, model, start: datetime, end: datetime, source: str,
+        filters: Dict[str, Any], group_by: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """按时间桶读取 [start, end) 内的汇总，可按一个维度分组。
+
+        参数:
+            filters: 维度列 -> 值，按等值过滤
+            group_by: 额外分组的维度列（service_id / tool_name / secret_id /
+                status），为空时每个时间桶一项
+
+        返回:
+            按时间桶排序，每项包含 bucket、分组维度和 ROLLUP_COUNTERS 的合计
+        """
+        dimensions = [model.bucket]
+        if group_by:
+            dimensions.append(getattr(model, group_by))
+        query = (
+            select(*dimensions, *[
+                func.sum(getattr(model, name)) for name in ROLLUP_COUNTERS
+            ])
+            .where(
+                model.bucket >= start,
+                model.bucket < end,
+                model.source == source,
+            )
+            .group_by(*dimensions)
+            .order_by(*dimensions)
+        )
+        for name, value in filters.items():
+            query = query.where(getattr(model, name) == value)
+        names = ["bucket"] + ([group_by] if group_by else []) + ROLLUP_COUNTERS
+        return [
+            {name: (int(value or 0) if name in ROLLUP_COUNTERS else value)
+             for name, value in zip(names, row)}
+            for row in db.execute(query)
+        ]
+
+    # ------------------------------------------------------------------
+    # 耗时直方图
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def get_histograms(
+        db: Session, model, keys: Iterable[Tuple[datetime, str, str]]
+    ) -> Dict[Tuple[datetime, str, str], Dict[str, Any]]:
+        """按 (bucket, service_id, tool_name) 读取已有直方图，
+        键 -> HISTOGRAM_COLUMNS。
+
+        每批 `_KEY_BATCH` 个键，条件为逐键等值的 OR（SQLite 上每个键走一次
+        唯一索引查找；元组 IN 会扫描整表）。语句按表只构造一次，键数不足时
+        重复最后一个键补齐，每批只绑定参数、不重新编译。
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        stmt = _histogram_lookup(model)
+        histograms = {}
+        for offset in range(0, len(keys), _KEY_BATCH):
+            batch = keys[offset:offset + _KEY_BATCH]
+            batch += [batch[-1]] * (_KEY_BATCH - len(batch))
+            params = {}
+            for index, (bucket, service_id, tool_name) in enumerate(batch):
+                params[f"bucket_{index}"] = bucket
+                params[f"service_id_{index}"] = service_id
+                params[f"tool_name_{index}"] = tool_name
+            for row in db.execute(stmt, params):
+                histograms[tuple(row[:3])] = dict(
+                    zip(HISTOGRAM_COLUMNS, row[3:]))
+        return histograms
+
+    @staticmethod
+    def upsert_histograms(
+        db: Session, model, rows: List[Dict[str, Any]]
+    ) -> None:
+        """按 HISTOGRAM_KEY 写入直方图，已存在的行整体覆盖（仅执行，
+        不 commit）。合并由调用方完成。"""
+        if not rows:
+            return
+        dialect = db.get_bind().dialect.name
+        table = model.__table__
+
+        if dialect == "sqlite":
+            stmt = sqlite_insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=HISTOGRAM_KEY,
+                set_={name: stmt.excluded[name]
+                      for name in HISTOGRAM_COLUMNS},
+            )
+            db.execute(stmt, rows)
+        elif dialect == "mysql":
+            stmt = mysql_insert(table)
+            stmt = stmt.on_duplicate_key_update(
+                {name: stmt.inserted[name] for name in HISTOGRAM_COLUMNS}
+            )
+            db.execute(stmt, rows)
+        else:
+            for row in rows:
+                item = db.query(model).filter_by(
+                    **{name: row[name] for name in HISTOGRAM_KEY}).first()
+                if item is None:
+                    db.add(model(**row))
+                else:
+                    for name in HISTOGRAM_COLUMNS:
+                        setattr(item, name, row[name])
+            db.flush()
+
+    @staticmethod
+    def query_histograms(
+        db: Session, model, start: datetime, end: datetime,
+        filters: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """读取 [start, end) 内的直方图行（按 service_id / tool_name
+        等值过滤），合并由调用方完成。"""
+        query = select(
+            model.service_id, model.tool_name,
+            *[getattr(model, name) for name in HISTOGRAM_COLUMNS],
+        ).where(model.bucket >= start, model.bucket < end)
+        for name, value in filters.items():
+            query = query.where(getattr(model, name) == value)
+        names = ["service_id", "tool_name"] + HISTOGRAM_COLUMNS
+        return [dict(zip(names, row)) for row in db.execute(query)]
@@ -0,0 +1,24 @@
+"""
+工具执行记录数据访问层。
+
+Repository 只负责数据库查询和持久化辅助，不承载业务校验、权限判断
+或响应封装。事务和 Session 生命周期由 Service 层控制。
+"""
+from typing import Any, Dict, List
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.tools.tool_execution import ToolExecution
+
+
+class ToolExecutionRepository:
+    """工具执行记录 Repository。"""
+
+    @staticmethod
+    def bulk_insert_executions(
+        db: Session, rows: List[Dict[str, Any]]
+    ) -> None:
+        """批量插入工具执行记录（executemany，仅执行，不 commit）。"""
+        if rows:
+            db.execute(insert(ToolExecution.__table__), rows)
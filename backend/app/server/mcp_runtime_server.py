@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 import sys
@@ -16,6 +17,7 @@ from app.models.engine import get_db
 # 导入配置和基础模块
 from ..core.config import settings
 from ..utils.logging import mcp_logger
+from ..services.tools.tool_index import tool_index
 from mcp.server.fastmcp import FastMCP
 from starlette.middleware.cors import CORSMiddleware
 from starlette.applications import Starlette
@@ -37,6 +39,84 @@ server_instance = None
 uni_server = None
 lifespan_manager = LifespanManager()
 
+
+@lifespan_manager.add
+async def batch_writer_lifespan(app):
+    """启动/停止批量写入器，停止时写完尚未落库的访问日志、统计和执行记录"""
+    from app.services.auth.secret_manager import SecretManager
+    from app.services.history.execution_writer import tool_execution_writer
+    SecretManager.start_access_log_writer()
+    tool_execution_writer.start()
+    yield
+    for stop in (SecretManager.stop_access_log_writer,
+                 tool_execution_writer.stop):
+        try:
+            await anyio.to_thread.run_sync(stop)
+        except Exception as e:
+            mcp_logger.error(f"停止批量写入器失败: {str(e)}")
+
+
+@lifespan_manager.add
+async def proxy_client_lifespan(app):
+    """启动第三方服务上游健康探测，应用关闭时停止探测并关闭上游连接池"""
+    from app.services.published_service import service_manager
+    from app.services.published_service.proxy_client import (
+        proxy_client_pool
+    )
+    service_manager.start_upstream_probes()
+    yield
+    service_manager.close_upstream_groups()
+    try:
+        await proxy_client_pool.aclose()
+    except Exception as e:
+        mcp_logger.error(f"关闭代理连接池失败: {str(e)}")
+
+
+@lifespan_manager.add
+async def shared_state_lifespan(app):
+    """多进程/多节点部署时监听其他进程的服务和密钥变更通知"""
+    from app.utils.shared_state import shared_state
+    listener = None
+    if shared_state.shared:
+        listener = asyncio.create_task(shared_state.listen(
+            poll_interval=settings.SHARED_STATE_POLL_INTERVAL,
+            resync_interval=settings.SHARED_STATE_RESYNC_INTERVAL))
+        mcp_logger.info(f"共享状态监听已启动，后端: {shared_state.backend}")
+    yield
+    if listener:
+        listener.cancel()
+        try:
+            await listener
+        except asyncio.CancelledError:
+            pass
+    shared_state.close()
+
+
+@lifespan_manager.add
+async def sse_session_lifespan(app):
+    """多进程/多节点部署时登记 SSE 会话归属，转发误投到本进程的消息"""
+    from app.services.published_service.sse_session_router import (
+        sse_session_router
+    )
+    try:
+        await sse_session_router.start(app)
+    except Exception as e:
+        mcp_logger.error(f"启用 SSE 会话转发失败: {str(e)}")
+    yield
+    await sse_session_router.stop()
+
+
+@lifespan_manager.add
+async def service_worker_lifespan(app):
+    """应用关闭时停止服务工作进程"""
+    yield
+    from app.services.published_service import service_manager
+    try:
+        await anyio.to_thread.run_sync(service_manager.close_worker_pool)
+    except Exception as e:
+        mcp_logger.error(f"停止服务工作进程失败: {str(e)}")
+
+
 def add_tool(
         func: Callable,
         name: Optional[str] = None,
@@ -70,6 +150,7 @@ def add_tool(
 
     # 使用mcp的tool装饰器添加工具
     server_instance.tool(name=tool_name, description=tool_doc)(func)
+    tool_index.on_tool_added(tool_name, func)
 
     mcp_logger.info(f"已成功添加工具: {tool_name}")
     return func  # 返回函数便于链式调用
@@ -94,6 +175,7 @@ def remove_tool(tool_name: str) -> bool:
         if (hasattr(server_instance._tool_manager, "_tools")
                 and tool_name in server_instance._tool_manager._tools):
             del server_instance._tool_manager._tools[tool_name]
+            tool_index.on_tool_removed(tool_name)
             mcp_logger.info(f"已从工具管理器中移除工具: {tool_name}")
 
             return True
@@ -0,0 +1,72 @@
+"""
+MCP访问日志异步批量写入器
+
+请求路径上只把访问日志放入有界队列，后台线程每隔 `flush_interval_ms`
+或攒够 `batch_size` 条时，在同一个事务里：
+
+- 批量 INSERT 访问日志；
+- 取出 `SecretQuotaCounter` 中累加的密钥统计增量，每个
+  (secret_id, 日期) 执行一次 upsert。
+
+写入前先调用 `SecretQuotaCounter.sync_shared`，把本进程的调用次数
+同步到共享计数（配置了共享状态后端时）。
+
+队列满时直接丢弃日志（不阻塞请求），并记录丢弃计数；密钥调用计数
+不经过队列，不受丢弃影响。服务停止时调用 `stop` 写完剩余数据。
+"""
+from typing import Any, Dict, List
+
+from app.models.engine import get_db
+from app.repositories.mcp_auth_repository import McpAuthRepository
+from app.services.auth.secret_cache import SecretQuotaCounter
+from app.utils.batch_writer import BatchWriter
+
+
+class AccessLogWriter(BatchWriter):
+    """访问日志异步批量写入器"""
+
+    def __init__(self, quota: SecretQuotaCounter, queue_size: int = 10000,
+                 batch_size: int = 500, flush_interval_ms: int = 1000):
+        """
+        初始化写入器
+
+        Args:
+            quota: 密钥当日调用计数器，每次写入时一并写回其增量
+            queue_size: 队列容量
+            batch_size: 单批最大写入条数
+            flush_interval_ms: 写入间隔（毫秒）
+        """
+        super().__init__("访问日志", queue_size=queue_size,
+                         batch_size=batch_size,
+                         flush_interval_ms=flush_interval_ms)
+        self._quota = quota
+        self._repo = McpAuthRepository()
+        self._statistics_upserts = 0
+
+    def write(self, batch: List[Dict[str, Any]]) -> None:
+        """在一个事务中写入一批日志和当前全部统计增量"""
+        self._quota.sync_shared()
+        deltas = self._quota.drain()
+        if not batch and not deltas:
+            return
+
+        with get_db() as db:
+            try:
+                self._repo.bulk_insert_access_logs(db, batch)
+                self._repo.upsert_statistics_deltas(db, deltas)
+                db.commit()
+            except Exception:
+                db.rollback()
+                # 统计增量放回等待下次写入，日志由基类丢弃避免无限堆积
+                self._quota.restore(deltas)
+                raise
+
+        with self._lock:
+            self._statistics_upserts += len(deltas)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写入器运行状态"""
+        stats = super().get_stats()
+        with self._lock:
+            stats["statistics_upserts"] = self._statistics_upserts
+        return stats
@@ -0,0 +1,355 @@
+"""
+MCP服务密钥缓存与日调用计数
+
+- `SecretCache`：按 (service_id, 密钥哈希) 缓存密钥校验所需信息，带 TTL，
+  密钥更新/删除时显式失效。未命中的密钥同样缓存，避免无效密钥反复查库。
+- `SecretQuotaCounter`：每个密钥的当日调用计数，首次使用时从
+  `published_service_secret_statistics` 读取当日已有调用次数作为初始值，
+  之后在内存中原子累加；累加的增量由定时任务批量写回数据库。配置了
+  共享状态后端时，计数同时按 (密钥, 日期) 原子累加到共享后端，调用次数
+  限制对全部进程生效。
+"""
+import hashlib
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.utils.shared_state import SharedState
+
+# 共享计数键前缀及有效期，有效期覆盖当日并留出余量
+_QUOTA_KEY_PREFIX = "secret_quota:"
+_QUOTA_KEY_TTL = 2 * 24 * 3600
+
+
+def _quota_key(secret_id: int, day: date) -> str:
+    """密钥当日共享计数的键"""
+    return f"{_QUOTA_KEY_PREFIX}{secret_id}:{day.isoformat()}"
+
+
+def hash_secret(secret: str) -> str:
+    """计算密钥哈希，缓存中不保存明文密钥"""
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()
+
+
+class SecretCache:
+    """密钥校验缓存"""
+
+    def __init__(self, ttl_seconds: int = 60):
+        """
+        初始化缓存
+
+        Args:
+            ttl_seconds: 缓存有效期（秒）
+        """
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Tuple[int, str], Dict[str, Any]] = {}
+        self._keys_by_secret_id: Dict[int, Tuple[int, str]] = {}
+        self._lock = threading.RLock()
+
+    def get(self, service_id: int,
+            secret: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        获取缓存的密钥信息
+
+        Args:
+            service_id: 服务ID
+            secret: 密钥字符串
+
+        Returns:
+            (是否命中, 密钥信息)，密钥信息为None表示密钥不存在或未激活
+        """
+        key = (service_id, hash_secret(secret))
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return False, None
+            if item["expire_at"] < time.time():
+                self._pop(key)
+                return False, None
+            return True, item["value"]
+
+    def set(self, service_id: int, secret: str,
+            value: Optional[Dict[str, Any]]) -> None:
+        """
+        写入密钥信息
+
+        Args:
+            service_id: 服务ID
+            secret: 密钥字符串
+            value: 密钥信息，需包含 id 字段；None 表示密钥无效
+        """
+        key = (service_id, hash_secret(secret))
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = {
+                "value": value,
+                "expire_at": time.time() + self.ttl_seconds
+            }
+            if value is not None:
+                self._keys_by_secret_id[value["id"]] = key
+
+    def invalidate(self, service_id: int, secret: str) -> None:
+        """使指定服务下某个密钥字符串的缓存失效"""
+        with self._lock:
+            self._pop((service_id, hash_secret(secret)))
+
+    def invalidate_secret(self, secret_id: int) -> None:
+        """按密钥ID使缓存失效"""
+        with self._lock:
+            key = self._keys_by_secret_id.get(secret_id)
+            if key:
+                self._pop(key)
+
+    def invalidate_service(self, service_id: int) -> None:
+        """使服务下所有密钥的缓存失效"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == service_id]:
+                self._pop(key)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_secret_id.clear()
+
+    def clean_expired(self) -> int:
+        """
+        清理过期缓存
+
+        Returns:
+            清理的缓存数量
+        """
+        current_time = time.time()
+        with self._lock:
+            expired = [
+                key for key, item in self._entries.items()
+                if item["expire_at"] < current_time
+            ]
+            for key in expired:
+                self._pop(key)
+        return len(expired)
+
+    def _pop(self, key: Tuple[int, str]) -> None:
+        """删除缓存项及其密钥ID反向索引（调用方持有锁）"""
+        item = self._entries.pop(key, None)
+        if item and item["value"] is not None:
+            secret_id = item["value"]["id"]
+            if self._keys_by_secret_id.get(secret_id) == key:
+                del self._keys_by_secret_id[secret_id]
+
+
+class SecretQuotaCounter:
+    """密钥当日调用计数器
+
+    只在本进程计数时，多进程部署下每个进程各自判断调用次数限制。传入
+    跨进程共享的 `shared` 后：首次使用时以共享计数为初始值（共享计数
+    不存在时用数据库当日调用次数初始化），本进程累加的次数由 `sync_shared`
+    定期原子累加到共享计数并读回全部进程的合计，超出限制的调用次数不超过
+    一个同步周期内各进程放行的次数。
+    """
+
+    def __init__(self, shared: Optional[SharedState] = None):
+        """
+        初始化计数器
+
+        Args:
+            shared: 共享状态后端，不跨进程共享时忽略
+        """
+        self._shared = shared if shared is not None and shared.shared else None
+        # secret_id -> {"date", "service_id", "count", "unsynced"}
+        self._counters: Dict[int, Dict[str, Any]] = {}
+        # (secret_id, date) -> 待写回数据库的增量
+        self._pending: Dict[Tuple[int, date], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get_count(self, secret_id: int, service_id: int,
+                  loader: Callable[[int], int]) -> int:
+        """
+        获取密钥当日调用次数
+
+        Args:
+            secret_id: 密钥ID
+            service_id: 服务ID
+            loader: 计数不存在时读取数据库当日调用次数的函数
+
+        Returns:
+            当日调用次数
+        """
+        today = date.today()
+        with self._lock:
+            counter = self._counters.get(secret_id)
+            if counter and counter["date"] == today:
+                return counter["count"]
+
+        # 数据库读取放在锁外，避免阻塞其他密钥的计数
+        seeded = loader(secret_id)
+        if self._shared is not None:
+            # 其他进程已初始化时以共享计数为准，后端不可用时退回本进程计数
+            shared_count = self._shared.get_or_set(
+                _quota_key(secret_id, today), seeded, _QUOTA_KEY_TTL)
+            if shared_count is not None:
+                seeded = int(shared_count)
+        with self._lock:
+            counter = self._counters.get(secret_id)
+            if counter and counter["date"] == today:
+                return counter["count"]
+            self._counters[secret_id] = {
+                "date": today,
+                "service_id": service_id,
+                "count": seeded,
+                "unsynced": 0
+            }
+            return seeded
+
+    def increment(self, secret_id: int, service_id: int,
+                  success: bool = True) -> int:
+        """
+        累加密钥调用次数，并记录待写回数据库的增量
+
+        Args:
+            secret_id: 密钥ID
+            service_id: 服务ID
+            success: 是否成功调用
+
+        Returns:
+            累加后的当日调用次数
+        """
+        today = date.today()
+        with self._lock:
+            counter = self._counters.get(secret_id)
+            if counter and counter["date"] == today:
+                counter["count"] += 1
+                counter["unsynced"] += 1
+                count = counter["count"]
+            else:
+                # 未初始化的计数不做种子查询，当日剩余次数以数据库为准
+                count = 0
+
+            pending = self._pending.get((secret_id, today))
+            if pending is None:
+                pending = {
+                    "service_id": service_id,
+                    "call_count": 0,
+                    "success_count": 0,
+                    "error_count": 0,
+                    "last_access_at": None
+                }
+                self._pending[(secret_id, today)] = pending
+            pending["call_count"] += 1
+            if success:
+                pending["success_count"] += 1
+            else:
+                pending["error_count"] += 1
+            pending["last_access_at"] = datetime.now()
+            return count
+
+    def sync_shared(self) -> int:
+        """
+        将本进程累加的当日调用次数原子累加到共享计数，并读回全部进程的合计
+
+        由访问日志写入线程每个写入周期调用；未配置共享后端时不做任何事。
+
+        Returns:
+            同步成功的计数数量
+        """
+        if self._shared is None:
+            return 0
+        today = date.today()
+        with self._lock:
+            unsynced = []
+            for secret_id, counter in self._counters.items():
+                if counter["date"] == today:
+                    unsynced.append((secret_id, counter["unsynced"]))
+                    counter["unsynced"] = 0
+
+        synced = 0
+        for secret_id, amount in unsynced:
+            total = self._shared.incr(_quota_key(secret_id, today), amount,
+                                      _QUOTA_KEY_TTL)
+            with self._lock:
+                counter = self._counters.get(secret_id)
+                if counter is None or counter["date"] != today:
+                    continue
+                if total is None:
+                    # 共享后端不可用，增量留到下次同步
+                    counter["unsynced"] += amount
+                    continue
+                # 同步期间本进程新增的次数仍计入
+                counter["count"] = total + counter["unsynced"]
+            synced += 1
+        return synced
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """
+        取出所有待写回的增量
+
+        Returns:
+            增量列表，每项包含 secret_id、statistics_date 及各计数
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return [
+            dict(secret_id=secret_id, statistics_date=stat_date, **delta)
+            for (secret_id, stat_date), delta in pending.items()
+        ]
+
+    def restore(self, deltas: List[Dict[str, Any]]) -> None:
+        """
+        写回失败时将增量放回，等待下次写回
+
+        Args:
+            deltas: `drain` 返回的增量列表
+        """
+        with self._lock:
+            for delta in deltas:
+                key = (delta["secret_id"], delta["statistics_date"])
+                pending = self._pending.get(key)
+                if pending is None:
+                    self._pending[key] = {
+                        "service_id": delta["service_id"],
+                        "call_count": delta["call_count"],
+                        "success_count": delta["success_count"],
+                        "error_count": delta["error_count"],
+                        "last_access_at": delta["last_access_at"]
+                    }
+                    continue
+                pending["call_count"] += delta["call_count"]
+                pending["success_count"] += delta["success_count"]
+                pending["error_count"] += delta["error_count"]
+                # 放回期间可能已有新的访问，取两者中较晚的时间
+                restored_at = delta["last_access_at"]
+                if restored_at and (pending["last_access_at"] is None
+                                    or restored_at > pending["last_access_at"]):
+                    pending["last_access_at"] = restored_at
+
+    def discard(self, secret_ids: List[int]) -> None:
+        """
+        丢弃已删除密钥的计数和待写回增量
+
+        Args:
+            secret_ids: 密钥ID列表
+        """
+        ids = set(secret_ids)
+        with self._lock:
+            for secret_id in ids:
+                self._counters.pop(secret_id, None)
+            for key in [k for k in self._pending if k[0] in ids]:
+                del self._pending[key]
+
+    def clean_stale(self) -> int:
+        """
+        清理非当日的计数
+
+        Returns:
+            清理的计数数量
+        """
+        today = date.today()
+        with self._lock:
+            stale = [
+                secret_id for secret_id, counter in self._counters.items()
+                if counter["date"] != today
+            ]
+            for secret_id in stale:
+                del self._counters[secret_id]
+        return len(stale)
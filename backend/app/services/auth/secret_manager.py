@@ -4,14 +4,19 @@ MCP服务密钥管理服务
 负责密钥的创建、验证、统计等功能
 """
 
+import json
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, date
 
+from app.core.config import settings
+from app.core.utils import now_beijing
 from app.models.engine import get_db
-from app.models.auth.published_service_access_log import McpAccessLog
 from app.repositories.mcp_auth_repository import McpAuthRepository
+from app.services.auth.access_log_writer import AccessLogWriter
+from app.services.auth.secret_cache import SecretCache, SecretQuotaCounter
 from app.utils.auth.secret_generator import SecretGenerator
 from app.utils.logging import mcp_logger
+from app.utils.shared_state import shared_state
 from app.utils.const.error_code import error_code
 from app.utils.http.pagination import PageParams
 
@@ -21,6 +26,16 @@ class SecretManager:
 
     # 共享 Repository 实例
     _repo = McpAuthRepository()
+    # 密钥校验缓存与当日调用计数
+    _cache = SecretCache(ttl_seconds=settings.SECRET_CACHE_TTL)
+    _quota = SecretQuotaCounter(shared_state)
+    # 访问日志与密钥统计的异步批量写入器
+    _writer = AccessLogWriter(
+        _quota,
+        queue_size=settings.ACCESS_LOG_QUEUE_SIZE,
+        batch_size=settings.ACCESS_LOG_BATCH_SIZE,
+        flush_interval_ms=settings.ACCESS_LOG_FLUSH_INTERVAL_MS
+    )
 
     @staticmethod
     def _to_dict_with_creator(
@@ -98,6 +113,9 @@ class SecretManager:
             db.add(secret_record)
             db.commit()
             db.refresh(secret_record)
+            # 清除该密钥字符串可能存在的"无效"缓存
+            SecretManager._cache.invalidate(service_id, secret_key)
+            SecretManager._broadcast_invalidation(service_id=service_id)
 
             mcp_logger.info(f"为服务 {service_id} 生成新密钥: {name}")
 
@@ -109,6 +127,9 @@ class SecretManager:
                         secret: str) -> Optional[Dict[str, Any]]:
         """验证密钥是否有效
 
+        密钥信息优先从缓存读取，调用次数限制通过内存中的当日计数判断，
+        缓存命中时不访问数据库。
+
         Args:
             service_id: 服务ID
             secret: 密钥字符串
@@ -116,32 +137,61 @@ class SecretManager:
         Returns:
             Optional[Dict]: 如果有效返回密钥信息，否则返回None
         """
+        hit, cached = SecretManager._cache.get(service_id, secret)
+        if not hit:
+            cached = SecretManager._load_secret(service_id, secret)
+            SecretManager._cache.set(service_id, secret, cached)
+
+        if not cached:
+            return error_code.SUCCESS, None
+
+        # 检查是否过期
+        expires_at = cached["expires_at"]
+        if expires_at and datetime.now() > expires_at:
+            return error_code.AUTH_KEY_EXPIRED, None
+
+        # 检查调用次数限制
+        limit_count = cached["limit_count"]
+        if limit_count > 0:
+            current_calls = SecretManager._quota.get_count(
+                cached["id"], service_id,
+                SecretManager._load_today_call_count)
+
+            if current_calls >= limit_count:
+                msg = (f"MCP服务: {service_id} "
+                       f"密钥:{cached['info']['secret_key']} "
+                       f"调用次数已达上限: {limit_count}，"
+                       f"今日已调用: {current_calls}")
+                mcp_logger.error(msg)
+                return error_code.AUTH_KEY_LIMIT_EXCEEDED, msg
+
+        return error_code.SUCCESS, cached["info"]
+
+    @staticmethod
+    def _load_secret(service_id: int,
+                     secret: str) -> Optional[Dict[str, Any]]:
+        """从数据库加载密钥校验信息，密钥不存在或未激活时返回None"""
         with get_db() as db:
             secret_record = SecretManager._repo.get_secret_by_key(
                 db, service_id, secret)
-
             if not secret_record:
-                return error_code.SUCCESS, None
-
-            # 检查是否过期
-            if secret_record.is_expired():
-                return error_code.AUTH_KEY_EXPIRED, None
-
-            # 检查调用次数限制
-            if secret_record.limit_count > 0:
-                today_stats = SecretManager._repo.get_today_statistics(
-                    db, secret_record.id)
-                current_calls = today_stats.call_count if today_stats else 0
-
-                if current_calls >= secret_record.limit_count:
-                    msg = (f"MCP服务: {service_id} "
-                           f"密钥:{secret_record.secret_key} "
-                           f"调用次数已达上限: {secret_record.limit_count}，"
-                           f"今日已调用: {current_calls}")
-                    mcp_logger.error(msg)
-                    return error_code.AUTH_KEY_LIMIT_EXCEEDED, msg
+                return None
+            return {
+                "id": secret_record.id,
+                "expires_at": secret_record.expires_at,
+                "limit_count": secret_record.limit_count or 0,
+                "info": secret_record.to_dict()
+            }
 
-            return error_code.SUCCESS, secret_record.to_dict()
+    @staticmethod
+    def _load_today_call_count(secret_id: int) -> int:
+        """从数据库读取密钥当日调用次数，作为内存计数的初始值"""
+        with get_db() as db:
+            today_stats = SecretManager._repo.get_today_statistics(
+                db, secret_id)
+            if not today_stats:
+                return 0
+            return today_stats.call_count or 0
 
     @staticmethod
     def list_secrets(service_id: int, user_id: Optional[int] = None,
@@ -197,6 +247,7 @@ class SecretManager:
 
             db.delete(secret)
             db.commit()
+            SecretManager.invalidate_secrets([secret_id])
 
             mcp_logger.info(f"删除密钥: {secret_id} ({secret.secret_name})")
             return True
@@ -246,35 +297,96 @@ class SecretManager:
 
             db.commit()
             db.refresh(secret)
+            SecretManager._cache.invalidate_secret(secret_id)
+            SecretManager._broadcast_invalidation(secret_ids=[secret_id])
 
             mcp_logger.info(f"更新密钥: {secret_id} ({secret.secret_name})")
             return SecretManager._to_dict_with_creator(
                 db, secret, include_full_key=is_admin)
 
     @staticmethod
-    def update_secret_statistics(secret_id: int, success: bool = True) -> None:
+    def invalidate_secrets(secret_ids: List[int],
+                           service_id: Optional[int] = None) -> None:
+        """使已删除密钥的缓存和计数失效
+
+        Args:
+            secret_ids: 密钥ID列表
+            service_id: 服务ID，传入时同时清除该服务下的全部密钥缓存
+        """
+        for secret_id in secret_ids:
+            SecretManager._cache.invalidate_secret(secret_id)
+        if service_id is not None:
+            SecretManager._cache.invalidate_service(service_id)
+        SecretManager._quota.discard(secret_ids)
+        SecretManager._broadcast_invalidation(
+            secret_ids=secret_ids, service_id=service_id, deleted=True)
+
+    @staticmethod
+    def _broadcast_invalidation(secret_ids: Optional[List[int]] = None,
+                                service_id: Optional[int] = None,
+                                deleted: bool = False) -> None:
+        """通知其他进程使密钥缓存失效，单进程部署时不做任何事"""
+        shared_state.notify("secrets", {
+            "secret_ids": secret_ids or [],
+            "service_id": service_id,
+            "deleted": deleted,
+        })
+
+    @staticmethod
+    def _apply_invalidation(payload: Dict[str, Any]) -> None:
+        """处理其他进程发出的密钥缓存失效通知"""
+        for secret_id in payload.get("secret_ids", []):
+            SecretManager._cache.invalidate_secret(secret_id)
+        if payload.get("service_id") is not None:
+            SecretManager._cache.invalidate_service(payload["service_id"])
+        if payload.get("deleted"):
+            SecretManager._quota.discard(payload.get("secret_ids", []))
+
+    @staticmethod
+    def update_secret_statistics(secret_id: int, success: bool = True,
+                                 service_id: Optional[int] = None) -> None:
         """更新密钥访问统计
 
+        只累加内存中的当日计数，由访问日志写入器定时写回数据库。
+
         Args:
             secret_id: 密钥ID
             success: 是否成功访问
+            service_id: 服务ID，为空时从数据库查询
         """
-        with get_db() as db:
-            try:
+        if service_id is None:
+            with get_db() as db:
                 secret = SecretManager._repo.get_secret_by_id(db, secret_id)
                 if not secret:
                     return
+                service_id = secret.service_id
+
+        SecretManager._quota.increment(secret_id, service_id, success)
+
+    @staticmethod
+    def start_access_log_writer() -> None:
+        """启动访问日志批量写入器"""
+        SecretManager._writer.start()
+
+    @staticmethod
+    def stop_access_log_writer() -> None:
+        """停止访问日志批量写入器，写完剩余日志和统计增量"""
+        SecretManager._writer.stop()
 
-                today = date.today()
-                stats = SecretManager._repo.get_or_create_statistics(
-                    db, secret_id, secret.service_id, today)
+    @staticmethod
+    def get_access_log_writer_stats() -> Dict[str, Any]:
+        """获取访问日志写入器的队列深度、写入/丢弃/失败计数"""
+        return SecretManager._writer.get_stats()
 
-                stats.increment_call(success)
-                db.commit()
+    @staticmethod
+    def clean_secret_cache() -> int:
+        """清理过期的密钥缓存和非当日计数
 
-            except Exception as e:
-                mcp_logger.error(f"更新密钥统计失败: {secret_id}, 错误: {str(e)}")
-                db.rollback()
+        Returns:
+            int: 清理的缓存数量
+        """
+        return (SecretManager._cache.clean_expired()
+                + SecretManager._quota.clean_stale())
 
     @staticmethod
     def log_access(service_id: int, secret_id: Optional[int], client_ip: str,
@@ -283,6 +395,8 @@ class SecretManager:
                    request_headers: Optional[Dict] = None) -> None:
         """记录访问日志
 
+        日志放入异步写入队列后立即返回，不在请求路径上访问数据库。
+
         Args:
             service_id: 服务ID
             secret_id: 密钥ID，可为空（免密访问）
@@ -292,31 +406,24 @@ class SecretManager:
             error_message: 错误信息
             request_headers: 请求头信息
         """
-        with get_db() as db:
-            try:
-                status = 'success' if success else 'error'
-
-                log_record = McpAccessLog(
-                    service_id=service_id,
-                    secret_id=secret_id,
-                    client_ip=client_ip,
-                    user_agent=user_agent,
-                    status=status,
-                    error_message=error_message if not success else None
-                )
-
-                if request_headers:
-                    log_record.set_request_headers(request_headers)
-
-                db.add(log_record)
-                db.commit()
-
-                if secret_id:
-                    SecretManager.update_secret_statistics(secret_id, success)
+        status = 'success' if success else 'error'
+        SecretManager._writer.submit({
+            "service_id": service_id,
+            "secret_id": secret_id,
+            "client_ip": client_ip,
+            "user_agent": user_agent,
+            "access_time": now_beijing(),
+            "status": status,
+            "error_message": error_message if not success else None,
+            "request_headers": (
+                json.dumps(request_headers, ensure_ascii=False)
+                if request_headers else None
+            )
+        })
 
-            except Exception as e:
-                mcp_logger.error(f"记录访问日志失败: {str(e)}")
-                db.rollback()
+        if secret_id:
+            SecretManager.update_secret_statistics(
+                secret_id, success, service_id=service_id)
 
     @staticmethod
     def get_secret_statistics(secret_id: int,
@@ -431,3 +538,7 @@ class SecretManager:
                 log['service_name'] = services_dict.get(log['service_id'])
 
             return logs_list, total
+
+
+# 其他进程更新/删除密钥后使本进程的密钥缓存失效
+shared_state.subscribe("secrets", SecretManager._apply_invalidation)
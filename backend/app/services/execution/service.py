@@ -3,6 +3,7 @@ from typing import Dict, Any
 import importlib
 from ...core.config import settings
 from ..tools.service import ToolService
+from ..tools.tool_index import tool_index
 from ..history.service import HistoryService
 
 
@@ -15,12 +16,14 @@ class ExecutionService:
 
     def execute_tool(self, tool_name: str, parameters: Dict[str, Any]) -> Any:
         """执行MCP工具"""
-        tools = self.tool_service.scan_tools()
-        
-        if tool_name not in tools:
+        tool_info = tool_index.get(tool_name)
+        if tool_info is None:
+            # 索引中没有时检查一次文件变化（如新增的工具文件）
+            tool_index.refresh()
+            tool_info = tool_index.get(tool_name)
+        if tool_info is None:
             raise ValueError(f"工具 {tool_name} 不存在")
-        
-        tool_info = tools[tool_name]
+
         module_name = tool_info["module"]
         
         # if module_name not in self.modules:
@@ -31,7 +34,7 @@ class ExecutionService:
         tool_func = getattr(module, tool_name)
         
         try:
-            # start_time = time.time()
+            start_time = time.time()
             ret = tool_func(**parameters)
             execution_time = time.time() - start_time
             self.history_service.record_tool_execution(
@@ -0,0 +1,39 @@
+"""
+工具执行记录异步批量写入器
+
+工具调用路径上只把执行记录放入有界队列，由后台线程批量 INSERT 到
+`tool_executions`，不在请求路径上访问数据库。
+"""
+from typing import Any, Dict, List
+
+from app.core.config import settings
+from app.models.engine import get_db
+from app.repositories.tool_execution_repository import (
+    ToolExecutionRepository
+)
+from app.utils.batch_writer import BatchWriter
+
+
+class ToolExecutionWriter(BatchWriter):
+    """工具执行记录异步批量写入器"""
+
+    def write(self, batch: List[Dict[str, Any]]) -> None:
+        """批量写入一批工具执行记录"""
+        if not batch:
+            return
+        with get_db() as db:
+            try:
+                ToolExecutionRepository.bulk_insert_executions(db, batch)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+
+# 全局写入器实例
+tool_execution_writer = ToolExecutionWriter(
+    "工具执行记录",
+    queue_size=settings.TOOL_EXECUTION_QUEUE_SIZE,
+    batch_size=settings.TOOL_EXECUTION_BATCH_SIZE,
+    flush_interval_ms=settings.TOOL_EXECUTION_FLUSH_INTERVAL_MS
+)
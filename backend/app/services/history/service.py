@@ -4,8 +4,10 @@ from sqlalchemy import desc, func
 import time
 from sqlalchemy.exc import OperationalError, SQLAlchemyError
 
+from app.core.utils import now_beijing
 from app.models.engine import engine, get_db
 from app.models.tools.tool_execution import ToolExecution
+from app.services.history.execution_writer import tool_execution_writer
 from sqlalchemy.orm import sessionmaker
 from app.utils.logging import mcp_logger
 
@@ -107,6 +109,56 @@ class HistoryService:
         
         return None
 
+    def submit_tool_execution(
+        self,
+        tool_name: str,
+        description: str,
+        parameters: Dict[str, Any],
+        result: Any,
+        status: str,
+        execution_time: int,
+        service_id: Optional[str] = None,
+        module_id: Optional[int] = None,
+        cpu_time: Optional[int] = None,
+        args_size: Optional[int] = None,
+        result_size: Optional[int] = None,
+        session_id: Optional[str] = None,
+        secret_id: Optional[int] = None,
+        error_message: Optional[str] = None
+    ) -> bool:
+        """异步记录工具执行，放入写入队列后立即返回
+
+        `cpu_time` 及之后的参数由 MCP 服务内的工具埋点提供，中间件记录时
+        为空。
+
+        Returns:
+            bool: 是否成功入队，队列已满时返回 False
+        """
+        try:
+            row = {
+                "tool_name": tool_name,
+                "service_id": service_id,
+                "module_id": module_id,
+                "description": description,
+                "parameters": json.dumps(parameters, default=str),
+                "result": (
+                    json.dumps(result) if result is not None else None
+                ),
+                "status": status,
+                "execution_time": execution_time,
+                "cpu_time": cpu_time,
+                "args_size": args_size,
+                "result_size": result_size,
+                "session_id": session_id,
+                "secret_id": secret_id,
+                "error_message": error_message,
+                "created_at": now_beijing()
+            }
+        except (TypeError, ValueError) as e:
+            mcp_logger.error(f"序列化工具执行记录失败: {str(e)}")
+            return False
+        return tool_execution_writer.submit(row)
+
     def get_executions(
         self,
         page: int = 1,
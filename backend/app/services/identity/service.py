@@ -15,7 +15,7 @@ from app.models.modules.users import User, Tenant, UserTenant
 from app.repositories import TenantRepository, UserRepository
 from app.utils.logging import mcp_logger
 from app.core.config import settings
-from app.utils.cache import memory_cache
+from app.utils.shared_state import shared_state
 
 
 # 缓存键前缀
@@ -297,7 +297,7 @@ class UserService:
         try:
             # 首先从缓存中查找，避免重复调用API
             cache_key = EGOVAKB_TOKEN_CACHE_PREFIX + authorization
-            cached_user_data = memory_cache.get(cache_key)
+            cached_user_data = shared_state.get(cache_key)
             
             if cached_user_data:
                 mcp_logger.debug("使用缓存的EGova KB用户数据")
@@ -392,7 +392,7 @@ class UserService:
                 }
                 
                 # 缓存用户数据
-                memory_cache.set(
+                shared_state.set(
                     cache_key, 
                     result,
                     expire_seconds=86400  # 24小时
@@ -439,7 +439,7 @@ class UserService:
             }
             
             # 缓存用户数据
-            memory_cache.set(
+            shared_state.set(
                 cache_key, 
                 result,
                 expire_seconds=86400  # 24小时
@@ -1,17 +1,18 @@
 """MCP 模板广场服务。"""
-from datetime import datetime
+import hashlib
 import json
-from typing import List, Dict, Any, Optional
+import multiprocessing
 import os
-import sys
-import importlib
-import tempfile
-import ast
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Optional, Tuple
 
-from sqlalchemy import select, update, delete, func
+from sqlalchemy import select, insert, update, delete, func
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.models.engine import get_db
 from app.models.modules.mcp_template import McpModule
 from app.models.modules.mcp_template_tool import McpTool
@@ -19,11 +20,18 @@ from app.models.group.group import McpGroup
 from app.core.utils import now_beijing
 from app.utils.logging import mcp_logger
 from app.services.published_service import service_manager
+from app.services.mcp_template.tool_metadata import (
+    parse_module_tools, tool_metadata_cache
+)
 from app.repositories.mcp_template_repository import McpTemplateRepository
+from app.repositories.statistics_repository import StatisticsRepository
 from app.utils.permissions import add_edit_permission
 from app.utils.http import PageParams, build_page_response
 from app.models.tools.tool_execution import ToolExecution
 
+# 变更模块少于该数量时在当前进程解析，不值得启动进程池
+_PARALLEL_SCAN_MIN_MODULES = 32
+
 
 class McpTemplateService:
     """MCP 模板广场服务。"""
@@ -250,7 +258,12 @@ class McpTemplateService:
     def get_module_tools(
         self, module_id: int
     ) -> Optional[List[Dict[str, Any]]]:
-        """获取指定MCP模块的所有工具"""
+        """
+        获取指定MCP模块的所有工具
+
+        静态解析模板代码，不执行模板代码，结果按代码内容缓存，
+        见 tool_metadata 模块
+        """
         with get_db() as db:
             # 先检查模块是否存在
             module_query = select(McpModule).where(McpModule.id == module_id)
@@ -261,178 +274,24 @@ class McpTemplateService:
             # 如果模块没有代码，则返回空列表
             if not module.code:
                 return []
+            code = module.code
 
-            # 从模块代码中解析工具
-            tools = []
-            try:
-                # 创建临时模块
-                import sys
-                import importlib.util
-                import inspect
-                import tempfile
-                import os
-                # 创建当天日期文件夹
-                today = datetime.now().strftime("%Y-%m-%d")
-                publish_dir = os.path.join(
-                    os.path.dirname(__file__), '..', '..', '..',
-                    'data', 'script', 'publish', today
-                )
-                if not os.path.exists(publish_dir):
-                    os.makedirs(publish_dir)
-
-                code = module.code
-                if code.find("${") != -1:
-                    service = service_manager.get_service_by_module_id(module_id)
-                    if service.config_params and code:
-                        config_params = None
-                        if isinstance(service.config_params, str):
-                            config_params = json.loads(service.config_params)
-                        else:
-                            config_params = service.config_params
-                        code = service_manager.replace_config_params(
-                            code, config_params
-                        )
-
-                # 解析AST来获取函数源代码
-                def extract_function_source(
-                    source_code: str, function_name: str
-                ) -> str:
-                    """从源代码中提取指定函数的源代码"""
-                    try:
-                        tree = ast.parse(source_code)
-                        lines = source_code.split('\n')
-
-                        for node in ast.walk(tree):
-                            if (isinstance(node, ast.FunctionDef) and
-                                node.name == function_name):
-                                # 获取函数的起始和结束行号
-                                start_line = node.lineno - 1
-                                end_line = (node.end_lineno if
-                                          hasattr(node, 'end_lineno')
-                                          else start_line + 1)
-
-                                # 提取函数源代码
-                                function_lines = lines[start_line:end_line]
-                                return '\n'.join(function_lines)
-                    except Exception as e:
-                        mcp_logger.warning(
-                            f"提取函数 {function_name} 源代码失败: {str(e)}"
-                        )
-                        return ""
-                    return ""
-
-                # 创建临时文件并写入代码
-                with tempfile.NamedTemporaryFile(
-                    suffix='.py', prefix=f'module_{module_id}_',
-                    delete=False, dir=publish_dir
-                ) as temp:
-                    temp_path = temp.name
-                    temp.write(code.encode('utf-8'))
-
-                try:
-                    # 动态加载模块
-                    module_name = f"temp_module_{module_id}"
-                    spec = importlib.util.spec_from_file_location(
-                        module_name, temp_path
+        try:
+            if code.find("${") != -1:
+                service = service_manager.get_service_by_module_id(module_id)
+                if service and service.config_params:
+                    config_params = None
+                    if isinstance(service.config_params, str):
+                        config_params = json.loads(service.config_params)
+                    else:
+                        config_params = service.config_params
+                    code = service_manager.replace_config_params(
+                        code, config_params
                     )
-                    if not spec or not spec.loader:
-                        return []
-
-                    temp_module = importlib.util.module_from_spec(spec)
-                    sys.modules[module_name] = temp_module
-                    spec.loader.exec_module(temp_module)
-
-                    # 查找所有函数
-                    for name, obj in inspect.getmembers(temp_module):
-                        if inspect.isfunction(obj):
-                            # 解析函数签名
-                            sig = inspect.signature(obj)
-                            param_info = []
-
-                            # 获取函数参数信息
-                            for param_name, param in sig.parameters.items():
-                                param_type_str = str(param.annotation)
-                                if hasattr(param.annotation, '__name__'):
-                                    param_type_str = param.annotation.__name__
-                                elif hasattr(param.annotation, '__origin__'):
-                                    origin_name = getattr(
-                                        param.annotation.__origin__,
-                                        '__name__',
-                                        str(param.annotation.__origin__)
-                                    )
-                                    args_str = ", ".join(
-                                        getattr(arg, '__name__', str(arg))
-                                        for arg in getattr(
-                                            param.annotation, '__args__', []
-                                        )
-                                    )
-                                    param_type_str = (
-                                        f"{origin_name}[{args_str}]"
-                                    )
-
-                                # 判断参数是否必填
-                                required = (param.default ==
-                                          inspect.Parameter.empty)
-
-                                param_info.append({
-                                    "name": param_name,
-                                    "type": (
-                                        param_type_str
-                                        if param_type_str != '_empty'
-                                        else 'Any'
-                                    ),
-                                    "required": required,
-                                    "default": (
-                                        repr(param.default)
-                                        if not required else None
-                                    )
-                                })
-
-                            # 获取函数源代码
-                            function_source = ""
-                            try:
-                                # 首先尝试使用inspect.getsource
-                                function_source = inspect.getsource(obj)
-                            except (OSError, TypeError):
-                                # 如果失败，使用AST解析
-                                function_source = extract_function_source(
-                                    code, name
-                                )
-
-                            # 构建工具信息
-                            tool_info = {
-                                "id": None,  # 动态生成的工具没有ID
-                                "name": name,
-                                "description": inspect.getdoc(obj) or "",
-                                "function_name": name,
-                                "parameters": param_info,
-                                "return_type": (
-                                    str(sig.return_annotation)
-                                    if str(sig.return_annotation) != '_empty'
-                                    else 'Any'
-                                ),
-                                "module_id": module_id,
-                                "is_enabled": True,
-                                "source_code": function_source
-                            }
-                            tools.append(tool_info)
-                finally:
-                    # # 清理临时文件
-                    # if os.path.exists(temp_path):
-                    #     os.unlink(temp_path)
-
-                    # 从sys.modules中移除临时模块
-                    if module_name in sys.modules:
-                        del sys.modules[module_name]
-
-            except Exception as e:
-                import traceback
-                from app.utils.logging import mcp_logger
-                mcp_logger.error(f"解析模块代码时出错: {str(e)}")
-                mcp_logger.error(traceback.format_exc())
-                return []
-
-            return tools
+            return tool_metadata_cache.get_tools(module_id, code)
+        except Exception as e:
+            mcp_logger.error(f"解析模块代码时出错: {str(e)}")
+            return []
 
     def get_tool(self, tool_id: int) -> Optional[Dict[str, Any]]:
         """获取指定MCP工具的详情"""
@@ -443,19 +302,37 @@ class McpTemplateService:
                 return tool.to_dict()
             return None
 
-    def scan_repository_modules(self) -> Dict[str, int]:
-        """扫描数据库中的MCP模块并更新工具信息"""
+    def scan_repository_modules(self, force: bool = False) -> Dict[str, Any]:
+        """扫描数据库中的MCP模块并更新工具信息
+
+        只扫描代码摘要与上次扫描不同的模块，静态解析模板代码（不执行），
+        变更模块较多时在进程池中并行解析；每个模块的工具批量写入。
+
+        参数:
+            force: 是否忽略代码摘要，重新扫描全部模块
+
+        返回:
+            扫描统计，modules 为每个模块的状态和解析、写入耗时
+        """
+        started = time.perf_counter()
         # 结果统计
         stats = {
             "total": 0,      # 总共扫描的模块数
             "updated": 0,    # 更新工具的模块数
-            "tools": 0       # 扫描到的工具数
+            "tools": 0,      # 扫描到的工具数
+            "skipped": 0,    # 代码未变化跳过的模块数
+            "failed": 0,     # 解析或写入失败的模块数
+            "elapsed_ms": 0,
+            "modules": []
         }
 
         try:
             with get_db() as db:
-                # 查询所有模块
-                modules = db.execute(select(McpModule)).scalars().all()
+                # 查询所有模块，不加载模块的其他大字段
+                modules = db.execute(
+                    select(McpModule.id, McpModule.name, McpModule.code,
+                           McpModule.tools_code_hash)
+                ).all()
                 stats["total"] = len(modules)
 
                 if not modules:
@@ -464,139 +341,162 @@ class McpTemplateService:
 
                 mcp_logger.info(f"在数据库中找到{len(modules)}个MCP模块")
 
-                # 创建临时目录存放模块代码
-                temp_dir = tempfile.mkdtemp(prefix="mcp_templates_")
-
-                # 添加临时目录到Python路径
-                if temp_dir not in sys.path:
-                    sys.path.insert(0, temp_dir)
-
-                # 处理每个模块
+                # 筛选代码有变化的模块
+                pending = []
+                scanned = {}
                 for module in modules:
+                    entry = {"id": module.id, "name": module.name,
+                             "status": "unchanged", "tools": 0,
+                             "parse_ms": 0, "write_ms": 0}
+                    stats["modules"].append(entry)
                     if not module.code:
                         mcp_logger.warning(f"模块 {module.name} 没有代码内容，跳过")
+                        entry["status"] = "empty"
                         continue
-
-                    # 创建临时模块文件
-                    module_file = os.path.join(temp_dir, f"{module.name}.py")
-
-                    try:
-                        # 写入代码到临时文件
-                        with open(module_file, "w", encoding="utf-8") as f:
-                            f.write(module.code)
-
-                        # 动态导入模块
-                        module_name = module.name
-
-                        spec = importlib.util.spec_from_file_location(
-                            module_name, module_file
-                        )
-                        if spec and spec.loader:
-                            module_obj = importlib.util.module_from_spec(spec)
-                            spec.loader.exec_module(module_obj)
-
-                            # 扫描模块中的函数
-                            tool_count = self._scan_module_tools(
-                                db, module_obj, module.id, module_name
+                    digest = hashlib.sha256(
+                        module.code.encode("utf-8")).hexdigest()
+                    if not force and digest == module.tools_code_hash:
+                        stats["skipped"] += 1
+                        continue
+                    pending.append((module.id, module.code))
+                    scanned[module.id] = (entry, digest)
+
+                if pending:
+                    existing_tools = self._load_existing_tools(
+                        db, list(scanned))
+                    for module_id, tools, error, parse_ms in (
+                            self._parse_modules(pending)):
+                        entry, digest = scanned[module_id]
+                        entry["parse_ms"] = round(parse_ms, 2)
+                        if tools is None:
+                            mcp_logger.error(
+                                f"处理模块 {entry['name']} 失败: {error}"
                             )
-
-                            if tool_count > 0:
-                                stats["updated"] += 1
-                                stats["tools"] += tool_count
-
-                    except Exception as e:
-                        mcp_logger.error(
-                            f"处理模块 {module.name} 失败: {str(e)}"
-                        )
-
-                # 清理临时目录
-                try:
-                    import shutil
-                    shutil.rmtree(temp_dir)
-                except Exception as e:
-                    mcp_logger.warning(f"清理临时目录失败: {str(e)}")
-
-                db.commit()
-                return stats
+                            entry["status"] = "error"
+                            entry["error"] = error
+                            stats["failed"] += 1
+                            continue
+
+                        write_started = time.perf_counter()
+                        try:
+                            self._write_module_tools(
+                                db, module_id, tools,
+                                existing_tools.get(module_id, {}), digest
+                            )
+                        except SQLAlchemyError as e:
+                            db.rollback()
+                            mcp_logger.error(
+                                f"写入模块 {entry['name']} 的工具失败: {str(e)}"
+                            )
+                            entry["status"] = "error"
+                            entry["error"] = str(e)
+                            stats["failed"] += 1
+                            continue
+                        entry["write_ms"] = round(
+                            (time.perf_counter() - write_started) * 1000, 2)
+                        entry["status"] = "updated"
+                        entry["tools"] = len(tools)
+                        if tools:
+                            stats["updated"] += 1
+                            stats["tools"] += len(tools)
 
         except Exception as e:
             mcp_logger.error(f"扫描模块时出错: {str(e)}")
-            return stats
-
-    def _scan_module_tools(
-        self, db, module_obj, module_id: int, module_name: str
-    ) -> int:
-        """扫描模块中的函数作为工具"""
-        tool_count = 0
-
-        for func_name, func in inspect.getmembers(module_obj, inspect.isfunction):
-            # 过滤出该模块定义的函数(而不是导入的函数)
-            if func.__module__ == module_name:
-                # 获取函数文档和参数信息
-                doc = inspect.getdoc(func) or f"{func_name} 函数"
-                signature = inspect.signature(func)
-                parameters = {}
-
-                for param_name, param in signature.parameters.items():
-                    if param_name == 'self':  # 跳过self参数
-                        continue
-
-                    param_type = "any"
-                    if param.annotation != param.empty:
-                        param_type = str(param.annotation)
-
-                    param_info = {
-                        "type": param_type,
-                        "required": param.default == param.empty
-                    }
-
-                    if param.default != param.empty:
-                        param_info["default"] = param.default
-
-                    parameters[param_name] = param_info
-
-                # 查询该工具是否已存在
-                query_conditions = [
-                    McpTool.module_id == module_id,
-                    McpTool.function_name == func_name
-                ]
-                tool_query = select(McpTool).where(*query_conditions)
-
-                # 获取现有工具
-                existing_tool = db.execute(
-                    tool_query
-                ).scalar_one_or_none()
-
-                if existing_tool:
-                    # 更新现有工具
-                    stmt = (
-                        update(McpTool)
-                        .where(McpTool.id == existing_tool.id)
-                        .values(
-                            name=func_name,
-                            description=doc,
-                            parameters=str(parameters) if parameters else None,
-                            updated_at=now_beijing()
-                        )
-                    )
-                    db.execute(stmt)
-                else:
-                    # 创建新工具
-                    new_tool = McpTool(
-                        module_id=module_id,
-                        name=func_name,
-                        function_name=func_name,
-                        description=doc,
-                        parameters=str(parameters) if parameters else None,
-                        created_at=now_beijing(),
-                        updated_at=now_beijing(),
-                        is_enabled=True
-                    )
-                    db.add(new_tool)
-
-                tool_count += 1
 
-        return tool_count
+        stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        mcp_logger.info(
+            f"扫描模块完成: 共{stats['total']}个，更新{stats['updated']}个，"
+            f"跳过{stats['skipped']}个，失败{stats['failed']}个，"
+            f"耗时{stats['elapsed_ms']}ms"
+        )
+        return stats
+
+    def _parse_modules(
+        self, pending: List[Tuple[int, str]]
+    ) -> List[Tuple[int, Optional[List[Dict[str, Any]]], Optional[str], float]]:
+        """解析变更模块的工具，变更模块较多时使用进程池并行解析"""
+        processes = settings.TEMPLATE_SCAN_PROCESSES or os.cpu_count() or 1
+        processes = min(processes, len(pending))
+        if processes > 1 and len(pending) >= _PARALLEL_SCAN_MIN_MODULES:
+            try:
+                # spawn 方式：不 fork 带有事件循环和线程的服务进程
+                with ProcessPoolExecutor(
+                    max_workers=processes,
+                    mp_context=multiprocessing.get_context("spawn")
+                ) as pool:
+                    chunksize = max(1, len(pending) // (processes * 4))
+                    return list(pool.map(parse_module_tools, pending,
+                                         chunksize=chunksize))
+            except (OSError, BrokenProcessPool) as e:
+                mcp_logger.warning(f"进程池解析模块失败，改为当前进程解析: {str(e)}")
+        return [parse_module_tools(item) for item in pending]
+
+    def _load_existing_tools(
+        self, db: Session, module_ids: List[int]
+    ) -> Dict[int, Dict[str, int]]:
+        """一次查询模块已有的工具，返回 {模块ID: {函数名: 工具ID}}"""
+        existing: Dict[int, Dict[str, int]] = {}
+        rows = db.execute(
+            select(McpTool.module_id, McpTool.function_name, McpTool.id)
+            .where(McpTool.module_id.in_(module_ids))
+            .order_by(McpTool.id)
+        ).all()
+        for module_id, function_name, tool_id in rows:
+            existing.setdefault(module_id, {}).setdefault(
+                function_name, tool_id)
+        return existing
+
+    def _write_module_tools(
+        self, db: Session, module_id: int, tools: List[Dict[str, Any]],
+        existing: Dict[str, int], digest: str
+    ) -> None:
+        """批量写入一个模块的工具并记录代码摘要，已存在的工具按函数名更新"""
+        now = now_beijing()
+        updates = []
+        inserts = []
+        for tool in tools:
+            func_name = tool["function_name"]
+            parameters = {}
+            for param in tool["parameters"]:
+                if param["name"] == "self":  # 跳过self参数
+                    continue
+                param_info = {
+                    "type": param["type"],
+                    "required": param["required"]
+                }
+                if not param["required"]:
+                    param_info["default"] = param["default"]
+                parameters[param["name"]] = param_info
+
+            values = {
+                "name": func_name,
+                "description": tool["description"] or f"{func_name} 函数",
+                "parameters": (json.dumps(parameters, ensure_ascii=False)
+                               if parameters else None),
+                "updated_at": now
+            }
+            tool_id = existing.get(func_name)
+            if tool_id:
+                updates.append({"id": tool_id, **values})
+            else:
+                inserts.append({
+                    "module_id": module_id,
+                    "function_name": func_name,
+                    "created_at": now,
+                    "is_enabled": True,
+                    **values
+                })
+
+        if updates:
+            db.execute(update(McpTool), updates)
+        if inserts:
+            db.execute(insert(McpTool), inserts)
+        db.execute(
+            update(McpModule)
+            .where(McpModule.id == module_id)
+            .values(tools_code_hash=digest)
+        )
+        db.commit()
 
     # 以下函数已移动到 group_service 中
     def list_categories(self) -> List[Dict[str, Any]]:
@@ -725,6 +625,7 @@ class McpTemplateService:
 
             db.commit()
             db.refresh(module)
+            tool_metadata_cache.invalidate(module_id)
 
             return module.to_dict()
 
@@ -758,6 +659,8 @@ class McpTemplateService:
                 db.execute(
                     delete(ToolExecution).where(ToolExecution.module_id == module_id)
                 )
+                # 调用统计是增量累加的，删除执行记录后下次刷新时全量重建
+                StatisticsRepository.reset_watermarks(db)
 
                 # 删除相关工具
                 db.execute(
@@ -770,6 +673,7 @@ class McpTemplateService:
                 )
 
                 db.commit()
+                tool_metadata_cache.invalidate(module_id)
                 return True
         except SQLAlchemyError as e:
             mcp_logger.error(f"删除模块错误: {str(e)}")
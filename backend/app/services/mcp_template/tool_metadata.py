@@ -0,0 +1,192 @@
+"""
+模板工具元数据静态解析
+
+模板详情页的工具列表以前每次都把代码写到 `data/script/publish/<日期>/`
+下的临时文件（从不删除）再 import 执行，模板顶层的 import 和副作用都会
+被执行一遍，只为了拿函数签名。
+
+这里直接解析 AST 取模块顶层定义的函数：名称、参数（注解、默认值、
+是否必填）、返回注解、docstring、源码和行号范围，不执行任何模板代码。
+解析结果按代码内容（替换配置参数后）的 sha256 缓存，同一份代码只解析
+一次；`update_module` / `delete_module` 时按模块ID清除。
+
+`parse_module_tools` 供 `scan_repository_modules` 在进程池中调用，本模块
+只依赖标准库，spawn 方式启动的子进程导入开销很小。
+"""
+import ast
+import copy
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# 缓存的代码份数上限
+_CACHE_SIZE = 1024
+# 模板配置参数占位符，如 ${database_host}
+_PLACEHOLDER_PATTERN = re.compile(r"\$\{[^}]*\}")
+
+
+def _unparse(node: Optional[ast.AST]) -> Optional[str]:
+    return ast.unparse(node) if node is not None else None
+
+
+def _parameters(args: ast.arguments) -> List[Dict[str, Any]]:
+    """按 inspect.signature 的顺序返回参数信息"""
+    positional = args.posonlyargs + args.args
+    defaults: List[Optional[ast.expr]] = (
+        [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+    )
+    params: List[Tuple[ast.arg, Optional[ast.expr]]] = list(
+        zip(positional, defaults))
+    if args.vararg:
+        params.append((args.vararg, None))
+    params.extend(zip(args.kwonlyargs, args.kw_defaults))
+    if args.kwarg:
+        params.append((args.kwarg, None))
+    return [
+        {
+            "name": arg.arg,
+            "type": _unparse(arg.annotation) or "Any",
+            "required": default is None,
+            "default": _unparse(default),
+        }
+        for arg, default in params
+    ]
+
+
+def extract_tools(code: str) -> List[Dict[str, Any]]:
+    """
+    解析模板代码中模块顶层定义的函数，按函数名排序
+
+    Args:
+        code: 模板代码（已替换配置参数）
+
+    Returns:
+        List[Dict]: 工具信息，字段与 `get_module_tools` 返回结构一致，
+        另有 `is_async` 和 `source_span`（起止行号，含装饰器）
+
+    Raises:
+        SyntaxError: 代码无法解析
+    """
+    tree = ast.parse(code)
+    lines = code.split("\n")
+    tools = []
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        start_line = (node.decorator_list[0].lineno if node.decorator_list
+                      else node.lineno)
+        end_line = node.end_lineno or node.lineno
+        tools.append({
+            "id": None,  # 动态生成的工具没有ID
+            "name": node.name,
+            "description": ast.get_docstring(node) or "",
+            "function_name": node.name,
+            "parameters": _parameters(node.args),
+            "return_type": _unparse(node.returns) or "Any",
+            "is_enabled": True,
+            "is_async": isinstance(node, ast.AsyncFunctionDef),
+            "source_code": "\n".join(lines[start_line - 1:end_line]),
+            "source_span": {"start_line": start_line, "end_line": end_line},
+        })
+    # 同名函数以最后一次定义为准，与模块执行后的结果一致
+    return sorted({tool["name"]: tool for tool in tools}.values(),
+                  key=lambda tool: tool["name"])
+
+
+def parse_module_tools(
+    item: Tuple[int, str]
+) -> Tuple[int, Optional[List[Dict[str, Any]]], Optional[str], float]:
+    """
+    解析一个模块的工具，供进程池调用，不抛出异常
+
+    扫描时没有服务的配置参数，占位符替换为 None 后解析，只影响默认值，
+    不影响工具名称和参数列表。
+
+    Args:
+        item: (模块ID, 模板代码)
+
+    Returns:
+        Tuple: (模块ID, 工具信息, 错误信息, 解析耗时毫秒)，
+        解析失败时工具信息为 None
+    """
+    module_id, code = item
+    started = time.perf_counter()
+    if "${" in code:
+        code = _PLACEHOLDER_PATTERN.sub("None", code)
+    try:
+        tools, error = extract_tools(code), None
+    except (SyntaxError, ValueError) as e:
+        tools, error = None, f"{type(e).__name__}: {e}"
+    return module_id, tools, error, (time.perf_counter() - started) * 1000
+
+
+class ToolMetadataCache:
+    """按代码内容缓存的工具元数据"""
+
+    def __init__(self, max_size: int = _CACHE_SIZE):
+        self.max_size = max(1, max_size)
+        # 代码摘要 -> 工具信息
+        self._entries: "OrderedDict[str, List[Dict[str, Any]]]" = (
+            OrderedDict())
+        # 模块ID -> 最近一次解析的代码摘要
+        self._module_digests: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get_tools(self, module_id: int, code: str) -> List[Dict[str, Any]]:
+        """
+        获取模板代码的工具信息，未缓存时解析
+
+        Args:
+            module_id: 模块ID，写入返回结果并用于按模块清除缓存
+            code: 模板代码（已替换配置参数）
+
+        Returns:
+            List[Dict]: 工具信息（副本，调用方可修改）
+
+        Raises:
+            SyntaxError: 代码无法解析
+        """
+        digest = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        with self._lock:
+            tools = self._entries.get(digest)
+            if tools is not None:
+                self._entries.move_to_end(digest)
+                self._hits += 1
+        if tools is None:
+            tools = extract_tools(code)
+            with self._lock:
+                self._misses += 1
+                self._entries[digest] = tools
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        with self._lock:
+            self._module_digests[module_id] = digest
+        result = copy.deepcopy(tools)
+        for tool in result:
+            tool["module_id"] = module_id
+        return result
+
+    def invalidate(self, module_id: int) -> None:
+        """清除模块最近一次解析的缓存，模板代码修改或删除时调用"""
+        with self._lock:
+            digest = self._module_digests.pop(module_id, None)
+            if digest is not None:
+                self._entries.pop(digest, None)
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取缓存命中计数"""
+        with self._lock:
+            return {
+                "cached": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+# 全局实例
+tool_metadata_cache = ToolMetadataCache()
@@ -1,4 +1,10 @@
 """MCP 服务管理模块。"""
 from .service import McpServiceManager, service_manager
+from .service_index import ServiceIndex, service_index
 
-__all__ = ["McpServiceManager", "service_manager"]
+__all__ = [
+    "McpServiceManager",
+    "service_manager",
+    "ServiceIndex",
+    "service_index",
+]
@@ -0,0 +1,308 @@
+"""
+第三方服务代理转发客户端
+
+第三方服务的代理路由通过 `proxy_client_pool.forward` 转发请求：
+
+- 每个上游（协议 + 主机 + 端口）一个共享的 `httpx.AsyncClient`，各自维护
+  连接池和 keep-alive 连接，一个上游连接耗尽不影响其他上游；
+- 连接、读取超时可配置，SSE 长连接按读取超时判断上游是否失联；
+- 响应体以异步方式逐块转发，不阻塞事件循环；客户端断开时
+  `StreamingResponse` 取消转发，上游响应随之关闭；
+- 记录每个上游的进行中请求数、连接池饱和次数、超时和错误计数。
+
+应用关闭时调用 `aclose` 关闭全部连接池。
+"""
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+
+from app.core.config import settings
+from app.utils.logging import mcp_logger
+
+# 不转发的逐跳请求头/响应头
+_HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+}
+
+# SSE 响应固定返回的响应头
+_SSE_RESPONSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Cache-Control",
+}
+
+
+class _UpstreamStats:
+    """单个上游的转发计数"""
+
+    __slots__ = ("in_flight", "peak_in_flight", "requests", "errors",
+                 "timeouts", "pool_saturated")
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        # 发起请求时进行中请求数已达连接池上限的次数（含连接池等待超时）
+        self.pool_saturated = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ProxyClientPool:
+    """按上游划分连接池的异步代理客户端"""
+
+    def __init__(self, connect_timeout: float = 5.0,
+                 read_timeout: float = 300.0, max_connections: int = 100,
+                 max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 30.0):
+        """
+        初始化代理客户端
+
+        Args:
+            connect_timeout: 连接超时（秒），也是等待连接池空闲连接的超时
+            read_timeout: 读取超时（秒），两次收到数据的最长间隔
+            max_connections: 单个上游的最大连接数
+            max_keepalive_connections: 单个上游保留的 keep-alive 连接数
+            keepalive_expiry: keep-alive 连接空闲过期时间（秒）
+        """
+        self.timeout = httpx.Timeout(
+            connect=connect_timeout, read=read_timeout,
+            write=read_timeout, pool=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry)
+        self.max_connections = max_connections
+
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        # 创建客户端的事件循环，丢弃客户端时在该循环上关闭
+        self._loops: Dict[str, asyncio.AbstractEventLoop] = {}
+        # 进行中的关闭任务（保留引用，避免任务被回收）
+        self._closing: set = set()
+        self._stats: Dict[str, _UpstreamStats] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _origin(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _get_client(self, key: str,
+                    uds: Optional[str] = None) -> httpx.AsyncClient:
+        """获取上游的共享客户端，不存在时创建"""
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None or client.is_closed:
+                    transport = (
+                        httpx.AsyncHTTPTransport(uds=uds, limits=self.limits)
+                        if uds else None
+                    )
+                    client = httpx.AsyncClient(
+                        timeout=self.timeout, limits=self.limits,
+                        transport=transport, follow_redirects=False)
+                    self._clients[key] = client
+                    self._loops[key] = asyncio.get_running_loop()
+                    self._stats.setdefault(key, _UpstreamStats())
+        return client
+
+    def discard_uds(self, uds: str) -> None:
+        """
+        丢弃 Unix socket 上游的客户端（工作进程重启后旧连接全部失效）
+
+        客户端在创建它的事件循环上关闭，可以从任意线程调用。
+        """
+        key = f"unix:{uds}"
+        with self._lock:
+            client = self._clients.pop(key, None)
+            loop = self._loops.pop(key, None)
+        if client is None or loop is None or loop.is_closed():
+            return
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            task = loop.create_task(client.aclose())
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+        else:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+    async def forward(self, request: Request, target_url: str,
+                      on_complete: Optional[Callable[[], None]] = None,
+                      on_event_chunk: Optional[Callable[[bytes], bool]] = None,
+                      uds: Optional[str] = None,
+                      header_overrides: Optional[
+                          Dict[str, Optional[str]]] = None,
+                      passthrough_errors: bool = False) -> Response:
+        """
+        把请求转发到上游并以流式响应返回
+
+        Args:
+            request: 客户端请求
+            target_url: 上游完整URL（不含查询参数）
+            on_complete: 转发结束（上游响应关闭或转发失败）时调用一次
+            on_event_chunk: SSE 响应的数据块回调，返回 True 后不再调用
+            uds: 通过本地 Unix socket 连接上游（服务工作进程），连接池按
+                socket 路径划分
+            header_overrides: 覆盖的请求头，值为 None 表示删除
+            passthrough_errors: 上游 4xx/5xx 响应原样返回，不转换为 JSON 错误
+
+        Returns:
+            Response: 上游响应的流式转发，失败时返回 JSON 错误
+        """
+        origin = f"unix:{uds}" if uds else self._origin(target_url)
+        client = self._get_client(origin, uds)
+        stats = self._stats[origin]
+
+        # 复制请求头，排除一些不需要的头
+        headers = {
+            key: value for key, value in request.headers.items()
+            if key not in _HOP_BY_HOP_HEADERS
+            and key not in ("host", "content-length")
+        }
+        for key, value in (header_overrides or {}).items():
+            headers.pop(key, None)
+            if value is not None:
+                headers[key] = value
+        body = await request.body()
+
+        stats.requests += 1
+        if stats.in_flight >= self.max_connections:
+            stats.pool_saturated += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                stats.in_flight -= 1
+                if on_complete is not None:
+                    on_complete()
+
+        try:
+            upstream_request = client.build_request(
+                request.method, target_url, headers=headers, content=body,
+                params=request.query_params)
+            upstream = await client.send(upstream_request, stream=True)
+        except httpx.PoolTimeout:
+            release()
+            stats.pool_saturated += 1
+            stats.timeouts += 1
+            mcp_logger.error(f"代理转发连接池已满: {target_url}")
+            return JSONResponse({"error": "代理转发连接池已满"},
+                                status_code=503)
+        except httpx.TimeoutException:
+            release()
+            stats.timeouts += 1
+            mcp_logger.error(f"代理转发超时: {target_url}")
+            return JSONResponse({"error": "代理转发超时"}, status_code=504)
+        except Exception as e:
+            release()
+            stats.errors += 1
+            mcp_logger.error(f"代理转发失败: {str(e)}")
+            return JSONResponse({"error": f"代理转发失败: {str(e)}"},
+                                status_code=502)
+
+        if upstream.status_code >= 400 and not passthrough_errors:
+            await upstream.aclose()
+            release()
+            stats.errors += 1
+            mcp_logger.error(
+                f"代理转发HTTP错误: {upstream.status_code} - {target_url}")
+            return JSONResponse(
+                {"error": f"代理转发HTTP错误: {upstream.status_code}"},
+                status_code=upstream.status_code)
+
+        async def close_upstream() -> None:
+            release()
+            await upstream.aclose()
+
+        content_type = upstream.headers.get("content-type", "")
+        is_event_stream = "text/event-stream" in content_type
+
+        async def stream_body():
+            inspect_chunk = on_event_chunk if is_event_stream else None
+            try:
+                async for chunk in upstream.aiter_raw():
+                    if inspect_chunk is not None and inspect_chunk(chunk):
+                        inspect_chunk = None
+                    yield chunk
+            except httpx.TimeoutException:
+                stats.timeouts += 1
+                mcp_logger.warning(f"代理转发读取超时: {target_url}")
+            except httpx.HTTPError as e:
+                stats.errors += 1
+                mcp_logger.warning(f"代理转发读取中断: {target_url}, {str(e)}")
+            finally:
+                # 客户端断开时生成器被关闭，同时关闭上游响应
+                await close_upstream()
+
+        if is_event_stream:
+            response_headers = dict(_SSE_RESPONSE_HEADERS)
+            # 流式HTTP上游以 SSE 返回响应时保留会话ID
+            session_id = upstream.headers.get("mcp-session-id")
+            if session_id:
+                response_headers["mcp-session-id"] = session_id
+            media_type = "text/event-stream"
+        else:
+            response_headers = {
+                key: value for key, value in upstream.headers.items()
+                if key.lower() not in _HOP_BY_HOP_HEADERS
+            }
+            media_type = None
+        return StreamingResponse(
+            stream_body(),
+            status_code=upstream.status_code,
+            headers=response_headers,
+            media_type=media_type,
+            background=BackgroundTask(close_upstream),
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各上游的转发状态"""
+        upstreams = {
+            origin: stats.to_dict() for origin, stats in self._stats.items()
+        }
+        return {
+            "upstreams": len(upstreams),
+            "in_flight": sum(s["in_flight"] for s in upstreams.values()),
+            "max_connections_per_upstream": self.max_connections,
+            "pool_saturated": sum(
+                s["pool_saturated"] for s in upstreams.values()),
+            "details": upstreams,
+        }
+
+    async def aclose(self) -> None:
+        """关闭全部上游连接池"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._loops.clear()
+        for client in clients:
+            await client.aclose()
+
+
+proxy_client_pool = ProxyClientPool(
+    connect_timeout=settings.PROXY_CONNECT_TIMEOUT,
+    read_timeout=settings.PROXY_READ_TIMEOUT,
+    max_connections=settings.PROXY_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.PROXY_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=settings.PROXY_KEEPALIVE_EXPIRY,
+)
@@ -0,0 +1,205 @@
+"""
+已发布服务路由分发器
+
+所有已发布 MCP 服务（内置服务的 SSE / 流式HTTP 路由、第三方服务的代理
+路由）不再逐条插入 Starlette 路由表，而是登记在一个分发器中，分发器作为
+单个路由挂在主应用路由表的最前面：
+
+- 精确路径（SSE 端点、流式HTTP 端点、代理路径本身）用字典查找；
+- 前缀路径（`.../messages/` 消息端点、代理子路径）用按路径段组织的
+  radix 树做最长前缀匹配。
+
+命中后仍交给服务自己的 `Route` / `Mount` 处理，请求方法校验、路径参数、
+root_path 等行为与直接注册到路由表一致。发布、停止服务只增删映射，
+不修改 Starlette 路由表，普通 API 和静态资源请求只多一次字典查找。
+"""
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.routing import BaseRoute, Match, NoMatchFound
+from starlette.types import Receive, Scope, Send
+
+# 命中的服务路由在子 scope 中的键
+_ROUTE_KEY = "mcp_dispatch_route"
+
+
+class _PrefixNode:
+    """radix 树节点"""
+
+    __slots__ = ("children", "value")
+
+    def __init__(self):
+        self.children: Dict[str, "_PrefixNode"] = {}
+        self.value: Any = None
+
+
+class PathPrefixTree:
+    """按路径段组织的前缀树，支持最长前缀匹配"""
+
+    def __init__(self):
+        self._root = _PrefixNode()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _segments(path: str) -> List[str]:
+        return [segment for segment in path.split("/") if segment]
+
+    def insert(self, prefix: str, value: Any) -> None:
+        """登记前缀，已存在时覆盖"""
+        node = self._root
+        for segment in self._segments(prefix):
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = _PrefixNode()
+            node = child
+        if node.value is None:
+            self._size += 1
+        node.value = value
+
+    def get(self, prefix: str) -> Any:
+        """获取前缀登记的值"""
+        node = self._root
+        for segment in self._segments(prefix):
+            node = node.children.get(segment)
+            if node is None:
+                return None
+        return node.value
+
+    def remove(self, prefix: str) -> Any:
+        """删除前缀并清理空节点，返回原来的值"""
+        path = [self._root]
+        segments = self._segments(prefix)
+        for segment in segments:
+            node = path[-1].children.get(segment)
+            if node is None:
+                return None
+            path.append(node)
+        value = path[-1].value
+        if value is None:
+            return None
+        path[-1].value = None
+        self._size -= 1
+        # 自底向上删除没有值也没有子节点的节点
+        for depth in range(len(segments), 0, -1):
+            node = path[depth]
+            if node.value is not None or node.children:
+                break
+            del path[depth - 1].children[segments[depth - 1]]
+        return value
+
+    def match(self, path: str) -> List[Any]:
+        """返回所有是 path 前缀的登记值，最长前缀在前"""
+        matched = []
+        node = self._root
+        for segment in self._segments(path):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.value is not None:
+                matched.append(node.value)
+        matched.reverse()
+        return matched
+
+
+class McpRouteDispatcher(BaseRoute):
+    """已发布服务路由分发器，作为单个路由挂载到主应用"""
+
+    def __init__(self):
+        # 精确路径 -> (服务UUID, 路由)
+        self._exact: Dict[str, Tuple[str, BaseRoute]] = {}
+        # 前缀路径 -> (服务UUID, 路由)
+        self._prefix = PathPrefixTree()
+        # 服务UUID -> [(是否前缀, 路径)]
+        self._by_service: Dict[str, List[Tuple[bool, str]]] = {}
+        self._lock = threading.RLock()
+
+    def add_route(self, service_uuid: str, path: str, route: BaseRoute,
+                  prefix: bool = False) -> None:
+        """
+        登记服务路由，相同路径已有路由时覆盖
+
+        Args:
+            service_uuid: 所属服务UUID
+            path: 精确路径，或前缀路径（prefix=True）
+            route: 命中后处理请求的 Starlette 路由
+            prefix: 是否按前缀匹配
+        """
+        with self._lock:
+            if prefix:
+                self._prefix.insert(path, (service_uuid, route))
+            else:
+                self._exact[path] = (service_uuid, route)
+            keys = self._by_service.setdefault(service_uuid, [])
+            if (prefix, path) not in keys:
+                keys.append((prefix, path))
+
+    def remove_service(self, service_uuid: str) -> List[str]:
+        """
+        删除服务登记的全部路由
+
+        已被其他服务覆盖的路径不会删除。
+
+        Returns:
+            List[str]: 删除的路径
+        """
+        removed = []
+        with self._lock:
+            for prefix, path in self._by_service.pop(service_uuid, []):
+                if prefix:
+                    owner = self._prefix.get(path)
+                    if owner and owner[0] == service_uuid:
+                        self._prefix.remove(path)
+                        removed.append(path)
+                else:
+                    owner = self._exact.get(path)
+                    if owner and owner[0] == service_uuid:
+                        del self._exact[path]
+                        removed.append(path)
+        return removed
+
+    def has_path(self, path: str) -> bool:
+        """路径是否已登记（精确路径或前缀路径本身）"""
+        return path in self._exact or self._prefix.get(path) is not None
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取登记数量"""
+        return {
+            "services": len(self._by_service),
+            "exact_routes": len(self._exact),
+            "prefix_routes": len(self._prefix),
+        }
+
+    def _candidates(self, path: str) -> List[BaseRoute]:
+        """按优先级返回可能处理该路径的路由"""
+        candidates = []
+        exact = self._exact.get(path)
+        if exact is not None:
+            candidates.append(exact[1])
+        candidates.extend(route for _, route in self._prefix.match(path))
+        return candidates
+
+    def matches(self, scope: Scope) -> Tuple[Match, Scope]:
+        if scope["type"] not in ("http", "websocket"):
+            return Match.NONE, {}
+        partial: Optional[Tuple[BaseRoute, Scope]] = None
+        for route in self._candidates(scope["path"]):
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                return Match.FULL, {**child_scope, _ROUTE_KEY: route}
+            if match == Match.PARTIAL and partial is None:
+                partial = (route, child_scope)
+        if partial is not None:
+            route, child_scope = partial
+            return Match.PARTIAL, {**child_scope, _ROUTE_KEY: route}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, /, **path_params: Any):
+        raise NoMatchFound(name, path_params)
+
+    async def handle(self, scope: Scope, receive: Receive,
+                     send: Send) -> None:
+        route = scope.pop(_ROUTE_KEY)
+        await route.handle(scope, receive, send)
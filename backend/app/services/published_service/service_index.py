@@ -0,0 +1,111 @@
+"""
+已发布服务解析索引
+
+在进程内维护 路径/UUID -> 服务鉴权元数据 的映射，MCP 鉴权中间件在请求
+热路径上通过该索引完成服务解析和鉴权配置判断，无需访问数据库。
+
+索引在应用启动时由 `McpServiceManager` 从 `published_services` 全量构建，
+之后由发布、启动、停止、删除、修改鉴权配置等操作增量维护。
+"""
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from app.models.modules.published_service import McpService
+
+
+class ServiceIndex:
+    """已发布服务解析索引"""
+
+    def __init__(self):
+        """初始化索引"""
+        self._by_path: Dict[str, Dict[str, Any]] = {}
+        self._by_uuid: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        """索引是否已完成全量构建"""
+        return self._loaded
+
+    @staticmethod
+    def _to_entry(service: McpService) -> Dict[str, Any]:
+        """从 ORM 对象复制鉴权需要的字段，避免持有数据库对象"""
+        return {
+            "service_id": service.id,
+            "service_uuid": service.service_uuid,
+            "module_id": service.module_id,
+            "service_type": service.service_type,
+            "sse_url": service.sse_url,
+            "auth_required": bool(service.auth_required),
+            "auth_mode": service.auth_mode or "",
+            "enabled": bool(service.enabled),
+        }
+
+    def load(self, services: Iterable[McpService]) -> int:
+        """
+        全量构建索引
+
+        Args:
+            services: 已发布服务列表
+
+        Returns:
+            索引的服务数量
+        """
+        by_path: Dict[str, Dict[str, Any]] = {}
+        by_uuid: Dict[str, Dict[str, Any]] = {}
+        for service in services:
+            entry = self._to_entry(service)
+            by_uuid[entry["service_uuid"]] = entry
+            if entry["sse_url"]:
+                by_path[entry["sse_url"]] = entry
+
+        with self._lock:
+            self._by_path = by_path
+            self._by_uuid = by_uuid
+            self._loaded = True
+        return len(by_uuid)
+
+    def upsert(self, service: McpService) -> None:
+        """
+        新增或更新单个服务的索引
+
+        Args:
+            service: 已发布服务记录（需在数据库会话内调用）
+        """
+        entry = self._to_entry(service)
+        with self._lock:
+            old_entry = self._by_uuid.get(entry["service_uuid"])
+            if old_entry and old_entry["sse_url"] != entry["sse_url"]:
+                self._by_path.pop(old_entry["sse_url"], None)
+            self._by_uuid[entry["service_uuid"]] = entry
+            if entry["sse_url"]:
+                self._by_path[entry["sse_url"]] = entry
+
+    def remove(self, service_uuid: str) -> None:
+        """
+        移除单个服务的索引
+
+        Args:
+            service_uuid: 服务UUID
+        """
+        with self._lock:
+            entry = self._by_uuid.pop(service_uuid, None)
+            if entry:
+                self._by_path.pop(entry["sse_url"], None)
+
+    def get_by_path(self, path: str) -> Optional[Dict[str, Any]]:
+        """根据服务访问路径（sse_url）获取服务元数据"""
+        return self._by_path.get(path)
+
+    def get_by_uuid(self, service_uuid: str) -> Optional[Dict[str, Any]]:
+        """根据服务UUID获取服务元数据"""
+        return self._by_uuid.get(service_uuid)
+
+    def has_path(self, path: str) -> bool:
+        """检查路径是否为某个服务的访问路径"""
+        return path in self._by_path
+
+
+# 全局索引实例
+service_index = ServiceIndex()
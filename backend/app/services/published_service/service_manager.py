@@ -8,11 +8,13 @@ MCP服务管理器模块
 import json
 import uuid
 from typing import Dict, Optional, List, Any
-from starlette.routing import Route
+from starlette.routing import Mount, Route, request_response
 from starlette.requests import Request
+from starlette.responses import JSONResponse
 import re
 import asyncio
-from contextlib import AsyncExitStack
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from app.core.config import settings
 from app.utils.logging import mcp_logger
@@ -22,17 +24,30 @@ from app.models.modules.published_service import McpService, ServiceType
 from app.models.modules.users import User
 from mcp.server.fastmcp import FastMCP
 from mcp.server.sse import SseServerTransport
-from mcp.server.streamable_http import StreamableHTTPServerTransport
-import importlib
 import inspect
-import os
-import sys
-import tempfile
 from app.utils.permissions import add_edit_permission
+from app.utils.shared_state import shared_state
+from app.utils.template_loader import template_loader
 from app.utils.http import PageParams, build_page_response
-import httpx
-import requests
-from starlette.responses import StreamingResponse
+from app.repositories.published_service_repository import (
+    PublishedServiceRepository
+)
+from .proxy_client import proxy_client_pool
+from .route_dispatcher import McpRouteDispatcher
+from .service_index import service_index
+from .sse_session_router import sse_session_router
+from .startup_loader import (
+    LOAD_MODE_EAGER, LOAD_MODE_LAZY, LOAD_MODE_PROXY, LOAD_MODE_WORKER,
+    LazyServiceRoute, service_load_report
+)
+from .stream_session_manager import StreamSessionManager
+from .tool_executor import create_tool_executor
+from .worker_pool import ServiceWorkerPool, create_worker_pool
+from .upstream_balancer import (
+    UPSTREAM_STRATEGIES, UpstreamGroup, create_upstream_group,
+    split_upstream_url
+)
+from .tool_instrumentation import instrument_tool
 
 
 class McpServiceManager:
@@ -43,6 +58,20 @@ class McpServiceManager:
     # _server = {}
     _running_services: Dict[str, Dict] = {}  # 存储正在运行的服务
     _lifespan_manager = None  # streamable http需要接入生命周期管理
+    # 已发布服务路由分发器，所有服务路由登记在这里而不是主应用路由表
+    _dispatcher = McpRouteDispatcher()
+    # 启用代理转发的第三方服务的上游集合
+    _upstream_groups: Dict[str, UpstreamGroup] = {}
+    # 工作进程池，开启 worker.enabled 时内置服务运行在工作进程中
+    _worker_pool: Optional[ServiceWorkerPool] = None
+    # 当前进程是否为服务工作进程
+    _in_worker = False
+    # 是否已订阅其他进程的服务变更通知
+    _shared_state_subscribed = False
+    # 主事件循环，线程中创建的第三方服务在它上面启动上游健康探测
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    # 正在由首个请求触发创建的服务
+    _lazy_loading: Dict[str, asyncio.Future] = {}
 
     def __new__(cls):
         if cls._instance is None:
@@ -53,66 +82,225 @@ class McpServiceManager:
         """初始化应用程序实例，保存引用"""
         self._main_app = app
         self._lifespan_manager = lifespan_manager
+        # 分发器放在所有路由之前，不然会被spa路由捕获
+        if self._dispatcher not in app.routes:
+            app.routes.insert(0, self._dispatcher)
         # self._server = server
+        if settings.WORKER_ENABLED and self._worker_pool is None:
+            self._worker_pool = create_worker_pool()
+            self._worker_pool.start()
+        # 多进程/多节点部署时，其他进程发布/停止/删除服务后按数据库同步
+        if shared_state.shared and not self._shared_state_subscribed:
+            shared_state.subscribe(
+                "services",
+                lambda payload: self.sync_service(payload["service_uuid"]))
+            shared_state.on_resync(self.reconcile_services)
+            self._shared_state_subscribed = True
         self._initialize()
 
+    def init_worker(self, app):
+        """在服务工作进程中初始化，只登记主进程下发的服务，不读取服务表"""
+        self._main_app = app
+        self._in_worker = True
+        if self._dispatcher not in app.routes:
+            app.routes.insert(0, self._dispatcher)
+
     def _initialize(self):
         """初始化管理器"""
+        self._build_service_index()
         self._load_services_from_db()
 
+    def _build_service_index(self):
+        """从数据库全量构建服务解析索引"""
+        try:
+            with get_db() as db:
+                services = PublishedServiceRepository.list_all_services(db)
+                count = service_index.load(services)
+            mcp_logger.info(f"服务解析索引构建完成，共 {count} 个服务")
+        except Exception as e:
+            mcp_logger.error(f"构建服务解析索引失败: {str(e)}")
+
     def _load_services_from_db(self):
-        """从数据库中加载已存在的服务"""
+        """从数据库中加载已存在的服务
+
+        第三方服务直接登记代理路由；内置服务开启 `startup.lazy_load` 且未
+        标记预加载时只登记占位路由，其余由线程池并发创建。
+        """
         if not self._main_app:
             mcp_logger.warning("主应用程序未初始化，无法加载服务")
             return
+        lazy_load = (settings.STARTUP_LAZY_LOAD
+                     and self._worker_pool is None)
+        concurrency = max(1, settings.STARTUP_CONCURRENCY)
+        service_load_report.start_boot(lazy_load, concurrency)
         try:
             with get_db() as db:
                 services = db.query(McpService).filter(
                     McpService.enabled == 1
                 ).all()
-                for service in services:
-                    if not service.enabled:
-                        continue
-                    # 尝试重新启动已发布的服务
-                    try:
-                        if service.service_type == ServiceType.THIRD.value:  # 第三方服务
-                            # 第三方服务需要检查是否启用了代理转发
-                            if service.proxy_enabled and service.custom_proxy_path:
-                                # 为启用代理转发的第三方服务创建代理路由
-                                self._create_third_party_proxy_routes(service)
-                            else:
-                                mcp_logger.info(
-                                    f"第三方服务已加载: "
-                                    f"{service.service_uuid} {service.name}")
-                        else:  # 内置服务
-                            module = db.query(McpModule).filter(
-                                McpModule.id == service.module_id
-                            ).first()
-                            if module:
-                                # if service.protocol_type == 1:
-                                #     continue
-                                self._create_mcp(service, module)
-                                mcp_logger.info(
-                                    f"已启动mcp服务: "
-                                    f"{service.service_uuid} {module.name}")
-                            else:
-                                mcp_logger.warning(
-                                    f"服务 {service.service_uuid} "
-                                    f"对应的模块不存在")
-                    except Exception as e:
-                        service_name = (
-                            service.name if service.service_type == 2
-                            else (module.name if 'module' in locals()
-                                  and module else "未知")
-                        )
-                        msg = (f"启动mcp服务失败 {service.service_uuid} "
-                               f"{service_name}: {str(e)}")
-                        mcp_logger.error(msg)
-                        service.status = "error"
-                        service.error_message = str(e)
-                        db.commit()
+                module_ids = {service.module_id for service in services
+                              if service.module_id}
+                modules = {
+                    module.id: module for module in db.query(McpModule).filter(
+                        McpModule.id.in_(module_ids)
+                    ).all()
+                } if module_ids else {}
+            # 会话关闭后对象已脱离会话，可在线程池中并发读取
+            eager_services = []
+            for service in services:
+                if service.service_type == ServiceType.THIRD.value:
+                    self._boot_third_party_service(service)
+                    continue
+                module = modules.get(service.module_id)
+                if not module:
+                    mcp_logger.warning(
+                        f"服务 {service.service_uuid} 对应的模块不存在")
+                    continue
+                if lazy_load and not service.eager_load:
+                    self._register_lazy_service(service)
+                else:
+                    eager_services.append((service, module))
+
+            if len(eager_services) > 1 and concurrency > 1:
+                with ThreadPoolExecutor(
+                        max_workers=concurrency,
+                        thread_name_prefix="mcp-service-boot") as pool:
+                    list(pool.map(lambda item: self._boot_service(*item),
+                                  eager_services))
+            else:
+                for service, module in eager_services:
+                    self._boot_service(service, module)
         except Exception as e:
             mcp_logger.error(f"启动mcp服务失败: {str(e)}")
+        finally:
+            service_load_report.finish_boot()
+        report = service_load_report.get_report()
+        mcp_logger.info(
+            f"服务启动加载完成，耗时 {report['boot_ms']}ms，"
+            f"加载方式: {report['modes']}，状态: {report['statuses']}")
+
+    def _boot_third_party_service(self, service: McpService):
+        """启动时加载第三方服务，启用代理转发时登记代理路由"""
+        started = time.perf_counter()
+        try:
+            if service.proxy_enabled and service.custom_proxy_path:
+                self._create_third_party_proxy_routes(service)
+            else:
+                mcp_logger.info(
+                    f"第三方服务已加载: {service.service_uuid} {service.name}")
+            service_load_report.record(
+                service.service_uuid, service.name, LOAD_MODE_PROXY,
+                "loaded", (time.perf_counter() - started) * 1000)
+        except Exception as e:
+            mcp_logger.error(
+                f"启动mcp服务失败 {service.service_uuid} "
+                f"{service.name}: {str(e)}")
+            self._mark_service_error(service.service_uuid, str(e))
+            service_load_report.record(
+                service.service_uuid, service.name, LOAD_MODE_PROXY,
+                "error", error=str(e))
+
+    def _boot_service(self, service: McpService, module: McpModule):
+        """启动时创建内置服务并记录耗时，失败时标记服务为错误状态"""
+        mode = (LOAD_MODE_WORKER if self._worker_pool is not None
+                else LOAD_MODE_EAGER)
+        started = time.perf_counter()
+        try:
+            self._create_mcp(service, module)
+            load_ms = (time.perf_counter() - started) * 1000
+            service_load_report.record(
+                service.service_uuid, service.name, mode, "loaded", load_ms)
+            mcp_logger.info(
+                f"已启动mcp服务: {service.service_uuid} {module.name} "
+                f"({load_ms:.1f}ms)")
+        except Exception as e:
+            # _create_mcp 失败时已把服务标记为错误状态
+            mcp_logger.error(
+                f"启动mcp服务失败 {service.service_uuid} "
+                f"{module.name}: {str(e)}")
+            service_load_report.record(
+                service.service_uuid, service.name, mode, "error",
+                (time.perf_counter() - started) * 1000, str(e))
+
+    def _mark_service_error(self, service_uuid: str, error_message: str):
+        """更新数据库中的服务状态为错误"""
+        with get_db() as db:
+            service_db = db.query(McpService).filter(
+                McpService.service_uuid == service_uuid
+            ).first()
+            if service_db:
+                service_db.status = "error"
+                service_db.error_message = error_message
+                db.commit()
+
+    def _register_lazy_service(self, service: McpService):
+        """登记未加载服务的占位路由，第一个请求到达时再创建服务"""
+        service_uuid = service.service_uuid
+        self._running_services[service_uuid] = {"lazy": True, "routes": []}
+        route = LazyServiceRoute(
+            service_uuid, self._load_lazy_service, self._dispatcher)
+        self._dispatcher.add_route(service_uuid, service.sse_url, route)
+        if service.protocol_type == 1:  # SSE协议的消息端点
+            self._dispatcher.add_route(
+                service_uuid, self._get_sse_message_path(service.sse_url),
+                route, prefix=True)
+        if service.status != "running":
+            self._mark_service_running(service_uuid)
+        service_load_report.record(
+            service_uuid, service.name, LOAD_MODE_LAZY, "pending")
+
+    async def _load_lazy_service(self, service_uuid: str) -> bool:
+        """创建未加载的服务，同一服务的并发请求共用一次创建
+
+        Returns:
+            bool: 服务是否已可用
+        """
+        future = self._lazy_loading.get(service_uuid)
+        if future is None:
+            future = asyncio.ensure_future(
+                asyncio.to_thread(self._build_lazy_service, service_uuid))
+            self._lazy_loading[service_uuid] = future
+            future.add_done_callback(
+                lambda _: self._lazy_loading.pop(service_uuid, None))
+        try:
+            return await asyncio.shield(future)
+        except Exception as e:
+            mcp_logger.error(f"加载服务失败 {service_uuid}: {str(e)}")
+            return False
+
+    def _build_lazy_service(self, service_uuid: str) -> bool:
+        """按数据库中的最新定义创建未加载的服务（在线程中执行）"""
+        service_info = self._running_services.get(service_uuid)
+        if not service_info or not service_info.get("lazy"):
+            # 已经创建完成，或服务已停止
+            return service_info is not None
+        started = time.perf_counter()
+        with get_db() as db:
+            service = db.query(McpService).filter(
+                McpService.service_uuid == service_uuid
+            ).first()
+            module = db.query(McpModule).filter(
+                McpModule.id == service.module_id
+            ).first() if service else None
+            if not service or not service.enabled or not module:
+                self._release_service(service_uuid)
+                return False
+            try:
+                self._create_mcp(service, module)
+            except Exception as e:
+                # 失败时释放占位路由，下次全量对齐时按数据库状态重试
+                self._release_service(service_uuid)
+                service_load_report.record(
+                    service_uuid, service.name, LOAD_MODE_LAZY, "error",
+                    (time.perf_counter() - started) * 1000, str(e),
+                    trigger="request")
+                raise
+            load_ms = (time.perf_counter() - started) * 1000
+            service_load_report.update(service_uuid, "loaded", load_ms)
+            mcp_logger.info(
+                f"首个请求触发加载服务: {service_uuid} {module.name} "
+                f"({load_ms:.1f}ms)")
+        return True
 
     def _get_sse_path(self, service_uuid: str) -> str:
         """获取SSE URL"""
@@ -273,6 +461,8 @@ class McpServiceManager:
             db.add(service_record)
             db.commit()
             db.refresh(service_record)
+            service_index.upsert(service_record)
+            self._notify_service_changed(service_uuid)
 
             try:
                 # 创建服务路由
@@ -293,7 +483,8 @@ class McpServiceManager:
         Args:
             user_id: 当前用户ID，可选
             is_admin: 是否为管理员用户
-            data: 服务数据，包含name, sse_url, description, proxy_enabled, custom_proxy_path等
+            data: 服务数据，包含name, sse_url, upstream_urls, upstream_strategy,
+                description, proxy_enabled, custom_proxy_path等
 
         Returns:
             McpService: 创建的服务记录
@@ -308,17 +499,33 @@ class McpServiceManager:
         is_public = data.get("is_public", False)
         proxy_enabled = data.get("proxy_enabled", False)
         custom_proxy_path = data.get("custom_proxy_path", "")
+        # 多个上游地址，第一个与 sse_url 相同或作为 sse_url
+        upstream_urls = [
+            url.strip() for url in (data.get("upstream_urls") or [])
+            if isinstance(url, str) and url.strip()
+        ]
+        upstream_strategy = data.get("upstream_strategy") or "round_robin"
 
         if not name:
             raise ValueError("服务名称不能为空")
+        if not sse_url and upstream_urls:
+            sse_url = upstream_urls[0]
         if not sse_url:
             raise ValueError("SSE URL不能为空")
+        if sse_url not in upstream_urls:
+            upstream_urls.insert(0, sse_url)
+        upstream_urls = list(dict.fromkeys(upstream_urls))
 
         # 验证URL格式
         import re
         url_pattern = r'^https?://[^\s/$.?#].[^\s]*$'
-        if not re.match(url_pattern, sse_url):
-            raise ValueError("SSE URL格式不正确")
+        for url in upstream_urls:
+            if not re.match(url_pattern, url):
+                raise ValueError(f"SSE URL格式不正确: {url}")
+        if upstream_strategy not in UPSTREAM_STRATEGIES:
+            raise ValueError(f"不支持的上游选择策略: {upstream_strategy}")
+        if len(upstream_urls) > 1 and not proxy_enabled:
+            raise ValueError("配置多个上游地址时需要启用代理转发")
 
         # 如果启用代理转发，验证自定义代理路径
         if proxy_enabled:
@@ -347,11 +554,18 @@ class McpServiceManager:
                 description=description,
                 config_params="",  # 第三方服务暂不支持配置参数
                 proxy_enabled=proxy_enabled,
-                custom_proxy_path=custom_proxy_path if proxy_enabled else None
+                custom_proxy_path=custom_proxy_path if proxy_enabled else None,
+                upstream_urls=(
+                    json.dumps(upstream_urls) if len(upstream_urls) > 1
+                    else None
+                ),
+                upstream_strategy=upstream_strategy
             )
             db.add(service_record)
             db.commit()
             db.refresh(service_record)
+            service_index.upsert(service_record)
+            self._notify_service_changed(service_uuid)
 
             mcp_logger.info(f"成功创建第三方服务: {service_uuid} - {name}")
             if proxy_enabled:
@@ -393,28 +607,56 @@ class McpServiceManager:
                 service.status = "stopped"
                 service.enabled = False
                 db.commit()
+                service_index.upsert(service)
+            # 第三方服务的代理路由也一并移除
+            self._remove_service_routes(service_uuid)
+            self._notify_service_changed(service_uuid)
             return True
 
-        # 获取服务信息并停止服务
+        # 停止服务并删除服务路由
+        self._release_service(service_uuid)
+
+        with get_db() as db:
+            service = db.query(McpService).filter(
+                McpService.service_uuid == service_uuid
+            ).first()
+            if service:
+                # 更新数据库状态
+                service.status = "stopped"
+                service.enabled = False
+                db.commit()
+                service_index.upsert(service)
+        self._notify_service_changed(service_uuid)
+
+        return True
+
+    def _release_service(self, service_uuid: str):
+        """释放服务的运行时资源（会话、线程池、任务、路由），不修改数据库
+
+        Args:
+            service_uuid: 服务UUID
+        """
         service_info = self._running_services.pop(service_uuid, None)
+        service_load_report.forget(service_uuid)
         if service_info:
-            # 如果有连接管理器，关闭它
-            if "connection_manager" in service_info:
-                try:
-                    import asyncio
-                    # 创建一个任务来异步关闭连接管理器
-
-                    async def close_connection():
-                        await service_info["connection_manager"].aclose()
+            # 运行在工作进程中的服务，从工作进程卸载
+            if "worker" in service_info and self._worker_pool:
+                self._worker_pool.release(service_uuid)
 
-                    # 在后台关闭连接
-                    asyncio.create_task(close_connection())
-                    mcp_logger.info(f"已关闭服务连接管理器: {service_uuid}")
+            # 如果有流式HTTP会话管理器，关闭全部会话
+            if "session_manager" in service_info:
+                try:
+                    service_info["session_manager"].close()
+                    mcp_logger.info(f"已关闭服务会话管理器: {service_uuid}")
                 except Exception as e:
                     mcp_logger.error(
-                        f"关闭连接管理器失败: {service_uuid}, 错误: {str(e)}"
+                        f"关闭会话管理器失败: {service_uuid}, 错误: {str(e)}"
                     )
 
+            # 关闭同步工具线程池
+            if "tool_executor" in service_info:
+                service_info["tool_executor"].shutdown()
+
             # 如果有任务，取消它们
             if "tasks" in service_info:
                 for task in service_info["tasks"]:
@@ -422,49 +664,8 @@ class McpServiceManager:
                         task.cancel()
                         mcp_logger.info(f"已取消服务任务: {service_uuid}")
 
-        # 从数据库获取服务信息以获取正确的路径
-        with get_db() as db:
-            service = db.query(McpService).filter(
-                McpService.service_uuid == service_uuid
-            ).first()
-            if service:
-                # 使用数据库中存储的真实路径
-                sse_path = service.sse_url
-
-                # 判断是否为完全自定义路径
-                is_full_custom = not (sse_path.startswith('/mcp') and
-                                      (sse_path.endswith('/sse') or
-                                       sse_path.endswith('/stream')))
-
-                if is_full_custom:
-                    # 完全自定义路径：直接添加/messages后缀
-                    message_path = f"{sse_path.rstrip('/')}/messages"
-                else:
-                    # 标准路径：去掉结尾的/sse或/stream，然后加上/messages
-                    base_path = sse_path.rstrip('/sse').rstrip('/stream')
-                    message_path = f"{base_path}/messages"
-
-                # 删除路由
-                routes_to_delete = []
-                for i, route in enumerate(self._main_app.routes):
-                    if hasattr(route, 'path'):
-                        if route.path in [sse_path, message_path]:
-                            routes_to_delete.append(route)
-
-                # 单独删除以避免迭代时修改列表
-                for route in routes_to_delete:
-                    try:
-                        self._main_app.routes.remove(route)
-                        mcp_logger.info(f"成功删除路由: {route.path}")
-                    except Exception as e:
-                        mcp_logger.error(f"删除路由失败: {route.path}, 错误: {str(e)}")
-
-                # 更新数据库状态
-                service.status = "stopped"
-                service.enabled = False
-                db.commit()
-
-        return True
+        # 删除服务路由
+        self._remove_service_routes(service_uuid)
 
     def start_service(self, service_uuid: str, user_id: Optional[int] = None,
                       is_admin: bool = False) -> bool:
@@ -519,6 +720,8 @@ class McpServiceManager:
                 service.enabled = True
                 db.commit()
                 db.refresh(service)
+                service_index.upsert(service)
+                self._notify_service_changed(service_uuid)
                 mcp_logger.info(f"第三方服务已启动: {service_uuid} - {service.name}")
                 return True
             else:  # 内置服务
@@ -538,6 +741,8 @@ class McpServiceManager:
                     service.enabled = True
                     db.commit()
                     db.refresh(service)
+                    service_index.upsert(service)
+                    self._notify_service_changed(service_uuid)
                     return True
                 except Exception as e:
                     mcp_logger.error(f"启动服务失败 {service_uuid}: {str(e)}")
@@ -593,6 +798,13 @@ class McpServiceManager:
                 ).all()
                 for log in access_logs:
                     db.delete(log)
+                # 访问日志计入调用统计是增量累加的，删除后下次刷新时全量
+                # 重建（SQLite 会复用被删除的 ID，不能只保留水位）
+                if access_logs:
+                    from app.repositories.statistics_repository import (
+                        StatisticsRepository
+                    )
+                    StatisticsRepository.reset_watermarks(db)
 
                 # 删除统计信息
                 statistics = db.query(McpSecretStatistics).filter(
@@ -605,12 +817,20 @@ class McpServiceManager:
                 secrets = db.query(McpServiceSecret).filter(
                     McpServiceSecret.service_id == service.id
                 ).all()
+                secret_ids = [secret.id for secret in secrets]
                 for secret in secrets:
                     db.delete(secret)
 
                 # 删除服务记录
+                service_id = service.id
                 db.delete(service)
                 db.commit()
+                service_index.remove(service_uuid)
+                self._notify_service_changed(service_uuid)
+                from app.services.auth.secret_manager import SecretManager
+                SecretManager.invalidate_secrets(
+                    secret_ids, service_id=service_id
+                )
                 return True
 
         return False
@@ -654,6 +874,74 @@ class McpServiceManager:
                 "id": service.id
             }
 
+    def update_service_eager_load(self, id: int, eager_load: bool,
+                                  user_id: Optional[int] = None,
+                                  is_admin: bool = False) -> Dict[str, Any]:
+        """更新服务是否启动时预加载，下次启动时生效
+
+        Args:
+            id: 服务ID
+            eager_load: 是否启动时预加载
+            user_id: 当前用户ID，可选
+            is_admin: 是否为管理员用户
+
+        Returns:
+            Dict: 包含更新结果的字典
+
+        Raises:
+            ValueError: 当服务不存在或权限不足时
+        """
+        with get_db() as db:
+            service = db.query(McpService).filter(
+                McpService.id == id
+            ).first()
+
+            if not service:
+                raise ValueError("服务不存在")
+
+            # 检查权限：非管理员只能修改自己创建的服务
+            if (not is_admin and user_id is not None
+                    and service.user_id != user_id):
+                raise ValueError("没有权限修改此服务")
+
+            service.eager_load = bool(eager_load)
+            db.commit()
+
+            return {
+                "eager_load": service.eager_load,
+                "id": service.id
+            }
+
+    def update_auth_config(self, service_id: int, auth_required: bool,
+                           auth_mode: str) -> Optional[Dict[str, Any]]:
+        """更新服务鉴权配置
+
+        Args:
+            service_id: 服务ID
+            auth_required: 是否需要鉴权
+            auth_mode: 鉴权模式
+
+        Returns:
+            Optional[Dict]: 更新后的鉴权配置，服务不存在时返回None
+        """
+        with get_db() as db:
+            service = PublishedServiceRepository.get_service_by_id(
+                db, service_id)
+            if not service:
+                return None
+
+            service.auth_required = auth_required
+            service.auth_mode = auth_mode if auth_required else ""
+            db.commit()
+            service_index.upsert(service)
+            self._notify_service_changed(service.service_uuid)
+
+            return {
+                "service_id": service.id,
+                "auth_required": service.auth_required,
+                "auth_mode": service.auth_mode
+            }
+
     def update_service_description(self, service_uuid: str, description: str,
                                    user_id: Optional[int] = None,
                                    is_admin: bool = False) -> bool:
@@ -807,6 +1095,23 @@ class McpServiceManager:
                 service_data = service.to_dict()
                 service_data["module_name"] = module_name
                 service_data["status"] = "running"
+                # 延迟加载的服务在首个请求到达前尚未创建
+                service_data["lazy"] = bool(service_info.get("lazy"))
+                # 流式HTTP服务的客户端会话状态
+                if "session_manager" in service_info:
+                    service_data["sessions"] = (
+                        service_info["session_manager"].get_stats()
+                    )
+                # 同步工具线程池状态
+                if "tool_executor" in service_info:
+                    service_data["tool_executor"] = (
+                        service_info["tool_executor"].get_stats()
+                    )
+                # 运行在工作进程中的服务，状态从工作进程获取
+                if "worker" in service_info and self._worker_pool:
+                    service_data["worker"] = (
+                        self._worker_pool.get_service_stats(service_uuid)
+                    )
 
                 # 替换SSE URL为完整URL
                 sse_url = service.sse_url
@@ -833,6 +1138,11 @@ class McpServiceManager:
                 service_data = service.to_dict()
                 service_data["module_name"] = module_name
 
+                # 代理转发的上游状态（熔断、健康探测、进行中请求）
+                upstream_group = self._upstream_groups.get(service_uuid)
+                if upstream_group:
+                    service_data["upstreams"] = upstream_group.get_stats()
+
                 # 替换SSE URL为完整URL
                 sse_url = service.sse_url
                 service_data["sse_url"] = self._get_full_sse_url(
@@ -843,6 +1153,159 @@ class McpServiceManager:
 
         return None
 
+    def _notify_service_changed(self, service_uuid: str) -> None:
+        """通知其他进程服务已变更，单进程部署时不做任何事"""
+        shared_state.notify("services", {"service_uuid": service_uuid})
+
+    def _is_service_loaded(self, service_uuid: str) -> bool:
+        """服务在本进程是否已加载（内置服务或第三方代理路由）"""
+        return (service_uuid in self._running_services
+                or service_uuid in self._upstream_groups)
+
+    def sync_service(self, service_uuid: str) -> None:
+        """按数据库中的最新状态同步本进程的服务
+
+        其他进程发布、启动、停止、删除服务或修改鉴权配置后调用：刷新
+        服务解析索引，已启用但未加载的服务在本进程创建，已停止或删除的
+        服务在本进程释放。
+
+        Args:
+            service_uuid: 服务UUID
+        """
+        with get_db() as db:
+            service = db.query(McpService).filter(
+                McpService.service_uuid == service_uuid
+            ).first()
+            if not service:
+                self._release_service(service_uuid)
+                service_index.remove(service_uuid)
+                return
+            service_index.upsert(service)
+
+            loaded = self._is_service_loaded(service_uuid)
+            if not service.enabled:
+                if loaded:
+                    self._release_service(service_uuid)
+                    mcp_logger.info(f"同步停止服务: {service_uuid}")
+                return
+            if loaded:
+                return
+            if service.service_type == ServiceType.THIRD.value:
+                if service.proxy_enabled and service.custom_proxy_path:
+                    self._create_third_party_proxy_routes(service)
+                    mcp_logger.info(f"同步启动第三方服务: {service_uuid}")
+                return
+            module = db.query(McpModule).filter(
+                McpModule.id == service.module_id
+            ).first()
+            if not module:
+                mcp_logger.warning(f"服务 {service_uuid} 对应的模块不存在")
+                return
+            try:
+                self._create_mcp(service, module)
+            except Exception:
+                # 创建失败时清理已登记的部分资源，下次全量对齐时重试
+                self._release_service(service_uuid)
+                raise
+            mcp_logger.info(f"同步启动服务: {service_uuid} {module.name}")
+
+    def reconcile_services(self) -> None:
+        """与数据库全量对齐：重建服务解析索引，补齐/释放与数据库不一致的服务
+
+        变更通知丢失（事件过期、通知失败）时由它兜底。
+        """
+        self._build_service_index()
+        with get_db() as db:
+            services = db.query(
+                McpService.service_uuid, McpService.service_type,
+                McpService.proxy_enabled, McpService.custom_proxy_path
+            ).filter(McpService.enabled == 1).all()
+        expected = {
+            service.service_uuid for service in services
+            if service.service_type != ServiceType.THIRD.value
+            or (service.proxy_enabled and service.custom_proxy_path)
+        }
+        loaded = set(self._running_services) | set(self._upstream_groups)
+        for service_uuid in (expected - loaded) | (loaded - expected):
+            try:
+                self.sync_service(service_uuid)
+            except Exception as e:
+                mcp_logger.error(f"同步服务失败 {service_uuid}: {str(e)}")
+
+    def start_upstream_probes(self) -> None:
+        """在当前事件循环上启动全部第三方服务的上游健康探测"""
+        self._loop = asyncio.get_running_loop()
+        for upstream_group in list(self._upstream_groups.values()):
+            upstream_group.start()
+
+    def close_upstream_groups(self) -> None:
+        """停止全部第三方服务的上游健康探测"""
+        for upstream_group in list(self._upstream_groups.values()):
+            upstream_group.close()
+
+    def get_stream_session_stats(self) -> Dict[str, Any]:
+        """汇总全部流式HTTP服务的客户端会话状态"""
+        totals = {
+            "services": 0,
+            "active_sessions": 0,
+            "busy_sessions": 0,
+            "created": 0,
+            "evicted": 0,
+            "expired": 0,
+            "rejected": 0,
+        }
+        for service_info in list(self._running_services.values()):
+            session_manager = service_info.get("session_manager")
+            if not session_manager:
+                continue
+            totals["services"] += 1
+            stats = session_manager.get_stats()
+            for key in totals:
+                if key != "services":
+                    totals[key] += stats[key]
+        return totals
+
+    def get_startup_report(self) -> Dict[str, Any]:
+        """获取服务启动加载报告（每个服务的加载方式和耗时）"""
+        report = service_load_report.get_report()
+        report["loading"] = len(self._lazy_loading)
+        return report
+
+    def get_worker_pool_stats(self) -> Optional[Dict[str, Any]]:
+        """获取工作进程池状态，未开启工作进程模式时返回None"""
+        if not self._worker_pool:
+            return None
+        return self._worker_pool.get_stats()
+
+    def close_worker_pool(self) -> None:
+        """停止全部服务工作进程"""
+        if self._worker_pool:
+            self._worker_pool.close()
+
+    def get_tool_executor_stats(self) -> Dict[str, Any]:
+        """汇总全部内置服务的同步工具线程池状态"""
+        totals = {
+            "services": 0,
+            "max_workers": 0,
+            "running": 0,
+            "queued": 0,
+            "completed": 0,
+            "rejected": 0,
+            "max_wait_ms": 0.0,
+        }
+        for service_info in list(self._running_services.values()):
+            tool_executor = service_info.get("tool_executor")
+            if not tool_executor:
+                continue
+            totals["services"] += 1
+            stats = tool_executor.get_stats()
+            for key in ("max_workers", "running", "queued", "completed",
+                        "rejected"):
+                totals[key] += stats[key]
+            totals["max_wait_ms"] = max(totals["max_wait_ms"],
+                                        stats["max_wait_ms"])
+        return totals
+
     def list_services(self, module_id: Optional[int] = None,
                       user_id: Optional[int] = None,
                       is_admin: bool = False,
@@ -1159,37 +1622,22 @@ class McpServiceManager:
                 code = self.replace_config_params(code, config_params)
             # 在数据库会话内复制需要的数据，而不是直接使用数据库对象
             module_name = module.name
+            module_id = module.id
             module_code = code
 
             # 数据库会话结束后，使用复制的数据而不是数据库对象
             mcp_logger.info(f"为服务 {service_uuid} 加载模块: {module_name}")
 
-            # 创建临时目录存放代码文件
-            temp_dir = tempfile.mkdtemp(
-                prefix=f"mcp_module_{service_uuid}_")
-
-            # 添加临时目录到Python路径
-            if temp_dir not in sys.path:
-                sys.path.insert(0, temp_dir)
-
-            # 创建临时模块文件
-            module_filename = f"{module_name}.py"
-            module_path = os.path.join(temp_dir, module_filename)
-
-            # 将代码写入临时文件
-            with open(module_path, "w", encoding="utf-8") as f:
-                f.write(module_code)
-
-            # 动态导入模块
-            spec = importlib.util.spec_from_file_location(
-                module_name, module_path)
-            if spec and spec.loader:
-                module_obj = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module_obj)
+            # 从内存加载器执行模板代码，同一份代码只编译一次
+            module_obj = template_loader.load(module_name, module_code)
+            if module_obj:
                 mcp_logger.info(f"成功导入模块: {module_name}")
 
                 # 获取服务实例
                 server = self._running_services[service_uuid]["server"]
+                tool_executor = (
+                    self._running_services[service_uuid]["tool_executor"]
+                )
                 registered_tools = []
 
                 # 遍历模块中的所有函数
@@ -1199,13 +1647,19 @@ class McpServiceManager:
                         # 过滤掉以_开头的函数
                         continue
                     # 过滤出该模块定义的函数(而不是导入的函数)
-                    if func.__module__ == module_name:
+                    if func.__module__ == module_obj.__name__:
                         # 获取函数文档
                         doc = inspect.getdoc(func)
 
-                        # 将工具注册到对应的服务实例
+                        # 包装埋点后注册到对应的服务实例，记录真实执行耗时
                         try:
-                            server.add_tool(func, name=name, description=doc)
+                            tool_func = instrument_tool(
+                                func, name, service_uuid, module_id)
+                            # 同步工具放到服务线程池执行，不阻塞事件循环
+                            if not inspect.iscoroutinefunction(func):
+                                tool_func = tool_executor.wrap(tool_func)
+                            server.add_tool(
+                                tool_func, name=name, description=doc)
                             registered_tools.append(name)
                         except Exception as e:
                             mcp_logger.error(
@@ -1261,7 +1715,9 @@ class McpServiceManager:
                         db.commit()
                 raise ValueError("模块没有代码内容")
 
-            if self._running_services.get(service.service_uuid):
+            existing = self._running_services.get(service.service_uuid)
+            # 占位的未加载服务直接覆盖
+            if existing and not existing.get("lazy"):
                 mcp_logger.info(f"服务 {service.service_uuid} 已存在，不重复创建")
                 raise ValueError("服务已存在，不重复创建")
 
@@ -1282,6 +1738,11 @@ class McpServiceManager:
             module_name = module.name
             service_uuid = service.service_uuid
 
+            # 工作进程模式：服务实例运行在工作进程中，主进程只登记转发路由
+            if self._worker_pool is not None:
+                self._create_worker_service(service, module)
+                return
+
             # 为每个服务创建独立的FastMCP实例，而不是使用共享实例
             self._running_services[service_uuid] = {
                 "server": FastMCP(
@@ -1289,6 +1750,7 @@ class McpServiceManager:
                     host=settings.HOST,
                     port=settings.PORT,
                 ),
+                "tool_executor": create_tool_executor(service_uuid),
                 "routes": []
             }
             self.register_mcp_tool(service_uuid, service, module)
@@ -1312,13 +1774,9 @@ class McpServiceManager:
                     db.commit()
             raise e
 
-    def _create_sse_handlers(self, service: McpService):
-        """创建SSE协议相关的处理函数和路由"""
-        service_uuid = service.service_uuid
-
-        # 直接使用数据库中存储的sse_url路径
-        sse_path = service.sse_url
-
+    @staticmethod
+    def _get_sse_message_path(sse_path: str) -> str:
+        """SSE服务的消息端点路径"""
         # 判断是否为完全自定义路径（不包含/mcp前缀和/sse后缀）
         is_full_custom = not (sse_path.startswith('/mcp') and
                               (sse_path.endswith('/sse') or
@@ -1326,30 +1784,90 @@ class McpServiceManager:
 
         if is_full_custom:
             # 完全自定义路径：直接添加/messages后缀
-            message_path = f"{sse_path.rstrip('/')}/messages/"
-        else:
-            # 标准路径：去掉结尾的/sse或/stream，然后加上/messages/
-            base_path = sse_path.rstrip('/sse').rstrip('/stream')
-            message_path = f"{base_path}/messages/"
+            return f"{sse_path.rstrip('/')}/messages/"
+        # 标准路径：去掉结尾的/sse或/stream，然后加上/messages/
+        base_path = sse_path.rstrip('/sse').rstrip('/stream')
+        return f"{base_path}/messages/"
+
+    def _mark_service_running(self, service_uuid: str):
+        """更新数据库中的服务状态为运行中，工作进程中由主进程负责"""
+        if self._in_worker:
+            return
+        with get_db() as db:
+            service_db = db.query(McpService).filter(
+                McpService.service_uuid == service_uuid
+            ).first()
+            if service_db:
+                service_db.status = "running"
+                service_db.error_message = ""
+                db.commit()
+
+    def _create_worker_service(self, service: McpService, module: McpModule):
+        """把服务交给工作进程，并在主进程登记转发路由"""
+        service_uuid = service.service_uuid
+        spec = {
+            "service": {
+                "id": service.id,
+                "service_uuid": service_uuid,
+                "name": service.name,
+                "sse_url": service.sse_url,
+                "protocol_type": service.protocol_type,
+                "config_params": service.config_params,
+                "service_type": service.service_type,
+            },
+            "module": {
+                "id": module.id,
+                "name": module.name,
+                "code": module.code,
+            },
+        }
+        worker_index = self._worker_pool.assign(service_uuid, spec)
+        self._running_services[service_uuid] = {
+            "worker": worker_index,
+            "routes": []
+        }
+
+        # 删除现有路由（如果存在）
+        self._remove_service_routes(service_uuid)
+
+        async def forward_to_worker(request: Request):
+            return await self._worker_pool.forward(request, service_uuid)
+
+        sse_path = service.sse_url
+        endpoint = forward_to_worker
+        if service.protocol_type == 1:
+            # SSE 会话由持有 GET 连接的主进程登记归属
+            endpoint = sse_session_router.stream_app(
+                service_uuid, request_response(forward_to_worker))
+        self._dispatcher.add_route(service_uuid, sse_path, Route(
+            path=sse_path,
+            endpoint=endpoint,
+            methods=["GET", "POST", "DELETE", "OPTIONS"],
+        ))
+        if service.protocol_type == 1:  # SSE协议的消息端点
+            message_mount = Mount(
+                self._get_sse_message_path(sse_path),
+                app=sse_session_router.message_app(
+                    service_uuid, request_response(forward_to_worker)))
+            self._dispatcher.add_route(
+                service_uuid, message_mount.path, message_mount, prefix=True)
+
+        self._mark_service_running(service_uuid)
+        mcp_logger.info(
+            f"服务 {service_uuid} 已分配到工作进程 {worker_index}: {sse_path}")
+
+    def _create_sse_handlers(self, service: McpService):
+        """创建SSE协议相关的处理函数和路由"""
+        service_uuid = service.service_uuid
+
+        # 直接使用数据库中存储的sse_url路径
+        sse_path = service.sse_url
+        message_path = self._get_sse_message_path(sse_path)
 
         # 创建SSE应用
         sse = SseServerTransport(message_path)
         # 删除现有路由（如果存在）
-        routes_to_delete = []
-        for i, route in enumerate(self._main_app.routes):
-            if hasattr(route, 'path'):
-                if route.path == sse_path:
-                    routes_to_delete.append(route)
-                if route.path == message_path:
-                    routes_to_delete.append(route)
-
-        # 单独删除以避免迭代时修改列表
-        for route in routes_to_delete:
-            try:
-                self._main_app.routes.remove(route)
-                mcp_logger.info(f"已删除现有路由: {route.path}")
-            except Exception as e:
-                mcp_logger.error(f"删除路由失败: {route.path}, 错误: {str(e)}")
+        self._remove_service_routes(service_uuid)
 
         # 创建SSE处理函数，使用特定服务的server实例
         mcp_server = self._running_services[service_uuid]["server"]._mcp_server
@@ -1408,25 +1926,23 @@ class McpServiceManager:
             finally:
                 mcp_logger.info(f"SSE连接关闭: service_uuid={service_uuid}")
 
-        # 添加服务路由到主应用
+        # 登记服务路由到分发器，多进程部署时登记会话归属、转发误投的消息
         route = Route(
             path=sse_path,
-            endpoint=handle_sse,
+            endpoint=sse_session_router.stream_app(
+                service_uuid, request_response(handle_sse)),
             methods=None,
             name=None,
             include_in_schema=True,
         )
-        # 在所有路由之前插入，不然会被spa路由捕获
-        self._main_app.routes.insert(0, route)
-        self._main_app.mount(message_path, sse.handle_post_message)
-        with get_db() as db:
-            service_db = db.query(McpService).filter(
-                McpService.service_uuid == service.service_uuid
-            ).first()
-            if service_db:
-                service_db.status = "running"
-                service_db.error_message = ""
-                db.commit()
+        self._dispatcher.add_route(service_uuid, sse_path, route)
+        message_mount = Mount(
+            message_path,
+            app=sse_session_router.message_app(
+                service_uuid, sse.handle_post_message))
+        self._dispatcher.add_route(
+            service_uuid, message_mount.path, message_mount, prefix=True)
+        self._mark_service_running(service_uuid)
 
     def _create_stream_handlers(self, service: McpService):
         """创建流式HTTP协议相关的处理函数和路由"""
@@ -1436,227 +1952,36 @@ class McpServiceManager:
         streamable_http_path = service.sse_url
 
         # 删除现有路由（如果存在）
-        routes_to_delete = []
-        for route in self._main_app.routes:
-            if hasattr(route, 'path') and route.path == streamable_http_path:
-                routes_to_delete.append(route)
-
-        # 单独删除以避免迭代时修改列表
-        for route in routes_to_delete:
-            try:
-                self._main_app.routes.remove(route)
-                mcp_logger.info(f"已删除现有路由: {route.path}")
-            except Exception as e:
-                mcp_logger.error(f"删除路由失败: {route.path}, 错误: {str(e)}")
-
-        # 创建StreamableHTTPServerTransport实例
-        streamable_http_transport = StreamableHTTPServerTransport(
-            mcp_session_id=service_uuid,  # 使用service_uuid作为session_id
-            is_json_response_enabled=False,  # 使用SSE响应模式
-            event_store=None  # 暂不使用事件存储
-        )
+        self._remove_service_routes(service_uuid)
 
         mcp_server = self._running_services[service_uuid]["server"]._mcp_server
 
-        # 创建连接管理器
-        connection_manager = AsyncExitStack()
-        connection_ready = asyncio.Event()
-
-        async def setup_connection():
-            """设置并维持MCP连接"""
-            try:
-                mcp_logger.info(f"启动流式HTTP MCP连接: {service_uuid}")
-                # 建立连接
-                context_manager = streamable_http_transport.connect()
-                streams = await connection_manager.enter_async_context(
-                    context_manager
-                )
-                read_stream, write_stream = streams
-
-                # 标记连接已准备好
-                connection_ready.set()
-
-                # 运行MCP服务器
-                await mcp_server.run(
-                    read_stream,
-                    write_stream,
-                    mcp_server.create_initialization_options(),
-                )
-            except Exception as e:
-                mcp_logger.error(
-                    f"流式HTTP MCP连接失败: {service_uuid}, 错误: {str(e)}"
-                )
-                # 更新服务状态为错误
-                with get_db() as db:
-                    service_db = db.query(McpService).filter(
-                        McpService.service_uuid == service_uuid
-                    ).first()
-                    if service_db:
-                        service_db.status = "error"
-                        service_db.error_message = str(e)
-                        db.commit()
-                raise
-            finally:
-                await connection_manager.aclose()
-
-        # 启动连接任务
-        try:
-            # 获取当前事件循环
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                # 如果事件循环正在运行，创建新任务
-                connection_task = loop.create_task(setup_connection())
-            else:
-                # 如果事件循环未运行，创建新的事件循环并在后台运行任务
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-
-                def run_in_background():
-                    """在后台运行连接任务"""
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(setup_connection())
-
-                # 在线程中运行连接任务
-                import threading
-                thread = threading.Thread(target=run_in_background)
-                thread.daemon = True
-                thread.start()
-                connection_task = None
-        except Exception as e:
-            mcp_logger.error(f"启动流式HTTP连接失败: {service_uuid}, 错误: {str(e)}")
-            connection_task = None
-
-        # 创建路由处理函数
-        async def handle_streamable_http(request: Request):
-            """处理流式HTTP请求"""
-            try:
-                mcp_logger.info(f"处理流式HTTP请求: {service_uuid}")
-                # 等待连接准备就绪
-                await connection_ready.wait()
-
-                # 创建响应流
-                from starlette.responses import StreamingResponse
-                import asyncio
-
-                # 创建队列来收集响应数据
-                response_queue = asyncio.Queue()
-                response_headers = {}
-                response_status = 200
-
-                async def custom_send(message):
-                    """自定义发送函数来捕获响应"""
-                    nonlocal response_headers, response_status
-                    if message['type'] == 'http.response.start':
-                        response_status = message['status']
-                        response_headers = dict(message.get('headers', []))
-                    elif message['type'] == 'http.response.body':
-                        await response_queue.put(message.get('body', b''))
-                        if not message.get('more_body', False):
-                            await response_queue.put(None)  # 结束标记
-
-                # 创建后台任务处理transport请求
-                async def handle_transport():
-                    try:
-                        await streamable_http_transport.handle_request(
-                            request.scope, request.receive, custom_send
-                        )
-                    except Exception as e:
-                        mcp_logger.error(f"Transport处理失败: {e}")
-                        await response_queue.put(None)
-
-                # 启动transport处理任务
-                transport_task = asyncio.create_task(handle_transport())
-
-                async def generate_response():
-                    """生成响应数据"""
-                    try:
-                        while True:
-                            chunk = await response_queue.get()
-                            if chunk is None:
-                                break
-                            yield chunk
-                    finally:
-                        if not transport_task.done():
-                            transport_task.cancel()
-
-                # 返回流式响应
-                return StreamingResponse(
-                    generate_response(),
-                    status_code=response_status,
-                    headers=response_headers
-                )
-
-            except Exception as e:
-                mcp_logger.error(
-                    f"处理流式HTTP请求失败: {service_uuid}, 错误: {str(e)}"
-                )
-                from starlette.responses import PlainTextResponse
-                return PlainTextResponse(
-                    f"流式HTTP处理失败: {str(e)}", status_code=500
-                )
+        # 按客户端 Mcp-Session-Id 维护独立的传输层和MCP服务循环
+        session_manager = StreamSessionManager(
+            service_uuid,
+            mcp_server,
+            max_sessions=settings.STREAMABLE_HTTP_MAX_SESSIONS,
+            idle_timeout=settings.STREAMABLE_HTTP_SESSION_IDLE_TIMEOUT,
+        )
 
-        # 使用Route方式直接注册路由
-        from starlette.routing import Route
+        # 登记流式HTTP路由到分发器，会话管理器作为 ASGI 应用直接处理请求
         route = Route(
             path=streamable_http_path,
-            endpoint=handle_streamable_http,
-            methods=["GET", "POST", "OPTIONS"],
+            endpoint=session_manager,
+            methods=["GET", "POST", "DELETE", "OPTIONS"],
             name=f"mcp_stream_{service_uuid}",
             include_in_schema=True,
         )
+        self._dispatcher.add_route(service_uuid, streamable_http_path, route)
+        mcp_logger.info(f"流式HTTP路由已登记: {streamable_http_path}")
 
-        # 在所有路由之前插入，防止被SPA路由捕获
-        mcp_logger.info(
-            f"插入流式HTTP路由前，当前路由数量: {len(self._main_app.routes)}"
+        # 保存会话管理器，停止服务时关闭全部会话
+        self._running_services[service_uuid]["session_manager"] = (
+            session_manager
         )
 
-        # 直接插入到最前面，与SSE路由相同的处理方式
-        self._main_app.routes.insert(0, route)
-        mcp_logger.info(f"流式HTTP路由已插入到位置0: {streamable_http_path}")
-
-        # 验证路由是否正确注册
-        route_found = False
-        for i, existing_route in enumerate(self._main_app.routes):
-            if (hasattr(existing_route, 'path') and
-                    existing_route.path == streamable_http_path):
-                route_found = True
-                mcp_logger.info(
-                    f"确认流式HTTP路由已注册在位置 {i}: "
-                    f"{existing_route.path}"
-                )
-                break
-
-        if not route_found:
-            mcp_logger.error(
-                f"流式HTTP路由注册失败: {streamable_http_path}"
-            )
-            raise RuntimeError(
-                f"流式HTTP路由注册失败: {streamable_http_path}"
-            )
-
-        # 将任务和连接管理器保存到运行服务中，以便后续清理
-        if "tasks" not in self._running_services[service_uuid]:
-            self._running_services[service_uuid]["tasks"] = []
-        if connection_task:
-            self._running_services[service_uuid]["tasks"].append(
-                connection_task
-            )
-
-        # 保存transport实例和连接管理器以便后续使用
-        running_service = self._running_services[service_uuid]
-        running_service["transport"] = streamable_http_transport
-        running_service["connection_manager"] = connection_manager
-        running_service["connection_ready"] = connection_ready
-
         # 更新数据库状态
-        with get_db() as db:
-            service_db = db.query(McpService).filter(
-                McpService.service_uuid == service.service_uuid
-            ).first()
-            if service_db:
-                service_db.status = "running"
-                service_db.error_message = ""
-                db.commit()
+        self._mark_service_running(service_uuid)
 
         mcp_logger.info(
             f"流式HTTP服务已启动: {service_uuid} at {streamable_http_path}"
@@ -1676,196 +2001,88 @@ class McpServiceManager:
         service_uuid = service.service_uuid
         # 使用用户自定义的代理路径，如果不以/开头则自动添加
         proxy_path = service.custom_proxy_path if service.custom_proxy_path.startswith('/') else f'/{service.custom_proxy_path}'
-        # 从sse_url中提取基础URL，移除MCP服务特定的路径部分
-        sse_url = service.sse_url.rstrip('/')
-        if '/mcp-' in sse_url:
-            # 提取基础URL部分（协议+域名+端口）
-            base_url = sse_url.split('/mcp-')[0]
-        else:
-            base_url = sse_url
-        target_url = base_url
-
-        # 从SSE URL中提取UUID路径
-        uuid_path = None
-        if '/mcp-' in sse_url:
-            uuid_part = sse_url.split('/mcp-')[1].split('/')[0]
-            uuid_path = f'/mcp-{uuid_part}'
+        # 从主上游（sse_url）中提取UUID路径，客户端也可以通过该路径访问
+        _, uuid_path = split_upstream_url(service.sse_url)
+        upstream_urls = service.get_upstream_urls()
 
-        mcp_logger.info(f"为第三方服务 {service_uuid} 创建代理路由: {proxy_path} -> {target_url}")
+        mcp_logger.info(f"为第三方服务 {service_uuid} 创建代理路由: {proxy_path} -> {', '.join(upstream_urls)}")
         if uuid_path:
-            mcp_logger.info(f"同时支持UUID路径: {uuid_path} -> {target_url}")
+            mcp_logger.info(f"同时支持UUID路径: {uuid_path}")
 
         # 删除现有代理路由（如果存在）
-        routes_to_delete = []
-        for route in self._main_app.routes:
-            if hasattr(route, 'path') and (route.path.startswith(proxy_path) or (uuid_path and route.path.startswith(uuid_path))):
-                routes_to_delete.append(route)
+        self._remove_service_routes(service_uuid)
+        upstream_group = create_upstream_group(
+            service_uuid, upstream_urls, service.upstream_strategy)
+        self._upstream_groups[service_uuid] = upstream_group
+        upstream_group.start(self._loop)
 
-        for route in routes_to_delete:
-            try:
-                self._main_app.routes.remove(route)
-                mcp_logger.info(f"已删除现有代理路由: {route.path}")
-            except Exception as e:
-                mcp_logger.error(f"删除代理路由失败: {route.path}, 错误: {str(e)}")
+        base_paths = [proxy_path] + ([uuid_path] if uuid_path else [])
 
         # 创建代理处理函数
         async def proxy_handler(request: Request):
             """代理转发处理函数"""
-            try:
-                # 构建目标URL
-                request_path = request.url.path
-
-                if request_path == proxy_path or request_path.startswith(f"{proxy_path}/"):
-                    # 简化路径匹配，转发到第三方服务
-                    if request_path == proxy_path:
-                        target_full_url = sse_url
-                    else:
-                        # 子路径，构建完整目标URL
-                        sub_path = request_path[len(proxy_path):]
-                        target_full_url = f"{target_url}/mcp-{sse_url.split('/mcp-')[1].split('/')[0]}{sub_path}"
-                elif uuid_path and (request_path == uuid_path or request_path.startswith(f"{uuid_path}/")):
-                    # UUID路径匹配，直接转发
-                    if request_path == uuid_path:
-                        target_full_url = sse_url
-                    else:
-                        # 子路径，构建完整目标URL
-                        sub_path = request_path[len(uuid_path):]
-                        target_full_url = f"{target_url}/mcp-{sse_url.split('/mcp-')[1].split('/')[0]}{sub_path}"
-                else:
-                    # 默认转发到SSE端点
-                    target_full_url = sse_url
-
-                # 复制请求头，排除一些不需要的头
-                headers = dict(request.headers)
-                headers.pop('host', None)
-                headers.pop('content-length', None)
-
-                # 获取请求体
-                body = await request.body()
-
-                mcp_logger.info(f"代理转发请求: {request.method} {target_full_url}")
-
-                # 使用requests进行同步请求转发，支持流式响应
-                try:
-                    # 发起请求
-                    response = requests.request(
-                        method=request.method,
-                        url=target_full_url,
-                        headers=headers,
-                        data=body,
-                        params=request.query_params,
-                        stream=True,
-                        timeout=30
-                    )
-
-                    # 检查响应状态
-                    response.raise_for_status()
-
-                    # 检查是否是SSE响应
-                    content_type = response.headers.get('content-type', '')
-                    if 'text/event-stream' in content_type:
-                        # SSE流式响应 - 使用requests的iter_content处理流
-                        response_headers = {
-                            'Content-Type': 'text/event-stream',
-                            'Cache-Control': 'no-cache',
-                            'Connection': 'keep-alive',
-                            'Access-Control-Allow-Origin': '*',
-                            'Access-Control-Allow-Headers': 'Cache-Control'
-                        }
-
-                        # 创建生成器来处理流式响应
-                        def stream_generator():
-                            try:
-                                for chunk in response.iter_content(chunk_size=1024):
-                                    if chunk:
-                                        yield chunk
-                            finally:
-                                response.close()
-
-                        return StreamingResponse(
-                            stream_generator(),
-                            status_code=response.status_code,
-                            headers=response_headers,
-                            media_type='text/event-stream'
-                        )
-                    else:
-                        # 普通响应 - 直接返回内容
-                        content = response.content
-                        response.close()
-
-                        return StreamingResponse(
-                            iter([content]),
-                            status_code=response.status_code,
-                            headers=dict(response.headers)
-                        )
-                except Exception as e:
-                    if 'response' in locals():
-                        response.close()
-                    raise e
-
-            except httpx.TimeoutException:
-                mcp_logger.error(f"代理转发超时: {target_full_url}")
-                from starlette.responses import JSONResponse
-                return JSONResponse(
-                    {"error": "代理转发超时"},
-                    status_code=504
-                )
-            except httpx.HTTPStatusError as e:
-                mcp_logger.error(f"代理转发HTTP错误: {e.response.status_code} - {target_full_url}")
-                from starlette.responses import JSONResponse
-                return JSONResponse(
-                    {"error": f"代理转发HTTP错误: {e.response.status_code}"},
-                    status_code=e.response.status_code
-                )
-            except Exception as e:
-                mcp_logger.error(f"代理转发失败: {str(e)}")
-                from starlette.responses import JSONResponse
+            # 代理路径之后的子路径，精确匹配代理路径时为空（转发到SSE端点）
+            request_path = request.url.path
+            sub_path = ""
+            for base_path in base_paths:
+                if request_path.startswith(f"{base_path}/"):
+                    sub_path = request_path[len(base_path):]
+                    break
+                if request_path == base_path:
+                    break
+
+            # 选择上游，已建立的会话转发到建立会话的上游
+            session_key = upstream_group.get_session_key(request)
+            upstream = upstream_group.select(session_key)
+            if upstream is None:
+                mcp_logger.warning(f"第三方服务 {service_uuid} 没有可用上游，请求被拒绝")
                 return JSONResponse(
-                    {"error": f"代理转发失败: {str(e)}"},
-                    status_code=502
-                )
-
-        # 创建代理路由，支持所有HTTP方法和路径
+                    {"error": "上游服务不可用"}, status_code=503,
+                    headers={"Retry-After": str(
+                        int(upstream_group.recovery_timeout) or 1)})
+            target_full_url = upstream.target_url(sub_path)
+
+            mcp_logger.debug(f"代理转发请求: {request.method} {target_full_url}")
+
+            # 通过按上游划分的异步连接池转发，响应体流式返回
+            lease = upstream_group.acquire(upstream)
+            response = await proxy_client_pool.forward(
+                request, target_full_url, on_complete=lease.release,
+                on_event_chunk=(
+                    lease.sniff_event_chunk if upstream_group.multiple
+                    else None
+                ))
+            if response.status_code >= 500:
+                upstream_group.record_failure(
+                    upstream, f"HTTP {response.status_code}")
+            else:
+                upstream_group.record_success(upstream)
+                session_id = response.headers.get("mcp-session-id")
+                if session_id:
+                    upstream_group.bind_session(session_id, upstream)
+            if request.method == "DELETE" and session_key:
+                upstream_group.unbind_session(session_key)
+            return response
+
+        # 登记代理路由，支持所有HTTP方法和路径
         # 同时支持精确匹配和路径匹配
-        proxy_routes = [
-            # 精确匹配代理路径本身
-            Route(
-                path=proxy_path,
+        proxy_methods = ["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS",
+                         "HEAD"]
+        for base_path in base_paths:
+            # 精确匹配路径本身
+            self._dispatcher.add_route(service_uuid, base_path, Route(
+                path=base_path,
                 endpoint=proxy_handler,
-                methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"],
+                methods=proxy_methods,
                 name=None,
                 include_in_schema=True,
-            ),
-            # 匹配代理路径下的子路径
-            Route(
-                path=f"{proxy_path}/{{path:path}}",
+            ))
+            # 匹配路径下的子路径
+            self._dispatcher.add_route(service_uuid, base_path, Route(
+                path=f"{base_path}/{{path:path}}",
                 endpoint=proxy_handler,
-                methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"]
-            ),
-        ]
-
-        # 如果有UUID路径，也添加UUID路径的路由
-        if uuid_path:
-            proxy_routes.extend([
-                # 精确匹配UUID路径本身
-                Route(
-                    path=uuid_path,
-                    endpoint=proxy_handler,
-                    methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"],
-                    name=None,
-                    include_in_schema=True,
-                ),
-                # 匹配UUID路径下的子路径
-                 Route(
-                     path=f"{uuid_path}/{{path:path}}",
-                     endpoint=proxy_handler,
-                     methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"]
-                 )
-             ])
-
-        # 在所有路由之前插入代理路由
-        for route in proxy_routes:
-            self._main_app.routes.insert(0, route)
+                methods=proxy_methods
+            ), prefix=True)
 
         mcp_logger.info(f"成功创建第三方服务 {service_uuid} 的代理路由: {proxy_path}")
 
@@ -1875,20 +2092,12 @@ class McpServiceManager:
         Args:
             service_uuid: 服务UUID
         """
-        if not self._main_app:
-            return
-
-        # 移除路由（如果存在）
-        routes_to_remove = [
-            f"/api/mcp/{service_uuid}/sse",
-            f"/api/mcp/{service_uuid}/messages"
-            f"/api/mcp/{service_uuid}/stream"
-        ]
-
-        for route in list(self._main_app.routes):
-            if hasattr(route, 'path') and route.path in routes_to_remove:
-                mcp_logger.info(f"移除路由: {route.path}")
-                self._main_app.routes.remove(route)
+        for path in self._dispatcher.remove_service(service_uuid):
+            mcp_logger.info(f"移除路由: {path}")
+        # 第三方服务的上游健康探测随代理路由一起停止
+        upstream_group = self._upstream_groups.pop(service_uuid, None)
+        if upstream_group:
+            upstream_group.close()
 
     def get_modules_for_select(self, user_id: Optional[int] = None,
                                is_admin: bool = False) -> List[Dict[str, Any]]:
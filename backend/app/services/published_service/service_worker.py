@@ -0,0 +1,164 @@
+"""
+已发布服务工作进程入口
+
+由 `ServiceWorkerPool` 启动：
+
+    python -m app.services.published_service.service_worker \
+        --index 0 --socket /tmp/mcp-workers-1/worker-0.sock --parent-pid 1
+
+进程内使用 `service_manager` 的工作进程模式（`init_worker`）创建服务，
+服务路由登记到进程自己的分发器，路径与主进程一致。控制接口：
+
+- `GET /_worker/health`：进程状态；
+- `POST /_worker/services`：加载服务，请求体为主进程下发的服务定义；
+- `DELETE /_worker/services/{service_uuid}`：卸载服务；
+- `GET /_worker/services/{service_uuid}`：服务会话、线程池状态。
+
+主进程退出后工作进程随之退出。
+"""
+import argparse
+import asyncio
+import os
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.models.modules.mcp_template import McpModule
+from app.models.modules.published_service import McpService
+from app.services.published_service import service_manager
+from app.services.published_service.worker_pool import (
+    WORKER_CONTROL_PREFIX, WORKER_SECRET_HEADER
+)
+from app.utils.logging import mcp_logger
+
+# 检查主进程是否存活的间隔（秒）
+_PARENT_CHECK_INTERVAL = 1.0
+
+
+class _SecretHeaderMiddleware:
+    """把主进程传来的密钥ID写入请求 state，供工具执行埋点读取"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        if scope["type"] == "http":
+            header = WORKER_SECRET_HEADER.encode("latin-1")
+            for name, value in scope.get("headers", []):
+                if name == header:
+                    try:
+                        scope.setdefault("state", {})["mcp_secret_id"] = (
+                            int(value)
+                        )
+                    except ValueError:
+                        pass
+                    break
+        await self.app(scope, receive, send)
+
+
+async def health(request: Request):
+    return JSONResponse({
+        "pid": os.getpid(),
+        "services": len(service_manager._running_services),
+    })
+
+
+async def load_service(request: Request):
+    spec = await request.json()
+    service = McpService(**spec["service"])
+    module = McpModule(**spec["module"])
+    service_uuid = service.service_uuid
+    # 重新下发时先卸载旧实例
+    service_manager._release_service(service_uuid)
+    try:
+        service_manager._create_mcp(service, module)
+    except Exception as e:
+        service_manager._release_service(service_uuid)
+        return JSONResponse({"error": str(e)}, status_code=500)
+    mcp_logger.info(f"工作进程 {os.getpid()} 已加载服务: {service_uuid}")
+    return JSONResponse({"service_uuid": service_uuid})
+
+
+async def unload_service(request: Request):
+    service_uuid = request.path_params["service_uuid"]
+    service_manager._release_service(service_uuid)
+    mcp_logger.info(f"工作进程 {os.getpid()} 已卸载服务: {service_uuid}")
+    return JSONResponse({"service_uuid": service_uuid})
+
+
+async def service_stats(request: Request):
+    service_uuid = request.path_params["service_uuid"]
+    service_info = service_manager._running_services.get(service_uuid)
+    if not service_info:
+        return JSONResponse({"error": "服务未加载"}, status_code=404)
+    data = {}
+    if "session_manager" in service_info:
+        data["sessions"] = service_info["session_manager"].get_stats()
+    if "tool_executor" in service_info:
+        data["tool_executor"] = service_info["tool_executor"].get_stats()
+    return JSONResponse(data)
+
+
+def create_worker_app(parent_pid: int) -> Starlette:
+    """创建工作进程应用"""
+
+    async def lifespan(app):
+        from app.services.history.execution_writer import (
+            tool_execution_writer
+        )
+        tool_execution_writer.start()
+        watcher = asyncio.create_task(_watch_parent(parent_pid))
+        yield
+        watcher.cancel()
+        for service_uuid in list(service_manager._running_services):
+            service_manager._release_service(service_uuid)
+        tool_execution_writer.stop()
+
+    app = Starlette(
+        routes=[
+            Route(f"{WORKER_CONTROL_PREFIX}/health", health),
+            Route(f"{WORKER_CONTROL_PREFIX}/services", load_service,
+                  methods=["POST"]),
+            Route(f"{WORKER_CONTROL_PREFIX}/services/{{service_uuid}}",
+                  unload_service, methods=["DELETE"]),
+            Route(f"{WORKER_CONTROL_PREFIX}/services/{{service_uuid}}",
+                  service_stats, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+    app.add_middleware(_SecretHeaderMiddleware)
+    service_manager.init_worker(app)
+    return app
+
+
+async def _watch_parent(parent_pid: int) -> None:
+    """主进程退出后结束工作进程"""
+    while True:
+        await asyncio.sleep(_PARENT_CHECK_INTERVAL)
+        if os.getppid() != parent_pid:
+            mcp_logger.warning(
+                f"主进程 {parent_pid} 已退出，工作进程 {os.getpid()} 退出")
+            os._exit(0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="已发布服务工作进程")
+    parser.add_argument("--index", type=int, required=True)
+    parser.add_argument("--socket", required=True)
+    parser.add_argument("--parent-pid", type=int, required=True)
+    args = parser.parse_args()
+
+    mcp_logger.info(
+        f"服务工作进程 {args.index} 启动，PID: {os.getpid()}，"
+        f"socket: {args.socket}")
+    app = create_worker_app(args.parent_pid)
+    uvicorn.run(app, uds=args.socket, log_level="warning", lifespan="on")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+SSE 会话归属表与消息转发
+
+SSE 协议的客户端先 `GET .../sse` 建立事件流，再按服务端下发的 endpoint
+事件 `POST .../messages/?session_id=...` 发送消息。会话的
+`SseServerTransport` 只存在于持有 GET 连接的进程中，多进程/多节点部署时
+消息 POST 可能落到其他进程，直接返回 404。
+
+配置共享状态后端（`shared_state.backend` 非 `local`）后：
+
+- `stream_app` 包装 SSE 端点，发出 endpoint 事件前把
+  session_id -> 本进程内部地址 写入共享状态（`sse_session:` 前缀），
+  连接关闭时删除；写入完成后客户端才拿到 session_id，其他进程一定能查到；
+- `message_app` 包装消息端点，session_id 不属于本进程时查归属表，把
+  POST 经 `proxy_client_pool` 转发到所属进程，转发请求带
+  `x-mcp-forwarded` 集群令牌，所属进程不再重复鉴权和记录访问日志；
+- 本进程内部地址取 `cluster.advertise_url`，未配置时在
+  `cluster.socket_dir` 下启动一个 Unix socket 监听（同一个应用），
+  适用于同一台机器上共享端口的多个进程；多节点部署需配置
+  `advertise_url`。
+
+未配置共享状态后端时两个包装直接调用原应用。
+"""
+import asyncio
+import contextlib
+import hmac
+import os
+import re
+import secrets
+import tempfile
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import uvicorn
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.utils.logging import mcp_logger
+from app.utils.shared_state import INSTANCE_ID, shared_state
+
+from .proxy_client import proxy_client_pool
+
+# 归属表键前缀
+SESSION_KEY_PREFIX = "sse_session:"
+# 进程间转发请求头，值为集群令牌
+FORWARDED_HEADER = "x-mcp-forwarded"
+# 转发请求携带入口进程鉴权得到的密钥ID
+FORWARDED_SECRET_HEADER = "x-mcp-secret-id"
+
+# endpoint 事件中的 session_id
+_SESSION_ID_PATTERN = re.compile(rb"session_id=([0-9a-f]{32})")
+# 查询参数中的 session_id
+_QUERY_SESSION_PATTERN = re.compile(r"(?:^|&)session_id=([0-9a-f]{32})")
+# 归属查询结果缓存上限
+_OWNER_CACHE_SIZE = 10000
+# Unix socket 转发时的占位主机名
+_INTERNAL_BASE_URL = "http://mcp-internal"
+
+
+class _InternalServer(uvicorn.Server):
+    """内部 Unix socket 监听，信号由主服务器处理，不能再接管"""
+
+    def install_signal_handlers(self) -> None:
+        """uvicorn < 0.29 在 `serve` 中调用"""
+
+    @contextlib.contextmanager
+    def capture_signals(self):
+        """uvicorn >= 0.29 在 `serve` 中调用"""
+        yield
+
+
+class SseSessionRouter:
+    """SSE 会话归属表与消息转发"""
+
+    def __init__(self):
+        # 本进程持有的会话：session_id -> 服务UUID
+        self._sessions: Dict[str, str] = {}
+        # 其他进程会话的归属缓存：session_id -> 地址
+        self._owner_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._address: Optional[str] = None
+        self._token: Optional[str] = None
+        self._socket_path: Optional[str] = None
+        self._internal_server: Optional[uvicorn.Server] = None
+        self._internal_task: Optional[asyncio.Task] = None
+
+        # 计数
+        self._registered = 0
+        self._local_messages = 0
+        self._forwarded = 0
+        self._forward_errors = 0
+        self._lookup_misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        """是否已启用会话归属路由"""
+        return self._address is not None
+
+    async def start(self, app: ASGIApp) -> None:
+        """
+        启用会话归属路由，未配置共享状态后端时不做任何事
+
+        Args:
+            app: 主应用，未配置 advertise_url 时内部 Unix socket 监听同一个应用
+        """
+        if not shared_state.shared or self.enabled:
+            return
+        self._token = await asyncio.to_thread(
+            shared_state.get_or_set, "cluster_token", secrets.token_hex(16))
+        if not self._token:
+            mcp_logger.error("读取集群令牌失败，SSE 会话转发未启用")
+            return
+
+        if settings.CLUSTER_ADVERTISE_URL:
+            self._address = settings.CLUSTER_ADVERTISE_URL.rstrip("/")
+        else:
+            socket_dir = (settings.CLUSTER_SOCKET_DIR
+                          or os.path.join(tempfile.gettempdir(),
+                                          "mcp-cluster"))
+            os.makedirs(socket_dir, exist_ok=True)
+            self._socket_path = os.path.join(
+                socket_dir, f"{INSTANCE_ID}.sock")
+            config = uvicorn.Config(app, uds=self._socket_path,
+                                    lifespan="off", log_level="warning")
+            self._internal_server = _InternalServer(config)
+            self._internal_task = asyncio.create_task(
+                self._internal_server.serve())
+            self._address = f"unix:{self._socket_path}"
+        mcp_logger.info(f"SSE 会话转发已启用，本进程地址: {self._address}")
+
+    async def stop(self) -> None:
+        """停止内部监听，删除本进程持有的会话归属"""
+        if not self.enabled:
+            return
+        keys = [SESSION_KEY_PREFIX + sid for sid in self._sessions]
+        self._sessions.clear()
+        for key in keys:
+            await asyncio.to_thread(shared_state.delete, key)
+        if self._internal_server is not None:
+            self._internal_server.should_exit = True
+            try:
+                await asyncio.wait_for(self._internal_task, timeout=5)
+            except (asyncio.TimeoutError, Exception) as e:
+                mcp_logger.warning(f"停止 SSE 会话内部监听超时: {str(e)}")
+            self._internal_server = None
+            self._internal_task = None
+        if self._socket_path and os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+        self._address = None
+
+    def is_forwarded(self, scope: Scope) -> bool:
+        """请求是否为其他进程转发来的（集群令牌校验通过）"""
+        if self._token is None:
+            return False
+        header = FORWARDED_HEADER.encode("latin-1")
+        for name, value in scope.get("headers", []):
+            if name == header:
+                return hmac.compare_digest(value, self._token.encode())
+        return False
+
+    def apply_forwarded_state(self, scope: Scope) -> None:
+        """把转发请求携带的密钥ID写入 scope state，供工具埋点关联调用方"""
+        header = FORWARDED_SECRET_HEADER.encode("latin-1")
+        for name, value in scope.get("headers", []):
+            if name == header:
+                try:
+                    scope.setdefault("state", {})["mcp_secret_id"] = (
+                        int(value))
+                except ValueError:
+                    pass
+                return
+
+    def stream_app(self, service_uuid: str, app: ASGIApp) -> ASGIApp:
+        """包装 SSE 端点，登记本进程建立的会话"""
+        return _SessionStreamApp(self, service_uuid, app)
+
+    def message_app(self, service_uuid: str, app: ASGIApp) -> ASGIApp:
+        """包装消息端点，不属于本进程的会话转发到所属进程"""
+        return _SessionMessageApp(self, service_uuid, app)
+
+    async def _register(self, session_id: str, service_uuid: str) -> None:
+        """登记本进程持有的会话"""
+        self._sessions[session_id] = service_uuid
+        self._registered += 1
+        await asyncio.to_thread(
+            shared_state.set, SESSION_KEY_PREFIX + session_id,
+            {"owner": self._address, "service_uuid": service_uuid},
+            settings.CLUSTER_SESSION_TTL)
+
+    def _unregister(self, session_id: str) -> None:
+        """删除会话归属，连接关闭时调用，不等待写入完成"""
+        if self._sessions.pop(session_id, None) is None:
+            return
+        try:
+            asyncio.get_running_loop().run_in_executor(
+                None, shared_state.delete, SESSION_KEY_PREFIX + session_id)
+        except RuntimeError:
+            pass
+
+    async def _lookup(self, session_id: str) -> Optional[str]:
+        """查询会话所属进程地址"""
+        owner = self._owner_cache.get(session_id)
+        if owner is not None:
+            self._owner_cache.move_to_end(session_id)
+            return owner
+        entry = await asyncio.to_thread(
+            shared_state.get, SESSION_KEY_PREFIX + session_id)
+        if not entry:
+            self._lookup_misses += 1
+            return None
+        owner = entry.get("owner")
+        if owner:
+            self._owner_cache[session_id] = owner
+            while len(self._owner_cache) > _OWNER_CACHE_SIZE:
+                self._owner_cache.popitem(last=False)
+        return owner
+
+    async def _forward(self, scope: Scope, receive: Receive, send: Send,
+                       session_id: str, owner: str) -> None:
+        """把消息 POST 转发到会话所属进程"""
+        request = Request(scope, receive)
+        path = (scope.get("raw_path") or scope["path"].encode()).decode(
+            "latin-1")
+        secret_id = scope.get("state", {}).get("mcp_secret_id")
+        if owner.startswith("unix:"):
+            target_url, uds = f"{_INTERNAL_BASE_URL}{path}", owner[5:]
+        else:
+            target_url, uds = f"{owner}{path}", None
+        response = await proxy_client_pool.forward(
+            request, target_url, uds=uds,
+            header_overrides={
+                FORWARDED_HEADER: self._token,
+                FORWARDED_SECRET_HEADER: (
+                    str(secret_id) if secret_id is not None else None),
+            },
+            passthrough_errors=True)
+        if response.status_code >= 500:
+            # 所属进程不可达，下次重新查询归属表
+            self._forward_errors += 1
+            self._owner_cache.pop(session_id, None)
+        else:
+            self._forwarded += 1
+        await response(scope, receive, send)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取会话归属和转发计数"""
+        return {
+            "enabled": self.enabled,
+            "address": self._address,
+            "sessions": len(self._sessions),
+            "registered": self._registered,
+            "local_messages": self._local_messages,
+            "forwarded": self._forwarded,
+            "forward_errors": self._forward_errors,
+            "lookup_misses": self._lookup_misses,
+        }
+
+
+class _SessionStreamApp:
+    """SSE 端点包装：从 endpoint 事件中取 session_id 并登记归属"""
+
+    def __init__(self, router: SseSessionRouter, service_uuid: str,
+                 app: ASGIApp):
+        self.router = router
+        self.service_uuid = service_uuid
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        if not self.router.enabled or scope.get("method") != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        session_id: Optional[str] = None
+
+        async def tracked_send(message: Message) -> None:
+            nonlocal session_id
+            if (session_id is None
+                    and message["type"] == "http.response.body"):
+                match = _SESSION_ID_PATTERN.search(message.get("body", b""))
+                if match:
+                    session_id = match.group(1).decode()
+                    # 先写归属表再把 endpoint 事件发给客户端
+                    await self.router._register(session_id, self.service_uuid)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, tracked_send)
+        finally:
+            if session_id is not None:
+                self.router._unregister(session_id)
+
+
+class _SessionMessageApp:
+    """消息端点包装：会话不在本进程时转发到所属进程"""
+
+    def __init__(self, router: SseSessionRouter, service_uuid: str,
+                 app: ASGIApp):
+        self.router = router
+        self.service_uuid = service_uuid
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        router = self.router
+        if not router.enabled or scope.get("method") != "POST":
+            await self.app(scope, receive, send)
+            return
+        session_id, owner = await self._resolve(scope)
+        if owner is None:
+            router._local_messages += 1
+            await self.app(scope, receive, send)
+            return
+        await router._forward(scope, receive, send, session_id, owner)
+
+    async def _resolve(self, scope: Scope) -> Tuple[Optional[str],
+                                                    Optional[str]]:
+        """返回 (session_id, 所属进程地址)，本进程处理时地址为 None"""
+        router = self.router
+        match = _QUERY_SESSION_PATTERN.search(
+            scope.get("query_string", b"").decode("latin-1"))
+        if not match:
+            return None, None
+        session_id = match.group(1)
+        # 本进程的会话或已经转发过一次的请求，都在本进程处理
+        if session_id in router._sessions or router.is_forwarded(scope):
+            return session_id, None
+        owner = await router._lookup(session_id)
+        if owner is None or owner == router._address:
+            return session_id, None
+        return session_id, owner
+
+
+# 全局实例
+sse_session_router = SseSessionRouter()
@@ -0,0 +1,179 @@
+"""
+内置服务启动加载
+
+启动时逐个创建全部已启用的内置服务（写代码文件、执行模块、注册工具、
+登记路由），启动耗时和内存随服务数线性增长，而大部分服务长期空闲。
+
+- 开启 `startup.lazy_load` 后，未标记预加载（`McpService.eager_load`）的
+  内置服务启动时只在分发器登记 `LazyServiceRoute` 占位路由，第一个请求
+  到达时在线程中创建服务实例，再把请求交给服务真正的路由；同一服务的
+  并发首个请求只创建一次；
+- 标记预加载的服务（未开启时为全部内置服务）由线程池并发创建，并发数为
+  `startup.concurrency`。
+
+每个服务的加载方式、耗时和结果记录在 `ServiceLoadReport`，通过
+`/api/system/services/startup` 查看。
+"""
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from starlette.responses import PlainTextResponse
+from starlette.routing import BaseRoute, Match, NoMatchFound
+from starlette.types import Receive, Scope, Send
+
+from app.utils.response import error_response
+
+# 加载方式
+LOAD_MODE_EAGER = "eager"
+LOAD_MODE_LAZY = "lazy"
+LOAD_MODE_PROXY = "proxy"
+LOAD_MODE_WORKER = "worker"
+
+
+class LazyServiceRoute(BaseRoute):
+    """未加载服务的占位路由，第一个请求到达时创建服务再转交请求"""
+
+    def __init__(self, service_uuid: str,
+                 load: Callable[[str], Awaitable[bool]],
+                 dispatcher: BaseRoute):
+        """
+        Args:
+            service_uuid: 服务UUID
+            load: 创建服务的协程函数，成功返回 True
+            dispatcher: 服务路由分发器，创建完成后重新分发请求
+        """
+        self.service_uuid = service_uuid
+        self._load = load
+        self._dispatcher = dispatcher
+
+    def matches(self, scope: Scope):
+        if scope["type"] != "http":
+            return Match.NONE, {}
+        # 不修改 scope，服务创建后按原始 scope 重新分发
+        return Match.FULL, {}
+
+    def url_path_for(self, name: str, /, **path_params: Any):
+        raise NoMatchFound(name, path_params)
+
+    async def handle(self, scope: Scope, receive: Receive,
+                     send: Send) -> None:
+        if not await self._load(self.service_uuid):
+            await error_response(
+                "服务加载失败", code=503, http_status_code=503
+            )(scope, receive, send)
+            return
+        match, child_scope = self._dispatcher.matches(scope)
+        route = child_scope.get("mcp_dispatch_route")
+        if match == Match.NONE or route is None or route is self:
+            await PlainTextResponse("Not Found", status_code=404)(
+                scope, receive, send)
+            return
+        scope.update(child_scope)
+        await self._dispatcher.handle(scope, receive, send)
+
+
+class ServiceLoadReport:
+    """服务加载报告：启动耗时、每个服务的加载方式和耗时"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._services: Dict[str, Dict[str, Any]] = {}
+        self._boot_started: Optional[float] = None
+        self._boot_ms: Optional[float] = None
+        self._lazy_load = False
+        self._concurrency = 1
+
+    def start_boot(self, lazy_load: bool, concurrency: int) -> None:
+        """开始启动加载"""
+        with self._lock:
+            self._services.clear()
+            self._boot_started = time.perf_counter()
+            self._boot_ms = None
+            self._lazy_load = lazy_load
+            self._concurrency = concurrency
+
+    def finish_boot(self) -> None:
+        """启动加载完成（预加载服务全部创建完成）"""
+        with self._lock:
+            if self._boot_started is not None:
+                self._boot_ms = round(
+                    (time.perf_counter() - self._boot_started) * 1000, 2)
+
+    def record(self, service_uuid: str, name: str, mode: str,
+               status: str, load_ms: Optional[float] = None,
+               error: Optional[str] = None,
+               trigger: str = "boot") -> None:
+        """
+        记录服务加载结果
+
+        Args:
+            service_uuid: 服务UUID
+            name: 服务名称
+            mode: 加载方式（eager / lazy / proxy / worker）
+            status: pending（等待首个请求）、loaded、error
+            load_ms: 加载耗时（毫秒）
+            error: 失败原因
+            trigger: boot（启动时）或 request（首个请求）
+        """
+        with self._lock:
+            self._services[service_uuid] = {
+                "service_uuid": service_uuid,
+                "name": name,
+                "mode": mode,
+                "status": status,
+                "load_ms": (round(load_ms, 2) if load_ms is not None
+                            else None),
+                "error": error,
+                "trigger": trigger,
+            }
+
+    def update(self, service_uuid: str, status: str,
+               load_ms: Optional[float] = None,
+               error: Optional[str] = None,
+               trigger: str = "request") -> None:
+        """更新已记录服务的加载结果，未记录的服务忽略"""
+        with self._lock:
+            entry = self._services.get(service_uuid)
+            if entry is None:
+                return
+            entry["status"] = status
+            entry["load_ms"] = (round(load_ms, 2) if load_ms is not None
+                                else None)
+            entry["error"] = error
+            entry["trigger"] = trigger
+
+    def forget(self, service_uuid: str) -> None:
+        """服务停止或删除后移除记录"""
+        with self._lock:
+            self._services.pop(service_uuid, None)
+
+    def get_report(self) -> Dict[str, Any]:
+        """获取加载报告，服务按加载耗时降序排列"""
+        with self._lock:
+            services = [dict(entry) for entry in self._services.values()]
+            boot_ms = self._boot_ms
+            lazy_load = self._lazy_load
+            concurrency = self._concurrency
+        modes: Dict[str, int] = {}
+        statuses: Dict[str, int] = {}
+        for entry in services:
+            modes[entry["mode"]] = modes.get(entry["mode"], 0) + 1
+            statuses[entry["status"]] = statuses.get(entry["status"], 0) + 1
+        services.sort(key=lambda entry: entry["load_ms"] or 0, reverse=True)
+        loaded_ms = [entry["load_ms"] for entry in services
+                     if entry["load_ms"] is not None]
+        return {
+            "lazy_load": lazy_load,
+            "concurrency": concurrency,
+            "boot_ms": boot_ms,
+            "total": len(services),
+            "modes": modes,
+            "statuses": statuses,
+            "total_load_ms": round(sum(loaded_ms), 2),
+            "services": services,
+        }
+
+
+# 全局实例
+service_load_report = ServiceLoadReport()
@@ -0,0 +1,330 @@
+"""
+流式HTTP服务会话管理
+
+每个流式HTTP协议的内置服务持有一个 `StreamSessionManager`，按客户端的
+`Mcp-Session-Id` 维护独立的 `StreamableHTTPServerTransport` 和 MCP 服务
+循环，不同客户端之间互不影响：
+
+- 不带会话ID的 POST（initialize）创建新会话，会话ID由传输层通过
+  `mcp-session-id` 响应头返回给客户端；
+- 带会话ID的请求交给对应会话的传输层处理，会话不存在时返回 404，
+  客户端按协议重新初始化；
+- 会话数达到上限时淘汰最久未活动、且已空闲一段时间的会话，没有可淘汰
+  会话则返回 503（刚完成初始化、正在两次请求之间的会话不会被淘汰）；
+- 超过空闲时间且没有进行中请求的会话由后台任务定期清理；客户端发送
+  DELETE 结束会话时服务循环退出，会话随之移除。
+
+管理器本身是 ASGI 应用，直接作为流式HTTP路由的端点，响应由传输层经原始
+`send` 写回。会话任务运行在处理请求的事件循环上，`close` 在服务停止时
+取消全部会话；在其他线程调用 `close` 时交给该事件循环执行。
+"""
+import asyncio
+import time
+import uuid
+from http import HTTPStatus
+from typing import Any, Dict, Optional
+
+from mcp.server.lowlevel.server import Server as MCPServer
+from mcp.server.streamable_http import (
+    MCP_SESSION_ID_HEADER,
+    StreamableHTTPServerTransport,
+)
+from starlette.responses import Response
+from starlette.types import Message, Receive, Scope, Send
+
+from app.utils.logging import mcp_logger
+
+# 会话数已满时，空闲超过该时长（秒）的会话才允许被淘汰
+_EVICT_MIN_IDLE_SECONDS = 30
+
+
+def _in_loop(loop: asyncio.AbstractEventLoop) -> bool:
+    """当前线程是否运行着指定的事件循环"""
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+class _StreamSession:
+    """单个客户端会话"""
+
+    def __init__(self, session_id: str,
+                 transport: StreamableHTTPServerTransport):
+        self.session_id = session_id
+        self.transport = transport
+        self.task: Optional[asyncio.Task] = None
+        self.ready = asyncio.Event()
+        self.created_at = time.monotonic()
+        self.last_active = self.created_at
+        # 进行中的请求数（含 GET 建立的长连接）
+        self.active_requests = 0
+
+    def idle_seconds(self, now: float) -> float:
+        """空闲时长，有进行中请求时为 0"""
+        if self.active_requests:
+            return 0.0
+        return now - self.last_active
+
+
+class StreamSessionManager:
+    """流式HTTP服务的客户端会话管理器"""
+
+    def __init__(self, service_uuid: str, mcp_server: MCPServer,
+                 max_sessions: int = 100, idle_timeout: int = 1800):
+        """
+        初始化会话管理器
+
+        Args:
+            service_uuid: 服务UUID，用于日志
+            mcp_server: 服务的底层 MCP Server
+            max_sessions: 最大会话数
+            idle_timeout: 空闲会话清理时间（秒），0 表示不清理
+        """
+        self.service_uuid = service_uuid
+        self.mcp_server = mcp_server
+        self.max_sessions = max(1, max_sessions)
+        self.idle_timeout = max(0, idle_timeout)
+
+        self._sessions: Dict[str, _StreamSession] = {}
+        self._create_lock = asyncio.Lock()
+        self._reaper: Optional[asyncio.Task] = None
+        # 会话任务所在的事件循环，首次创建会话时记录
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closed = False
+
+        # 运行计数
+        self._created = 0
+        self._evicted = 0
+        self._expired = 0
+        self._rejected = 0
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        """
+        作为 ASGI 应用处理流式HTTP请求
+
+        请求直接交给会话传输层，使用原始的 `send` 写回响应，不经过额外的
+        任务、队列和响应包装。
+        """
+        response_started = False
+
+        async def tracked_send(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.handle_request(scope, receive, tracked_send)
+        except Exception as e:
+            mcp_logger.error(
+                f"处理流式HTTP请求失败: {self.service_uuid}, 错误: {str(e)}")
+            if not response_started:
+                await self._reply(scope, receive, send,
+                                  HTTPStatus.INTERNAL_SERVER_ERROR,
+                                  f"流式HTTP处理失败: {str(e)}")
+
+    async def handle_request(self, scope: Scope, receive: Receive,
+                             send: Send) -> None:
+        """
+        按会话ID分发请求
+
+        Args:
+            scope: ASGI 连接信息
+            receive: ASGI 接收通道
+            send: ASGI 发送通道
+        """
+        session_id = self._get_session_id(scope)
+        if session_id is not None:
+            session = self._sessions.get(session_id)
+            if session is None:
+                await self._reply(scope, receive, send, HTTPStatus.NOT_FOUND,
+                                  "Session not found")
+                return
+            await self._handle_in_session(session, scope, receive, send)
+            return
+
+        # 新会话只能由 POST（initialize）创建
+        if scope["method"] != "POST":
+            await self._reply(scope, receive, send, HTTPStatus.BAD_REQUEST,
+                              "Bad Request: Missing session ID")
+            return
+
+        session = await self._create_session()
+        if session is None:
+            self._rejected += 1
+            await self._reply(scope, receive, send,
+                              HTTPStatus.SERVICE_UNAVAILABLE,
+                              "Too many sessions", {"Retry-After": "5"})
+            return
+        await self._handle_in_session(session, scope, receive, send)
+
+    def close(self) -> None:
+        """停止全部会话和后台清理任务"""
+        self._closed = True
+        loop = self._loop
+        if loop is not None and not loop.is_closed() and not _in_loop(loop):
+            # 任务只能在所属事件循环上取消
+            loop.call_soon_threadsafe(self.close)
+            return
+        if self._reaper and not self._reaper.done():
+            self._reaper.cancel()
+        for session in list(self._sessions.values()):
+            self._stop_session(session)
+        self._sessions.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取会话运行状态"""
+        sessions = list(self._sessions.values())
+        return {
+            "active_sessions": len(sessions),
+            "busy_sessions": sum(1 for s in sessions if s.active_requests),
+            "max_sessions": self.max_sessions,
+            "idle_timeout": self.idle_timeout,
+            "created": self._created,
+            "evicted": self._evicted,
+            "expired": self._expired,
+            "rejected": self._rejected,
+        }
+
+    def clean_idle_sessions(self) -> int:
+        """清理超过空闲时间的会话，返回清理数量"""
+        if not self.idle_timeout:
+            return 0
+        now = time.monotonic()
+        expired = [
+            session for session in self._sessions.values()
+            if session.idle_seconds(now) > self.idle_timeout
+        ]
+        for session in expired:
+            self._remove_session(session)
+        self._expired += len(expired)
+        if expired:
+            mcp_logger.info(
+                f"流式HTTP服务 {self.service_uuid} 清理空闲会话 "
+                f"{len(expired)} 个，当前会话数: {len(self._sessions)}")
+        return len(expired)
+
+    @staticmethod
+    def _get_session_id(scope: Scope) -> Optional[str]:
+        """从请求头获取会话ID"""
+        header = MCP_SESSION_ID_HEADER.encode("latin-1")
+        for name, value in scope.get("headers", []):
+            if name.lower() == header:
+                return value.decode("latin-1")
+        return None
+
+    @staticmethod
+    async def _reply(scope: Scope, receive: Receive, send: Send,
+                     status: HTTPStatus, message: str,
+                     headers: Optional[Dict[str, str]] = None) -> None:
+        response = Response(message, status_code=status, headers=headers)
+        await response(scope, receive, send)
+
+    async def _handle_in_session(self, session: _StreamSession, scope: Scope,
+                                 receive: Receive, send: Send) -> None:
+        """在会话的传输层中处理请求"""
+        session.active_requests += 1
+        session.last_active = time.monotonic()
+        try:
+            await session.transport.handle_request(scope, receive, send)
+        finally:
+            session.active_requests -= 1
+            session.last_active = time.monotonic()
+
+    async def _create_session(self) -> Optional[_StreamSession]:
+        """创建会话并启动服务循环，会话数已满且无可淘汰会话时返回None"""
+        async with self._create_lock:
+            if self._closed:
+                return None
+            if (len(self._sessions) >= self.max_sessions
+                    and not self._evict_one()):
+                mcp_logger.warning(
+                    f"流式HTTP服务 {self.service_uuid} 会话数已达上限 "
+                    f"{self.max_sessions}，拒绝新会话")
+                return None
+
+            self._loop = asyncio.get_running_loop()
+            session_id = uuid.uuid4().hex
+            transport = StreamableHTTPServerTransport(
+                mcp_session_id=session_id,
+                is_json_response_enabled=False,  # 使用SSE响应模式
+                event_store=None  # 暂不使用事件存储
+            )
+            session = _StreamSession(session_id, transport)
+            self._sessions[session_id] = session
+            session.task = asyncio.create_task(self._run_session(session))
+            self._created += 1
+            self._ensure_reaper()
+
+        await session.ready.wait()
+        mcp_logger.debug(
+            f"流式HTTP服务 {self.service_uuid} 创建会话 {session_id}，"
+            f"当前会话数: {len(self._sessions)}")
+        return session
+
+    async def _run_session(self, session: _StreamSession) -> None:
+        """运行会话的 MCP 服务循环，结束后移除会话"""
+        try:
+            async with session.transport.connect() as streams:
+                read_stream, write_stream = streams
+                session.ready.set()
+                await self.mcp_server.run(
+                    read_stream,
+                    write_stream,
+                    self.mcp_server.create_initialization_options(),
+                )
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            mcp_logger.error(
+                f"流式HTTP服务 {self.service_uuid} 会话 "
+                f"{session.session_id} 异常结束: {str(e)}")
+        finally:
+            session.ready.set()
+            if self._sessions.get(session.session_id) is session:
+                del self._sessions[session.session_id]
+
+    def _evict_one(self) -> bool:
+        """淘汰最久未活动的空闲会话"""
+        now = time.monotonic()
+        min_idle = _EVICT_MIN_IDLE_SECONDS
+        if self.idle_timeout:
+            min_idle = min(min_idle, self.idle_timeout)
+        idle = [
+            session for session in self._sessions.values()
+            if session.idle_seconds(now) >= min_idle
+        ]
+        if not idle:
+            return False
+        oldest = max(idle, key=lambda session: session.idle_seconds(now))
+        self._remove_session(oldest)
+        self._evicted += 1
+        mcp_logger.info(
+            f"流式HTTP服务 {self.service_uuid} 会话数已满，淘汰空闲会话 "
+            f"{oldest.session_id}")
+        return True
+
+    def _remove_session(self, session: _StreamSession) -> None:
+        self._sessions.pop(session.session_id, None)
+        self._stop_session(session)
+
+    @staticmethod
+    def _stop_session(session: _StreamSession) -> None:
+        if session.task and not session.task.done():
+            session.task.cancel()
+
+    def _ensure_reaper(self) -> None:
+        """按需启动空闲会话清理任务"""
+        if not self.idle_timeout:
+            return
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_idle_sessions())
+
+    async def _reap_idle_sessions(self) -> None:
+        """定期清理空闲会话，没有会话时退出"""
+        interval = max(1.0, min(self.idle_timeout / 2, 60.0))
+        while self._sessions and not self._closed:
+            await asyncio.sleep(interval)
+            self.clean_idle_sessions()
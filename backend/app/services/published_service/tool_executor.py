@@ -0,0 +1,162 @@
+"""
+内置服务同步工具执行器
+
+模板中的工具函数大多是同步函数（`requests`、`pymysql` 等阻塞调用），
+直接注册到 FastMCP 会在事件循环线程上执行，一次慢调用会卡住进程内
+所有 SSE 连接和请求。`register_mcp_tool` 用 `ServiceToolExecutor.wrap`
+把同步工具包装为协程，在服务独立的线程池中执行，`async def` 工具仍在
+事件循环上原样执行：
+
+- 每个服务一个线程池，线程数即该服务同时执行的同步工具上限，一个服务
+  的慢工具只占用自己的线程，不影响其他服务；
+- 超过上限的调用在事件循环中排队等待，排队数超过上限时直接返回错误；
+- 记录执行中/排队中的调用数、排队等待时间和拒绝次数。
+
+工具在线程中执行时复制调用方的 contextvars，执行埋点仍能读取 MCP
+请求上下文。服务停止时调用 `shutdown`。
+"""
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from app.core.config import settings
+from app.utils.logging import mcp_logger
+
+
+class ToolExecutorBusy(RuntimeError):
+    """工具执行排队数已满"""
+
+
+class ServiceToolExecutor:
+    """单个服务的同步工具线程池"""
+
+    def __init__(self, service_uuid: str, max_workers: int = 4,
+                 max_queue: int = 100):
+        """
+        初始化工具执行器
+
+        Args:
+            service_uuid: 服务UUID，用于线程名和日志
+            max_workers: 线程数，即同时执行的同步工具调用上限
+            max_queue: 排队等待的调用上限，0 表示不排队
+        """
+        self.service_uuid = service_uuid
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=f"mcp-tool-{service_uuid[:8]}")
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._closed = False
+
+        # 运行计数
+        self._running = 0
+        self._queued = 0
+        self._peak_queued = 0
+        self._started = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def wrap(self, func: Callable) -> Callable:
+        """
+        把同步工具函数包装为在线程池中执行的协程函数
+
+        包装函数保留原函数的名称、文档和签名，FastMCP 生成的参数 schema
+        不变。
+        """
+        @functools.wraps(func)
+        async def offloaded(*args, **kwargs):
+            return await self.run(func, *args, **kwargs)
+
+        return offloaded
+
+    async def run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        在线程池中执行同步函数
+
+        Raises:
+            ToolExecutorBusy: 排队数已满或执行器已关闭
+        """
+        if self._closed:
+            raise ToolExecutorBusy("服务已停止")
+        if self._slots.locked() and self._queued >= self.max_queue:
+            self._rejected += 1
+            mcp_logger.warning(
+                f"服务 {self.service_uuid} 工具执行排队已满 "
+                f"({self._queued}/{self.max_queue})，拒绝调用 "
+                f"{getattr(func, '__name__', func)}")
+            raise ToolExecutorBusy("服务繁忙，工具执行排队已满，请稍后重试")
+
+        enqueued_at = time.monotonic()
+        self._queued += 1
+        self._peak_queued = max(self._peak_queued, self._queued)
+        try:
+            await self._slots.acquire()
+        finally:
+            self._queued -= 1
+        wait = time.monotonic() - enqueued_at
+        self._started += 1
+        self._wait_total += wait
+        self._wait_max = max(self._wait_max, wait)
+
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        self._running += 1
+        try:
+            future = self._pool.submit(
+                context.run, functools.partial(func, *args, **kwargs))
+        except RuntimeError:
+            self._running -= 1
+            self._slots.release()
+            raise ToolExecutorBusy("服务已停止")
+
+        def on_done(_) -> None:
+            # 线程执行结束才释放名额，调用方取消等待不会放进更多调用
+            self._running -= 1
+            self._completed += 1
+            self._slots.release()
+
+        def schedule_done(f) -> None:
+            try:
+                loop.call_soon_threadsafe(on_done, f)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+        future.add_done_callback(schedule_done)
+        return await asyncio.wrap_future(future)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取线程池运行状态"""
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "queued": self._queued,
+            "peak_queued": self._peak_queued,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "avg_wait_ms": round(
+                self._wait_total / self._started * 1000, 2
+            ) if self._started else 0.0,
+            "max_wait_ms": round(self._wait_max * 1000, 2),
+        }
+
+    def shutdown(self) -> None:
+        """关闭线程池，取消尚未开始的调用，执行中的调用在后台结束"""
+        self._closed = True
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def create_tool_executor(service_uuid: str) -> ServiceToolExecutor:
+    """按 `tool_executor.*` 配置创建工具执行器"""
+    return ServiceToolExecutor(
+        service_uuid,
+        max_workers=settings.TOOL_EXECUTOR_MAX_WORKERS,
+        max_queue=settings.TOOL_EXECUTOR_MAX_QUEUE,
+    )
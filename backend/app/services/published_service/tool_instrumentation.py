@@ -0,0 +1,187 @@
+"""
+已发布服务工具执行埋点
+
+`McpServiceManager.register_mcp_tool` 注册工具前用 `instrument_tool`
+包装模板中的工具函数，在 MCP 服务内部记录工具的真实执行情况：
+
+- 墙钟耗时、CPU 耗时（异步工具只统计工具自身协程每一步的 CPU 时间，
+  不包含等待期间事件循环中其他任务的时间）；
+- 是否抛出异常及异常信息；
+- 参数、结果序列化后的字节数；
+- 调用方会话ID（SSE 的 session_id / 流式HTTP 的 mcp-session-id）和
+  鉴权中间件写入的密钥ID。
+
+执行记录经 `HistoryService.submit_tool_execution` 放入批量写入队列，
+不在工具调用路径上访问数据库。
+"""
+import functools
+import inspect
+import json
+import time
+import types
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from mcp.server.fastmcp import Context
+from mcp.server.lowlevel.server import request_ctx
+
+from app.services.history.service import history_service
+from app.utils.logging import mcp_logger
+
+# 记录的异常信息最大长度
+_MAX_ERROR_LENGTH = 1000
+
+
+def payload_size(value: Any) -> Optional[int]:
+    """计算参数/结果序列化后的字节数，无法序列化时返回None"""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    try:
+        return len(json.dumps(value, ensure_ascii=False,
+                              default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _call_context() -> Tuple[Optional[str], Optional[int]]:
+    """从 MCP 请求上下文获取 (会话ID, 密钥ID)"""
+    try:
+        ctx = request_ctx.get()
+    except LookupError:
+        return None, None
+    request = getattr(ctx, "request", None)
+    if request is None:
+        return None, None
+    session_id = (request.query_params.get("session_id")
+                  or request.headers.get("mcp-session-id"))
+    secret_id = request.scope.get("state", {}).get("mcp_secret_id")
+    return session_id, secret_id
+
+
+@types.coroutine
+def _run_with_cpu_time(coro, cpu_time: list):
+    """驱动协程执行，只累计协程自身每一步占用的 CPU 时间"""
+    send_value, error = None, None
+    while True:
+        start = time.thread_time()
+        try:
+            if error is not None:
+                yielded = coro.throw(error)
+            else:
+                yielded = coro.send(send_value)
+        except StopIteration as stop:
+            cpu_time[0] += time.thread_time() - start
+            return stop.value
+        except BaseException:
+            cpu_time[0] += time.thread_time() - start
+            raise
+        cpu_time[0] += time.thread_time() - start
+        try:
+            send_value, error = (yield yielded), None
+        except BaseException as e:
+            send_value, error = None, e
+
+
+def _typed_signature(func: Callable) -> inspect.Signature:
+    """获取已求值注解的函数签名，避免包装函数所在模块无法解析字符串注解"""
+    try:
+        return inspect.signature(func, eval_str=True)
+    except Exception:
+        return inspect.signature(func)
+
+
+def instrument_tool(func: Callable, tool_name: str, service_uuid: str,
+                    module_id: Optional[int] = None) -> Callable:
+    """
+    包装工具函数，记录每次调用的执行信息
+
+    包装函数保留原函数的名称、文档和签名，FastMCP 生成的参数 schema
+    与直接注册原函数一致。
+
+    Args:
+        func: 模板中的工具函数
+        tool_name: 工具名称
+        service_uuid: 服务UUID
+        module_id: 模板ID
+
+    Returns:
+        包装后的函数
+    """
+    signature = _typed_signature(func)
+    # Context 参数由 FastMCP 注入，不计入工具参数
+    context_names = {
+        name for name, param in signature.parameters.items()
+        if inspect.isclass(param.annotation)
+        and issubclass(param.annotation, Context)
+    }
+
+    def record(arguments: Dict[str, Any], started: float, cpu_time: float,
+               result: Any, error: Optional[BaseException]) -> None:
+        execution_time = int((time.perf_counter() - started) * 1000)
+        try:
+            parameters = {
+                key: value for key, value in arguments.items()
+                if key not in context_names
+            }
+            session_id, secret_id = _call_context()
+            history_service.submit_tool_execution(
+                tool_name=tool_name,
+                service_id=service_uuid,
+                module_id=module_id,
+                description=f"执行工具 {tool_name}",
+                parameters=parameters,
+                result=None,
+                status="error" if error is not None else "success",
+                execution_time=execution_time,
+                cpu_time=int(cpu_time * 1000),
+                args_size=payload_size(parameters),
+                result_size=(
+                    payload_size(result) if error is None else None
+                ),
+                session_id=session_id,
+                secret_id=secret_id,
+                error_message=(
+                    str(error)[:_MAX_ERROR_LENGTH]
+                    if error is not None else None
+                )
+            )
+        except Exception as e:
+            mcp_logger.error(f"记录工具 {tool_name} 执行信息失败: {str(e)}")
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            cpu_time = [0.0]
+            try:
+                result = await _run_with_cpu_time(
+                    func(*args, **kwargs), cpu_time)
+            except Exception as e:
+                record(kwargs, started, cpu_time[0], None, e)
+                raise
+            record(kwargs, started, cpu_time[0], result, None)
+            return result
+
+        wrapper = async_wrapper
+    else:
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            cpu_started = time.thread_time()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                record(kwargs, started, time.thread_time() - cpu_started,
+                       None, e)
+                raise
+            record(kwargs, started, time.thread_time() - cpu_started,
+                   result, None)
+            return result
+
+        wrapper = sync_wrapper
+
+    wrapper.__signature__ = signature
+    return wrapper
@@ -0,0 +1,414 @@
+"""
+第三方服务上游选择与熔断
+
+启用代理转发的第三方服务持有一个 `UpstreamGroup`，管理一个或多个上游地址：
+
+- 按轮询（round_robin）或最少进行中请求（least_in_flight）选择上游；
+- 每个上游一个熔断器：连续失败达到阈值后熔断，熔断期间直接返回 503，
+  不再占用客户端连接等待超时；熔断超过恢复时间后放行一个试探请求，
+  成功则恢复，失败则继续熔断；
+- 后台任务定期探测每个上游（配置的健康路径，或对上游地址发 HEAD，不建立
+  MCP 会话），探测失败计入连续失败，探测成功立即恢复；
+- 多上游时按会话保持：SSE 会话根据 `endpoint` 事件中的 `session_id`、
+  流式HTTP 会话根据 `mcp-session-id` 响应头绑定到建立会话的上游，后续
+  消息请求转发到同一上游。
+
+探测任务运行在事件循环上，`start` 在没有运行中的事件循环时不做处理，
+由应用启动时或第一次选择上游时再启动；服务停止时调用 `close`。
+"""
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.utils import now_beijing
+from app.utils.logging import mcp_logger
+
+# 熔断器状态
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+# 上游选择策略
+STRATEGY_ROUND_ROBIN = "round_robin"
+STRATEGY_LEAST_IN_FLIGHT = "least_in_flight"
+UPSTREAM_STRATEGIES = (STRATEGY_ROUND_ROBIN, STRATEGY_LEAST_IN_FLIGHT)
+
+# 会话保持表的最大条目数，超过后淘汰最早绑定的会话
+_MAX_AFFINITY_SESSIONS = 10000
+# SSE 响应中查找 session_id 的最大字节数
+_SESSION_SNIFF_MAX_BYTES = 4096
+_SESSION_ID_PATTERN = re.compile(rb"session_id=([0-9A-Za-z_-]+)")
+_MCP_SESSION_HEADER = "mcp-session-id"
+
+
+def split_upstream_url(url: str) -> Tuple[str, str]:
+    """
+    拆分上游SSE地址
+
+    Returns:
+        (基础URL, UUID路径)：地址包含 `/mcp-<uuid>` 时基础URL为其之前的
+        部分，否则基础URL为整个地址、UUID路径为空
+    """
+    url = url.rstrip('/')
+    if '/mcp-' not in url:
+        return url, ""
+    base_url, rest = url.split('/mcp-', 1)
+    return base_url, f"/mcp-{rest.split('/')[0]}"
+
+
+class Upstream:
+    """单个上游地址及其熔断状态"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        self.base_url, self.uuid_path = split_upstream_url(self.url)
+
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        # 半开状态下是否已放行试探请求
+        self.trial_in_flight = False
+
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+        # 最近一次探测结果，未探测时为 None
+        self.healthy: Optional[bool] = None
+        self.last_probe_at: Optional[str] = None
+        self.last_probe_latency_ms: Optional[float] = None
+
+    def target_url(self, sub_path: str = "") -> str:
+        """构建转发目标地址，sub_path 为代理路径之后的子路径"""
+        if not sub_path:
+            return self.url
+        return f"{self.base_url}{self.uuid_path}{sub_path}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "state": self.state,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "last_probe_at": self.last_probe_at,
+            "last_probe_latency_ms": self.last_probe_latency_ms,
+        }
+
+
+class UpstreamLease:
+    """一次转发占用的上游，转发结束时释放"""
+
+    def __init__(self, group: "UpstreamGroup", upstream: Upstream):
+        self.group = group
+        self.upstream = upstream
+        self.session_id: Optional[str] = None
+        # 是否为半开状态下放行的试探请求
+        self.trial = upstream.state == CIRCUIT_HALF_OPEN
+        self._buffer = b""
+        self._released = False
+
+    def release(self) -> None:
+        """转发结束（含客户端断开）时调用，只生效一次"""
+        if self._released:
+            return
+        self._released = True
+        self.upstream.in_flight -= 1
+        if self.trial:
+            self.upstream.trial_in_flight = False
+        if self.session_id:
+            # SSE 长连接结束，会话随之失效
+            self.group.unbind_session(self.session_id)
+
+    def sniff_event_chunk(self, chunk: bytes) -> bool:
+        """
+        从 SSE 响应开头查找 session_id 并绑定到当前上游
+
+        Returns:
+            bool: 是否已结束查找
+        """
+        self._buffer += chunk
+        match = _SESSION_ID_PATTERN.search(self._buffer)
+        if match:
+            self.session_id = match.group(1).decode("latin-1")
+            self.group.bind_session(self.session_id, self.upstream)
+            self._buffer = b""
+            return True
+        if len(self._buffer) >= _SESSION_SNIFF_MAX_BYTES:
+            self._buffer = b""
+            return True
+        return False
+
+
+class UpstreamGroup:
+    """第三方服务的上游集合"""
+
+    def __init__(self, service_uuid: str, urls: List[str],
+                 strategy: str = STRATEGY_ROUND_ROBIN,
+                 failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 probe_interval: float = 10.0, probe_timeout: float = 3.0,
+                 probe_path: str = ""):
+        """
+        初始化上游集合
+
+        Args:
+            service_uuid: 服务UUID，用于日志
+            urls: 上游地址列表，至少一个
+            strategy: 选择策略，round_robin 或 least_in_flight
+            failure_threshold: 连续失败多少次后熔断
+            recovery_timeout: 熔断后多久（秒）放行试探请求
+            probe_interval: 健康探测间隔（秒），0 表示不探测
+            probe_timeout: 单次探测超时（秒）
+            probe_path: 健康探测路径（相对上游基础地址），为空时对上游地址
+                发 HEAD
+        """
+        if not urls:
+            raise ValueError("上游地址不能为空")
+        if strategy not in UPSTREAM_STRATEGIES:
+            strategy = STRATEGY_ROUND_ROBIN
+        self.service_uuid = service_uuid
+        self.upstreams = [Upstream(url) for url in urls]
+        self.strategy = strategy
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = max(0.0, recovery_timeout)
+        self.probe_interval = max(0.0, probe_interval)
+        self.probe_timeout = probe_timeout
+        self.probe_path = probe_path.strip()
+        if self.probe_path and not self.probe_path.startswith('/'):
+            self.probe_path = '/' + self.probe_path
+
+        self._cursor = 0
+        self._affinity: "OrderedDict[str, Upstream]" = OrderedDict()
+        self._prober: Optional[asyncio.Task] = None
+        self._closed = False
+        # 所有可用上游都处于熔断时直接拒绝的请求数
+        self._rejected = 0
+
+    @property
+    def multiple(self) -> bool:
+        """是否有多个上游，只有一个上游时不需要会话保持"""
+        return len(self.upstreams) > 1
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """
+        启动健康探测任务
+
+        Args:
+            loop: 不在事件循环线程中调用时（如在线程中发布服务），
+                在该事件循环上启动探测；为None时不启动
+        """
+        if self._closed or not self.probe_interval:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            if loop is not None and not loop.is_closed():
+                loop.call_soon_threadsafe(self.start)
+            return
+        if self._prober is not None and not self._prober.done():
+            return
+        self._prober = running.create_task(self._probe_loop())
+
+    def close(self) -> None:
+        """停止健康探测，可在任意线程调用"""
+        self._closed = True
+        prober = self._prober
+        if prober and not prober.done():
+            loop = prober.get_loop()
+            try:
+                in_loop = asyncio.get_running_loop() is loop
+            except RuntimeError:
+                in_loop = False
+            if in_loop:
+                prober.cancel()
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(prober.cancel)
+        self._affinity.clear()
+
+    def get_session_key(self, request: Request) -> Optional[str]:
+        """获取请求所属的会话ID，用于会话保持"""
+        if not self.multiple:
+            return None
+        return (request.headers.get(_MCP_SESSION_HEADER)
+                or request.query_params.get("session_id"))
+
+    def select(self, session_key: Optional[str] = None) -> Optional[Upstream]:
+        """
+        选择一个上游
+
+        Args:
+            session_key: 请求所属的会话ID，已绑定的会话固定转发到绑定的上游
+
+        Returns:
+            Optional[Upstream]: 选中的上游，没有可用上游时返回None
+        """
+        self.start()
+        now = time.monotonic()
+        if session_key:
+            upstream = self._affinity.get(session_key)
+            if upstream is not None:
+                if self._allow(upstream, now):
+                    return self._take(upstream)
+                self._rejected += 1
+                return None
+
+        candidates = [u for u in self.upstreams if self._allow(u, now)]
+        if not candidates:
+            self._rejected += 1
+            return None
+
+        offset = self._cursor % len(candidates)
+        self._cursor += 1
+        ordered = candidates[offset:] + candidates[:offset]
+        if self.strategy == STRATEGY_LEAST_IN_FLIGHT:
+            upstream = min(ordered, key=lambda u: u.in_flight)
+        else:
+            upstream = ordered[0]
+        return self._take(upstream)
+
+    def acquire(self, upstream: Upstream) -> UpstreamLease:
+        """登记一次转发，转发结束时调用返回值的 release"""
+        upstream.in_flight += 1
+        upstream.requests += 1
+        return UpstreamLease(self, upstream)
+
+    def record_success(self, upstream: Upstream) -> None:
+        """记录一次成功，关闭熔断"""
+        upstream.consecutive_failures = 0
+        if upstream.state != CIRCUIT_CLOSED:
+            upstream.state = CIRCUIT_CLOSED
+            mcp_logger.info(
+                f"第三方服务 {self.service_uuid} 上游已恢复: {upstream.url}")
+
+    def record_failure(self, upstream: Upstream, error: str) -> None:
+        """记录一次失败，连续失败达到阈值或试探失败时熔断"""
+        upstream.failures += 1
+        upstream.consecutive_failures += 1
+        upstream.last_error = error
+        if (upstream.state == CIRCUIT_HALF_OPEN
+                or (upstream.state == CIRCUIT_CLOSED
+                    and upstream.consecutive_failures
+                    >= self.failure_threshold)):
+            upstream.state = CIRCUIT_OPEN
+            upstream.opened_at = time.monotonic()
+            upstream.trial_in_flight = False
+            mcp_logger.warning(
+                f"第三方服务 {self.service_uuid} 上游熔断: {upstream.url}，"
+                f"连续失败 {upstream.consecutive_failures} 次，"
+                f"最近错误: {error}")
+        elif upstream.state == CIRCUIT_OPEN:
+            # 熔断期间的探测失败，重新计算恢复时间
+            upstream.opened_at = time.monotonic()
+
+    def bind_session(self, session_id: str, upstream: Upstream) -> None:
+        """把会话绑定到上游"""
+        if not self.multiple:
+            return
+        self._affinity[session_id] = upstream
+        self._affinity.move_to_end(session_id)
+        while len(self._affinity) > _MAX_AFFINITY_SESSIONS:
+            self._affinity.popitem(last=False)
+
+    def unbind_session(self, session_id: str) -> None:
+        """解除会话绑定"""
+        self._affinity.pop(session_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取上游状态"""
+        now = time.monotonic()
+        return {
+            "strategy": self.strategy,
+            "failure_threshold": self.failure_threshold,
+            "recovery_timeout": self.recovery_timeout,
+            "probe_interval": self.probe_interval,
+            "probe_path": self.probe_path,
+            "available": sum(
+                1 for u in self.upstreams if self._allow(u, now)),
+            "sessions": len(self._affinity),
+            "rejected": self._rejected,
+            "upstreams": [u.to_dict() for u in self.upstreams],
+        }
+
+    @staticmethod
+    def _take(upstream: Upstream) -> Upstream:
+        """选中上游，熔断恢复时间已到时转为半开并放行一个试探请求"""
+        if upstream.state == CIRCUIT_OPEN:
+            upstream.state = CIRCUIT_HALF_OPEN
+            upstream.trial_in_flight = True
+        return upstream
+
+    def _allow(self, upstream: Upstream, now: float) -> bool:
+        """上游当前是否可以接收请求"""
+        if upstream.state == CIRCUIT_CLOSED:
+            return True
+        if upstream.state == CIRCUIT_HALF_OPEN:
+            return not upstream.trial_in_flight
+        return now - upstream.opened_at >= self.recovery_timeout
+
+    async def _probe_loop(self) -> None:
+        """定期探测全部上游"""
+        timeout = httpx.Timeout(self.probe_timeout)
+        async with httpx.AsyncClient(timeout=timeout,
+                                     follow_redirects=False) as client:
+            while not self._closed:
+                await asyncio.gather(
+                    *(self._probe(client, u) for u in self.upstreams))
+                await asyncio.sleep(self.probe_interval)
+
+    async def _probe(self, client: httpx.AsyncClient,
+                     upstream: Upstream) -> None:
+        """
+        探测单个上游
+
+        配置了健康路径时 GET `基础地址 + 健康路径`，否则对上游地址发 HEAD
+        （不对SSE地址发 GET，避免每次探测都在上游建立一个 MCP 会话）；
+        收到状态行即关闭连接，不读取响应体。状态码小于 500 视为健康（不支持
+        HEAD 返回 405、流式HTTP地址不带会话返回 4xx 也说明服务在线）。
+        """
+        if self.probe_path:
+            method, url = "GET", upstream.base_url + self.probe_path
+        else:
+            method, url = "HEAD", upstream.url
+        started = time.monotonic()
+        error: Optional[str] = None
+        try:
+            async with client.stream(method, url) as response:
+                if response.status_code >= 500:
+                    error = f"健康探测HTTP错误: {response.status_code}"
+        except httpx.TimeoutException:
+            error = "健康探测超时"
+        except Exception as e:
+            error = f"健康探测失败: {str(e)}"
+
+        upstream.last_probe_at = now_beijing().strftime("%Y-%m-%d %H:%M:%S")
+        upstream.last_probe_latency_ms = round(
+            (time.monotonic() - started) * 1000, 2)
+        upstream.healthy = error is None
+        if error is None:
+            self.record_success(upstream)
+        else:
+            self.record_failure(upstream, error)
+
+
+def create_upstream_group(service_uuid: str, urls: List[str],
+                          strategy: Optional[str] = None) -> UpstreamGroup:
+    """按 `upstream.*` 配置创建上游集合"""
+    return UpstreamGroup(
+        service_uuid, urls,
+        strategy=strategy or STRATEGY_ROUND_ROBIN,
+        failure_threshold=settings.UPSTREAM_FAILURE_THRESHOLD,
+        recovery_timeout=settings.UPSTREAM_RECOVERY_TIMEOUT,
+        probe_interval=settings.UPSTREAM_PROBE_INTERVAL,
+        probe_timeout=settings.UPSTREAM_PROBE_TIMEOUT,
+        probe_path=settings.UPSTREAM_PROBE_PATH,
+    )
@@ -0,0 +1,426 @@
+"""
+已发布服务工作进程池
+
+默认所有内置服务运行在主进程中，CPU 密集的模板受 GIL 限制只能使用一个
+核。开启 `worker.enabled` 后，`McpServiceManager._create_mcp` 不在主进程
+创建 FastMCP 实例，而是把服务交给工作进程：
+
+- 进程池启动固定数量的工作进程（`service_worker.py`），每个进程在本地
+  Unix socket 上运行一个 uvicorn；
+- 服务按 UUID 哈希固定分配到一个工作进程，同一服务的 SSE 连接和消息
+  POST、流式HTTP 会话都落在同一进程；
+- 主进程仍负责鉴权和路由分发，服务路由命中后经 `proxy_client_pool`
+  通过 Unix socket 流式转发到工作进程；
+- 监控线程检测工作进程退出后自动重启，并把分配给该进程的服务重新
+  下发；
+- 记录每个工作进程的 PID、重启次数、RSS 和 CPU 占用。
+
+服务定义（服务字段 + 模板代码）由主进程下发，工作进程不读取服务表。
+
+控制接口（下发、卸载服务）是同步 HTTP 调用，统一在一个单线程执行器上
+按顺序执行：卸载不等待结果，下发等待加载完成。`assign` 和
+`get_service_stats` 会阻塞调用线程，不要在事件循环线程上调用（API 端点
+通过 `asyncio.to_thread` 调用发布、启动和状态查询）。
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import psutil
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from app.core.config import settings
+from app.utils.logging import mcp_logger
+
+from .proxy_client import proxy_client_pool
+
+# 工作进程控制接口的前缀和主机名（经 Unix socket 访问，主机名只用于构造URL）
+WORKER_CONTROL_PREFIX = "/_worker"
+_WORKER_BASE_URL = "http://mcp-worker"
+# 主进程鉴权中间件解析出的密钥ID，经该请求头传给工作进程
+WORKER_SECRET_HEADER = "x-mcp-secret-id"
+# 监控线程检查间隔（秒）
+_MONITOR_INTERVAL = 0.5
+# 控制接口超时（秒）
+_CONTROL_TIMEOUT = 10.0
+
+
+class _Worker:
+    """单个工作进程"""
+
+    def __init__(self, index: int, socket_path: str):
+        self.index = index
+        self.socket_path = socket_path
+        self.process: Optional[subprocess.Popen] = None
+        # 进程已就绪且分配的服务已全部下发
+        self.ready = False
+        self.started_at = 0.0
+        self.restarts = 0
+        self.last_exit_code: Optional[int] = None
+        self._ps: Optional[psutil.Process] = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def resource_usage(self) -> Dict[str, Any]:
+        """工作进程的 RSS 和 CPU 占用"""
+        if not self.alive():
+            return {"rss": None, "cpu_percent": None, "cpu_time": None}
+        try:
+            if self._ps is None or self._ps.pid != self.pid:
+                self._ps = psutil.Process(self.pid)
+                # 第一次调用只建立基准
+                self._ps.cpu_percent(interval=None)
+            cpu_times = self._ps.cpu_times()
+            return {
+                "rss": self._ps.memory_info().rss,
+                "cpu_percent": self._ps.cpu_percent(interval=None),
+                "cpu_time": round(cpu_times.user + cpu_times.system, 2),
+            }
+        except psutil.Error:
+            return {"rss": None, "cpu_percent": None, "cpu_time": None}
+
+
+class ServiceWorkerPool:
+    """按服务分片的工作进程池"""
+
+    def __init__(self, size: int, socket_dir: Optional[str] = None,
+                 restart_delay: float = 1.0, startup_timeout: float = 60.0,
+                 output: Optional[int] = None):
+        """
+        初始化工作进程池
+
+        Args:
+            size: 工作进程数
+            socket_dir: Unix socket 目录，为空时使用临时目录
+            restart_delay: 工作进程退出后重启前的等待时间（秒）
+            startup_timeout: 工作进程启动超时（秒），超时后强制重启
+            output: 工作进程标准输出/错误的重定向目标（如
+                `subprocess.DEVNULL`），默认继承主进程
+        """
+        self.size = max(1, size)
+        self.socket_dir = socket_dir or os.path.join(
+            tempfile.gettempdir(), f"mcp-workers-{os.getpid()}")
+        self.restart_delay = restart_delay
+        self.startup_timeout = startup_timeout
+        self.output = output
+
+        self._workers = [
+            _Worker(index, os.path.join(self.socket_dir,
+                                        f"worker-{index}.sock"))
+            for index in range(self.size)
+        ]
+        # service_uuid -> 服务定义，工作进程（重新）就绪时按分片下发
+        self._specs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._monitor: Optional[threading.Thread] = None
+        # 控制调用按提交顺序执行，先卸载再下发同一服务时不会乱序
+        self._control_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="mcp-worker-control")
+        self._closed = False
+
+    def start(self) -> None:
+        """启动全部工作进程和监控线程"""
+        os.makedirs(self.socket_dir, exist_ok=True)
+        for worker in self._workers:
+            self._spawn(worker)
+        self._monitor = threading.Thread(
+            target=self._monitor_loop, name="mcp-worker-monitor",
+            daemon=True)
+        self._monitor.start()
+        mcp_logger.info(
+            f"服务工作进程池已启动，进程数: {self.size}，"
+            f"socket 目录: {self.socket_dir}")
+
+    def close(self) -> None:
+        """停止全部工作进程"""
+        self._closed = True
+        self._control_executor.shutdown(wait=False, cancel_futures=True)
+        for worker in self._workers:
+            worker.ready = False
+            if worker.alive():
+                worker.process.terminate()
+        for worker in self._workers:
+            if worker.process is None:
+                continue
+            try:
+                worker.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                worker.process.kill()
+        mcp_logger.info("服务工作进程池已停止")
+
+    def shard(self, service_uuid: str) -> int:
+        """服务固定分配的工作进程序号"""
+        return zlib.crc32(service_uuid.encode("utf-8")) % self.size
+
+    def assign(self, service_uuid: str, spec: Dict[str, Any]) -> int:
+        """
+        把服务分配到工作进程
+
+        工作进程已就绪时立即下发并等待加载完成；未就绪（启动或重启中）时
+        只登记，由监控线程在进程就绪后下发。
+
+        Raises:
+            RuntimeError: 工作进程加载服务失败
+
+        Returns:
+            int: 工作进程序号
+        """
+        index = self.shard(service_uuid)
+        worker = self._workers[index]
+        # 与监控线程置就绪在同一把锁下判断：未就绪时登记的服务由监控线程
+        # 在置就绪前补发
+        with self._lock:
+            self._specs[service_uuid] = spec
+            ready = worker.ready
+        if ready:
+            try:
+                self._control_executor.submit(
+                    self._load, worker, spec).result()
+            except httpx.TransportError as e:
+                # 进程正在退出，重启后由监控线程重新下发
+                worker.ready = False
+                mcp_logger.warning(
+                    f"工作进程 {index} 不可用，服务 {service_uuid} "
+                    f"将在进程重启后加载: {str(e)}")
+            except Exception:
+                with self._lock:
+                    self._specs.pop(service_uuid, None)
+                raise
+        return index
+
+    def release(self, service_uuid: str) -> None:
+        """从工作进程卸载服务（提交到控制线程执行，不等待结果）"""
+        worker = self._workers[self.shard(service_uuid)]
+        # 未就绪时由监控线程在置就绪前卸载已下发的服务
+        with self._lock:
+            spec = self._specs.pop(service_uuid, None)
+            ready = worker.ready
+        if spec is None or self._closed or not ready:
+            return
+        self._control_executor.submit(self._unload, worker, service_uuid)
+
+    def _unload(self, worker: _Worker, service_uuid: str) -> None:
+        try:
+            self._control(worker, "DELETE",
+                          f"/services/{service_uuid}")
+        except Exception as e:
+            mcp_logger.error(
+                f"工作进程 {worker.index} 卸载服务 {service_uuid} 失败: "
+                f"{str(e)}")
+
+    async def forward(self, request: Request, service_uuid: str) -> Response:
+        """把服务请求转发到所在的工作进程"""
+        worker = self._workers[self.shard(service_uuid)]
+        if not worker.ready or not worker.alive():
+            return JSONResponse({"error": "服务工作进程启动中"},
+                                status_code=503,
+                                headers={"Retry-After": "1"})
+        # 保留原始路径，工作进程按相同路径登记服务路由
+        path = request.scope.get("raw_path") or request.url.path.encode()
+        secret_id = request.scope.get("state", {}).get("mcp_secret_id")
+        return await proxy_client_pool.forward(
+            request, f"{_WORKER_BASE_URL}{path.decode('latin-1')}",
+            uds=worker.socket_path,
+            header_overrides={
+                WORKER_SECRET_HEADER: (
+                    str(secret_id) if secret_id is not None else None
+                ),
+            },
+            passthrough_errors=True)
+
+    def get_service_stats(self, service_uuid: str) -> Dict[str, Any]:
+        """获取服务所在工作进程及服务在进程内的运行状态"""
+        worker = self._workers[self.shard(service_uuid)]
+        data: Dict[str, Any] = {
+            "worker_index": worker.index,
+            "worker_pid": worker.pid,
+            "worker_ready": worker.ready,
+        }
+        if worker.ready:
+            try:
+                data.update(self._control(
+                    worker, "GET", f"/services/{service_uuid}",
+                    timeout=2.0))
+            except Exception as e:
+                data["error"] = str(e)
+        return data
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取全部工作进程状态"""
+        with self._lock:
+            service_counts: Dict[int, int] = {}
+            for service_uuid in self._specs:
+                index = self.shard(service_uuid)
+                service_counts[index] = service_counts.get(index, 0) + 1
+        workers: List[Dict[str, Any]] = []
+        for worker in self._workers:
+            workers.append({
+                "index": worker.index,
+                "pid": worker.pid,
+                "alive": worker.alive(),
+                "ready": worker.ready,
+                "restarts": worker.restarts,
+                "last_exit_code": worker.last_exit_code,
+                "services": service_counts.get(worker.index, 0),
+                **worker.resource_usage(),
+            })
+        return {
+            "size": self.size,
+            "ready": sum(1 for w in workers if w["ready"]),
+            "services": sum(service_counts.values()),
+            "restarts": sum(w["restarts"] for w in workers),
+            "workers": workers,
+        }
+
+    def _spawn(self, worker: _Worker) -> None:
+        """启动工作进程"""
+        if os.path.exists(worker.socket_path):
+            os.unlink(worker.socket_path)
+        proxy_client_pool.discard_uds(worker.socket_path)
+        worker.ready = False
+        worker.started_at = time.monotonic()
+        worker.process = subprocess.Popen(
+            [sys.executable, "-m",
+             "app.services.published_service.service_worker",
+             "--index", str(worker.index),
+             "--socket", worker.socket_path,
+             "--parent-pid", str(os.getpid())],
+            cwd=settings.MCP_BASE_DIR,
+            stdout=self.output,
+            stderr=self.output,
+        )
+        mcp_logger.info(
+            f"启动服务工作进程 {worker.index}，PID: {worker.process.pid}")
+
+    def _monitor_loop(self) -> None:
+        """检测工作进程状态：退出后重启，就绪后下发服务"""
+        while not self._closed:
+            for worker in self._workers:
+                if self._closed:
+                    break
+                try:
+                    self._check(worker)
+                except Exception as e:
+                    mcp_logger.error(
+                        f"检查工作进程 {worker.index} 失败: {str(e)}")
+            time.sleep(_MONITOR_INTERVAL)
+
+    def _check(self, worker: _Worker) -> None:
+        now = time.monotonic()
+        if not worker.alive():
+            worker.ready = False
+            if now - worker.started_at < self.restart_delay:
+                return
+            worker.last_exit_code = (
+                worker.process.returncode if worker.process else None)
+            mcp_logger.error(
+                f"服务工作进程 {worker.index} 已退出，"
+                f"退出码: {worker.last_exit_code}，正在重启")
+            worker.restarts += 1
+            self._spawn(worker)
+            return
+        if worker.ready:
+            return
+        if not os.path.exists(worker.socket_path):
+            if now - worker.started_at > self.startup_timeout:
+                mcp_logger.error(
+                    f"服务工作进程 {worker.index} 启动超时，强制重启")
+                worker.process.kill()
+            return
+        try:
+            self._control(worker, "GET", "/health", timeout=2.0)
+        except Exception:
+            return
+        # 进程就绪，下发分配给它的服务。下发期间 assign/release 只改登记，
+        # 每轮结束后在锁内与登记比对，补发新增/变更、卸载已移除的服务，
+        # 没有差异时在同一把锁内置就绪
+        loaded: Dict[str, Dict[str, Any]] = {}
+        while not self._closed:
+            with self._lock:
+                specs = {
+                    service_uuid: spec
+                    for service_uuid, spec in self._specs.items()
+                    if self.shard(service_uuid) == worker.index
+                }
+                pending = [
+                    spec for service_uuid, spec in specs.items()
+                    if loaded.get(service_uuid) is not spec
+                ]
+                removed = [
+                    service_uuid for service_uuid in loaded
+                    if service_uuid not in specs
+                ]
+                if not pending and not removed:
+                    worker.ready = True
+                    break
+            try:
+                for service_uuid in removed:
+                    self._reload_call(worker, service_uuid, self._control,
+                                      worker, "DELETE",
+                                      f"/services/{service_uuid}")
+                    del loaded[service_uuid]
+                for spec in pending:
+                    service_uuid = spec["service"]["service_uuid"]
+                    self._reload_call(worker, service_uuid, self._load,
+                                      worker, spec)
+                    loaded[service_uuid] = spec
+            except httpx.TransportError:
+                return
+        if not worker.ready:
+            return
+        mcp_logger.info(
+            f"服务工作进程 {worker.index} 已就绪，PID: {worker.pid}，"
+            f"服务数: {len(loaded)}")
+
+    @staticmethod
+    def _reload_call(worker: _Worker, service_uuid: str,
+                     func: Callable[..., Any], *args: Any) -> None:
+        """监控线程下发/卸载服务，业务失败只记录日志（进程不可用时继续抛出）"""
+        try:
+            func(*args)
+        except httpx.TransportError:
+            raise
+        except Exception as e:
+            mcp_logger.error(
+                f"工作进程 {worker.index} 下发/卸载服务 {service_uuid} "
+                f"失败: {str(e)}")
+
+    def _load(self, worker: _Worker, spec: Dict[str, Any]) -> None:
+        self._control(worker, "POST", "/services", json=spec)
+
+    def _control(self, worker: _Worker, method: str, path: str,
+                 timeout: float = _CONTROL_TIMEOUT,
+                 **kwargs: Any) -> Dict[str, Any]:
+        """调用工作进程控制接口，业务失败时抛出 RuntimeError"""
+        transport = httpx.HTTPTransport(uds=worker.socket_path)
+        with httpx.Client(transport=transport, timeout=timeout) as client:
+            response = client.request(
+                method, f"{_WORKER_BASE_URL}{WORKER_CONTROL_PREFIX}{path}",
+                **kwargs)
+        data = response.json() if response.content else {}
+        if response.status_code >= 400:
+            raise RuntimeError(data.get("error") or response.text)
+        return data
+
+
+def create_worker_pool() -> ServiceWorkerPool:
+    """按 `worker.*` 配置创建工作进程池"""
+    return ServiceWorkerPool(
+        size=settings.WORKER_PROCESSES or os.cpu_count() or 1,
+        socket_dir=settings.WORKER_SOCKET_DIR or None,
+        restart_delay=settings.WORKER_RESTART_DELAY,
+        startup_timeout=settings.WORKER_STARTUP_TIMEOUT,
+    )
@@ -1,14 +1,16 @@
 """
 缓存清理定时任务模块
 """
-from app.utils.cache import memory_cache
+from app.services.auth.secret_manager import SecretManager
+from app.utils.shared_state import shared_state
 from app.utils.logging import mcp_logger
 
 
 def clean_expired_cache() -> None:
     """清理过期的缓存数据"""
     try:
-        count = memory_cache.clean_expired()
+        count = shared_state.clean_expired()
+        count += SecretManager.clean_secret_cache()
         if count > 0:
             mcp_logger.info(f"定时清理了 {count} 个过期缓存项")
     except Exception as e:
@@ -110,6 +110,10 @@ def clean_old_statistics():
                 mcp_logger.info(f"已清理 {deleted_count} 条过期统计数据")
             else:
                 mcp_logger.info("没有需要清理的过期统计数据")
+
+        # 时间桶汇总按各自的保留天数清理
+        deleted_rollups = statistics_service.clean_rollups()
+        mcp_logger.info(f"已清理过期时间桶汇总: {deleted_rollups}")
                 
     except Exception as e:
         mcp_logger.error(f"清理过期统计数据时出错: {str(e)}")
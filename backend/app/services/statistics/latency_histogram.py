@@ -0,0 +1,108 @@
+"""
+执行耗时直方图
+
+`ToolStatistics.avg_execution_time` 只有平均值，回答不了 p95 / p99。这里用
+HDR 风格的对数-线性分桶记录耗时（毫秒）：
+
+- 小于 64ms 的值每毫秒一个桶（精确）；
+- 之后每个 2 的幂区间均分为 32 个桶，相对误差不超过 1/32（约 3%）；
+- 只保存非零桶，按 `[[桶序号, 次数], ...]` 编码成 JSON，一小时级别耗时
+  最多约 600 个桶，通常只有几十个。
+
+同一分桶规则下的直方图逐桶相加即可合并，所以分钟直方图可以合并成小时 /
+天直方图，多个时间桶、服务、节点的直方图也可以在查询时合并后再取分位数。
+"""
+import json
+from typing import Dict, Iterable, List, Optional
+
+# 每个 2 的幂区间的子桶数（2^5 = 32）
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# 小于该值的耗时每毫秒一个桶
+_LINEAR_LIMIT = SUB_BUCKETS * 2
+
+
+def bucket_index(value: int) -> int:
+    """耗时（毫秒）所在的桶序号"""
+    if value < _LINEAR_LIMIT:
+        return max(value, 0)
+    shift = value.bit_length() - (SUB_BUCKET_BITS + 1)
+    return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+
+def bucket_upper(index: int) -> int:
+    """桶内的最大耗时（毫秒），分位数按桶上界报告"""
+    if index < _LINEAR_LIMIT:
+        return index
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    mantissa = index - (shift << SUB_BUCKET_BITS)
+    return ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """可合并的耗时直方图"""
+
+    __slots__ = ("counts", "count", "total", "max_value")
+
+    def __init__(self, counts: Optional[Dict[int, int]] = None,
+                 count: int = 0, total: int = 0, max_value: int = 0):
+        # 桶序号 -> 次数
+        self.counts = counts if counts is not None else {}
+        self.count = count
+        self.total = total
+        self.max_value = max_value
+
+    def record(self, value: int, times: int = 1) -> None:
+        """记录一次（或 times 次）耗时"""
+        index = bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + times
+        self.count += times
+        self.total += value * times
+        if value > self.max_value:
+            self.max_value = value
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """把另一个直方图逐桶加到当前直方图上，返回自身"""
+        counts = self.counts
+        for index, times in other.counts.items():
+            counts[index] = counts.get(index, 0) + times
+        self.count += other.count
+        self.total += other.total
+        if other.max_value > self.max_value:
+            self.max_value = other.max_value
+        return self
+
+    def percentile(self, percent: float) -> int:
+        """分位数（毫秒），没有记录时为 0"""
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(bucket_upper(index), self.max_value)
+        return self.max_value
+
+    def percentiles(self, percents: Iterable[float]) -> Dict[str, int]:
+        """多个分位数，键为 p50 / p99 / p99.9 形式"""
+        return {
+            f"p{percent:g}": self.percentile(percent) for percent in percents
+        }
+
+    def mean(self) -> int:
+        return self.total // self.count if self.count else 0
+
+    def encode(self) -> str:
+        """编码非零桶"""
+        return json.dumps(
+            [[index, self.counts[index]] for index in sorted(self.counts)],
+            separators=(",", ":"))
+
+    @classmethod
+    def decode(cls, text: Optional[str], count: int = 0, total: int = 0,
+               max_value: int = 0) -> "LatencyHistogram":
+        """从 encode 的结果和汇总列还原"""
+        pairs: List[List[int]] = json.loads(text) if text else []
+        return cls({index: times for index, times in pairs},
+                   count or 0, total or 0, max_value or 0)
@@ -5,25 +5,299 @@
 """
 
 import json
-from datetime import datetime, date
+import threading
+import time
+from datetime import datetime, date, timedelta
 from typing import List, Dict, Any, Optional
 from pytz import timezone
 from sqlalchemy import func, desc
 
+from app.core.config import settings
 from app.models.engine import get_db
+from app.models.auth.published_service_access_log import McpAccessLog
 from app.models.statistics import (
     ServiceStatistics,
     ModuleStatistics,
     ToolStatistics,
-    ServiceCallStatistics
+    ServiceCallStatistics,
+    StatisticsRollupMinute,
+    StatisticsRollupHour,
+    StatisticsRollupDay,
+    LatencyHistogramMinute,
+    LatencyHistogramHour,
+    LatencyHistogramDay
 )
 from app.models.modules.published_service import McpService
 from app.models.modules.mcp_template import McpModule
 from app.models.tools.tool_execution import ToolExecution
-from app.models.group.group import McpGroup
 from app.utils.logging import mcp_logger
 from app.utils.http import PageParams, PageResult, build_page_response
 from app.models.modules.users import User
+from app.repositories.statistics_repository import (
+    ROLLUP_COUNTERS,
+    ROLLUP_KEY,
+    StatisticsRepository,
+)
+from app.services.statistics.latency_histogram import LatencyHistogram
+
+# 增量聚合的数据源（statistics_watermarks.source）
+_EXECUTIONS_SOURCE = "tool_executions"
+_ACCESS_LOGS_SOURCE = "published_service_access_logs"
+
+# 各统计表中按增量累加的计数列
+_TOOL_COUNTERS = [
+    "call_count", "success_count", "error_count",
+    "execution_time_sum", "execution_time_count", "last_called_at",
+]
+_SERVICE_COUNTERS = [
+    "call_count", "success_count", "error_count",
+    "access_count", "access_error_count",
+]
+_MODULE_COUNTERS = ["call_count", "success_count", "error_count"]
+
+# 时间桶汇总：粒度 -> 汇总表
+_ROLLUPS = {
+    "minute": StatisticsRollupMinute,
+    "hour": StatisticsRollupHour,
+    "day": StatisticsRollupDay,
+}
+# 耗时直方图：粒度 -> 直方图表（保留天数与同粒度的时间桶汇总相同）
+_HISTOGRAMS = {
+    "minute": LatencyHistogramMinute,
+    "hour": LatencyHistogramHour,
+    "day": LatencyHistogramDay,
+}
+# 未指定时返回的分位数
+_DEFAULT_PERCENTILES = (50, 90, 95, 99)
+# 分位数查询的分组参数 -> 直方图维度列
+_LATENCY_GROUP_BY = {"service": "service_id", "tool": "tool_name"}
+
+# 增量聚合的数据源 -> (记录表, 写入时间列)
+_FOLD_SOURCES = {
+    _EXECUTIONS_SOURCE: (ToolExecution, ToolExecution.created_at),
+    _ACCESS_LOGS_SOURCE: (McpAccessLog, McpAccessLog.access_time),
+}
+# 每段汇总的记录 ID 区间长度，积压较多时分段提交
+_FOLD_CHUNK = 100000
+# 全量重建超过该秒数没有提交进展时视为中断，由下一次刷新重新开始
+_REBUILD_STALE_SECONDS = 600
+
+# 时间桶汇总的数据源（statistics_rollup_*.source）
+_EXECUTION_ROLLUP = "execution"
+_ACCESS_ROLLUP = "access"
+
+# 时间桶长度
+_BUCKET_STEPS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+# 未指定起始时间时的默认范围
+_DEFAULT_SERIES_RANGES = {
+    "minute": timedelta(hours=1),
+    "hour": timedelta(days=1),
+    "day": timedelta(days=30),
+}
+# 单次查询的时间桶数量上限
+_MAX_SERIES_BUCKETS = 10000
+# 序列分组参数 -> 汇总表维度列
+_SERIES_GROUP_BY = {
+    "service": "service_id",
+    "tool": "tool_name",
+    "secret": "secret_id",
+    "status": "status",
+}
+
+
+def _rollup_retention_days(granularity: str) -> int:
+    """时间桶汇总的保留天数"""
+    return {
+        "minute": settings.STATISTICS_ROLLUP_MINUTE_RETENTION_DAYS,
+        "hour": settings.STATISTICS_ROLLUP_HOUR_RETENTION_DAYS,
+        "day": settings.STATISTICS_ROLLUP_DAY_RETENTION_DAYS,
+    }[granularity]
+
+
+def _today_start() -> datetime:
+    """今天零点（北京时间，不带时区，与记录的存储时间一致）"""
+    now = datetime.now(timezone('Asia/Shanghai')).replace(tzinfo=None)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _truncate(value: datetime, granularity: str) -> datetime:
+    """截断到所在时间桶的起点"""
+    value = value.replace(second=0, microsecond=0)
+    if granularity in ("hour", "day"):
+        value = value.replace(minute=0)
+    if granularity == "day":
+        value = value.replace(hour=0)
+    return value
+
+
+def _plan_histogram_segments(
+        start: datetime, end: datetime) -> List[tuple]:
+    """
+    把 [start, end) 拆成若干 (粒度, 起点, 终点) 段
+
+    从起点往后，每一步使用保留期覆盖当前位置、与当前位置对齐且能放下一个
+    完整时间桶的最粗粒度，细粒度段只延伸到上一级粒度的下一个边界；都放不下
+    时用可用的最细粒度向外扩一个时间桶（只会发生在两端）。
+    """
+    order = ("day", "hour", "minute")
+    today = _today_start()
+    cutoffs = {
+        granularity: today - timedelta(
+            days=_rollup_retention_days(granularity))
+        for granularity in order
+    }
+    segments = []
+    cursor = start
+    while cursor < end:
+        retained = [g for g in order if cursor >= cutoffs[g]] or ["day"]
+        for granularity in retained:
+            step = _BUCKET_STEPS[granularity]
+            if (_truncate(cursor, granularity) == cursor
+                    and cursor + step <= end):
+                segment_start = cursor
+                segment_end = _truncate(end, granularity)
+                level = order.index(granularity)
+                if level:
+                    segment_end = min(segment_end,
+                                      _ceil(cursor + step, order[level - 1]))
+                break
+        else:
+            granularity = retained[-1]
+            segment_start = _truncate(cursor, granularity)
+            segment_end = segment_start + _BUCKET_STEPS[granularity]
+        if (segments and segments[-1][0] == granularity
+                and segments[-1][2] == segment_start):
+            segments[-1] = (granularity, segments[-1][1], segment_end)
+        else:
+            segments.append((granularity, segment_start, segment_end))
+        cursor = segment_end
+    return segments
+
+
+def _roll_up_histograms(
+        source: Dict[tuple, LatencyHistogram], kept: Dict[tuple, Any],
+        kept_since: datetime, target: Dict[tuple, LatencyHistogram],
+        granularity: str, target_since: datetime) -> None:
+    """
+    把细粒度直方图合并到 granularity 粒度
+
+    source 中时间桶不早于 kept_since 的直方图累加到 kept（细粒度自身要写入
+    的部分），截断后不早于 target_since 的累加到 target。时间桶截断按不同
+    时间桶缓存。
+    """
+    coarse = {}
+    for key, histogram in source.items():
+        bucket, service_id, tool_name = key
+        if bucket >= kept_since:
+            current = kept.get(key)
+            if current is None:
+                kept[key] = LatencyHistogram().merge(histogram)
+            else:
+                current.merge(histogram)
+        parent = coarse.get(bucket)
+        if parent is None:
+            parent = coarse[bucket] = _truncate(bucket, granularity)
+        if parent < target_since:
+            continue
+        parent_key = (parent, service_id, tool_name)
+        current = target.get(parent_key)
+        if current is None:
+            # 源直方图之后不再使用，直接复用
+            target[parent_key] = histogram
+        else:
+            current.merge(histogram)
+
+
+def _roll_up_rollups(
+        rows: List[Dict[str, Any]], kept_since: datetime, granularity: str,
+        target_since: datetime) -> tuple:
+    """
+    把细粒度汇总行合并到 granularity 粒度
+
+    Returns:
+        tuple: (时间桶不早于 kept_since 的原汇总行, 截断后不早于
+        target_since 的合并汇总行)
+    """
+    kept = []
+    merged = {}
+    coarse = {}
+    for row in rows:
+        bucket = row["bucket"]
+        if bucket >= kept_since:
+            kept.append(row)
+        parent = coarse.get(bucket)
+        if parent is None:
+            parent = coarse[bucket] = _truncate(bucket, granularity)
+        if parent < target_since:
+            continue
+        key = (parent,) + tuple(row[name] for name in ROLLUP_KEY[1:])
+        current = merged.get(key)
+        if current is None:
+            merged[key] = dict(row, bucket=parent)
+        else:
+            for name in ROLLUP_COUNTERS:
+                current[name] += row[name]
+    return kept, list(merged.values())
+
+
+def _ceil(value: datetime, granularity: str) -> datetime:
+    """向上取整到时间桶边界"""
+    bucket = _truncate(value, granularity)
+    return bucket if bucket == value else bucket + _BUCKET_STEPS[granularity]
+
+
+def _zero_counters(columns: List[str]) -> Dict[str, Any]:
+    """全量重建前的计数初值"""
+    values = {name: 0 for name in columns}
+    if "last_called_at" in values:
+        values["last_called_at"] = None
+    if "execution_time_count" in values:
+        values["avg_execution_time"] = 0
+    return values
+
+
+def _accumulate(deltas: Dict[Any, Dict[str, Any]], key: Any,
+                values: Dict[str, Any]) -> None:
+    """把一组聚合结果加到 key 的增量上"""
+    delta = deltas.setdefault(key, {})
+    for name, value in values.items():
+        delta[name] = _add_counter(name, delta.get(name), value)
+
+
+def _add_counter(name: str, current: Any, value: Any) -> Any:
+    """计数相加，最后调用时间取较晚的一个"""
+    if name == "last_called_at":
+        if current is None or (value is not None and value > current):
+            return value
+        return current
+    return (current or 0) + (value or 0)
+
+
+def _fold_counters(db, model, key: str, deltas: Dict[Any, Dict[str, Any]],
+                   columns: List[str],
+                   replace: bool = False) -> List[Dict[str, Any]]:
+    """把增量累加到统计行的当前计数上，返回待 upsert 的行
+
+    只读取本次有增量的统计行，每行写入全部计数列；replace=True 时不读取，
+    增量即新值（全量重建）。
+    """
+    current = {}
+    if not replace:
+        current = StatisticsRepository.get_counters(
+            db, model, key, deltas, columns)
+    rows = []
+    for value, delta in deltas.items():
+        existing = current.get(value, {})
+        row = {key: value}
+        for name in columns:
+            row[name] = _add_counter(
+                name, existing.get(name), delta.get(name))
+        rows.append(row)
+    return rows
 
 
 class StatisticsService:
@@ -31,58 +305,32 @@ class StatisticsService:
 
     def __init__(self):
         """初始化统计服务"""
-        pass
+        # 上次汇总新增记录的时间（time.monotonic），查询时间桶汇总时判断新鲜度
+        self._last_folded_at: Optional[float] = None
+        # 服务统计（概览）缓存及其更新时间（time.monotonic）
+        self._overview: Optional[Dict[str, Any]] = None
+        self._overview_at: Optional[float] = None
+        # 缓存过期时只让一个请求重新计数
+        self._overview_lock = threading.Lock()
 
     def update_service_statistics(self) -> ServiceStatistics:
         """
         更新服务统计数据
 
+        各项计数由 `StatisticsRepository.count_overview` 两条查询得到，今日
+        范围为北京时间 [今天零点, 明天零点)。更新后同时刷新内存中的概览缓存。
+
         Returns:
             ServiceStatistics: 更新后的服务统计数据
         """
         with get_db() as db:
             try:
-                today = date.today()
+                day_start = _today_start()
+                today = day_start.date()
                 tz = timezone('Asia/Shanghai')
 
-                # 查询MCP模板分组统计
-                total_template_groups = db.query(McpGroup).count()
-                today_new_template_groups = db.query(McpGroup).filter(
-                    func.date(McpGroup.created_at) == today
-                ).count()
-
-                # 查询MCP模板统计
-                total_templates = db.query(McpModule).count()
-                today_new_templates = db.query(McpModule).filter(
-                    func.date(McpModule.created_at) == today
-                ).count()
-
-                # 查询MCP工具调用统计
-                total_tools_calls = db.query(ToolExecution).count()
-                today_new_tools_calls = db.query(ToolExecution).filter(
-                    func.date(ToolExecution.created_at) == today
-                ).count()
-
-                # 查询MCP服务调用统计
-                total_service_calls = db.query(ToolExecution).filter(
-                    ToolExecution.service_id.isnot(None)
-                ).count()
-                today_new_service_calls = db.query(ToolExecution).filter(
-                    ToolExecution.service_id.isnot(None),
-                    func.date(ToolExecution.created_at) == today
-                ).count()
-
-                # 查询MCP发布服务统计
-                total_services = db.query(McpService).count()
-                running_services = db.query(McpService).filter(
-                    McpService.status == "running"
-                ).count()
-                stopped_services = db.query(McpService).filter(
-                    McpService.status == "stopped"
-                ).count()
-                error_services = db.query(McpService).filter(
-                    McpService.status == "error"
-                ).count()
+                counts = StatisticsRepository.count_overview(
+                    db, day_start, day_start + timedelta(days=1))
 
                 # 获取或创建今日统计记录
                 stats = db.query(ServiceStatistics).filter(
@@ -94,265 +342,899 @@ class StatisticsService:
                     db.add(stats)
 
                 # 更新统计数据
-                stats.total_template_groups = total_template_groups
-                stats.today_new_template_groups = today_new_template_groups
-                stats.total_templates = total_templates
-                stats.today_new_templates = today_new_templates
-                stats.total_service_calls = total_service_calls
-                stats.today_new_service_calls = today_new_service_calls
-                stats.total_tools_calls = total_tools_calls
-                stats.today_new_tools_calls = today_new_tools_calls
-                stats.total_services = total_services
-                stats.running_services = running_services
-                stats.stopped_services = stopped_services
-                stats.error_services = error_services
+                for name, value in counts.items():
+                    setattr(stats, name, value)
                 stats.updated_at = datetime.now(tz)
 
                 db.commit()
                 db.refresh(stats)
 
+                self._overview = stats.to_dict()
+                self._overview_at = time.monotonic()
                 return stats
             except Exception as e:
                 db.rollback()
                 mcp_logger.error(f"更新服务统计数据时出错: {str(e)}")
                 raise
 
-    def update_module_statistics(self) -> List[ModuleStatistics]:
+    def update_module_statistics(self) -> int:
         """
         更新模块统计数据
 
         Returns:
-            List[ModuleStatistics]: 更新后的模块统计数据列表
+            int: 更新的模块统计数
         """
         with get_db() as db:
             try:
                 # 获取每个模块的服务数量
-                module_stats = {}
-                services = db.query(
-                    McpService.module_id,
-                    func.count(McpService.id).label('service_count')
-                ).group_by(McpService.module_id).all()
-
-                for module_id, service_count in services:
-                    module_stats[module_id] = service_count
+                module_stats = StatisticsRepository.count_services_by_module(db)
 
-                # 获取所有模块
-                modules = db.query(McpModule).all()
-                result = []
+                # 获取所有模块（只查询需要的字段）
+                modules = db.query(
+                    McpModule.id, McpModule.name, McpModule.user_id
+                ).all()
 
                 user_ids = {module.user_id for module in modules}
-                users = db.query(User).filter(User.id.in_(user_ids)).all()
+                users = db.query(User.id, User.username).filter(
+                    User.id.in_(user_ids)
+                ).all()
                 user_dict = {user.id: user.username for user in users}
 
-                for module in modules:
-                    # 查找或创建统计记录
-                    stats = db.query(ModuleStatistics).filter(
-                        ModuleStatistics.module_id == module.id
-                    ).first()
-
-                    if not stats:
-                        stats = ModuleStatistics(
-                            module_id=module.id,
-                            module_name=module.name,
-                            user_id=module.user_id,
-                            user_name=user_dict.get(module.user_id)
-                        )
-                        db.add(stats)
+                now = datetime.now(timezone('Asia/Shanghai'))
+                rows = [
+                    {
+                        "module_id": module.id,
+                        # 保持名称和创建者信息同步
+                        "module_name": module.name,
+                        "service_count": module_stats.get(module.id, 0),
+                        "user_id": module.user_id,
+                        "user_name": user_dict.get(module.user_id),
+                        "updated_at": now,
+                    }
+                    for module in modules
+                ]
+                StatisticsRepository.upsert_module_statistics(db, rows)
+                db.commit()
 
-                    # 更新模块名称（可能已更改）
-                    stats.module_name = module.name  # 保持名称同步
+                return len(rows)
+            except Exception as e:
+                db.rollback()
+                mcp_logger.error(f"更新模块统计数据时出错: {str(e)}")
+                raise
 
-                    # 更新服务数量
-                    stats.service_count = module_stats.get(module.id, 0)
+    def update_call_statistics(
+            self, rebuild: bool = False,
+            incremental_only: bool = False) -> Dict[str, Any]:
+        """
+        增量更新工具、服务调用、模块调用统计、时间桶汇总和耗时直方图
 
-                    # 更新创建者信息
-                    stats.user_id = module.user_id
-                    stats.user_name = user_dict.get(module.user_id)
+        只汇总记录 ID 大于水位的新工具执行记录和访问日志，每段最多
+        `_FOLD_CHUNK` 个 ID：先在写事务外完成 GROUP BY 聚合并算出统计行、
+        时间桶汇总和直方图的新值，再在一个短事务里按 CAS 推进水位并写入，
+        水位已被其他任务推进时回滚放弃。本次汇总的上界只取写入时间早于
+        `watermark_lag_seconds` 的记录，晚提交的小 ID 记录留到下次汇总。
 
-                    # 更新时间
-                    stats.updated_at = datetime.now(timezone('Asia/Shanghai'))
+        水位不存在（首次运行、模块删除后）、超过当前最大 ID（数据被清空过）
+        或 rebuild=True 时全量重建（见 `_rebuild_call_statistics`），重建
+        期间读取方看到的仍是旧的计数，之后继续增量汇总重建期间的新记录。
+        其他任务正在重建时跳过。
 
-                    result.append(stats)
+        Args:
+            rebuild: 是否丢弃已有计数全量重建
+            incremental_only: 需要全量重建时不执行（查询路径上使用）
 
-                db.commit()
-                for stats in result:
-                    db.refresh(stats)
+        Returns:
+            Dict: rebuild（是否全量重建）、executions / access_logs（本次汇总
+            的记录数）、tool_stats / service_call_stats / module_call_stats
+            （写入的统计行数）、rollup_rows（写入的时间桶汇总行数）、
+            histogram_rows（写入的直方图行数）、chunks（提交的分段数），
+            行数按分段累加
+        """
+        with get_db() as db:
+            try:
+                watermarks = StatisticsRepository.get_watermarks(db)
+                rebuilding = any(
+                    last_id is not None and last_id < 0
+                    for last_id in watermarks.values())
+                if rebuilding and not self._rebuild_stalled(db):
+                    mcp_logger.info("统计数据正在由其他任务全量重建，跳过本次更新")
+                    return {"rebuild": False, "skipped": True}
+                # 水位缺失、超过当前最大 ID（数据被清空过）或重建中断时全量重建
+                rebuild = rebuild or rebuilding or any(
+                    watermarks.get(source) is None
+                    or watermarks[source] > StatisticsRepository.get_max_id(
+                        db, model)
+                    for source, (model, _) in _FOLD_SOURCES.items()
+                )
+                if rebuild and incremental_only:
+                    return {"rebuild": False, "skipped": True}
+                result = {
+                    "rebuild": rebuild,
+                    "executions": 0,
+                    "access_logs": 0,
+                    "tool_stats": 0,
+                    "service_call_stats": 0,
+                    "module_call_stats": 0,
+                    "rollup_rows": 0,
+                    "histogram_rows": 0,
+                    "chunks": 0,
+                }
 
+                lag = settings.STATISTICS_WATERMARK_LAG
+                settled_before = None
+                if lag > 0:
+                    settled_before = (
+                        datetime.now(timezone('Asia/Shanghai'))
+                        .replace(tzinfo=None) - timedelta(seconds=lag))
+                if rebuild:
+                    watermarks = self._rebuild_call_statistics(
+                        db, watermarks, settled_before, result)
+                    if watermarks is None:
+                        mcp_logger.info("统计数据正在由其他任务刷新，跳过本次更新")
+                        return result
+                while True:
+                    upper = {
+                        source: StatisticsRepository.get_fold_upper(
+                            db, model, time_column, watermarks[source],
+                            _FOLD_CHUNK, settled_before)
+                        for source, (model, time_column)
+                        in _FOLD_SOURCES.items()
+                    }
+                    # 查询到此为止只有读，结束读事务，写事务从 CAS 开始
+                    db.commit()
+                    if upper == watermarks:
+                        break
+                    if not self._fold_chunk(db, watermarks, upper, result):
+                        mcp_logger.info("统计数据正在由其他任务刷新，跳过本次更新")
+                        return result
+                    watermarks = upper
+                self._last_folded_at = time.monotonic()
                 return result
             except Exception as e:
                 db.rollback()
-                mcp_logger.error(f"更新模块统计数据时出错: {str(e)}")
+                mcp_logger.error(f"更新调用统计数据时出错: {str(e)}")
                 raise
 
-    def update_tool_statistics(self) -> List[ToolStatistics]:
+    @staticmethod
+    def _rebuild_stalled(db) -> bool:
+        """正在进行的全量重建是否已超过 `_REBUILD_STALE_SECONDS` 没有进展"""
+        updated_at = StatisticsRepository.get_watermark_updated_at(db)
+        return (updated_at is None or datetime.utcnow() - updated_at
+                > timedelta(seconds=_REBUILD_STALE_SECONDS))
+
+    def _rebuild_call_statistics(
+            self, db, watermarks: Dict[str, Optional[int]],
+            settled_before: Optional[datetime],
+            result: Dict[str, Any]) -> Optional[Dict[str, int]]:
         """
-        更新工具调用统计数据
+        全量重建计数、时间桶汇总和直方图，旧数据保留到被新数据替换
+
+        - 先按 CAS 把水位改为本次重建的标记（负数）并提交，增量汇总看到
+          标记后跳过；上界固定为开始时已落定的最大 ID；
+        - 时间桶汇总和直方图按天重算：每天先在写事务外聚合，再在一个短
+          事务里确认标记未变、删除当天的旧行并写入新行；
+        - 计数在内存中从头聚合，最后一个事务把水位从标记推进到上界、替换
+          全部计数并删除重建范围之外的旧汇总行。
+
+        读取方在重建期间看到的是旧值或已重算的值，不会看到清零的统计。
 
         Returns:
-            List[ToolStatistics]: 更新后的工具统计数据列表
+            Dict: 各数据源的上界（重建后的水位）；标记被其他任务改动时回滚
+            并返回 None
         """
-        with get_db() as db:
-            try:
-                # 获取所有工具名称
-                tool_names = db.query(ToolExecution.tool_name).distinct().all()
-                result = []
+        marker = -(time.time_ns() // 1000)
+        upper = {
+            source: StatisticsRepository.get_fold_upper(
+                db, model, time_column, 0,
+                StatisticsRepository.get_max_id(db, model) + 1,
+                settled_before)
+            for source, (model, time_column) in _FOLD_SOURCES.items()
+        }
+        db.commit()
+        if not self._advance_watermarks(db, watermarks, marker):
+            return None
+        db.commit()
+
+        # 按天替换时间桶汇总和直方图
+        service_uuids = StatisticsRepository.get_service_uuids(db)
+        today = _today_start()
+        start = today - timedelta(days=max(
+            _rollup_retention_days(granularity) for granularity in _ROLLUPS))
+        earliest, latest = [], []
+        columns = [time_column for _, time_column in _FOLD_SOURCES.values()]
+        columns += [model.bucket for model in _ROLLUPS.values()]
+        columns += [model.bucket for model in _HISTOGRAMS.values()]
+        for column in columns:
+            first, last = StatisticsRepository.get_time_range(db, column)
+            if first is not None:
+                earliest.append(first)
+                latest.append(last)
+        if earliest:
+            start = max(start, _truncate(min(earliest), "day"))
+        end = start
+        if latest:
+            end = max(start, _truncate(max(latest), "day") + timedelta(days=1))
+        day = start
+        while day < end:
+            next_day = day + timedelta(days=1)
+            if not self._replace_rollups(db, upper, day, next_day,
+                                         service_uuids, marker, result):
+                return None
+            day = next_day
+
+        # 从头聚合计数，与水位一起替换
+        lower = {source: 0 for source in _FOLD_SOURCES}
+        (tool_rows, service_rows, module_rows, execution_count,
+         access_count) = self._aggregate_counters(
+            db, lower, upper, service_uuids, replace=True)
+        db.commit()
+        if not self._advance_watermarks(db, {
+                source: marker for source in _FOLD_SOURCES}, upper):
+            return None
+        StatisticsRepository.reset_counters(
+            db, ToolStatistics, _zero_counters(_TOOL_COUNTERS))
+        StatisticsRepository.reset_counters(
+            db, ServiceCallStatistics, _zero_counters(_SERVICE_COUNTERS))
+        StatisticsRepository.reset_counters(
+            db, ModuleStatistics, _zero_counters(_MODULE_COUNTERS))
+        StatisticsRepository.upsert_tool_statistics(db, tool_rows)
+        StatisticsRepository.upsert_service_call_statistics(db, service_rows)
+        StatisticsRepository.upsert_module_statistics(db, module_rows)
+        for model in list(_ROLLUPS.values()) + list(_HISTOGRAMS.values()):
+            StatisticsRepository.delete_rollups(db, model, before=start)
+            StatisticsRepository.delete_rollups(db, model, since=end)
+        db.commit()
+        result["executions"] += execution_count
+        result["access_logs"] += access_count
+        result["tool_stats"] += len(tool_rows)
+        result["service_call_stats"] += len(service_rows)
+        result["module_call_stats"] += len(module_rows)
+        result["chunks"] += 1
+        return upper
+
+    def _replace_rollups(
+            self, db, upper: Dict[str, int], since: datetime,
+            until: datetime, service_uuids: Dict[int, str], marker: int,
+            result: Dict[str, Any]) -> bool:
+        """
+        全量重建时重算 [since, until) 内的时间桶汇总和直方图并替换旧行
 
-                for (tool_name,) in tool_names:
-                    # 基础查询
-                    base_query = db.query(ToolExecution).filter(
-                        ToolExecution.tool_name == tool_name
-                    )
+        ID 区间取该时间段内 ID 不超过上界的记录的最小 / 最大 ID，聚合时再按
+        时间过滤。没有记录也没有旧行时不提交。
 
-                    # 统计数据
-                    call_count = base_query.count()
-                    success_count = base_query.filter(
-                        ToolExecution.status == 'success'
-                    ).count()
-                    error_count = base_query.filter(
-                        ToolExecution.status == 'error'
-                    ).count()
-
-                    # 计算平均执行时间
-                    avg_time_result = db.query(
-                        func.avg(ToolExecution.execution_time)
-                    ).filter(
-                        ToolExecution.tool_name == tool_name
-                    ).scalar()
-                    avg_time = int(avg_time_result) if avg_time_result else 0
-
-                    # 获取最后调用时间
-                    last_called = db.query(
-                        ToolExecution.created_at
-                    ).filter(
-                        ToolExecution.tool_name == tool_name
-                    ).order_by(
-                        desc(ToolExecution.created_at)
-                    ).first()
-                    last_called = last_called[0] if last_called else None
-
-                    # 查找或创建统计记录
-                    stats = db.query(ToolStatistics).filter(
-                        ToolStatistics.tool_name == tool_name
-                    ).first()
-
-                    if not stats:
-                        stats = ToolStatistics(tool_name=tool_name)
-                        db.add(stats)
-
-                    # 更新统计数据
-                    stats.call_count = call_count
-                    stats.success_count = success_count
-                    stats.error_count = error_count
-                    stats.avg_execution_time = avg_time
-                    stats.last_called_at = last_called
-                    stats.updated_at = datetime.now(timezone('Asia/Shanghai'))
-
-                    result.append(stats)
+        Returns:
+            bool: 重建标记已被其他任务改动时回滚并返回 False
+        """
+        lower = {}
+        window_upper = {}
+        for source, (model, time_column) in _FOLD_SOURCES.items():
+            ids = StatisticsRepository.get_id_range(
+                db, model, time_column, since, until, upper[source])
+            lower[source], window_upper[source] = (
+                (ids[0] - 1, ids[1]) if ids else (0, 0))
+        rollups = self._aggregate_rollups(
+            db, lower, window_upper, service_uuids, since, until)
+        histograms = self._aggregate_histograms(
+            db, lower[_EXECUTIONS_SOURCE], window_upper[_EXECUTIONS_SOURCE],
+            since, until, merge=False)
+        db.commit()
+
+        if not self._advance_watermarks(db, {
+                source: marker for source in _FOLD_SOURCES}, marker):
+            return False
+        deleted = 0
+        for model in list(_ROLLUPS.values()) + list(_HISTOGRAMS.values()):
+            deleted += StatisticsRepository.delete_rollups(
+                db, model, before=until, since=since)
+        rollup_rows = sum(len(rows) for rows in rollups.values())
+        histogram_rows = sum(len(rows) for rows in histograms.values())
+        if not deleted and not rollup_rows and not histogram_rows:
+            db.rollback()
+            return True
+        for granularity, rows in rollups.items():
+            StatisticsRepository.upsert_rollup_deltas(
+                db, _ROLLUPS[granularity], rows)
+        for granularity, rows in histograms.items():
+            StatisticsRepository.upsert_histograms(
+                db, _HISTOGRAMS[granularity], rows)
+        db.commit()
+        result["rollup_rows"] += rollup_rows
+        result["histogram_rows"] += histogram_rows
+        result["chunks"] += 1
+        return True
+
+    @staticmethod
+    def _advance_watermarks(
+            db, expected: Dict[str, Optional[int]],
+            last_ids: Any) -> bool:
+        """按 CAS 推进全部数据源的水位（last_ids 为字典或同一个值），
+        任一数据源失败时回滚并返回 False"""
+        for source in _FOLD_SOURCES:
+            last_id = (last_ids[source] if isinstance(last_ids, dict)
+                       else last_ids)
+            if not StatisticsRepository.advance_watermark(
+                    db, source, expected.get(source), last_id):
+                db.rollback()
+                return False
+        return True
 
-                db.commit()
-                for stats in result:
-                    db.refresh(stats)
+    def _fold_chunk(self, db, lower: Dict[str, int], upper: Dict[str, int],
+                    result: Dict[str, Any]) -> bool:
+        """
+        汇总一段 ID 区间 (lower, upper] 并提交
 
-                return result
+        聚合和读取已有计数都在写事务之前完成，写事务里先按 CAS 推进全部
+        数据源的水位（读取期间有其他任务提交时推进失败），再写入算好的行。
+
+        Returns:
+            bool: 水位已被其他任务推进时回滚并返回 False
+        """
+        service_uuids = {}
+        if upper[_ACCESS_LOGS_SOURCE] > lower[_ACCESS_LOGS_SOURCE]:
+            service_uuids = StatisticsRepository.get_service_uuids(db)
+        (tool_rows, service_rows, module_rows, execution_count,
+         access_count) = self._aggregate_counters(
+            db, lower, upper, service_uuids)
+        rollups = self._aggregate_rollups(db, lower, upper, service_uuids)
+        histograms = self._aggregate_histograms(
+            db, lower[_EXECUTIONS_SOURCE], upper[_EXECUTIONS_SOURCE])
+        db.commit()
+
+        # 写事务：先推进水位，同时有两次刷新时只有一次能写入
+        if not self._advance_watermarks(db, lower, upper):
+            return False
+        StatisticsRepository.upsert_tool_statistics(db, tool_rows)
+        StatisticsRepository.upsert_service_call_statistics(db, service_rows)
+        StatisticsRepository.upsert_module_statistics(db, module_rows)
+        for granularity, rows in rollups.items():
+            StatisticsRepository.upsert_rollup_deltas(
+                db, _ROLLUPS[granularity], rows)
+        for granularity, rows in histograms.items():
+            StatisticsRepository.upsert_histograms(
+                db, _HISTOGRAMS[granularity], rows)
+        db.commit()
+
+        result["executions"] += execution_count
+        result["access_logs"] += access_count
+        result["tool_stats"] += len(tool_rows)
+        result["service_call_stats"] += len(service_rows)
+        result["module_call_stats"] += len(module_rows)
+        result["rollup_rows"] += sum(len(rows) for rows in rollups.values())
+        result["histogram_rows"] += sum(
+            len(rows) for rows in histograms.values())
+        result["chunks"] += 1
+        return True
+
+    def _aggregate_counters(
+            self, db, lower: Dict[str, int], upper: Dict[str, int],
+            service_uuids: Dict[int, str], replace: bool = False) -> tuple:
+        """
+        聚合 ID 区间 (lower, upper] 内的记录，算出待写入的工具、服务调用和
+        模块统计行
+
+        Args:
+            service_uuids: 服务 ID -> UUID（访问日志按服务 UUID 计入）
+            replace: 是否不读取已有计数、直接以聚合结果作为新值（全量重建）
+
+        Returns:
+            tuple: (工具统计行, 服务调用统计行, 模块统计行, 执行记录数,
+            访问日志数)
+        """
+        executions = []
+        if upper[_EXECUTIONS_SOURCE] > lower[_EXECUTIONS_SOURCE]:
+            executions = StatisticsRepository.aggregate_executions(
+                db, lower[_EXECUTIONS_SOURCE], upper[_EXECUTIONS_SOURCE])
+        access_logs = []
+        if upper[_ACCESS_LOGS_SOURCE] > lower[_ACCESS_LOGS_SOURCE]:
+            access_logs = StatisticsRepository.aggregate_access_logs(
+                db, lower[_ACCESS_LOGS_SOURCE], upper[_ACCESS_LOGS_SOURCE])
+
+        # 按工具 / 服务 / 模块汇总本段的增量
+        tool_deltas = {}
+        service_deltas = {}
+        module_deltas = {}
+        execution_count = 0
+        for item in executions:
+            execution_count += item["call_count"]
+            if item["tool_name"] is not None:
+                _accumulate(tool_deltas, item["tool_name"], {
+                    "call_count": item["call_count"],
+                    "success_count": item["success_count"],
+                    "error_count": item["error_count"],
+                    "execution_time_sum": item["time_sum"],
+                    "execution_time_count": item["time_count"],
+                    "last_called_at": item["last_called_at"],
+                })
+            calls = {
+                "call_count": item["call_count"],
+                "success_count": item["success_count"],
+                "error_count": item["error_count"],
+            }
+            if item["service_id"] is not None:
+                _accumulate(service_deltas, item["service_id"], calls)
+            if item["module_id"] is not None:
+                _accumulate(module_deltas, item["module_id"], calls)
+
+        access_count = 0
+        for item in access_logs:
+            access_count += item["access_count"]
+            # 服务已删除的访问日志不再计入
+            service_uuid = service_uuids.get(item["service_id"])
+            if service_uuid is not None:
+                _accumulate(service_deltas, service_uuid, {
+                    "access_count": item["access_count"],
+                    "access_error_count": item["access_error_count"],
+                })
+
+        now = datetime.now(timezone('Asia/Shanghai'))
+
+        tool_rows = _fold_counters(
+            db, ToolStatistics, "tool_name", tool_deltas, _TOOL_COUNTERS,
+            replace)
+        for row in tool_rows:
+            # 平均执行时间 = 耗时总和 / 有耗时的记录数
+            row["avg_execution_time"] = (
+                row["execution_time_sum"] // row["execution_time_count"]
+                if row["execution_time_count"] else 0)
+            row["updated_at"] = now
+
+        service_rows = _fold_counters(
+            db, ServiceCallStatistics, "service_id", service_deltas,
+            _SERVICE_COUNTERS, replace)
+        if service_rows:
+            module_names = StatisticsRepository.get_service_module_names(db)
+        for row in service_rows:
+            service_id = row["service_id"]
+            row["service_name"] = "未知服务"
+            row["module_name"] = "未知模块"
+            # 获取服务和模块信息
+            if service_id in module_names:
+                row["service_name"] = f"服务 {service_id}"
+                row["module_name"] = (module_names[service_id]
+                                      or row["module_name"])
+            row["updated_at"] = now
+
+        module_rows = _fold_counters(
+            db, ModuleStatistics, "module_id", module_deltas,
+            _MODULE_COUNTERS, replace)
+        for row in module_rows:
+            row["updated_at"] = now
+
+        return (tool_rows, service_rows, module_rows, execution_count,
+                access_count)
+
+    def _aggregate_rollups(
+            self, db, lower: Dict[str, int], upper: Dict[str, int],
+            service_uuids: Dict[int, str], since: Optional[datetime] = None,
+            until: Optional[datetime] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        把 ID 区间内的工具执行记录和访问日志聚合成分钟 / 小时 / 天汇总增量
+
+        每个数据源两次 GROUP BY：分钟汇总只在分钟保留期内按服务聚合（不区分
+        工具），小时汇总按全部维度聚合，天汇总由小时汇总行在内存中合并得到。
+        超出各粒度保留期的记录不汇总；给出 since / until 时只汇总该时间段内
+        的记录（全量重建按天重算）。
+
+        Returns:
+            Dict: 粒度 -> 待累加的汇总行
+        """
+        today = _today_start()
+        cutoffs = {
+            granularity: today - timedelta(
+                days=_rollup_retention_days(granularity))
+            for granularity in _ROLLUPS
+        }
+        minute_since = cutoffs["minute"]
+        hour_since = min(cutoffs["hour"], cutoffs["day"])
+        if since is not None:
+            minute_since = max(minute_since, since)
+            hour_since = max(hour_since, since)
+        minutes = []
+        hours = []
+        passes = [(minutes, "minute", minute_since),
+                  (hours, "hour", hour_since)]
+        if until is not None:
+            # 整个时间段都在保留期之外的粒度不汇总
+            passes = [item for item in passes if item[2] < until]
+        if upper[_EXECUTIONS_SOURCE] > lower[_EXECUTIONS_SOURCE]:
+            for rows, granularity, granularity_since in passes:
+                for item in StatisticsRepository.aggregate_execution_buckets(
+                        db, lower[_EXECUTIONS_SOURCE],
+                        upper[_EXECUTIONS_SOURCE], granularity,
+                        granularity_since, until,
+                        by_tool=granularity != "minute"):
+                    item["source"] = _EXECUTION_ROLLUP
+                    rows.append(item)
+        if upper[_ACCESS_LOGS_SOURCE] > lower[_ACCESS_LOGS_SOURCE]:
+            for rows, granularity, granularity_since in passes:
+                for item in StatisticsRepository.aggregate_access_log_buckets(
+                        db, lower[_ACCESS_LOGS_SOURCE],
+                        upper[_ACCESS_LOGS_SOURCE], granularity,
+                        granularity_since, until):
+                    # 服务已删除的访问日志不再计入
+                    service_uuid = service_uuids.get(item["service_id"])
+                    if service_uuid is None:
+                        continue
+                    rows.append({
+                        "bucket": item["bucket"],
+                        "source": _ACCESS_ROLLUP,
+                        "service_id": service_uuid,
+                        "tool_name": "",
+                        "secret_id": item["secret_id"],
+                        "status": item["status"],
+                        "call_count": item["call_count"],
+                        "error_count": item["error_count"],
+                        "latency_sum": 0,
+                        "latency_count": 0,
+                    })
+        kept, days = _roll_up_rollups(
+            hours, cutoffs["hour"], "day", cutoffs["day"])
+        return {"minute": minutes, "hour": kept, "day": days}
+
+    def clean_rollups(self) -> Dict[str, int]:
+        """
+        按各粒度的保留天数删除过期的时间桶汇总和耗时直方图
+
+        Returns:
+            Dict: 粒度 -> 删除的汇总行数，histogram_<粒度> -> 删除的直方图行数
+        """
+        today = _today_start()
+        with get_db() as db:
+            try:
+                deleted = {}
+                for granularity, model in _ROLLUPS.items():
+                    cutoff = today - timedelta(
+                        days=_rollup_retention_days(granularity))
+                    deleted[granularity] = StatisticsRepository.delete_rollups(
+                        db, model, cutoff)
+                    deleted[f"histogram_{granularity}"] = (
+                        StatisticsRepository.delete_rollups(
+                            db, _HISTOGRAMS[granularity], cutoff))
+                db.commit()
+                return deleted
             except Exception as e:
                 db.rollback()
-                mcp_logger.error(f"更新工具统计数据时出错: {str(e)}")
+                mcp_logger.error(f"清理时间桶汇总时出错: {str(e)}")
                 raise
 
-    def update_service_call_statistics(self) -> List[ServiceCallStatistics]:
+    def get_statistics_series(
+        self,
+        granularity: str = "hour",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        source: str = _EXECUTION_ROLLUP,
+        service_id: Optional[str] = None,
+        tool_name: Optional[str] = None,
+        secret_id: Optional[int] = None,
+        status: Optional[str] = None,
+        group_by: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
-        更新服务调用统计数据
+        按时间桶查询调用统计（读取分钟 / 小时 / 天汇总表，不扫描原始记录）
+
+        距上次汇总超过 statistics.rollup_max_staleness 秒时，先汇总新增记录
+        （只做增量，需要全量重建时等待定时任务）。
+
+        Args:
+            granularity: minute / hour / day
+            start: 起始时间（含），默认按粒度取最近 1 小时 / 1 天 / 30 天
+            end: 结束时间（不含），默认当前时间
+            source: execution（工具执行记录）或 access（访问日志）
+            service_id / tool_name / secret_id / status: 维度过滤
+            group_by: 按 service / tool / secret / status 拆分序列（分钟
+                粒度不区分工具，不能按工具过滤或分组）
 
         Returns:
-            List[ServiceCallStatistics]: 更新后的服务调用统计数据列表
+            Dict: granularity、start、end、source、group_by 和 items（按时间桶
+            排序，每项包含 bucket、分组维度、call_count、error_count、
+            avg_latency）；不分组时没有数据的时间桶补 0
         """
+        if granularity not in _ROLLUPS:
+            raise ValueError(f"不支持的时间粒度: {granularity}")
+        if source not in (_EXECUTION_ROLLUP, _ACCESS_ROLLUP):
+            raise ValueError(f"不支持的数据源: {source}")
+        if group_by is not None and group_by not in _SERIES_GROUP_BY:
+            raise ValueError(f"不支持的分组维度: {group_by}")
+        if granularity == "minute" and (tool_name is not None
+                                        or group_by == "tool"):
+            raise ValueError("分钟汇总不区分工具，按工具查询请使用 hour / day 粒度")
+
+        step = _BUCKET_STEPS[granularity]
+        end = end or datetime.now(timezone('Asia/Shanghai')).replace(
+            tzinfo=None)
+        start = start or end - _DEFAULT_SERIES_RANGES[granularity]
+        start = _truncate(start, granularity)
+        if start >= end:
+            raise ValueError("起始时间必须早于结束时间")
+        if (end - start) / step > _MAX_SERIES_BUCKETS:
+            raise ValueError(
+                f"时间桶数量超过 {_MAX_SERIES_BUCKETS}，请缩小范围或使用更大的粒度")
+
+        self._ensure_rollups_fresh()
+
+        filters = {
+            name: value for name, value in (
+                ("service_id", service_id),
+                ("tool_name", tool_name),
+                ("secret_id", secret_id),
+                ("status", status),
+            ) if value is not None
+        }
+        group_column = _SERIES_GROUP_BY.get(group_by)
         with get_db() as db:
-            try:
-                # 获取所有有调用记录的服务ID
-                service_ids = db.query(ToolExecution.service_id).filter(
-                    ToolExecution.service_id.isnot(None)
-                ).distinct().all()
+            rows = StatisticsRepository.query_rollups(
+                db, _ROLLUPS[granularity], start, end, source, filters,
+                group_column)
+
+        items = []
+        for row in rows:
+            item = {"bucket": row["bucket"]}
+            if group_by:
+                item[group_by] = row[group_column]
+            item["call_count"] = row["call_count"]
+            item["error_count"] = row["error_count"]
+            item["avg_latency"] = (row["latency_sum"] // row["latency_count"]
+                                   if row["latency_count"] else 0)
+            items.append(item)
+
+        if not group_by:
+            # 补齐没有数据的时间桶
+            by_bucket = {item["bucket"]: item for item in items}
+            items = []
+            bucket = start
+            while bucket < end:
+                items.append(by_bucket.get(bucket) or {
+                    "bucket": bucket, "call_count": 0, "error_count": 0,
+                    "avg_latency": 0})
+                bucket += step
+
+        for item in items:
+            item["bucket"] = item["bucket"].strftime("%Y-%m-%d %H:%M:%S")
+        return {
+            "granularity": granularity,
+            "start": start.strftime("%Y-%m-%d %H:%M:%S"),
+            "end": end.strftime("%Y-%m-%d %H:%M:%S"),
+            "source": source,
+            "group_by": group_by,
+            "items": items,
+        }
+
+    def _aggregate_histograms(
+            self, db, after_id: int, up_to_id: int,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+            merge: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        把 ID 区间内的执行耗时合并到分钟 / 小时 / 天直方图
 
-                result = []
+        按 ID 分批读取耗时，先在内存中按分钟分桶，再合并出小时 / 天直方图，
+        merge=True 时再与已有的直方图逐桶相加，得到待写回的行。超出各粒度
+        保留期的记录不写入；给出 since / until 时只读取该时间段内的记录。
 
-                for (service_id,) in service_ids:
-                    # 基础查询
-                    base_query = db.query(ToolExecution).filter(
-                        ToolExecution.service_id == service_id
-                    )
+        Returns:
+            Dict: 粒度 -> 待覆盖写入的直方图行
+        """
+        if up_to_id <= after_id:
+            return {}
+
+        today = _today_start()
+        cutoffs = {
+            granularity: today - timedelta(
+                days=_rollup_retention_days(granularity))
+            for granularity in _HISTOGRAMS
+        }
+        deltas = {granularity: {} for granularity in _HISTOGRAMS}
+        earliest = min(cutoffs.values())
+        if since is not None:
+            earliest = max(earliest, since)
+        for rows in StatisticsRepository.iter_execution_latencies(
+                db, after_id, up_to_id, earliest, until):
+            # 本批按分钟分桶
+            minutes = {}
+            for bucket, service_id, tool_name, execution_time, times in rows:
+                key = (bucket, service_id, tool_name)
+                histogram = minutes.get(key)
+                if histogram is None:
+                    histogram = minutes[key] = LatencyHistogram()
+                histogram.record(execution_time, times)
+            # 分钟合并到小时，保留期内的分钟直方图单独保存
+            _roll_up_histograms(
+                minutes, deltas["minute"], cutoffs["minute"], deltas["hour"],
+                "hour", min(cutoffs["hour"], cutoffs["day"]))
+        # 小时合并到天，超出小时保留期的只用于天直方图
+        hours = deltas["hour"]
+        deltas["hour"] = {}
+        _roll_up_histograms(
+            hours, deltas["hour"], cutoffs["hour"], deltas["day"], "day",
+            cutoffs["day"])
+
+        merged = {}
+        for granularity, model in _HISTOGRAMS.items():
+            histograms = deltas[granularity]
+            if not histograms:
+                continue
+            existing = {}
+            if merge:
+                existing = StatisticsRepository.get_histograms(
+                    db, model, histograms)
+            rows = []
+            for key, histogram in histograms.items():
+                current = existing.get(key)
+                if current is not None:
+                    histogram.merge(LatencyHistogram.decode(
+                        current["histogram"], current["count"],
+                        current["latency_sum"], current["max_latency"]))
+                bucket, service_id, tool_name = key
+                rows.append({
+                    "bucket": bucket,
+                    "service_id": service_id,
+                    "tool_name": tool_name,
+                    "count": histogram.count,
+                    "latency_sum": histogram.total,
+                    "max_latency": histogram.max_value,
+                    "histogram": histogram.encode(),
+                })
+            merged[granularity] = rows
+        return merged
+
+    def get_latency_percentiles(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        tool_name: Optional[str] = None,
+        service_id: Optional[str] = None,
+        granularity: Optional[str] = None,
+        percentiles: Optional[List[float]] = None,
+        group_by: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        查询任意工具 / 服务 / 时间范围的执行耗时分位数
 
-                    # 统计数据
-                    call_count = base_query.count()
-                    success_count = base_query.filter(
-                        ToolExecution.status == 'success'
-                    ).count()
-                    error_count = base_query.filter(
-                        ToolExecution.status == 'error'
-                    ).count()
-
-                    # 获取服务信息
-                    service = db.query(McpService).filter(
-                        McpService.service_uuid == service_id
-                    ).first()
-
-                    service_name = "未知服务"
-                    module_name = "未知模块"
-
-                    if service:
-                        service_name = f"服务 {service_id}"
-
-                        # 获取模块信息
-                        if service.module_id:
-                            module = db.query(McpModule).filter(
-                                McpModule.id == service.module_id
-                            ).first()
-                            if module:
-                                module_name = module.name
-
-                    # 查找或创建统计记录
-                    stats = db.query(ServiceCallStatistics).filter(
-                        ServiceCallStatistics.service_id == service_id
-                    ).first()
-
-                    if not stats:
-                        stats = ServiceCallStatistics(
-                            service_id=service_id,
-                            service_name=service_name,
-                            module_name=module_name
-                        )
-                        db.add(stats)
-
-                    # 更新统计数据
-                    stats.service_name = service_name
-                    stats.module_name = module_name
-                    stats.call_count = call_count
-                    stats.success_count = success_count
-                    stats.error_count = error_count
-                    stats.updated_at = datetime.now(timezone('Asia/Shanghai'))
-
-                    result.append(stats)
+        合并范围内的直方图后计算分位数，不读取原始执行记录。未指定粒度时
+        范围按分钟取整后拆段：整天读天直方图，两端的零头读小时 / 分钟直方图
+        （超出保留期时向外扩到更粗的时间桶边界）；指定粒度时整个范围向外扩
+        到该粒度的时间桶边界。实际读取的分段见返回值 segments。
 
-                db.commit()
-                for stats in result:
-                    db.refresh(stats)
+        Args:
+            start: 起始时间（含），默认结束时间前 1 天
+            end: 结束时间（不含），默认当前时间
+            tool_name / service_id: 过滤条件
+            granularity: minute / hour / day，默认按范围自动拆段
+            percentiles: 分位数列表，默认 50 / 90 / 95 / 99
+            group_by: 按 tool / service 分组，每组一项
 
-                return result
-            except Exception as e:
-                db.rollback()
-                mcp_logger.error(f"更新服务调用统计数据时出错: {str(e)}")
-                raise
+        Returns:
+            Dict: segments、实际的 start / end、count、mean、max、
+            percentiles（p50 等）；分组时为 items 列表，按调用数倒序
+        """
+        if granularity is not None and granularity not in _HISTOGRAMS:
+            raise ValueError(f"不支持的时间粒度: {granularity}")
+        if group_by is not None and group_by not in _LATENCY_GROUP_BY:
+            raise ValueError(f"不支持的分组维度: {group_by}")
+        percentiles = list(percentiles or _DEFAULT_PERCENTILES)
+        if any(not 0 < percent <= 100 for percent in percentiles):
+            raise ValueError("分位数必须在 (0, 100] 范围内")
+
+        end = end or datetime.now(timezone('Asia/Shanghai')).replace(
+            tzinfo=None)
+        start = start or end - timedelta(days=1)
+        if start >= end:
+            raise ValueError("起始时间必须早于结束时间")
+        if granularity is None:
+            segments = _plan_histogram_segments(
+                _truncate(start, "minute"), _ceil(end, "minute"))
+        else:
+            segments = [(granularity, _truncate(start, granularity),
+                         _ceil(end, granularity))]
+
+        self._ensure_rollups_fresh()
+
+        filters = {
+            name: value for name, value in (
+                ("tool_name", tool_name), ("service_id", service_id)
+            ) if value is not None
+        }
+        rows = []
+        with get_db() as db:
+            for segment, segment_start, segment_end in segments:
+                rows.extend(StatisticsRepository.query_histograms(
+                    db, _HISTOGRAMS[segment], segment_start, segment_end,
+                    filters))
+
+        group_column = _LATENCY_GROUP_BY.get(group_by)
+        merged = {}
+        for row in rows:
+            key = row[group_column] if group_column else None
+            histogram = LatencyHistogram.decode(
+                row["histogram"], row["count"], row["latency_sum"],
+                row["max_latency"])
+            if key in merged:
+                merged[key].merge(histogram)
+            else:
+                merged[key] = histogram
+
+        def summary(histogram: LatencyHistogram) -> Dict[str, Any]:
+            return {
+                "count": histogram.count,
+                "mean": histogram.mean(),
+                "max": histogram.max_value,
+                "percentiles": histogram.percentiles(percentiles),
+            }
+
+        time_format = "%Y-%m-%d %H:%M:%S"
+        result = {
+            "segments": [
+                {
+                    "granularity": segment,
+                    "start": segment_start.strftime(time_format),
+                    "end": segment_end.strftime(time_format),
+                }
+                for segment, segment_start, segment_end in segments
+            ],
+            "start": segments[0][1].strftime(time_format),
+            "end": segments[-1][2].strftime(time_format),
+            "tool_name": tool_name,
+            "service_id": service_id,
+        }
+        if group_by:
+            result["group_by"] = group_by
+            result["items"] = [
+                {group_by: key, **summary(histogram)}
+                for key, histogram in sorted(
+                    merged.items(), key=lambda item: -item[1].count)
+            ]
+        else:
+            result.update(summary(merged.get(None) or LatencyHistogram()))
+        return result
+
+    def _ensure_rollups_fresh(self) -> None:
+        """距上次汇总超过新鲜度上限时先做一次增量汇总"""
+        max_staleness = settings.STATISTICS_ROLLUP_MAX_STALENESS
+        if max_staleness <= 0:
+            return
+        if (self._last_folded_at is not None
+                and time.monotonic() - self._last_folded_at < max_staleness):
+            return
+        try:
+            self.update_call_statistics(incremental_only=True)
+        except Exception as e:
+            # 汇总失败时仍返回已有数据
+            mcp_logger.warning(f"查询前汇总新增记录失败: {str(e)}")
 
     def get_service_statistics(self) -> Dict[str, Any]:
         """
         获取服务统计数据
 
+        缓存未超过 `overview_max_staleness` 秒且仍是今天的数据时直接返回
+        内存中的结果，否则重新计数。
+
         Returns:
             Dict: 服务统计数据
         """
-        # 首先更新统计数据
-        stats = self.update_service_statistics()
-
-        return stats.to_dict()
+        overview = self._fresh_overview()
+        if overview is not None:
+            return overview
+        with self._overview_lock:
+            # 等锁期间可能已被其他请求刷新
+            overview = self._fresh_overview()
+            if overview is not None:
+                return overview
+            self.update_service_statistics()
+            return self._overview
+
+    def _fresh_overview(self) -> Optional[Dict[str, Any]]:
+        """未过期的概览缓存，没有或已过期时为 None"""
+        overview, updated_at = self._overview, self._overview_at
+        if overview is None or updated_at is None:
+            return None
+        if (time.monotonic() - updated_at
+                >= settings.STATISTICS_OVERVIEW_MAX_STALENESS):
+            return None
+        # 跨天后今日计数需要归零
+        if overview["statistics_date"] != _today_start().strftime("%Y-%m-%d"):
+            return None
+        return overview
 
     def get_module_rankings(
             self, size: int = 10, page: int = 1) -> Dict[str, Any]:
@@ -882,10 +1764,13 @@ class StatisticsService:
                 for tool_name, count in tool_stats
             ]
 
-    def refresh_all_statistics(self) -> Dict[str, Any]:
+    def refresh_all_statistics(self, rebuild: bool = False) -> Dict[str, Any]:
         """
         刷新所有统计数据
 
+        Args:
+            rebuild: 是否全量重建调用统计（默认只汇总新增记录）
+
         Returns:
             Dict: 刷新结果
         """
@@ -898,17 +1783,20 @@ class StatisticsService:
             # 更新模块统计
             module_stats = self.update_module_statistics()
 
-            # 更新工具统计
-            tool_stats = self.update_tool_statistics()
-
-            # 更新服务调用统计
-            service_call_stats = self.update_service_call_statistics()
+            # 更新工具、服务调用和模块调用统计
+            call_stats = self.update_call_statistics(rebuild=rebuild)
 
             return {
                 "service_stats": service_stats.total_services,
-                "module_stats": len(module_stats),
-                "tool_stats": len(tool_stats),
-                "service_call_stats": len(service_call_stats),
+                "module_stats": module_stats,
+                "tool_stats": call_stats["tool_stats"],
+                "service_call_stats": call_stats["service_call_stats"],
+                "module_call_stats": call_stats["module_call_stats"],
+                "new_executions": call_stats["executions"],
+                "new_access_logs": call_stats["access_logs"],
+                "rollup_rows": call_stats["rollup_rows"],
+                "histogram_rows": call_stats["histogram_rows"],
+                "rebuild": call_stats["rebuild"],
                 "updated_at": datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S")
             }
         except Exception as e:
@@ -928,7 +1816,7 @@ class StatisticsService:
             Dict: 日期统计数据
         """
         if target_date is None:
-            target_date = date.today()
+            target_date = _today_start().date()
 
         with get_db() as db:
             try:
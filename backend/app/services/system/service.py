@@ -348,11 +348,95 @@ class SystemService:
                     "pid": 5678
                 }
             }
+            from app.services.auth.secret_manager import SecretManager
+            from app.services.history.execution_writer import (
+                tool_execution_writer
+            )
+            writers = {
+                "access_log_writer": (
+                    "访问日志写入器",
+                    SecretManager.get_access_log_writer_stats()
+                ),
+                "tool_execution_writer": (
+                    "工具执行记录写入器",
+                    tool_execution_writer.get_stats()
+                ),
+            }
+            for key, (name, writer_stats) in writers.items():
+                services[key] = {
+                    "name": name,
+                    "status": (
+                        "running" if writer_stats["running"] else "stopped"
+                    ),
+                    **writer_stats
+                }
+            from app.services.published_service import service_manager
+            from app.services.published_service.proxy_client import (
+                proxy_client_pool
+            )
+            services["proxy_client"] = {
+                "name": "第三方服务代理连接池",
+                "status": "running",
+                **proxy_client_pool.get_stats()
+            }
+            services["streamable_http_sessions"] = {
+                "name": "流式HTTP会话",
+                "status": "running",
+                **service_manager.get_stream_session_stats()
+            }
+            services["tool_executor"] = {
+                "name": "内置服务同步工具线程池",
+                "status": "running",
+                **service_manager.get_tool_executor_stats()
+            }
+            from app.utils.template_loader import template_loader
+            services["template_loader"] = {
+                "name": "模板代码内存加载器",
+                "status": "running",
+                **template_loader.get_stats()
+            }
+            from app.services.mcp_template.tool_metadata import (
+                tool_metadata_cache)
+            services["tool_metadata_cache"] = {
+                "name": "模板工具元数据缓存",
+                "status": "running",
+                **tool_metadata_cache.get_stats()
+            }
+            from app.utils.shared_state import shared_state
+            services["shared_state"] = {
+                "name": "多进程共享状态",
+                "status": "running",
+                **shared_state.get_stats()
+            }
+            from app.services.published_service.sse_session_router import (
+                sse_session_router
+            )
+            sse_session_stats = sse_session_router.get_stats()
+            if sse_session_stats["enabled"]:
+                services["sse_session_router"] = {
+                    "name": "SSE会话跨进程转发",
+                    "status": "running",
+                    **sse_session_stats
+                }
+            worker_pool_stats = service_manager.get_worker_pool_stats()
+            if worker_pool_stats is not None:
+                services["service_workers"] = {
+                    "name": "服务工作进程池",
+                    "status": (
+                        "running" if worker_pool_stats["ready"] else "starting"
+                    ),
+                    **worker_pool_stats
+                }
             return services
         except Exception as e:
             self.logger.error(f"获取服务状态失败: {e}")
             raise e
 
+    async def get_service_startup_report(self) -> Dict[str, Any]:
+        """获取已发布服务启动加载报告"""
+        from app.services.published_service import service_manager
+        return service_manager.get_startup_report()
+
     async def restart_service(self, service_name: str) -> Dict[str, Any]:
         """重启服务"""
         try:
@@ -1,6 +1,5 @@
 import os
 import sys
-import importlib.util
 import inspect
 import time
 from typing import Dict, Any, List
@@ -12,6 +11,7 @@ from ...models.tools.schemas import ToolContent
 # 导入历史服务
 from ..history.service import HistoryService
 from ...utils.logging import mcp_logger
+from .tool_index import tool_index
 # 创建历史服务实例
 history_service = HistoryService()
 
@@ -36,21 +36,7 @@ class ToolService:
 
     def get_all_tools(self) -> List[Dict[str, Any]]:
         """获取所有工具信息"""
-        # 每次调用都重新扫描，以反映文件系统变化（如手动添加/删除文件）
-        # 并尝试更新已注册工具列表缓存
-        server_instance = get_mcp_server()
-        try:
-            if server_instance and hasattr(server_instance, '_tool_manager'):
-                self._registered_tool_names = {
-                    tool.name for tool in server_instance._tool_manager.list_tools()
-                }
-                mcp_logger.info(f"更新时加载了 {len(self._registered_tool_names)} 个注册工具")
-            else:
-                mcp_logger.warning("更新时server_instance未找到或未初始化")
-        except Exception as e:
-            mcp_logger.error(f"更新时无法从server_instance._tool_manager获取工具列表: {e}")
-            # 这里保留旧缓存
-
+        # 检查文件变化（如手动添加/删除文件）并更新已注册工具列表
         tools = self.scan_tools()
         return list(tools.values())
 
@@ -76,6 +62,7 @@ class ToolService:
 
         with open(full_path, "w", encoding="utf-8") as f:
             f.write(content)
+        tool_index.refresh_file(full_path)
 
         # 重新加载模块
         module_name = os.path.basename(full_path).replace(".py", "")
@@ -99,6 +86,7 @@ class ToolService:
 
         with open(full_path, "w", encoding="utf-8") as f:
             f.write(content)
+        tool_index.refresh_file(full_path)
 
         return tool_path
 
@@ -110,6 +98,7 @@ class ToolService:
             raise FileNotFoundError("Tool not found")
 
         os.remove(full_path)
+        tool_index.refresh_file(full_path)
 
         # 从缓存中移除
         module_name = os.path.basename(full_path).replace(".py", "")
@@ -119,140 +108,26 @@ class ToolService:
                 del sys.modules[module_name]
 
     def scan_tools(self) -> Dict[str, Any]:
-        """扫描所有MCP工具"""
-        tools = {}
-        server_instance = get_mcp_server()
-        # 每次扫描都实时获取最新的工具列表，不依赖于缓存
-        registered_tool_names = set()
-        try:
-            if server_instance and hasattr(server_instance, '_tool_manager'):
-                registered_tools = server_instance._tool_manager.list_tools()
-                registered_tool_names = {tool.name for tool in registered_tools}
-                mcp_logger.info(f"从server_instance._tool_manager获取到的工具列表: {registered_tool_names}")
-                if not registered_tool_names:
-                    mcp_logger.warning("警告: server_instance._tool_manager中没有找到任何注册工具！")
-            else:
-                mcp_logger.warning("警告: server_instance不存在或未初始化")
-        except Exception as e:
-            mcp_logger.error(f"获取已注册工具列表时出错: {e}")
+        """
+        扫描所有MCP工具
 
+        只 stat 检查 repository 下的文件，解析有变化的文件，见 tool_index
+        """
+        stats = tool_index.refresh()
+        tools = tool_index.get_registered_tools()
         # 更新实例变量，以便其他方法使用
-        self._registered_tool_names = registered_tool_names
-
-        # 获取所有Python文件
-        py_files = []
-        repository_path = os.path.join(self.base_dir, "repository")
-        for root, _, files in os.walk(repository_path):
-            for file in files:
-                if (file.endswith(".py") and file != "_init_.py" and
-                    file != "__init__.py"):
-                    py_files.append(os.path.join(root, file))
-
-        print(f"找到{len(py_files)}个Python文件")
-
-        # 添加必要的目录到sys.path
-        if repository_path not in sys.path:
-            sys.path.insert(0, repository_path)
-        if self.base_dir not in sys.path:
-            sys.path.insert(0, self.base_dir)
-
-        # 加载所有模块并扫描工具
-        for py_file in py_files:
-            module_rel_path = os.path.relpath(py_file, repository_path)
-            module_dot_path = module_rel_path.replace(
-                os.sep, "."
-            ).replace(".py", "")
-            module_key = f"repository.{module_dot_path}"
-
-            if module_key == "repository.mcp_base":
-                # 跳过已移除的mcp_base文件
-                continue
-
-            print(f"处理模块: {module_key}")
-
-            # 加载模块
-            module = None
-            try:
-                spec = importlib.util.spec_from_file_location(
-                    module_key, py_file
-                )
-                if not spec or not spec.loader:
-                    continue
-
-                if module_key in sys.modules:
-                    module = sys.modules[module_key]
-                else:
-                    module = importlib.util.module_from_spec(spec)
-                    sys.modules[module_key] = module
-                    spec.loader.exec_module(module)
-            except Exception as e:
-                print(f"加载模块 {module_key} 时出错: {e}")
-                continue
-
-            if module is None:
-                continue
-
-            # 查找所有函数，检查是否在注册工具列表中
-            for name, obj in inspect.getmembers(module):
-                if inspect.isfunction(obj):
-                    if obj.__name__ in registered_tool_names:
-                        print(f"✓ 在模块 {module_key} 中找到已注册工具: {obj.__name__}")
-                        sig = inspect.signature(obj)
-                        param_info = {}
-
-                        for param_name, param in sig.parameters.items():
-                            param_type_str = str(param.annotation)
-                            if hasattr(param.annotation, '__name__'):
-                                param_type_str = param.annotation.__name__
-                            elif hasattr(param.annotation, '__origin__'):
-                                origin_name = getattr(
-                                    param.annotation.__origin__,
-                                    '__name__',
-                                    str(param.annotation.__origin__)
-                                )
-                                args_str = ", ".join(
-                                    getattr(arg, '__name__', str(arg))
-                                    for arg in getattr(
-                                        param.annotation, '__args__', []
-                                    )
-                                )
-                                param_type_str = f"{origin_name}[{args_str}]"
-
-                            param_info[param_name] = {
-                                "type": param_type_str
-                                    if param_type_str != '_empty' else 'Any',
-                                "default": repr(param.default)
-                                    if param.default is not inspect.Parameter.empty
-                                    else None
-                            }
-
-                        # 使用相对于 base_dir 的路径
-                        relative_file_path = os.path.relpath(
-                            py_file, self.base_dir
-                        )
-
-                        tools[obj.__name__] = {
-                            "name": obj.__name__,
-                            "doc": inspect.getdoc(obj) or "",
-                            "parameters": param_info,
-                            "return_type": (
-                                str(sig.return_annotation)
-                                if str(sig.return_annotation) != '_empty'
-                                else 'Any'
-                            ),
-                            "module": module_key,
-                            "file_path": relative_file_path.replace("\\", "/")
-                        }
-                    else:
-                        # 额外打印未注册的函数，帮助诊断
-                        mcp_logger.warning(
-                            f"× 模块 {module_key} 中的函数 {obj.__name__} "
-                            f"未在工具管理器中注册"
-                        )
-
-        print(f"扫描完成，找到已注册工具: {list(tools.keys())}")
+        self._registered_tool_names = set(tools)
+        mcp_logger.info(
+            f"扫描完成，文件 {stats['files']} 个（重新解析 {stats['parsed']} 个），"
+            f"找到已注册工具 {len(tools)} 个"
+        )
         return tools
 
+    def reload_tools(self) -> Dict[str, Any]:
+        """丢弃工具索引并全量重建"""
+        stats = tool_index.reload()
+        return {**stats, **tool_index.get_stats()}
+
     def execute_tool(self, tool_name: str, parameters: Dict[str, Any]) -> Any:
         """执行MCP工具"""
         start_time = time.time()
@@ -260,9 +135,6 @@ class ToolService:
         status = "success"
 
         try:
-            # 获取工具信息
-            tools = self.scan_tools()
-            description = tools.get(tool_name, {}).get("doc", "")
             server_instance = get_mcp_server()
             if not server_instance:
                 raise ValueError("MCP服务器实例未初始化")
@@ -272,6 +144,11 @@ class ToolService:
             if not tool_info:
                 raise ValueError(f"工具 {tool_name} 未在 ToolManager 中注册")
 
+            # 获取工具信息（索引中的字典查找，不在 repository 中时用注册描述）
+            indexed = tool_index.get(tool_name)
+            description = (indexed["doc"] if indexed
+                           else tool_info.description or "")
+
             # 直接执行工具函数
             result = tool_info.fn(**parameters)
             return result
@@ -364,7 +241,7 @@ class ToolService:
 
     def list_tools(self) -> List[Dict[str, Any]]:
         """列出所有可用的工具信息，按模块分组"""
-        # 直接调用scan_tools获取最新工具列表
+        # 检查文件变化后从工具索引获取工具列表
         try:
             tools = self.scan_tools()
 
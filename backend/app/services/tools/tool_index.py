@@ -0,0 +1,261 @@
+"""
+工具索引
+
+`ToolService.scan_tools` 以前每次调用都 `os.walk` 遍历 `repository/`，
+import 每个 .py 文件并对所有成员做 `inspect.getmembers` /
+`inspect.signature`，`execute_tool`、`list_tools` 和
+`ExecutionService.execute_tool` 每次都要走一遍，只为取一个工具的 docstring。
+
+`ToolIndex` 只在首次使用时建立索引：
+
+- 按文件记录 (mtime_ns, size) 和静态解析（AST，不执行代码）出的模块顶层
+  函数，`refresh` 只 stat 文件，重新解析有变化的文件，删除已不存在的文件；
+- 已注册工具名集合在建立索引时从 MCP 工具管理器读取，之后由
+  `mcp_runtime_server.add_tool` / `remove_tool` 事件维护；
+- `get` 只做字典查找，未命中时从工具管理器重新读取已注册工具名（覆盖不经过
+  `add_tool` 注册的工具）后再查一次；
+- `reload` 丢弃索引全量重建，对应 `POST /api/tools/reload`。
+"""
+import inspect
+import os
+import threading
+from typing import Any, Callable, Dict, NamedTuple, Optional, Set
+
+from app.core.config import settings
+from app.services.mcp_template.tool_metadata import extract_tools
+from app.utils.logging import mcp_logger
+
+# 不作为工具模块扫描的文件
+_SKIPPED_FILES = {"__init__.py", "_init_.py"}
+_SKIPPED_MODULES = {"repository.mcp_base"}
+
+
+class _IndexedFile(NamedTuple):
+    """已索引的文件"""
+    mtime_ns: int
+    size: int
+    functions: Dict[str, Dict[str, Any]]
+
+
+def _tool_info(tool: Dict[str, Any], module_key: str,
+               file_path: str) -> Dict[str, Any]:
+    """转换为 scan_tools 的工具信息结构"""
+    return {
+        "name": tool["name"],
+        "doc": tool["description"],
+        "parameters": {
+            param["name"]: {
+                "type": param["type"],
+                "default": param["default"]
+            }
+            for param in tool["parameters"]
+        },
+        "return_type": tool["return_type"],
+        "module": module_key,
+        "file_path": file_path
+    }
+
+
+class ToolIndex:
+    """repository 目录下工具函数的索引"""
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        self.repository_path = os.path.join(base_dir, "repository")
+        # 文件绝对路径 -> 已索引的文件
+        self._files: Dict[str, _IndexedFile] = {}
+        # 函数名 -> 工具信息（所有文件的顶层函数，同名时路径排序靠后的生效）
+        self._functions: Dict[str, Dict[str, Any]] = {}
+        # 已注册的工具名
+        self._registered: Set[str] = set()
+        self._built = False
+        self._lock = threading.RLock()
+
+        # 计数
+        self._refreshes = 0
+        self._parsed_files = 0
+
+    def _module_key(self, path: str) -> str:
+        rel_path = os.path.relpath(path, self.repository_path)
+        return "repository." + rel_path[:-len(".py")].replace(os.sep, ".")
+
+    def _is_tool_file(self, path: str) -> bool:
+        return (path.endswith(".py")
+                and os.path.basename(path) not in _SKIPPED_FILES
+                and path.startswith(self.repository_path + os.sep)
+                and self._module_key(path) not in _SKIPPED_MODULES)
+
+    def _list_files(self) -> Dict[str, os.stat_result]:
+        """列出 repository 目录下的工具文件及其 stat 信息"""
+        files = {}
+        for root, _, names in os.walk(self.repository_path):
+            for name in names:
+                path = os.path.join(root, name)
+                if not self._is_tool_file(path):
+                    continue
+                try:
+                    files[path] = os.stat(path)
+                except OSError:
+                    continue
+        return files
+
+    def _parse_file(self, path: str,
+                    stat: os.stat_result) -> _IndexedFile:
+        """静态解析文件中的模块顶层函数，解析失败时记录为空"""
+        module_key = self._module_key(path)
+        file_path = os.path.relpath(path, self.base_dir).replace("\\", "/")
+        functions = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                code = f.read()
+            functions = {
+                tool["name"]: _tool_info(tool, module_key, file_path)
+                for tool in extract_tools(code)
+            }
+        except (OSError, SyntaxError, ValueError) as e:
+            mcp_logger.error(f"解析工具模块 {module_key} 时出错: {e}")
+        self._parsed_files += 1
+        return _IndexedFile(stat.st_mtime_ns, stat.st_size, functions)
+
+    def _rebuild_functions(self) -> None:
+        functions = {}
+        for path in sorted(self._files):
+            functions.update(self._files[path].functions)
+        self._functions = functions
+
+    def _sync_registered(self) -> None:
+        """从 MCP 工具管理器读取已注册的工具名"""
+        from app.server import mcp_runtime_server
+
+        server = mcp_runtime_server.server_instance
+        registered = set()
+        try:
+            if server is not None and hasattr(server, "_tool_manager"):
+                registered = {
+                    tool.name for tool in server._tool_manager.list_tools()
+                }
+            else:
+                mcp_logger.warning("MCP服务器实例不存在或未初始化")
+        except Exception as e:
+            mcp_logger.error(f"获取已注册工具列表时出错: {e}")
+        self._registered = registered
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        检查文件变化并更新索引，只解析新增或 mtime/size 变化的文件
+
+        Returns:
+            Dict: files（文件数）、parsed（本次解析数）、removed（移除数）
+        """
+        with self._lock:
+            current = self._list_files()
+            parsed = 0
+            for path, stat in current.items():
+                indexed = self._files.get(path)
+                if (indexed is None or indexed.mtime_ns != stat.st_mtime_ns
+                        or indexed.size != stat.st_size):
+                    self._files[path] = self._parse_file(path, stat)
+                    parsed += 1
+            removed = [path for path in self._files if path not in current]
+            for path in removed:
+                del self._files[path]
+            if parsed or removed or not self._built:
+                self._rebuild_functions()
+            self._sync_registered()
+            self._built = True
+            self._refreshes += 1
+            return {"files": len(self._files), "parsed": parsed,
+                    "removed": len(removed)}
+
+    def reload(self) -> Dict[str, int]:
+        """丢弃索引并全量重建"""
+        with self._lock:
+            self._files.clear()
+            self._functions = {}
+            self._built = False
+            return self.refresh()
+
+    def refresh_file(self, path: str) -> None:
+        """文件新增、修改或删除后更新单个文件的索引"""
+        path = os.path.abspath(path)
+        with self._lock:
+            if not self._built or not self._is_tool_file(path):
+                return
+            try:
+                stat = os.stat(path)
+            except OSError:
+                if self._files.pop(path, None) is not None:
+                    self._rebuild_functions()
+                return
+            self._files[path] = self._parse_file(path, stat)
+            self._rebuild_functions()
+
+    def _ensure_built(self) -> None:
+        if not self._built:
+            self.refresh()
+
+    def get(self, tool_name: str) -> Optional[Dict[str, Any]]:
+        """
+        获取已注册工具的信息
+
+        Args:
+            tool_name: 工具名称
+
+        Returns:
+            Optional[Dict]: 工具信息，工具未注册或不在 repository 中时为 None
+        """
+        self._ensure_built()
+        if tool_name not in self._registered:
+            # 不经过 add_tool 注册的工具，重新读取一次已注册工具名
+            with self._lock:
+                self._sync_registered()
+        if tool_name not in self._registered:
+            return None
+        tool = self._functions.get(tool_name)
+        return dict(tool) if tool else None
+
+    def get_registered_tools(self) -> Dict[str, Dict[str, Any]]:
+        """获取所有已注册工具的信息，按工具名索引"""
+        self._ensure_built()
+        functions = self._functions
+        return {
+            name: dict(functions[name])
+            for name in sorted(self._registered) if name in functions
+        }
+
+    def on_tool_added(self, tool_name: str, func: Callable) -> None:
+        """工具注册事件，函数来自 repository 时同时更新其所在文件的索引"""
+        with self._lock:
+            if not self._built:
+                return
+            self._registered.add(tool_name)
+            try:
+                source_file = inspect.getsourcefile(func)
+            except TypeError:
+                source_file = None
+            if source_file:
+                path = os.path.abspath(source_file)
+                indexed = self._files.get(path)
+                if indexed is None or tool_name not in indexed.functions:
+                    self.refresh_file(path)
+
+    def on_tool_removed(self, tool_name: str) -> None:
+        """工具移除事件"""
+        with self._lock:
+            self._registered.discard(tool_name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取索引统计"""
+        with self._lock:
+            return {
+                "built": self._built,
+                "files": len(self._files),
+                "functions": len(self._functions),
+                "registered": len(self._registered),
+                "refreshes": self._refreshes,
+                "parsed_files": self._parsed_files,
+            }
+
+
+# 全局实例
+tool_index = ToolIndex(settings.MCP_BASE_DIR)
@@ -0,0 +1,202 @@
+"""
+批量写入器基类
+
+请求路径上只把记录放入有界队列，后台线程每隔 `flush_interval_ms`
+或攒够 `batch_size` 条时调用 `write` 批量落库。队列满时直接丢弃记录
+（不阻塞请求）并计数；`write` 抛出异常时该批记录丢弃并计入失败数。
+"""
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.utils.logging import mcp_logger
+
+# 唤醒写入线程的哨兵
+_WAKEUP = object()
+
+
+class BatchWriter:
+    """有界队列 + 后台线程的批量写入器，子类实现 `write`"""
+
+    def __init__(self, name: str, queue_size: int = 10000,
+                 batch_size: int = 500, flush_interval_ms: int = 1000):
+        """
+        初始化写入器
+
+        Args:
+            name: 写入器名称，用于日志和线程名
+            queue_size: 队列容量
+            batch_size: 单批最大写入条数
+            flush_interval_ms: 写入间隔（毫秒）
+        """
+        self.name = name
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self.queue_size = queue_size
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(flush_interval_ms, 10) / 1000.0
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+        # 运行计数
+        self._enqueued = 0
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._batches = 0
+        self._last_flush_at: Optional[datetime] = None
+        self._last_error: Optional[str] = None
+
+    def write(self, batch: List[Any]) -> None:
+        """
+        写入一批记录，由后台线程调用
+
+        每个写入周期都会调用一次，`batch` 可能为空，子类可借此写回
+        其他累积数据。
+
+        Args:
+            batch: 本批记录
+        """
+        raise NotImplementedError
+
+    def start(self) -> None:
+        """启动后台写入线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run, name=f"batch-writer-{self.name}",
+                daemon=True)
+            self._thread.start()
+        mcp_logger.info(
+            f"{self.name}写入器已启动，批量: {self.batch_size}，"
+            f"间隔: {int(self.flush_interval * 1000)}ms")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        停止后台写入线程，并写完队列中剩余的记录
+
+        Args:
+            timeout: 等待线程退出的最长时间（秒）
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        self._stop_event.set()
+        if thread and thread.is_alive():
+            try:
+                self._queue.put_nowait(_WAKEUP)
+            except queue.Full:
+                pass
+            thread.join(timeout)
+        else:
+            # 线程未运行时在当前线程写完
+            self._drain_all()
+
+    def submit(self, record: Any) -> bool:
+        """
+        提交一条记录，不阻塞
+
+        Args:
+            record: 待写入的记录
+
+        Returns:
+            bool: 是否成功入队，队列已满时返回 False
+        """
+        if self._thread is None and not self._stop_event.is_set():
+            self.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+                dropped = self._dropped
+            if dropped == 1 or dropped % 1000 == 0:
+                mcp_logger.warning(
+                    f"{self.name}队列已满（容量 {self.queue_size}），"
+                    f"累计丢弃 {dropped} 条")
+            return False
+        with self._lock:
+            self._enqueued += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写入器运行状态"""
+        with self._lock:
+            return {
+                "running": bool(self._thread and self._thread.is_alive()),
+                "queue_size": self.queue_size,
+                "queue_depth": self._queue.qsize(),
+                "batch_size": self.batch_size,
+                "flush_interval_ms": int(self.flush_interval * 1000),
+                "enqueued": self._enqueued,
+                "written": self._written,
+                "dropped": self._dropped,
+                "failed": self._failed,
+                "batches": self._batches,
+                "last_flush_at": (
+                    self._last_flush_at.strftime("%Y-%m-%d %H:%M:%S")
+                    if self._last_flush_at else None
+                ),
+                "last_error": self._last_error,
+            }
+
+    def _run(self) -> None:
+        """后台写入循环"""
+        while not self._stop_event.is_set():
+            self._flush(self._collect())
+        self._drain_all()
+
+    def _collect(self) -> List[Any]:
+        """收集一批记录，攒够 batch_size 条或到达写入间隔即返回"""
+        batch: List[Any] = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _WAKEUP:
+                break
+            batch.append(item)
+        return batch
+
+    def _drain_all(self) -> None:
+        """写完队列中剩余的全部记录"""
+        while True:
+            batch: List[Any] = []
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _WAKEUP:
+                    batch.append(item)
+            self._flush(batch)
+            if self._queue.empty():
+                return
+
+    def _flush(self, batch: List[Any]) -> None:
+        """调用 `write` 写入一批记录并更新计数"""
+        try:
+            self.write(batch)
+        except Exception as e:
+            with self._lock:
+                self._failed += len(batch)
+                self._last_error = str(e)
+            mcp_logger.error(
+                f"{self.name}批量写入失败，丢弃 {len(batch)} 条: {str(e)}")
+            return
+
+        if batch:
+            with self._lock:
+                self._written += len(batch)
+                self._batches += 1
+                self._last_flush_at = datetime.now()
@@ -81,7 +81,8 @@ def log_api_call(
     response: Optional[Response] = None,
     error: Optional[Exception] = None,
     logger: Optional[logging.Logger] = None,
-    start_time: Optional[float] = None
+    start_time: Optional[float] = None,
+    status_code: Optional[int] = None
 ) -> None:
     """
     记录 API 调用日志
@@ -92,6 +93,7 @@ def log_api_call(
         error: 异常对象
         logger: 日志记录器，如果为None则使用默认的mcp_logger
         start_time: 请求开始时间戳，用于计算处理耗时
+        status_code: 响应状态码，未传入响应对象时使用
     """
     if logger is None:
         logger = mcp_logger
@@ -103,7 +105,9 @@ def log_api_call(
             message += f" 查询参数: {request.query_params}"
 
     if response:
-        message += f" 响应状态码: {response.status_code}"
+        status_code = response.status_code
+    if status_code is not None:
+        message += f" 响应状态码: {status_code}"
 
     # 计算处理耗时
     if start_time is not None:
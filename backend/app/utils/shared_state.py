@@ -0,0 +1,626 @@
+"""
+多进程/多节点共享状态
+
+uvicorn 多进程或多节点部署时，登录缓存和已发布服务的路由都是进程内的，
+一个进程发布的服务其他进程看不到。`shared_state` 提供两部分能力：
+
+- 缓存：接口与 `MemoryCache` 相同（get/set/delete/clear/clean_expired），
+  登录令牌等缓存写入这里，各进程共享；另有 `get_or_set`（不存在时写入）
+  和 `incr`（原子累加整数），用于跨进程的一次性初始化和计数；
+- 变更通知：`notify(channel, payload)` 写入事件流，各进程的
+  `listen()` 按 `poll_interval` 轮询读取其他进程发出的事件，交给
+  `subscribe` 注册的回调（回调在线程中执行，可做同步的数据库和网络
+  IO）；另按 `resync_interval` 调用 `on_resync` 注册的回调做一次全量
+  对齐，事件丢失时也能在有限时间内收敛。
+
+后端由 `shared_state.backend` 选择：
+
+- `local`（默认）：进程内缓存，不产生事件，单进程部署与改造前一致；
+- `sqlite`：共享的 SQLite 文件（WAL），适用于同一台机器上的多个进程；
+- `redis`：Redis 协议（RESP），可用 Redis 或任何兼容 RESP 的服务，
+  事件流使用 Stream（XADD / XREAD），适用于多节点。
+
+缓存值需可 JSON 序列化。
+"""
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from app.core.config import settings
+from app.utils.cache import MemoryCache
+from app.utils.logging import mcp_logger
+
+# 当前进程标识，读取事件时跳过本进程发出的事件
+INSTANCE_ID = uuid.uuid4().hex
+
+# 单次轮询读取的事件数上限
+_EVENT_BATCH_SIZE = 500
+
+
+class SharedState:
+    """共享状态后端基类"""
+
+    # 后端名称
+    backend = "base"
+    # 是否跨进程共享，False 时不产生事件、不需要轮询
+    shared = True
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable[[Dict], None]]] = {}
+        self._resync_callbacks: List[Callable[[], None]] = []
+        self._cursor: Any = None
+        self._published = 0
+        self._received = 0
+        self._errors = 0
+        self._last_poll_at: Optional[float] = None
+        self._last_resync_at: Optional[float] = None
+
+    # ---- 缓存接口，与 MemoryCache 一致 ----
+    # 后端不可用时记录日志并按未命中处理，不影响登录等调用方
+
+    def get(self, key: str) -> Optional[Any]:
+        return self._safe_call("读取缓存", self._get, key)
+
+    def set(self, key: str, value: Any, expire_seconds: int = 3600) -> None:
+        self._safe_call("写入缓存", self._set, key, value, expire_seconds)
+
+    def delete(self, key: str) -> bool:
+        return bool(self._safe_call("删除缓存", self._delete, key))
+
+    def clear(self) -> None:
+        self._safe_call("清空缓存", self._clear)
+
+    def clean_expired(self) -> int:
+        return self._safe_call("清理过期缓存", self._clean_expired) or 0
+
+    def get_or_set(self, key: str, value: Any,
+                   expire_seconds: int = 0) -> Optional[Any]:
+        """键不存在时写入，返回最终保存的值；多个进程并发调用时结果一致
+
+        Args:
+            key: 缓存键
+            value: 键不存在时写入的值
+            expire_seconds: 过期时间（秒），0 表示不过期
+        """
+        return self._safe_call("写入缓存", self._get_or_set, key, value,
+                               expire_seconds)
+
+    def incr(self, key: str, amount: int = 1,
+             expire_seconds: int = 0) -> Optional[int]:
+        """原子累加整数值，键不存在时从 0 开始，返回累加后的值
+
+        Args:
+            key: 缓存键
+            amount: 累加量，0 表示只读取当前值
+            expire_seconds: 键不存在时新建的过期时间（秒），0 表示不过期
+
+        Returns:
+            累加后的值，后端不可用时返回None
+        """
+        return self._safe_call("累加计数", self._incr, key, amount,
+                               expire_seconds)
+
+    def _safe_call(self, action: str, func: Callable, *args: Any) -> Any:
+        try:
+            return func(*args)
+        except Exception as e:
+            self._errors += 1
+            mcp_logger.error(f"共享状态{action}失败: {str(e)}")
+            return None
+
+    def _get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: Any, expire_seconds: int) -> None:
+        raise NotImplementedError
+
+    def _delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def _clear(self) -> None:
+        raise NotImplementedError
+
+    def _clean_expired(self) -> int:
+        raise NotImplementedError
+
+    def _get_or_set(self, key: str, value: Any, expire_seconds: int) -> Any:
+        raise NotImplementedError
+
+    def _incr(self, key: str, amount: int, expire_seconds: int) -> int:
+        raise NotImplementedError
+
+    # ---- 事件流，由子类实现 ----
+
+    def _append_event(self, channel: str, payload: str) -> None:
+        """写入一条事件"""
+        raise NotImplementedError
+
+    def _read_events(self, cursor: Any) -> Tuple[List[Tuple[str, Dict]], Any]:
+        """读取游标之后的事件，返回 ([(channel, event)], 新游标)"""
+        raise NotImplementedError
+
+    def _latest_cursor(self) -> Any:
+        """事件流当前末尾的游标，监听从这里开始"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """关闭连接"""
+
+    # ---- 订阅与通知 ----
+
+    def subscribe(self, channel: str,
+                  callback: Callable[[Dict], None]) -> None:
+        """注册事件回调，回调在 `listen` 的工作线程中按事件顺序执行，参数为事件内容"""
+        self._subscribers.setdefault(channel, []).append(callback)
+
+    def on_resync(self, callback: Callable[[], None]) -> None:
+        """注册全量对齐回调"""
+        self._resync_callbacks.append(callback)
+
+    def notify(self, channel: str, payload: Dict[str, Any]) -> None:
+        """
+        通知其他进程
+
+        通知失败只记录日志，不影响调用方；其他进程在下一次全量对齐时收敛。
+
+        Args:
+            channel: 频道，如 "services"
+            payload: 事件内容，需可 JSON 序列化
+        """
+        if not self.shared:
+            return
+        try:
+            self._append_event(channel, json.dumps(
+                {"origin": INSTANCE_ID, "payload": payload}))
+            self._published += 1
+        except Exception as e:
+            self._errors += 1
+            mcp_logger.error(f"发送共享状态事件失败 {channel}: {str(e)}")
+
+    def poll(self) -> List[Tuple[str, Dict]]:
+        """读取其他进程发出的新事件（阻塞调用，在线程中执行）"""
+        if self._cursor is None:
+            self._cursor = self._latest_cursor()
+            return []
+        events, self._cursor = self._read_events(self._cursor)
+        self._last_poll_at = time.time()
+        return [
+            (channel, event["payload"]) for channel, event in events
+            if event.get("origin") != INSTANCE_ID
+        ]
+
+    def _poll_and_dispatch(self) -> None:
+        """读取新事件并依次分发（在线程中执行）"""
+        for channel, payload in self.poll():
+            self.dispatch(channel, payload)
+
+    def dispatch(self, channel: str, payload: Dict) -> None:
+        """调用频道的全部回调"""
+        self._received += 1
+        for callback in self._subscribers.get(channel, []):
+            try:
+                callback(payload)
+            except Exception as e:
+                self._errors += 1
+                mcp_logger.error(
+                    f"处理共享状态事件失败 {channel} {payload}: {str(e)}")
+
+    def resync(self) -> None:
+        """调用全部全量对齐回调"""
+        self._last_resync_at = time.time()
+        for callback in self._resync_callbacks:
+            try:
+                callback()
+            except Exception as e:
+                self._errors += 1
+                mcp_logger.error(f"共享状态全量对齐失败: {str(e)}")
+
+    async def listen(self, poll_interval: float = 1.0,
+                     resync_interval: float = 60.0) -> None:
+        """
+        轮询事件并分发，直到任务被取消
+
+        读取事件、执行回调和全量对齐都放到线程中执行，回调里的数据库查询、
+        服务创建和工作进程控制调用不会阻塞事件循环。
+
+        Args:
+            poll_interval: 轮询间隔（秒），即其他进程变更的最大传播延迟
+            resync_interval: 全量对齐间隔（秒），0 表示不做全量对齐
+        """
+        # 首次轮询确定游标后立即全量对齐一次，补上启动加载到开始监听之间的变更
+        next_resync = time.monotonic()
+        while True:
+            try:
+                await asyncio.to_thread(self._poll_and_dispatch)
+            except Exception as e:
+                self._errors += 1
+                mcp_logger.error(f"读取共享状态事件失败: {str(e)}")
+            if resync_interval > 0 and time.monotonic() >= next_resync:
+                next_resync = time.monotonic() + resync_interval
+                await asyncio.to_thread(self.resync)
+            await asyncio.sleep(poll_interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取后端状态"""
+        return {
+            "backend": self.backend,
+            "instance_id": INSTANCE_ID,
+            "published": self._published,
+            "received": self._received,
+            "errors": self._errors,
+            "last_poll_at": self._last_poll_at,
+            "last_resync_at": self._last_resync_at,
+        }
+
+
+class LocalSharedState(MemoryCache, SharedState):
+    """进程内后端，单进程部署使用，不产生事件"""
+
+    backend = "local"
+    shared = False
+
+    def __init__(self):
+        MemoryCache.__init__(self)
+        SharedState.__init__(self)
+
+
+class SqliteSharedState(SharedState):
+    """SQLite 文件后端，同一台机器上的多个进程共享"""
+
+    backend = "sqlite"
+
+    def __init__(self, path: str, event_retention: int = 10000):
+        """
+        初始化 SQLite 后端
+
+        Args:
+            path: 数据库文件路径
+            event_retention: 事件表保留的事件条数
+        """
+        super().__init__()
+        self.path = path
+        self.event_retention = max(100, event_retention)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expire_at REAL NOT NULL)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, "
+            "data TEXT NOT NULL, created_at REAL NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        """当前线程的连接，自动提交模式"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10,
+                                   isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, key: str) -> Optional[Any]:
+        row = self._conn().execute(
+            "SELECT value, expire_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] > 0 and row[1] < time.time():
+            self._delete(key)
+            return None
+        return json.loads(row[0])
+
+    def _set(self, key: str, value: Any, expire_seconds: int) -> None:
+        expire_at = time.time() + expire_seconds if expire_seconds > 0 else 0
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expire_at) "
+            "VALUES (?, ?, ?)",
+            (key, json.dumps(value, default=str), expire_at))
+
+    def _delete(self, key: str) -> bool:
+        cursor = self._conn().execute(
+            "DELETE FROM cache WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+
+    def _clear(self) -> None:
+        self._conn().execute("DELETE FROM cache")
+
+    def _clean_expired(self) -> int:
+        cursor = self._conn().execute(
+            "DELETE FROM cache WHERE expire_at > 0 AND expire_at < ?",
+            (time.time(),))
+        return cursor.rowcount
+
+    def _get_or_set(self, key: str, value: Any, expire_seconds: int) -> Any:
+        now = time.time()
+        expire_at = now + expire_seconds if expire_seconds > 0 else 0
+        conn = self._conn()
+        conn.execute(
+            "DELETE FROM cache WHERE key = ? AND expire_at > 0 "
+            "AND expire_at < ?", (key, now))
+        conn.execute(
+            "INSERT OR IGNORE INTO cache (key, value, expire_at) "
+            "VALUES (?, ?, ?)",
+            (key, json.dumps(value, default=str), expire_at))
+        row = conn.execute(
+            "SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0])
+
+    def _incr(self, key: str, amount: int, expire_seconds: int) -> int:
+        now = time.time()
+        conn = self._conn()
+        # 读取和写入放在同一个写事务中，其他进程的累加排队等待
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, expire_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] > 0 and row[1] < now):
+                value = amount
+                expire_at = now + expire_seconds if expire_seconds > 0 else 0
+            else:
+                value = int(json.loads(row[0])) + amount
+                expire_at = row[1]
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expire_at) "
+                "VALUES (?, ?, ?)", (key, json.dumps(value), expire_at))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def _append_event(self, channel: str, payload: str) -> None:
+        conn = self._conn()
+        event_id = conn.execute(
+            "INSERT INTO events (channel, data, created_at) VALUES (?, ?, ?)",
+            (channel, payload, time.time())).lastrowid
+        if event_id % 100 == 0:
+            conn.execute("DELETE FROM events WHERE id <= ?",
+                         (event_id - self.event_retention,))
+
+    def _read_events(self, cursor: int) -> Tuple[List[Tuple[str, Dict]], int]:
+        rows = self._conn().execute(
+            "SELECT id, channel, data FROM events WHERE id > ? "
+            "ORDER BY id LIMIT ?", (cursor, _EVENT_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            return [], cursor
+        return [(row[1], json.loads(row[2])) for row in rows], rows[-1][0]
+
+    def _latest_cursor(self) -> int:
+        return self._conn().execute(
+            "SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**super().get_stats(), "path": self.path}
+
+
+class RespError(RuntimeError):
+    """RESP 服务返回的错误"""
+
+
+class _RespConnection:
+    """RESP2 协议连接，只实现共享状态需要的命令"""
+
+    def __init__(self, host: str, port: int, password: Optional[str],
+                 db: int, timeout: float):
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._file = self._sock.makefile("rb")
+        if password:
+            self.command("AUTH", password)
+        if db:
+            self.command("SELECT", db)
+
+    def command(self, *args: Any) -> Any:
+        """发送命令并读取回复"""
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+        self._sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self) -> Any:
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("连接已关闭")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RespError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)
+            return data[:-2].decode()
+        if kind == b"*":
+            length = int(rest)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise ConnectionError(f"无法解析的回复: {line!r}")
+
+    def close(self) -> None:
+        try:
+            self._file.close()
+            self._sock.close()
+        except OSError:
+            pass
+
+
+class RedisSharedState(SharedState):
+    """Redis 协议后端，多节点共享"""
+
+    backend = "redis"
+
+    def __init__(self, url: str, key_prefix: str = "mcp:",
+                 event_retention: int = 10000, timeout: float = 5.0):
+        """
+        初始化 Redis 后端
+
+        Args:
+            url: 连接地址，如 redis://:password@127.0.0.1:6379/0
+            key_prefix: 键前缀，多套部署共用一个 Redis 时区分
+            event_retention: 事件流保留的大致条数
+            timeout: 连接和读写超时（秒）
+        """
+        super().__init__()
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"不支持的共享状态地址: {url}")
+        self.url = url
+        self._host = parsed.hostname or "127.0.0.1"
+        self._port = parsed.port or 6379
+        self._password = unquote(parsed.password) if parsed.password else None
+        self._db = int(parsed.path.lstrip("/") or 0)
+        self._timeout = timeout
+        self.key_prefix = key_prefix
+        self.event_retention = max(100, event_retention)
+        self._events_key = f"{key_prefix}events"
+        self._local = threading.local()
+
+    def _command(self, *args: Any) -> Any:
+        """在当前线程的连接上执行命令，连接断开时重连一次"""
+        for attempt in range(2):
+            conn = getattr(self._local, "conn", None)
+            try:
+                if conn is None:
+                    conn = _RespConnection(self._host, self._port,
+                                           self._password, self._db,
+                                           self._timeout)
+                    self._local.conn = conn
+                return conn.command(*args)
+            except (ConnectionError, OSError):
+                if conn is not None:
+                    conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+    def _get(self, key: str) -> Optional[Any]:
+        value = self._command("GET", self.key_prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def _set(self, key: str, value: Any, expire_seconds: int) -> None:
+        args = ["SET", self.key_prefix + key, json.dumps(value, default=str)]
+        if expire_seconds > 0:
+            args += ["EX", int(expire_seconds)]
+        self._command(*args)
+
+    def _delete(self, key: str) -> bool:
+        return self._command("DEL", self.key_prefix + key) > 0
+
+    def _clear(self) -> None:
+        cursor = "0"
+        while True:
+            cursor, keys = self._command(
+                "SCAN", cursor, "MATCH", f"{self.key_prefix}*",
+                "COUNT", 500)
+            keys = [k for k in keys if k != self._events_key]
+            if keys:
+                self._command("DEL", *keys)
+            if cursor == "0":
+                break
+
+    def _clean_expired(self) -> int:
+        # 过期由 Redis 处理
+        return 0
+
+    def _get_or_set(self, key: str, value: Any, expire_seconds: int) -> Any:
+        args = ["SET", self.key_prefix + key,
+                json.dumps(value, default=str), "NX"]
+        if expire_seconds > 0:
+            args += ["EX", int(expire_seconds)]
+        self._command(*args)
+        return self._get(key)
+
+    def _incr(self, key: str, amount: int, expire_seconds: int) -> int:
+        value = self._command("INCRBY", self.key_prefix + key, int(amount))
+        # 新建的键设置过期时间；累加量为 0 时新建的键值也为 0
+        if expire_seconds > 0 and value == amount:
+            self._command("EXPIRE", self.key_prefix + key,
+                          int(expire_seconds))
+        return int(value)
+
+    def _append_event(self, channel: str, payload: str) -> None:
+        self._command("XADD", self._events_key, "MAXLEN", "~",
+                      self.event_retention, "*",
+                      "channel", channel, "data", payload)
+
+    def _read_events(self, cursor: str) -> Tuple[List[Tuple[str, Dict]], str]:
+        reply = self._command("XREAD", "COUNT", _EVENT_BATCH_SIZE,
+                              "STREAMS", self._events_key, cursor)
+        if not reply:
+            return [], cursor
+        events = []
+        for entry_id, fields in reply[0][1]:
+            data = dict(zip(fields[::2], fields[1::2]))
+            events.append((data["channel"], json.loads(data["data"])))
+            cursor = entry_id
+        return events, cursor
+
+    def _latest_cursor(self) -> str:
+        reply = self._command("XREVRANGE", self._events_key, "+", "-",
+                              "COUNT", 1)
+        return reply[0][0] if reply else "0-0"
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**super().get_stats(),
+                "server": f"{self._host}:{self._port}/{self._db}"}
+
+
+def create_shared_state() -> SharedState:
+    """按 `shared_state.*` 配置创建共享状态后端"""
+    backend = settings.SHARED_STATE_BACKEND
+    if backend == "sqlite":
+        path = settings.SHARED_STATE_SQLITE_PATH
+        if not os.path.isabs(path):
+            path = os.path.join(settings.MCP_BASE_DIR, path)
+        return SqliteSharedState(
+            path, event_retention=settings.SHARED_STATE_EVENT_RETENTION)
+    if backend == "redis":
+        return RedisSharedState(
+            settings.SHARED_STATE_REDIS_URL,
+            key_prefix=settings.SHARED_STATE_KEY_PREFIX,
+            event_retention=settings.SHARED_STATE_EVENT_RETENTION)
+    if backend != "local":
+        mcp_logger.warning(f"未知的共享状态后端 {backend}，使用进程内缓存")
+    return LocalSharedState()
+
+
+# 全局共享状态实例
+shared_state = create_shared_state()
+if shared_state.shared and not settings.JWT_SECRET_KEY_CONFIGURED:
+    # 未配置 jwt.secret_key 时各进程随机生成的密钥不同，一个进程签发的令牌
+    # 在其他进程校验失败，改用共享状态中第一个进程写入的密钥
+    settings.JWT_SECRET_KEY = (
+        shared_state.get_or_set("jwt_secret_key", settings.JWT_SECRET_KEY)
+        or settings.JWT_SECRET_KEY
+    )
@@ -0,0 +1,203 @@
+"""
+模板代码内存加载器
+
+发布服务、扫描模板时需要把数据库中的模板代码当作 Python 模块执行。以前
+每次都 `tempfile.mkdtemp` 写一个临时文件并把目录插到 `sys.path[0]`，临时
+目录和 `sys.path` 条目都不清理，`sys.path` 随发布次数增长，进程内每次
+import 都要多扫描这些目录。
+
+`TemplateModuleLoader` 是安装在 `sys.meta_path` 上的 finder/loader：
+
+- 模板代码按内容（替换配置参数后的最终代码）的 sha256 寻址，模块名为
+  `mcp_templates.<模板名>_<摘要前缀>`，源码和编译后的代码对象缓存在
+  内存中（LRU，`template_loader.cache_size`），同一模板发布 N 次只编译
+  一次；
+- `load` 每次返回新的模块对象并执行代码，服务之间的模块级状态互不影响，
+  模块不放入 `sys.modules`；
+- 实现 `get_source` 并登记到 `linecache`，`inspect.getsource` 和异常
+  堆栈能显示模板源码。
+
+不再写临时文件，也不修改 `sys.path`。
+"""
+import hashlib
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import linecache
+import re
+import sys
+import threading
+from collections import OrderedDict
+from types import CodeType, ModuleType
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+# 模板模块所在的虚拟包
+PACKAGE_NAME = "mcp_templates"
+# 模块名中摘要的长度
+_DIGEST_LENGTH = 16
+_UNSAFE_NAME_PATTERN = re.compile(r"\W")
+
+
+class TemplateModuleLoader(importlib.abc.MetaPathFinder,
+                           importlib.abc.InspectLoader):
+    """按内容寻址的模板代码 finder/loader"""
+
+    def __init__(self, cache_size: int = 256):
+        """
+        Args:
+            cache_size: 缓存的模板代码（源码 + 代码对象）条数上限
+        """
+        self.cache_size = max(1, cache_size)
+        # 模块名 -> (源码, 代码对象)，按最近使用排序
+        self._entries: "OrderedDict[str, Tuple[str, CodeType]]" = (
+            OrderedDict())
+        self._lock = threading.Lock()
+
+        # 计数
+        self._hits = 0
+        self._misses = 0
+        self._loads = 0
+
+    def install(self) -> None:
+        """安装到 sys.meta_path 末尾，只处理 mcp_templates 包下的模块"""
+        if self not in sys.meta_path:
+            sys.meta_path.append(self)
+
+    @staticmethod
+    def module_name_for(name: str, source: str) -> str:
+        """模板代码对应的模块名：mcp_templates.<模板名>_<摘要前缀>"""
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        safe_name = _UNSAFE_NAME_PATTERN.sub("_", name) or "module"
+        return f"{PACKAGE_NAME}.{safe_name}_{digest[:_DIGEST_LENGTH]}"
+
+    def register(self, name: str, source: str) -> str:
+        """
+        登记模板代码并编译（已缓存时直接复用）
+
+        Args:
+            name: 模板名称，用于模块名和异常堆栈
+            source: 最终执行的代码（已替换配置参数）
+
+        Returns:
+            str: 模块名
+
+        Raises:
+            SyntaxError: 代码无法编译
+        """
+        return self._compile(name, source)[0]
+
+    def load(self, name: str, source: str) -> ModuleType:
+        """
+        创建并执行模板模块，每次返回新的模块对象
+
+        Args:
+            name: 模板名称
+            source: 最终执行的代码（已替换配置参数）
+
+        Returns:
+            ModuleType: 已执行的模块，`__name__` 为 register 返回的模块名
+        """
+        fullname, code = self._compile(name, source)
+        spec = importlib.util.spec_from_loader(
+            fullname, self, origin=self._filename(fullname))
+        spec.has_location = True
+        module = importlib.util.module_from_spec(spec)
+        with self._lock:
+            self._loads += 1
+        # 模块不在 sys.modules 中，登记到 linecache 后 inspect 才能取到源码
+        linecache.lazycache(spec.origin, module.__dict__)
+        exec(code, module.__dict__)
+        return module
+
+    def _compile(self, name: str, source: str) -> Tuple[str, CodeType]:
+        """返回 (模块名, 代码对象)，同一份代码只编译一次"""
+        fullname = self.module_name_for(name, source)
+        with self._lock:
+            entry = self._entries.get(fullname)
+            if entry is not None and entry[0] == source:
+                self._entries.move_to_end(fullname)
+                self._hits += 1
+                return fullname, entry[1]
+        # 编译放在锁外，并发编译同一份代码时结果相同
+        code = compile(source, self._filename(fullname), "exec",
+                       dont_inherit=True)
+        with self._lock:
+            self._misses += 1
+            self._entries[fullname] = (source, code)
+            self._entries.move_to_end(fullname)
+            while len(self._entries) > self.cache_size:
+                self._entries.popitem(last=False)
+        return fullname, code
+
+    # ---- MetaPathFinder ----
+
+    def find_spec(self, fullname: str, path: Any = None,
+                  target: Optional[ModuleType] = None):
+        if fullname == PACKAGE_NAME:
+            return importlib.machinery.ModuleSpec(
+                fullname, self, is_package=True)
+        if not fullname.startswith(PACKAGE_NAME + "."):
+            return None
+        with self._lock:
+            if fullname not in self._entries:
+                return None
+        spec = importlib.util.spec_from_loader(
+            fullname, self, origin=self._filename(fullname))
+        spec.has_location = True
+        return spec
+
+    # ---- Loader ----
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module: ModuleType) -> None:
+        if module.__name__ == PACKAGE_NAME:
+            module.__path__ = []
+            return
+        code = self.get_code(module.__name__)
+        if code is None:
+            raise ImportError(f"模板模块不存在或已过期: {module.__name__}",
+                              name=module.__name__)
+        exec(code, module.__dict__)
+
+    def is_package(self, fullname: str) -> bool:
+        return fullname == PACKAGE_NAME
+
+    def get_code(self, fullname: str) -> Optional[CodeType]:
+        with self._lock:
+            entry = self._entries.get(fullname)
+        return entry[1] if entry else None
+
+    def get_source(self, fullname: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(fullname)
+        return entry[0] if entry else None
+
+    @staticmethod
+    def _filename(fullname: str) -> str:
+        # 不能用 <...> 形式，否则 linecache 不会向 loader 取源码
+        return fullname.replace(".", "/") + ".py"
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中和加载计数"""
+        with self._lock:
+            return {
+                "cached": len(self._entries),
+                "cache_size": self.cache_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "loads": self._loads,
+            }
+
+
+# 全局实例
+template_loader = TemplateModuleLoader(settings.TEMPLATE_CODE_CACHE_SIZE)
+template_loader.install()
@@ -0,0 +1,181 @@
+"""
+耗时分位数基准
+
+在 SQLite 数据库中生成最近 30 天的 `--rows` 条工具执行记录（默认 100 万条，
+`--services` 个服务，每个服务 `--tools-per-service` 个工具，耗时为对数正态
+分布），写入分钟 / 小时 / 天耗时直方图后，对比三种范围的 p50 / p90 / p95 /
+p99 查询：
+
+- raw：读取范围内全部耗时，排序后取分位数；
+- histogram：`StatisticsService.get_latency_percentiles` 合并直方图。
+
+输出两者耗时和 histogram 相对 raw 的最大误差（分桶误差上限约 3%），并输出
+直方图表行数。
+
+用法（在 backend 目录的 Python 环境中执行）：
+
+    python ../scripts/benchmarks/latency_percentiles.py
+    python ../scripts/benchmarks/latency_percentiles.py --rows 5000000
+"""
+import argparse
+import logging
+import math
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+)
+sys.path.insert(0, BACKEND_DIR)
+
+_BATCH = 100000
+_PERCENTILES = (50, 90, 95, 99)
+
+
+def configure(db_path: str) -> None:
+    """把数据库指向基准文件，需在导入业务模块前调用"""
+    from app.core.config import settings
+    settings.DATABASE_TYPE = "sqlite"
+    settings.DATABASE_FILE = db_path
+    settings.DEBUG = False
+    # 生成的最新记录接近当前时间，汇总不留写入余量，与直接查询的结果可比
+    settings.STATISTICS_WATERMARK_LAG = 0
+    # 查询前不触发增量汇总，只测量读取
+    settings.STATISTICS_ROLLUP_MAX_STALENESS = 0
+
+
+def generate(db_path: str, rows: int, services: int,
+             tools_per_service: int, now: datetime) -> None:
+    """建表并生成最近 30 天的工具执行记录"""
+    from app.models.engine import init_db
+    init_db()
+    rng = random.Random(42)
+    start = now - timedelta(days=30)
+    pairs = [
+        (f"bench-service-{service:04d}",
+         f"bench_tool_{service:04d}_{tool:02d}")
+        for service in range(services) for tool in range(tools_per_service)
+    ]
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=OFF")
+    for offset in range(0, rows, _BATCH):
+        batch = []
+        for index in range(offset, min(offset + _BATCH, rows)):
+            service_id, tool_name = rng.choice(pairs)
+            batch.append((
+                service_id, tool_name, "success",
+                # 与 SQLAlchemy 写入 SQLite 的时间格式一致
+                (start + timedelta(seconds=index * 2592000 // rows)).strftime(
+                    "%Y-%m-%d %H:%M:%S.%f"),
+                # 中位数约 150ms 的长尾分布
+                min(int(rng.lognormvariate(5, 1)), 600000),
+            ))
+        connection.executemany(
+            "INSERT INTO tool_executions (service_id, tool_name, status, "
+            "created_at, execution_time) VALUES (?, ?, ?, ?, ?)", batch)
+        connection.commit()
+    connection.close()
+
+
+def raw_percentiles(start: datetime, end: datetime,
+                    tool_name: str = None) -> dict:
+    """读取范围内全部耗时并排序取分位数"""
+    from app.models.engine import get_db
+    from app.models.tools.tool_execution import ToolExecution
+
+    with get_db() as db:
+        query = db.query(ToolExecution.execution_time).filter(
+            ToolExecution.created_at >= start,
+            ToolExecution.created_at < end,
+            ToolExecution.execution_time.isnot(None),
+        )
+        if tool_name:
+            query = query.filter(ToolExecution.tool_name == tool_name)
+        values = sorted(value for (value,) in query)
+    return {
+        f"p{percent}": values[max(1, math.ceil(len(values) * percent / 100))
+                              - 1] if values else 0
+        for percent in _PERCENTILES
+    }
+
+
+def histogram_percentiles(start: datetime, end: datetime,
+                          tool_name: str = None) -> dict:
+    from app.services.statistics.service import statistics_service
+    result = statistics_service.get_latency_percentiles(
+        start=start, end=end, tool_name=tool_name, percentiles=_PERCENTILES)
+    return result["percentiles"]
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="耗时分位数基准")
+    parser.add_argument("--rows", type=int, default=1000000,
+                        help="工具执行记录数，默认 100 万")
+    parser.add_argument("--services", type=int, default=50,
+                        help="服务数，默认 50")
+    parser.add_argument("--tools-per-service", type=int, default=5,
+                        help="每个服务的工具数，默认 5")
+    args = parser.parse_args()
+
+    db_path = os.path.join(
+        tempfile.mkdtemp(prefix="mcp-bench-latency-"), "mcp.db")
+    configure(db_path)
+    from pytz import timezone
+    from app.utils.logging import mcp_logger
+    mcp_logger.setLevel(logging.ERROR)
+
+    now = datetime.now(timezone("Asia/Shanghai")).replace(
+        tzinfo=None, minute=0, second=0, microsecond=0)
+    print(f"生成 {args.rows} 条工具执行记录: {db_path}")
+    generate(db_path, args.rows, args.services, args.tools_per_service, now)
+
+    from app.models.engine import get_db
+    from app.models.statistics import (
+        LatencyHistogramDay, LatencyHistogramHour, LatencyHistogramMinute
+    )
+    from app.services.statistics.service import statistics_service
+    _, elapsed = timed(statistics_service.update_call_statistics, True)
+    with get_db() as db:
+        sizes = {
+            model.__tablename__: db.query(model).count()
+            for model in (LatencyHistogramMinute, LatencyHistogramHour,
+                          LatencyHistogramDay)
+        }
+    print(f"全量汇总 {elapsed / 1000:.1f}s，直方图表行数 {sizes}")
+
+    # 生成的数据截止到 now
+    end = now
+    cases = [
+        ("最近 1 小时", end - timedelta(hours=1), end, None),
+        ("最近 1 天", end - timedelta(days=1), end, None),
+        ("30 天", (end - timedelta(days=30)).replace(hour=0), end, None),
+        ("30 天 / 单工具", (end - timedelta(days=30)).replace(hour=0), end,
+         "bench_tool_0000_00"),
+    ]
+    for label, start, stop, tool_name in cases:
+        raw, raw_ms = timed(raw_percentiles, start, stop, tool_name)
+        histogram, histogram_ms = timed(
+            histogram_percentiles, start, stop, tool_name)
+        error = max(
+            (abs(histogram[key] - raw[key]) / raw[key] if raw[key] else 0)
+            for key in raw
+        )
+        print(f"{label:<12} raw {raw_ms:>8.1f}ms  histogram "
+              f"{histogram_ms:>7.1f}ms  p99 {raw['p99']} / {histogram['p99']}"
+              f"  最大误差 {error:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+MCP 中间件栈单请求开销基准
+
+对比三种 4 层中间件栈在 1 / 100 / 1000 条并发 SSE 长连接下的开销：
+
+- legacy：4 个透传的 `BaseHTTPMiddleware`（改造前的中间件基类，
+  不含业务逻辑，代表改造前栈的框架开销下限）；
+- asgi：4 个透传的纯 ASGI 中间件（框架开销基线）；
+- current：当前仓库中的 AuthMiddleware、APILoggingMiddleware、
+  ToolExecutionMiddleware、McpAuthMiddleware。
+
+直接在进程内调用 ASGI 应用，不经过网络和 uvicorn。统计：
+
+- ping：SSE 长连接保持期间，普通 API 请求的端到端耗时；
+- sse：SSE 事件从端点发出到最外层 send 收到的延迟。
+
+用法（在 backend 目录的 Python 环境中执行）：
+
+    python ../scripts/benchmarks/middleware_overhead.py
+    python ../scripts/benchmarks/middleware_overhead.py --streams 1 100 --requests 500
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+)
+sys.path.insert(0, BACKEND_DIR)
+
+import jwt as pyjwt  # noqa: E402
+from starlette.applications import Starlette  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.middleware.auth import AuthMiddleware  # noqa: E402
+from app.middleware.logging_middleware import APILoggingMiddleware  # noqa: E402
+from app.middleware.mcp_auth_middleware import McpAuthMiddleware  # noqa: E402
+from app.middleware.tool_execution_middleware import (  # noqa: E402
+    ToolExecutionMiddleware
+)
+from app.services.published_service.service_index import (  # noqa: E402
+    service_index
+)
+from app.utils.logging import mcp_logger  # noqa: E402
+
+PING_PATH = "/api/bench/ping"
+SSE_PATH = "/mcp/bench/sse"
+
+
+class LegacyPassThrough(BaseHTTPMiddleware):
+    """透传的 BaseHTTPMiddleware"""
+
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+class AsgiPassThrough:
+    """透传的纯 ASGI 中间件"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
+
+
+class SseEndpoint:
+    """按固定间隔发送带时间戳事件的 SSE 端点，直到客户端断开"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream")],
+        })
+        disconnected = asyncio.Event()
+
+        async def wait_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        watcher = asyncio.ensure_future(wait_disconnect())
+        try:
+            while not disconnected.is_set():
+                payload = f"data: {time.perf_counter()}\n\n".encode()
+                await send({"type": "http.response.body", "body": payload,
+                            "more_body": True})
+                try:
+                    await asyncio.wait_for(disconnected.wait(),
+                                           self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            await send({"type": "http.response.body", "body": b"",
+                        "more_body": False})
+        finally:
+            watcher.cancel()
+
+
+async def ping(request):
+    return JSONResponse({"code": 0})
+
+
+def build_app(stack: str, sse_interval: float) -> Starlette:
+    """构建指定中间件栈的应用"""
+    app = Starlette(routes=[
+        Route(PING_PATH, ping),
+        Route(SSE_PATH, SseEndpoint(sse_interval)),
+    ])
+    if stack == "legacy":
+        for _ in range(4):
+            app.add_middleware(LegacyPassThrough)
+    elif stack == "asgi":
+        for _ in range(4):
+            app.add_middleware(AsgiPassThrough)
+    else:
+        app.add_middleware(AuthMiddleware)
+        app.add_middleware(APILoggingMiddleware)
+        app.add_middleware(ToolExecutionMiddleware)
+        app.add_middleware(McpAuthMiddleware)
+    return app
+
+
+def make_scope(path: str, headers) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 12345),
+        "server": ("127.0.0.1", 8000),
+    }
+
+
+async def run_ping(app, headers) -> float:
+    """发送一次普通请求，返回耗时（毫秒）"""
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    await app(make_scope(PING_PATH, headers), receive, send)
+    return (time.perf_counter() - start) * 1000
+
+
+async def run_stream(app, headers, stop: asyncio.Event, latencies: list):
+    """保持一条 SSE 连接，记录每个事件的投递延迟（毫秒）"""
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await stop.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message["body"]:
+            stamp = float(message["body"][6:].strip())
+            latencies.append((time.perf_counter() - stamp) * 1000)
+
+    await app(make_scope(SSE_PATH, headers), receive, send)
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * pct / 100))
+    return values[index]
+
+
+async def bench(stack: str, streams: int, requests: int,
+                sse_interval: float, headers) -> dict:
+    app = build_app(stack, sse_interval)
+    stop = asyncio.Event()
+    sse_latencies: list = []
+    tasks = [
+        asyncio.ensure_future(run_stream(app, headers, stop, sse_latencies))
+        for _ in range(streams)
+    ]
+    # 等待所有连接建立
+    await asyncio.sleep(max(0.2, streams / 2000))
+    sse_latencies.clear()
+
+    ping_latencies = []
+    for _ in range(requests):
+        ping_latencies.append(await run_ping(app, headers))
+        # 让出事件循环，SSE 连接在请求之间继续推送事件
+        await asyncio.sleep(0)
+    # 额外采样一段时间的 SSE 投递延迟
+    await asyncio.sleep(sse_interval * 10)
+
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {
+        "ping_p50": statistics.median(ping_latencies),
+        "ping_p99": percentile(ping_latencies, 99),
+        "sse_p50": percentile(sse_latencies, 50),
+        "sse_p99": percentile(sse_latencies, 99),
+        "sse_events": len(sse_latencies),
+    }
+
+
+async def main(args):
+    # 屏蔽请求日志输出，只测量中间件本身
+    mcp_logger.setLevel(logging.WARNING)
+    service_index.load([])
+    token = pyjwt.encode({"user_id": 1, "is_admin": True},
+                         settings.JWT_SECRET_KEY, algorithm="HS256")
+    headers = [(b"authorization", f"Bearer {token}".encode()),
+               (b"user-agent", b"bench")]
+
+    print(f"{'stack':<8} {'streams':>7} {'ping p50':>10} {'ping p99':>10} "
+          f"{'sse p50':>10} {'sse p99':>10} {'events':>8}")
+    for streams in args.streams:
+        for stack in ("legacy", "asgi", "current"):
+            result = await bench(stack, streams, args.requests,
+                                 args.sse_interval, headers)
+            print(f"{stack:<8} {streams:>7} "
+                  f"{result['ping_p50']:>8.3f}ms {result['ping_p99']:>8.3f}ms "
+                  f"{result['sse_p50']:>8.3f}ms {result['sse_p99']:>8.3f}ms "
+                  f"{result['sse_events']:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MCP 中间件栈开销基准")
+    parser.add_argument("--streams", type=int, nargs="+",
+                        default=[1, 100, 1000], help="并发 SSE 连接数")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="每组普通请求次数")
+    parser.add_argument("--sse-interval", type=float, default=0.05,
+                        help="SSE 事件间隔（秒）")
+    asyncio.run(main(parser.parse_args()))
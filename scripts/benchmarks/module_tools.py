@@ -0,0 +1,125 @@
+"""
+模板工具列表解析基准
+
+对比 `get_module_tools` 的三种取工具信息的方式：
+
+- exec：旧实现，写临时文件、import 执行模板代码，再用 `inspect` 取函数
+  签名、docstring 和源码；
+- ast：`tool_metadata.extract_tools` 静态解析，不执行模板代码；
+- cached：`tool_metadata_cache.get_tools` 命中缓存（按代码内容寻址）。
+
+模板代码顶层 import 了若干标准库模块并做了少量初始化，模拟真实模板。
+
+用法（在 backend 目录的 Python 环境中执行）：
+
+    python ../scripts/benchmarks/module_tools.py
+    python ../scripts/benchmarks/module_tools.py --tools 100 --rounds 200
+"""
+import argparse
+import importlib.util
+import inspect
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+)
+sys.path.insert(0, BACKEND_DIR)
+
+
+def build_code(tools: int) -> str:
+    header = (
+        "import json\nimport datetime\nimport decimal\nimport re\n"
+        "from typing import List, Optional\n\n"
+        "PATTERN = re.compile(r'\\d+')\n"
+        "TABLE = {str(i): i * i for i in range(2000)}\n"
+    )
+    return header + "\n".join(f'''
+def tool_{index}(value: str, items: List[str] = None,
+             limit: Optional[int] = 10) -> str:
+    """工具 {index}
+
+    返回 JSON 字符串
+    """
+    data = {{"value": value, "items": items or [], "limit": limit}}
+    return json.dumps(data)
+''' for index in range(tools))
+
+
+def exec_tools(code: str, work_dir: str) -> list:
+    """旧实现：写临时文件并执行，inspect 取工具信息"""
+    with tempfile.NamedTemporaryFile(suffix=".py", prefix="module_1_",
+                                     delete=False, dir=work_dir) as temp:
+        temp.write(code.encode("utf-8"))
+    spec = importlib.util.spec_from_file_location("temp_module_1", temp.name)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["temp_module_1"] = module
+    try:
+        spec.loader.exec_module(module)
+        tools = []
+        for name, obj in inspect.getmembers(module):
+            if inspect.isfunction(obj):
+                sig = inspect.signature(obj)
+                tools.append({
+                    "name": name,
+                    "description": inspect.getdoc(obj) or "",
+                    "parameters": [
+                        {"name": p.name, "type": str(p.annotation)}
+                        for p in sig.parameters.values()],
+                    "source_code": inspect.getsource(obj),
+                })
+        return tools
+    finally:
+        del sys.modules["temp_module_1"]
+
+
+def measure(func, rounds: int) -> list:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    assert result
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="模板工具列表解析基准")
+    parser.add_argument("--tools", type=int, default=30,
+                        help="模板中的函数数，默认 30")
+    parser.add_argument("--rounds", type=int, default=100,
+                        help="每种方式的执行次数，默认 100")
+    args = parser.parse_args()
+
+    from app.services.mcp_template.tool_metadata import (
+        ToolMetadataCache, extract_tools)
+
+    code = build_code(args.tools)
+    work_dir = tempfile.mkdtemp(prefix="mcp-bench-tools-")
+    cache = ToolMetadataCache()
+    try:
+        results = {
+            "exec": measure(lambda: exec_tools(code, work_dir), args.rounds),
+            "ast": measure(lambda: extract_tools(code), args.rounds),
+            "cached": measure(lambda: cache.get_tools(1, code), args.rounds),
+        }
+        files = len(os.listdir(work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"函数数: {args.tools}，代码 {len(code)} 字节，"
+          f"每种方式 {args.rounds} 次")
+    print(f"{'mode':<8}{'first(ms)':>10}{'median(ms)':>12}{'p95(ms)':>10}")
+    for mode, timings in results.items():
+        p95 = sorted(timings)[int(len(timings) * 0.95) - 1]
+        print(f"{mode:<8}{timings[0]:>10.2f}"
+              f"{statistics.median(timings):>12.3f}{p95:>10.3f}")
+    print(f"exec 方式留下的临时文件: {files}，ast/cached 方式: 0")
+
+
+if __name__ == "__main__":
+    main()
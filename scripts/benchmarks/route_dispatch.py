@@ -0,0 +1,232 @@
+"""
+已发布服务路由分发基准
+
+对比两种已发布服务路由注册方式在 N 个（默认 1000）已发布 SSE 服务下的
+开销：
+
+- legacy：改造前的方式，每个服务把 SSE `Route` 插入主应用路由表第 0 位，
+  消息端点 `app.mount` 追加到路由表，停止服务时遍历路由表删除；
+- dispatcher：当前方式，所有服务路由登记在 `McpRouteDispatcher`，主应用
+  路由表只有一个分发器路由。
+
+主应用使用真实的 `get_router` 路由表（约 100 条 API/静态资源路由，末尾
+为 SPA 兜底路由），服务端点和 SPA 路由替换为直接返回的空端点。直接在进程内调用
+主应用的 Router，不经过网络和中间件。统计：
+
+- publish / stop：发布、停止全部服务的平均单次耗时；
+- api：普通 API 请求耗时；
+- static：SPA 兜底路由（静态页面）请求耗时；
+- sse：中间位置服务的 SSE 端点请求耗时；
+- messages：中间位置服务的消息端点（前缀匹配）请求耗时。
+
+用法（在 backend 目录的 Python 环境中执行）：
+
+    python ../scripts/benchmarks/route_dispatch.py
+    python ../scripts/benchmarks/route_dispatch.py --services 100 1000 5000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+)
+sys.path.insert(0, BACKEND_DIR)
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.responses import PlainTextResponse  # noqa: E402
+from starlette.routing import Mount, Route  # noqa: E402
+
+from app.api.urls import get_router  # noqa: E402
+from app.services.published_service.route_dispatcher import (  # noqa: E402
+    McpRouteDispatcher
+)
+from app.utils.logging import mcp_logger  # noqa: E402
+
+PING_PATH = "/api/bench/ping"
+
+
+async def ok_endpoint(request):
+    """空端点"""
+    return PlainTextResponse("ok")
+
+
+async def ok_app(scope, receive, send):
+    """空 ASGI 应用，代替 SSE 消息端点"""
+    await PlainTextResponse("ok")(scope, receive, send)
+
+
+def service_paths(index: int):
+    """第 index 个服务的 SSE 路径和消息路径"""
+    uuid = f"{index:08x}-bench"
+    return f"/mcp-{uuid}/sse", f"/mcp-{uuid}/messages/"
+
+
+def build_app() -> Starlette:
+    """构建带真实 API 路由表的主应用"""
+    app = Starlette()
+    get_router(app)
+    # 静态资源和 SPA 兜底路由替换为空端点，不依赖前端构建产物
+    spa_index = next(
+        i for i, route in enumerate(app.routes)
+        if getattr(route, "path", None) == "/"
+    )
+    del app.routes[spa_index:]
+    app.routes.extend([
+        Route(PING_PATH, ok_endpoint),
+        Route("/", ok_endpoint),
+        Route("/assets/{path:path}", ok_endpoint),
+        Route("/{path:path}", ok_endpoint),
+    ])
+    return app
+
+
+class LegacyRegistry:
+    """改造前：直接修改主应用路由表"""
+
+    def __init__(self, app: Starlette):
+        self.app = app
+
+    def publish(self, index: int) -> None:
+        sse_path, message_path = service_paths(index)
+        self.app.routes.insert(0, Route(sse_path, ok_endpoint))
+        self.app.mount(message_path, ok_app)
+
+    def stop(self, index: int) -> None:
+        sse_path, message_path = service_paths(index)
+        message_path = message_path.rstrip("/")
+        for route in [
+            route for route in self.app.routes
+            if getattr(route, "path", None) in (sse_path, message_path)
+        ]:
+            self.app.routes.remove(route)
+
+
+class DispatcherRegistry:
+    """当前：登记到路由分发器"""
+
+    def __init__(self, app: Starlette):
+        self.dispatcher = McpRouteDispatcher()
+        app.routes.insert(0, self.dispatcher)
+
+    def publish(self, index: int) -> None:
+        sse_path, message_path = service_paths(index)
+        uuid = str(index)
+        self.dispatcher.add_route(uuid, sse_path, Route(sse_path, ok_endpoint))
+        mount = Mount(message_path, app=ok_app)
+        self.dispatcher.add_route(uuid, mount.path, mount, prefix=True)
+
+    def stop(self, index: int) -> None:
+        self.dispatcher.remove_service(str(index))
+
+
+async def request(app, method: str, path: str) -> float:
+    """发起一次请求，返回耗时（毫秒）"""
+    scope = {
+        "type": "http", "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 8000),
+    }
+    status = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    elapsed = (time.perf_counter() - started) * 1000
+    if status.get("code") != 200:
+        raise RuntimeError(f"{method} {path} 返回 {status.get('code')}")
+    return elapsed
+
+
+async def measure(app, method: str, path: str, requests: int) -> dict:
+    """多次请求统计耗时"""
+    # 预热
+    for _ in range(10):
+        await request(app, method, path)
+    samples = sorted([
+        await request(app, method, path) for _ in range(requests)
+    ])
+    return {
+        "p50": statistics.median(samples),
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+async def run_case(name: str, registry_cls, services: int,
+                   requests: int) -> dict:
+    """测量一种注册方式"""
+    app = build_app()
+    registry = registry_cls(app)
+
+    started = time.perf_counter()
+    for index in range(services):
+        registry.publish(index)
+    publish_us = (time.perf_counter() - started) / services * 1e6
+
+    middle_sse, middle_messages = service_paths(services // 2)
+    # 只测路由匹配，跳过 get_router 注册的认证中间件
+    router = app.router
+    result = {
+        "case": name,
+        "routes": len(app.routes),
+        "publish_us": publish_us,
+        "api": await measure(router, "GET", PING_PATH, requests),
+        "static": await measure(router, "GET", "/index.html", requests),
+        "sse": await measure(router, "GET", middle_sse, requests),
+        "messages": await measure(
+            router, "POST", middle_messages, requests),
+    }
+
+    started = time.perf_counter()
+    for index in range(services):
+        registry.stop(index)
+    result["stop_us"] = (time.perf_counter() - started) / services * 1e6
+    return result
+
+
+def print_results(services: int, results) -> None:
+    """输出结果表"""
+    print(f"\n== {services} 个已发布服务 ==")
+    print(f"{'case':<12}{'routes':>8}{'publish(us)':>13}{'stop(us)':>11}"
+          f"{'api p50/p99(ms)':>20}{'static p50/p99':>20}"
+          f"{'sse p50/p99':>20}{'messages p50/p99':>20}")
+    for r in results:
+        cols = "".join(
+            f"{r[key]['p50']:>9.3f}/{r[key]['p99']:<10.3f}"
+            for key in ("api", "static", "sse", "messages")
+        )
+        print(f"{r['case']:<12}{r['routes']:>8}{r['publish_us']:>13.1f}"
+              f"{r['stop_us']:>11.1f} {cols}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="已发布服务路由分发基准")
+    parser.add_argument("--services", type=int, nargs="+", default=[1000],
+                        help="已发布服务数量，默认 1000")
+    parser.add_argument("--requests", type=int, default=2000,
+                        help="每类请求的次数，默认 2000")
+    args = parser.parse_args()
+
+    mcp_logger.setLevel(logging.WARNING)
+    for services in args.services:
+        results = [
+            await run_case("legacy", LegacyRegistry, services, args.requests),
+            await run_case("dispatcher", DispatcherRegistry, services,
+                           args.requests),
+        ]
+        print_results(services, results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
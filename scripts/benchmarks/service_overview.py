@@ -0,0 +1,162 @@
+"""
+服务统计（概览）基准
+
+在 SQLite 数据库中生成最近 30 天的 `--rows` 条工具执行记录（默认 100 万条），
+对比三种方式得到服务统计各项计数的耗时：
+
+- legacy：旧实现，12 条 COUNT 查询，今日条件为 `func.date(created_at) == 今天`；
+- overview：`StatisticsRepository.count_overview`，两条查询，今日条件为
+  created_at 半开区间（走 created_at 索引）；
+- cached：`StatisticsService.get_service_statistics` 缓存命中。
+
+同时校验 legacy 与 overview 的计数一致。
+
+用法（在 backend 目录的 Python 环境中执行）：
+
+    python ../scripts/benchmarks/service_overview.py
+    python ../scripts/benchmarks/service_overview.py --rows 5000000
+"""
+import argparse
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+)
+sys.path.insert(0, BACKEND_DIR)
+
+_BATCH = 100000
+_REPEAT = 5
+
+
+def configure(db_path: str) -> None:
+    """把数据库指向基准文件，需在导入业务模块前调用"""
+    from app.core.config import settings
+    settings.DATABASE_TYPE = "sqlite"
+    settings.DATABASE_FILE = db_path
+    settings.DEBUG = False
+
+
+def generate(db_path: str, rows: int, now: datetime) -> None:
+    """建表并生成最近 30 天的工具执行记录"""
+    from app.models.engine import init_db
+    init_db()
+    rng = random.Random(42)
+    start = now - timedelta(days=30)
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=OFF")
+    for offset in range(0, rows, _BATCH):
+        batch = []
+        for index in range(offset, min(offset + _BATCH, rows)):
+            batch.append((
+                # 约一成是直接调用主服务工具，没有服务 ID
+                None if rng.random() < 0.1
+                else f"bench-service-{rng.randrange(50):04d}",
+                f"bench_tool_{rng.randrange(250):03d}",
+                "error" if rng.random() < 0.05 else "success",
+                # 与 SQLAlchemy 写入 SQLite 的时间格式一致
+                (start + timedelta(seconds=index * 2592000 // rows)).strftime(
+                    "%Y-%m-%d %H:%M:%S.%f"),
+                rng.randint(1, 2000),
+            ))
+        connection.executemany(
+            "INSERT INTO tool_executions (service_id, tool_name, status, "
+            "created_at, execution_time) VALUES (?, ?, ?, ?, ?)", batch)
+        connection.commit()
+    connection.close()
+
+
+def legacy_counts(today) -> dict:
+    """旧实现：逐项 COUNT，今日条件对列套 date()"""
+    from sqlalchemy import func
+    from app.models.engine import get_db
+    from app.models.group.group import McpGroup
+    from app.models.modules.mcp_template import McpModule
+    from app.models.modules.published_service import McpService
+    from app.models.tools.tool_execution import ToolExecution
+
+    with get_db() as db:
+        is_service_call = ToolExecution.service_id.isnot(None)
+        return {
+            "total_template_groups": db.query(McpGroup).count(),
+            "today_new_template_groups": db.query(McpGroup).filter(
+                func.date(McpGroup.created_at) == today).count(),
+            "total_templates": db.query(McpModule).count(),
+            "today_new_templates": db.query(McpModule).filter(
+                func.date(McpModule.created_at) == today).count(),
+            "total_tools_calls": db.query(ToolExecution).count(),
+            "today_new_tools_calls": db.query(ToolExecution).filter(
+                func.date(ToolExecution.created_at) == today).count(),
+            "total_service_calls": db.query(ToolExecution).filter(
+                is_service_call).count(),
+            "today_new_service_calls": db.query(ToolExecution).filter(
+                is_service_call,
+                func.date(ToolExecution.created_at) == today).count(),
+            "total_services": db.query(McpService).count(),
+            "running_services": db.query(McpService).filter(
+                McpService.status == "running").count(),
+            "stopped_services": db.query(McpService).filter(
+                McpService.status == "stopped").count(),
+            "error_services": db.query(McpService).filter(
+                McpService.status == "error").count(),
+        }
+
+
+def overview_counts(day_start: datetime) -> dict:
+    from app.models.engine import get_db
+    from app.repositories.statistics_repository import StatisticsRepository
+    with get_db() as db:
+        return StatisticsRepository.count_overview(
+            db, day_start, day_start + timedelta(days=1))
+
+
+def timed(func, *args):
+    """多次执行取中位数（毫秒）"""
+    elapsed = []
+    for _ in range(_REPEAT):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed.append((time.perf_counter() - started) * 1000)
+    return result, sorted(elapsed)[_REPEAT // 2]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="服务统计（概览）基准")
+    parser.add_argument("--rows", type=int, default=1000000,
+                        help="工具执行记录数，默认 100 万")
+    args = parser.parse_args()
+
+    db_path = os.path.join(
+        tempfile.mkdtemp(prefix="mcp-bench-overview-"), "mcp.db")
+    configure(db_path)
+    from pytz import timezone
+    from app.utils.logging import mcp_logger
+    mcp_logger.setLevel(logging.ERROR)
+
+    now = datetime.now(timezone("Asia/Shanghai")).replace(tzinfo=None)
+    print(f"生成 {args.rows} 条工具执行记录: {db_path}")
+    generate(db_path, args.rows, now)
+
+    from app.services.statistics.service import statistics_service
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    legacy, legacy_ms = timed(legacy_counts, day_start.date())
+    overview, overview_ms = timed(overview_counts, day_start)
+    statistics_service.get_service_statistics()
+    _, cached_ms = timed(statistics_service.get_service_statistics)
+    consistent = all(overview[name] == value for name, value in legacy.items())
+    print(f"legacy   {legacy_ms:>8.1f}ms")
+    print(f"overview {overview_ms:>8.1f}ms")
+    print(f"cached   {cached_ms:>8.3f}ms")
+    print(f"今日工具调用 {overview['today_new_tools_calls']}，"
+          f"{'计数一致' if consistent else '计数不一致'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+已发布服务启动加载基准
+
+在临时 SQLite 数据库中发布 N 个内置服务（SSE / 流式HTTP 各一半），分别
+以三种方式执行 `service_manager.init_app`，每种方式在独立子进程中运行：
+
+- sequential：全部服务启动时创建，`startup.concurrency=1`；
+- parallel：全部服务启动时创建，并发数为 `--concurrency`；
+- lazy：开启 `startup.lazy_load`，只有 `--eager` 个服务标记预加载。
+
+输出启动耗时、启动后进程 RSS、加载报告中最慢的服务；lazy 方式另外测量
+延迟加载服务首个请求（触发创建）和第二个请求的耗时。
+
+用法（在 backend 目录的 Python 环境中执行）：
+
+    python ../scripts/benchmarks/service_startup.py
+    python ../scripts/benchmarks/service_startup.py --services 500 --eager 20 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+BACKEND_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+)
+sys.path.insert(0, BACKEND_DIR)
+
+TOOL_CODE = '''
+import json
+import decimal
+import datetime
+
+
+def add(a: float, b: float) -> float:
+    """两数相加"""
+    return a + b
+
+
+def now() -> str:
+    """当前时间"""
+    return datetime.datetime.now().isoformat()
+
+
+def to_json(data: dict) -> str:
+    """序列化为 JSON"""
+    return json.dumps(data, ensure_ascii=False)
+
+
+def round_money(value: str) -> str:
+    """金额保留两位小数"""
+    return str(decimal.Decimal(value).quantize(decimal.Decimal("0.01")))
+'''
+
+INITIALIZE = {
+    "jsonrpc": "2.0", "id": 1, "method": "initialize",
+    "params": {"protocolVersion": "2025-03-26", "capabilities": {},
+               "clientInfo": {"name": "bench", "version": "1.0"}},
+}
+
+
+def configure(state_dir: str) -> None:
+    """把数据库指向临时目录，需在导入业务模块前调用"""
+    from app.core.config import settings
+    settings.DATABASE_TYPE = "sqlite"
+    settings.DATABASE_FILE = os.path.join(state_dir, "mcp.db")
+    settings.DEBUG = False
+
+
+def prepare(state_dir: str, count: int, eager: int) -> None:
+    """初始化数据库并发布 count 个已启用的内置服务"""
+    configure(state_dir)
+    from app.models.engine import get_db, init_db
+    from app.models.modules.mcp_template import McpModule
+    from app.models.modules.published_service import McpService
+    init_db()
+    with get_db() as db:
+        module = McpModule(name="bench_tools", code=TOOL_CODE)
+        db.add(module)
+        db.commit()
+        for index in range(count):
+            service_uuid = str(uuid.uuid4())
+            protocol_type = 1 if index % 2 == 0 else 2
+            suffix = "sse" if protocol_type == 1 else "stream"
+            db.add(McpService(
+                module_id=module.id, service_uuid=service_uuid,
+                name=f"bench_{index}",
+                sse_url=f"/mcp-{service_uuid}/{suffix}",
+                status="running", enabled=True, protocol_type=protocol_type,
+                service_type=1, auth_required=False, config_params="",
+                eager_load=index < eager))
+        db.commit()
+
+
+async def first_requests(app, path: str) -> list:
+    """对流式HTTP服务连续发送两次 initialize，返回耗时（毫秒）"""
+    import httpx
+    headers = {"accept": "application/json, text/event-stream"}
+    transport = httpx.ASGITransport(app=app)
+    timings = []
+    async with httpx.AsyncClient(transport=transport,
+                                 base_url="http://bench") as client:
+        for _ in range(2):
+            started = time.perf_counter()
+            response = await client.post(path, json=INITIALIZE,
+                                         headers=headers)
+            timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise RuntimeError(
+                    f"请求失败 {response.status_code}: {response.text}")
+    return timings
+
+
+def run_mode(state_dir: str, mode: str, concurrency: int) -> None:
+    """子进程：按指定方式加载服务并输出结果（JSON）"""
+    configure(state_dir)
+    import psutil
+    from starlette.applications import Starlette
+    from app.core.config import settings
+    from app.services.published_service import service_manager
+    from app.utils.logging import mcp_logger
+
+    mcp_logger.setLevel(logging.WARNING)
+    settings.STARTUP_LAZY_LOAD = mode == "lazy"
+    settings.STARTUP_CONCURRENCY = 1 if mode == "sequential" else concurrency
+    app = Starlette()
+    rss_before = psutil.Process().memory_info().rss
+    started = time.perf_counter()
+    service_manager.init_app(app, None)
+    boot_ms = (time.perf_counter() - started) * 1000
+    rss = psutil.Process().memory_info().rss - rss_before
+    report = service_manager.get_startup_report()
+    result = {
+        "boot_ms": boot_ms,
+        "rss_mb": rss / 1024 / 1024,
+        "statuses": report["statuses"],
+        "slowest": report["services"][:3],
+    }
+    if mode == "lazy":
+        lazy = next((entry for entry in report["services"]
+                     if entry["status"] == "pending"
+                     and entry["name"].endswith(("1", "3", "5", "7", "9"))),
+                    None)
+        if lazy:
+            path = service_manager._dispatcher._by_service[
+                lazy["service_uuid"]][0][1]
+            result["first_requests_ms"] = asyncio.run(
+                first_requests(app, path))
+            result["after_first"] = next(
+                entry for entry in service_manager.get_startup_report()[
+                    "services"] if entry["service_uuid"] == lazy[
+                        "service_uuid"])
+    print(json.dumps(result, ensure_ascii=False))
+
+
+def main() -> None:
+    if len(sys.argv) == 5 and sys.argv[1] == "--mode":
+        run_mode(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        return
+    parser = argparse.ArgumentParser(description="已发布服务启动加载基准")
+    parser.add_argument("--services", type=int, default=200,
+                        help="已发布服务数，默认 200")
+    parser.add_argument("--eager", type=int, default=10,
+                        help="lazy 方式下标记预加载的服务数，默认 10")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="parallel / lazy 方式的并发数，默认 4")
+    parser.add_argument("--modes", nargs="+",
+                        default=["sequential", "parallel", "lazy"],
+                        choices=["sequential", "parallel", "lazy"])
+    args = parser.parse_args()
+
+    state_dir = tempfile.mkdtemp(prefix="mcp-bench-startup-")
+    prepare(state_dir, args.services, args.eager)
+    print(f"服务数: {args.services}，预加载: {args.eager}，"
+          f"并发: {args.concurrency}")
+    print(f"{'mode':<12}{'boot(ms)':>10}{'rss(MB)':>10}  statuses")
+    results = {}
+    for mode in args.modes:
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", state_dir, mode,
+             str(args.concurrency)],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        results[mode] = result
+        print(f"{mode:<12}{result['boot_ms']:>10.1f}"
+              f"{result['rss_mb']:>10.1f}  {result['statuses']}")
+    for mode, result in results.items():
+        slowest = ", ".join(f"{entry['name']}={entry['load_ms']}ms"
+                            for entry in result["slowest"])
+        print(f"{mode} 最慢服务: {slowest}")
+    lazy = results.get("lazy", {})
+    if "first_requests_ms" in lazy:
+        first, second = lazy["first_requests_ms"]
+        print(f"lazy 首个请求（触发加载）: {first:.1f}ms，"
+              f"第二个请求: {second:.1f}ms，"
+              f"报告记录加载耗时: {lazy['after_first']['load_ms']}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+SSE 会话跨进程转发基准
+
+测量多进程部署下 SSE 消息 POST 落到非所属进程、经会话归属表转发的额外
+开销：
+
+- 基准在临时目录准备 SQLite 数据库和共享状态文件，发布一个 SSE 服务，
+  启动两个节点进程 A / B（各自 `service_manager.init_app` 从数据库加载
+  服务，`sse_session_router` 使用 Unix socket 内部地址）；
+- 客户端在 A 上建立 SSE 连接（会话归属 A），后台读取事件流；
+- 以 `--concurrency` 个并发分别向 A（直接处理）和 B（查归属表后转发到
+  A）POST `--messages` 条 ping 消息，统计吞吐和 202 响应延迟的 p50/p99，
+  并确认每条消息的响应都从 SSE 流返回。
+
+用法（在 backend 目录的 Python 环境中执行）：
+
+    python ../scripts/benchmarks/sse_session_forwarding.py
+    python ../scripts/benchmarks/sse_session_forwarding.py --messages 2000 --concurrency 16
+"""
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+BACKEND_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+)
+sys.path.insert(0, BACKEND_DIR)
+
+TOOL_CODE = '''
+def echo(text: str) -> str:
+    """原样返回"""
+    return text
+'''
+
+
+def configure(state_dir: str) -> None:
+    """把数据库和共享状态指向临时目录，需在导入业务模块前调用"""
+    from app.core.config import settings
+    settings.DATABASE_TYPE = "sqlite"
+    settings.DATABASE_FILE = os.path.join(state_dir, "mcp.db")
+    settings.SHARED_STATE_BACKEND = "sqlite"
+    settings.SHARED_STATE_SQLITE_PATH = os.path.join(state_dir, "state.db")
+    settings.CLUSTER_SOCKET_DIR = state_dir
+
+
+def prepare(state_dir: str) -> str:
+    """初始化数据库并写入一个已启用的 SSE 服务，返回 SSE 路径"""
+    configure(state_dir)
+    from app.models.engine import get_db, init_db
+    from app.models.modules.mcp_template import McpModule
+    from app.models.modules.published_service import McpService
+    init_db()
+    service_uuid = str(uuid.uuid4())
+    sse_path = f"/mcp-{service_uuid}/sse"
+    with get_db() as db:
+        module = McpModule(name="bench_echo", code=TOOL_CODE)
+        db.add(module)
+        db.commit()
+        db.add(McpService(
+            module_id=module.id, service_uuid=service_uuid, name="bench",
+            sse_url=sse_path, status="running", enabled=True,
+            protocol_type=1, service_type=1, auth_required=False,
+            config_params=""))
+        db.commit()
+    return sse_path
+
+
+def run_node(state_dir: str, port: int) -> None:
+    """节点进程：加载服务并启动 HTTP 服务"""
+    configure(state_dir)
+    import uvicorn
+    from starlette.applications import Starlette
+    from app.middleware.mcp_auth_middleware import McpAuthMiddleware
+    from app.server.mcp_runtime_server import sse_session_lifespan
+    from app.services.published_service import service_manager
+    from app.utils.logging import mcp_logger
+
+    mcp_logger.setLevel(logging.WARNING)
+    app = Starlette(
+        lifespan=contextlib.asynccontextmanager(sse_session_lifespan))
+    app.add_middleware(McpAuthMiddleware)
+    service_manager.init_app(app, None)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def wait_ready(client, base: str) -> None:
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            await client.get(f"{base}/")
+            return
+        except Exception:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"节点启动超时: {base}")
+
+
+async def measure(client, url: str, count: int, concurrency: int,
+                  start_id: int) -> dict:
+    """并发 POST ping 消息，返回吞吐和延迟"""
+    latencies = []
+    next_id = 0
+
+    async def worker():
+        nonlocal next_id
+        while next_id < count:
+            message_id = start_id + next_id
+            next_id += 1
+            started = time.perf_counter()
+            response = await client.post(url, json={
+                "jsonrpc": "2.0", "id": message_id, "method": "ping"})
+            if response.status_code != 202:
+                raise RuntimeError(
+                    f"POST 失败 {response.status_code}: {response.text}")
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "throughput": count / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+async def run_bench(args) -> None:
+    import httpx
+
+    state_dir = tempfile.mkdtemp(prefix="mcp-bench-sse-")
+    sse_path = prepare(state_dir)
+    nodes = {"A": args.port, "B": args.port + 1}
+    processes = []
+    for name, port in nodes.items():
+        processes.append(subprocess.Popen(
+            [sys.executable, __file__, "--node", state_dir, str(port)],
+            cwd=BACKEND_DIR, stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL if not args.verbose else None))
+        # 依次启动，避免两个进程同时建表
+        await asyncio.sleep(0.5)
+    base = {name: f"http://127.0.0.1:{port}" for name, port in nodes.items()}
+
+    received = 0
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency + 2)
+        async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+            for name in nodes:
+                await wait_ready(client, base[name])
+
+            endpoint = asyncio.get_running_loop().create_future()
+
+            async def read_stream():
+                nonlocal received
+                async with client.stream("GET", base["A"] + sse_path) as r:
+                    event = None
+                    async for line in r.aiter_lines():
+                        if line.startswith("event:"):
+                            event = line[6:].strip()
+                        elif line.startswith("data:") and event == "endpoint":
+                            endpoint.set_result(line[5:].strip())
+                        elif line.startswith("data:") and event == "message":
+                            received += 1
+
+            reader = asyncio.create_task(read_stream())
+            message_path = await asyncio.wait_for(endpoint, 30)
+
+            # 经 B 转发完成初始化握手
+            init = {"jsonrpc": "2.0", "id": 0, "method": "initialize",
+                    "params": {"protocolVersion": "2024-11-05",
+                               "capabilities": {},
+                               "clientInfo": {"name": "bench",
+                                              "version": "1.0"}}}
+            for payload in (init, {"jsonrpc": "2.0",
+                                   "method": "notifications/initialized"}):
+                response = await client.post(base["B"] + message_path,
+                                             json=payload)
+                if response.status_code != 202:
+                    raise RuntimeError(
+                        f"初始化失败 {response.status_code}: {response.text}")
+
+            results = {}
+            for label, name in (("direct (A)", "A"), ("forwarded (B→A)", "B")):
+                url = base[name] + message_path
+                await measure(client, url, args.warmup, args.concurrency,
+                              start_id=10 ** 8 + len(results) * 10 ** 6)
+                results[label] = await measure(
+                    client, url, args.messages, args.concurrency,
+                    start_id=(len(results) + 1) * 10 ** 6)
+
+            expected = 1 + 2 * (args.messages + args.warmup)
+            deadline = time.monotonic() + 10
+            while received < expected and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            reader.cancel()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    print(f"消息: {args.messages}，并发: {args.concurrency}，"
+          f"SSE 收到响应: {received}/{expected}")
+    print(f"{'route':<18}{'msg/s':>10}{'p50(ms)':>10}{'p99(ms)':>10}")
+    for label, r in results.items():
+        print(f"{label:<18}{r['throughput']:>10.1f}{r['p50']:>10.2f}"
+              f"{r['p99']:>10.2f}")
+    direct, forwarded = results.values()
+    print(f"转发额外延迟 p50: {forwarded['p50'] - direct['p50']:.2f} ms")
+
+
+def main() -> None:
+    if len(sys.argv) == 4 and sys.argv[1] == "--node":
+        run_node(sys.argv[2], int(sys.argv[3]))
+        return
+    parser = argparse.ArgumentParser(description="SSE 会话跨进程转发基准")
+    parser.add_argument("--messages", type=int, default=1000,
+                        help="每条路径的消息数，默认 1000")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="并发 POST 数，默认 8")
+    parser.add_argument("--warmup", type=int, default=50,
+                        help="预热消息数，默认 50")
+    parser.add_argument("--port", type=int, default=18960,
+                        help="节点 A 端口，B 使用下一个端口，默认 18960")
+    parser.add_argument("--verbose", action="store_true",
+                        help="显示节点进程的错误输出")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(run_bench(args))
+
+
+if __name__ == "__main__":
+    main()
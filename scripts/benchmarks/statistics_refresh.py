@@ -0,0 +1,228 @@
+"""
+统计刷新基准
+
+在 SQLite 数据库中生成 `--rows` 条工具执行记录（默认 1000 万条，
+`--tools` 个工具、`--services` 个服务），对比工具统计和服务调用统计的
+刷新耗时：
+
+- legacy：旧实现，逐个工具/服务执行 count、成功数、失败数、平均耗时、
+  最后调用时间等查询，再逐行查找并更新统计行；
+- rebuild：`StatisticsService.update_call_statistics(rebuild=True)`，
+  一条 GROUP BY 汇总全部记录后替换计数，并按天重算时间桶汇总和直方图
+  （耗时主要在写入汇总行和直方图行）；
+- incremental：再写入 `--new-rows` 条记录后调用
+  `update_call_statistics()`，只汇总水位之后的新记录，并与全量重建的
+  结果比对。
+
+生成 1000 万条记录需要几分钟和约 1GB 磁盘，`--db` 指定的文件已存在时
+直接复用（每次运行都会追加 `--new-rows` 条记录）。
+
+用法（在 backend 目录的 Python 环境中执行）：
+
+    python ../scripts/benchmarks/statistics_refresh.py --db /tmp/mcp-stats.db
+    python ../scripts/benchmarks/statistics_refresh.py --rows 1000000 --tools 500
+"""
+import argparse
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+)
+sys.path.insert(0, BACKEND_DIR)
+
+_BATCH = 100000
+
+
+def configure(db_path: str) -> None:
+    """把数据库指向基准文件，需在导入业务模块前调用"""
+    from app.core.config import settings
+    settings.DATABASE_TYPE = "sqlite"
+    settings.DATABASE_FILE = db_path
+    settings.DEBUG = False
+    # 生成的最新记录接近当前时间，汇总不留写入余量，与直接查询的结果可比
+    settings.STATISTICS_WATERMARK_LAG = 0
+
+
+def generate(db_path: str, rows: int, tools: int, services: int,
+             seed: int = 42, progress: bool = True) -> None:
+    """建表并用 sqlite3 executemany 批量生成工具执行记录"""
+    from app.models.engine import init_db
+    init_db()
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(days=30)
+    service_ids = [f"bench-service-{index:04d}" for index in range(services)]
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=OFF")
+    started = time.perf_counter()
+    for offset in range(0, rows, _BATCH):
+        batch = []
+        for index in range(offset, min(offset + _BATCH, rows)):
+            batch.append((
+                rng.choice(service_ids) if index % 4 else None,
+                f"bench_tool_{rng.randrange(tools):05d}",
+                "error" if rng.random() < 0.05 else "success",
+                (start + timedelta(seconds=index * 2592000 // rows)).isoformat(
+                    sep=" "),
+                rng.randint(1, 2000),
+            ))
+        connection.executemany(
+            "INSERT INTO tool_executions (service_id, tool_name, status, "
+            "created_at, execution_time) VALUES (?, ?, ?, ?, ?)", batch)
+        connection.commit()
+        done = min(offset + _BATCH, rows)
+        if progress and (done % 1000000 == 0 or done == rows):
+            print(f"  已生成 {done} 条，"
+                  f"{time.perf_counter() - started:.0f}s", flush=True)
+    connection.close()
+
+
+def legacy_refresh() -> None:
+    """旧实现：逐个工具/服务查询"""
+    from sqlalchemy import desc, func
+    from app.models.engine import get_db
+    from app.models.modules.published_service import McpService
+    from app.models.statistics import ServiceCallStatistics, ToolStatistics
+    from app.models.tools.tool_execution import ToolExecution
+
+    with get_db() as db:
+        for (tool_name,) in db.query(ToolExecution.tool_name).distinct().all():
+            base_query = db.query(ToolExecution).filter(
+                ToolExecution.tool_name == tool_name)
+            call_count = base_query.count()
+            success_count = base_query.filter(
+                ToolExecution.status == 'success').count()
+            error_count = base_query.filter(
+                ToolExecution.status == 'error').count()
+            avg_time = db.query(func.avg(ToolExecution.execution_time)).filter(
+                ToolExecution.tool_name == tool_name).scalar()
+            last_called = db.query(ToolExecution.created_at).filter(
+                ToolExecution.tool_name == tool_name).order_by(
+                    desc(ToolExecution.created_at)).first()
+            stats = db.query(ToolStatistics).filter(
+                ToolStatistics.tool_name == tool_name).first()
+            if not stats:
+                stats = ToolStatistics(tool_name=tool_name)
+                db.add(stats)
+            stats.call_count = call_count
+            stats.success_count = success_count
+            stats.error_count = error_count
+            stats.avg_execution_time = int(avg_time) if avg_time else 0
+            stats.last_called_at = last_called[0] if last_called else None
+        for (service_id,) in db.query(ToolExecution.service_id).filter(
+                ToolExecution.service_id.isnot(None)).distinct().all():
+            base_query = db.query(ToolExecution).filter(
+                ToolExecution.service_id == service_id)
+            call_count = base_query.count()
+            success_count = base_query.filter(
+                ToolExecution.status == 'success').count()
+            error_count = base_query.filter(
+                ToolExecution.status == 'error').count()
+            db.query(McpService).filter(
+                McpService.service_uuid == service_id).first()
+            stats = db.query(ServiceCallStatistics).filter(
+                ServiceCallStatistics.service_id == service_id).first()
+            if not stats:
+                stats = ServiceCallStatistics(service_id=service_id)
+                db.add(stats)
+            stats.call_count = call_count
+            stats.success_count = success_count
+            stats.error_count = error_count
+        db.commit()
+
+
+def rebuild_refresh() -> None:
+    from app.services.statistics.service import statistics_service
+    statistics_service.update_call_statistics(rebuild=True)
+
+
+def incremental_refresh() -> None:
+    from app.services.statistics.service import statistics_service
+    statistics_service.update_call_statistics()
+
+
+def snapshot() -> dict:
+    from app.models.engine import get_db
+    from app.models.statistics import ServiceCallStatistics, ToolStatistics
+    with get_db() as db:
+        tools = {
+            s.tool_name: (s.call_count, s.success_count, s.error_count,
+                          s.avg_execution_time)
+            for s in db.query(ToolStatistics)}
+        services = {
+            s.service_id: (s.call_count, s.success_count, s.error_count)
+            for s in db.query(ServiceCallStatistics)}
+    return {"tools": tools, "services": services}
+
+
+def run(mode: str, refresh) -> dict:
+    """执行一次刷新并打印耗时，返回刷新后的统计快照"""
+    started = time.perf_counter()
+    refresh()
+    elapsed = time.perf_counter() - started
+    result = snapshot()
+    print(f"{mode:<20} {elapsed:>8.2f}s  工具统计 "
+          f"{len(result['tools'])} 条，服务调用统计 "
+          f"{len(result['services'])} 条", flush=True)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="统计刷新基准")
+    parser.add_argument("--rows", type=int, default=10000000,
+                        help="工具执行记录数，默认 1000 万")
+    parser.add_argument("--tools", type=int, default=2000,
+                        help="工具数，默认 2000")
+    parser.add_argument("--services", type=int, default=200,
+                        help="服务数，默认 200")
+    parser.add_argument("--db", default="",
+                        help="数据库文件，已存在时复用，默认使用临时文件")
+    parser.add_argument("--skip-legacy", action="store_true",
+                        help="不运行旧实现（数据量大时很慢）")
+    parser.add_argument("--new-rows", type=int, default=10000,
+                        help="增量刷新前新写入的记录数，默认 1 万")
+    args = parser.parse_args()
+
+    db_path = os.path.abspath(args.db) if args.db else os.path.join(
+        tempfile.mkdtemp(prefix="mcp-bench-stats-"), "mcp.db")
+    reuse = os.path.exists(db_path)
+    configure(db_path)
+    from app.utils.logging import mcp_logger
+    mcp_logger.setLevel(logging.ERROR)
+    if reuse:
+        print(f"复用数据库: {db_path}")
+        # 同步新增的表和字段
+        from app.models.engine import init_db
+        init_db()
+    else:
+        print(f"生成 {args.rows} 条工具执行记录: {db_path}")
+        generate(db_path, args.rows, args.tools, args.services)
+
+    modes = [("rebuild", rebuild_refresh)]
+    if not args.skip_legacy:
+        modes.insert(0, ("legacy", legacy_refresh))
+    results = {}
+    for mode, refresh in modes:
+        results[mode] = run(mode, refresh)
+    if "legacy" in results:
+        print("结果一致" if results["legacy"] == results["rebuild"]
+              else "结果不一致")
+
+    # 追加新记录后增量刷新，再与全量重建比对
+    generate(db_path, args.new_rows, args.tools, args.services,
+             seed=time.time_ns(), progress=False)
+    incremental = run(f"incremental (+{args.new_rows})", incremental_refresh)
+    rebuilt = run("rebuild", rebuild_refresh)
+    print("增量与全量重建结果一致" if incremental == rebuilt
+          else "增量与全量重建结果不一致")
+
+
+if __name__ == "__main__":
+    main()
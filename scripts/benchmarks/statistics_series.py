@@ -0,0 +1,165 @@
+"""
+统计时间序列基准
+
+在 SQLite 数据库中生成最近 30 天的 `--rows` 条工具执行记录（默认 100 万条，
+`--services` 个服务，每个服务 `--tools-per-service` 个工具），汇总到分钟 /
+小时 / 天时间桶后，对比 30 天趋势的两种查询：
+
+- raw：直接对 `tool_executions` 按天 / 按小时 GROUP BY；
+- rollup：`StatisticsService.get_statistics_series` 读取时间桶汇总表。
+
+同时校验两者的调用数、失败数一致，并输出汇总表行数。
+
+用法（在 backend 目录的 Python 环境中执行）：
+
+    python ../scripts/benchmarks/statistics_series.py
+    python ../scripts/benchmarks/statistics_series.py --rows 5000000
+"""
+import argparse
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+)
+sys.path.insert(0, BACKEND_DIR)
+
+_BATCH = 100000
+
+
+def configure(db_path: str) -> None:
+    """把数据库指向基准文件，需在导入业务模块前调用"""
+    from app.core.config import settings
+    settings.DATABASE_TYPE = "sqlite"
+    settings.DATABASE_FILE = db_path
+    settings.DEBUG = False
+    # 生成的最新记录接近当前时间，汇总不留写入余量，与直接查询的结果可比
+    settings.STATISTICS_WATERMARK_LAG = 0
+    # 查询前不触发增量汇总，只测量读取
+    settings.STATISTICS_ROLLUP_MAX_STALENESS = 0
+
+
+def generate(db_path: str, rows: int, services: int,
+             tools_per_service: int, now: datetime) -> None:
+    """建表并生成最近 30 天的工具执行记录"""
+    from app.models.engine import init_db
+    init_db()
+    rng = random.Random(42)
+    start = now - timedelta(days=30)
+    pairs = [
+        (f"bench-service-{service:04d}",
+         f"bench_tool_{service:04d}_{tool:02d}")
+        for service in range(services) for tool in range(tools_per_service)
+    ]
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=OFF")
+    for offset in range(0, rows, _BATCH):
+        batch = []
+        for index in range(offset, min(offset + _BATCH, rows)):
+            service_id, tool_name = rng.choice(pairs)
+            batch.append((
+                service_id, tool_name,
+                "error" if rng.random() < 0.05 else "success",
+                # 与 SQLAlchemy 写入 SQLite 的时间格式一致
+                (start + timedelta(seconds=index * 2592000 // rows)).strftime(
+                    "%Y-%m-%d %H:%M:%S.%f"),
+                rng.randint(1, 2000),
+            ))
+        connection.executemany(
+            "INSERT INTO tool_executions (service_id, tool_name, status, "
+            "created_at, execution_time) VALUES (?, ?, ?, ?, ?)", batch)
+        connection.commit()
+    connection.close()
+
+
+def raw_series(granularity: str, start: datetime, end: datetime) -> dict:
+    """直接扫描 tool_executions 的按时间桶统计"""
+    from sqlalchemy import case, func
+    from app.models.engine import get_db
+    from app.models.tools.tool_execution import ToolExecution
+
+    fmt = {"hour": "%Y-%m-%d %H:00:00", "day": "%Y-%m-%d 00:00:00"}
+    bucket = func.strftime(fmt[granularity], ToolExecution.created_at)
+    with get_db() as db:
+        rows = db.query(
+            bucket,
+            func.count(ToolExecution.id),
+            func.sum(case((ToolExecution.status == "error", 1), else_=0)),
+        ).filter(
+            ToolExecution.created_at >= start,
+            ToolExecution.created_at < end,
+        ).group_by(bucket).all()
+    return {key: (count, int(errors)) for key, count, errors in rows}
+
+
+def rollup_series(granularity: str, start: datetime, end: datetime) -> dict:
+    from app.services.statistics.service import statistics_service
+    series = statistics_service.get_statistics_series(
+        granularity, start=start, end=end)
+    return {
+        item["bucket"]: (item["call_count"], item["error_count"])
+        for item in series["items"] if item["call_count"]
+    }
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="统计时间序列基准")
+    parser.add_argument("--rows", type=int, default=1000000,
+                        help="工具执行记录数，默认 100 万")
+    parser.add_argument("--services", type=int, default=50,
+                        help="服务数，默认 50")
+    parser.add_argument("--tools-per-service", type=int, default=5,
+                        help="每个服务的工具数，默认 5")
+    args = parser.parse_args()
+
+    db_path = os.path.join(
+        tempfile.mkdtemp(prefix="mcp-bench-series-"), "mcp.db")
+    configure(db_path)
+    from pytz import timezone
+    from app.utils.logging import mcp_logger
+    mcp_logger.setLevel(logging.ERROR)
+
+    now = datetime.now(timezone("Asia/Shanghai")).replace(
+        tzinfo=None, minute=0, second=0, microsecond=0)
+    print(f"生成 {args.rows} 条工具执行记录: {db_path}")
+    generate(db_path, args.rows, args.services, args.tools_per_service, now)
+
+    from app.models.engine import get_db
+    from app.models.statistics import (
+        StatisticsRollupDay, StatisticsRollupHour, StatisticsRollupMinute
+    )
+    from app.services.statistics.service import statistics_service
+    _, elapsed = timed(statistics_service.update_call_statistics, True)
+    with get_db() as db:
+        sizes = {
+            model.__tablename__: db.query(model).count()
+            for model in (StatisticsRollupMinute, StatisticsRollupHour,
+                          StatisticsRollupDay)
+        }
+    print(f"全量汇总 {elapsed / 1000:.1f}s，汇总表行数 {sizes}")
+
+    end = now + timedelta(hours=1)
+    start = (end - timedelta(days=30)).replace(hour=0)
+    for granularity in ("day", "hour"):
+        raw, raw_ms = timed(raw_series, granularity, start, end)
+        rollup, rollup_ms = timed(rollup_series, granularity, start, end)
+        print(f"30 天 / {granularity:<4}  raw {raw_ms:>8.1f}ms  "
+              f"rollup {rollup_ms:>7.1f}ms  时间桶 {len(rollup)}  "
+              f"{'结果一致' if raw == rollup else '结果不一致'}")
+
+
+if __name__ == "__main__":
+    main()
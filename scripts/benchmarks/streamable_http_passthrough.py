@@ -0,0 +1,238 @@
+"""
+流式HTTP服务响应转发基准
+
+对比流式HTTP路由两种响应转发方式在大工具结果下的首字节时间和吞吐：
+
+- relay：改造前的处理函数，传输层在后台任务中运行，`custom_send` 把每个
+  响应分片放入 `asyncio.Queue`，再由 `StreamingResponse` 重新输出；
+- passthrough：当前方式，`StreamSessionManager` 作为 ASGI 端点，传输层
+  直接使用原始 `send` 写回响应。
+
+两种方式使用相同的 FastMCP 服务和会话管理器，工具返回指定大小的字符串。
+直接在进程内调用 Starlette Router，不经过网络。统计 tools/call 请求：
+
+- ttfb：从发起请求到收到第一个非空响应分片的耗时；
+- total：收到完整响应的耗时；
+- MB/s：响应字节数 / total。
+
+用法（在 backend 目录的 Python 环境中执行）：
+
+    python ../scripts/benchmarks/streamable_http_passthrough.py
+    python ../scripts/benchmarks/streamable_http_passthrough.py --sizes 65536 1048576 --requests 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+)
+sys.path.insert(0, BACKEND_DIR)
+
+from mcp.server.fastmcp import FastMCP  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from starlette.responses import StreamingResponse  # noqa: E402
+from starlette.routing import Route, Router  # noqa: E402
+
+from app.services.published_service.stream_session_manager import (  # noqa: E402
+    StreamSessionManager
+)
+from app.utils.logging import mcp_logger  # noqa: E402
+
+PATH = "/mcp-bench/stream"
+
+
+def build_server() -> FastMCP:
+    """构建返回指定大小结果的 MCP 服务"""
+    server = FastMCP(name="bench")
+
+    @server.tool()
+    def payload(size: int) -> str:
+        """返回 size 字节的字符串"""
+        return "x" * size
+
+    return server
+
+
+def relay_endpoint(session_manager: StreamSessionManager):
+    """改造前的队列中转处理函数"""
+
+    async def handle_streamable_http(request: Request):
+        response_queue = asyncio.Queue()
+        response_started = asyncio.Event()
+        response_headers = {}
+        response_status = 200
+
+        async def custom_send(message):
+            nonlocal response_headers, response_status
+            if message['type'] == 'http.response.start':
+                response_status = message['status']
+                response_headers = {
+                    key.decode('latin-1'): value.decode('latin-1')
+                    for key, value in message.get('headers', [])
+                }
+                response_started.set()
+            elif message['type'] == 'http.response.body':
+                await response_queue.put(message.get('body', b''))
+                if not message.get('more_body', False):
+                    await response_queue.put(None)
+
+        async def handle_transport():
+            try:
+                await session_manager.handle_request(
+                    request.scope, request.receive, custom_send
+                )
+            finally:
+                response_started.set()
+                await response_queue.put(None)
+
+        transport_task = asyncio.create_task(handle_transport())
+        await response_started.wait()
+        response_headers.pop('content-length', None)
+
+        async def generate_response():
+            try:
+                while True:
+                    chunk = await response_queue.get()
+                    if chunk is None:
+                        break
+                    yield chunk
+            finally:
+                if not transport_task.done():
+                    transport_task.cancel()
+
+        return StreamingResponse(
+            generate_response(),
+            status_code=response_status,
+            headers=response_headers
+        )
+
+    return handle_streamable_http
+
+
+async def call(app, body: dict, session_id: str = None):
+    """发起一次 POST，返回 (响应头, 响应字节数, ttfb毫秒, total毫秒)"""
+    raw = json.dumps(body).encode()
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"accept", b"application/json, text/event-stream"),
+    ]
+    if session_id:
+        headers.append((b"mcp-session-id", session_id.encode()))
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": PATH, "raw_path": PATH.encode(),
+        "root_path": "", "query_string": b"", "headers": headers,
+        "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 8000),
+    }
+    body_sent = False
+    finished = asyncio.Event()
+    result = {"headers": {}, "size": 0, "ttfb": None}
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": raw, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["headers"] = {
+                k.decode(): v.decode() for k, v in message["headers"]
+            }
+        elif message["type"] == "http.response.body":
+            chunk = message.get("body", b"")
+            if chunk and result["ttfb"] is None:
+                result["ttfb"] = time.perf_counter()
+            result["size"] += len(chunk)
+            if not message.get("more_body", False):
+                finished.set()
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    total = (time.perf_counter() - started) * 1000
+    ttfb = ((result["ttfb"] or time.perf_counter()) - started) * 1000
+    return result["headers"], result["size"], ttfb, total
+
+
+async def open_session(app) -> str:
+    """完成 initialize 握手，返回会话ID"""
+    headers, _, _, _ = await call(app, {
+        "jsonrpc": "2.0", "id": 0, "method": "initialize",
+        "params": {
+            "protocolVersion": "2025-03-26", "capabilities": {},
+            "clientInfo": {"name": "bench", "version": "1.0"},
+        },
+    })
+    session_id = headers["mcp-session-id"]
+    await call(app, {
+        "jsonrpc": "2.0", "method": "notifications/initialized"
+    }, session_id)
+    return session_id
+
+
+async def run_case(name: str, size: int, requests: int) -> dict:
+    """测量一种转发方式"""
+    session_manager = StreamSessionManager(
+        "bench", build_server()._mcp_server, idle_timeout=0)
+    endpoint = (
+        relay_endpoint(session_manager) if name == "relay"
+        else session_manager
+    )
+    app = Router(routes=[
+        Route(PATH, endpoint=endpoint, methods=["GET", "POST", "DELETE"])
+    ])
+    session_id = await open_session(app)
+
+    ttfbs, totals, sizes = [], [], []
+    for index in range(requests + 3):
+        _, received, ttfb, total = await call(app, {
+            "jsonrpc": "2.0", "id": index + 1, "method": "tools/call",
+            "params": {"name": "payload", "arguments": {"size": size}},
+        }, session_id)
+        if index < 3:
+            # 预热
+            continue
+        ttfbs.append(ttfb)
+        totals.append(total)
+        sizes.append(received)
+    session_manager.close()
+
+    total_ms = statistics.median(totals)
+    return {
+        "case": name,
+        "ttfb": statistics.median(ttfbs),
+        "total": total_ms,
+        "mbps": statistics.median(sizes) / 1024 / 1024 / (total_ms / 1000),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="流式HTTP服务响应转发基准")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[65536, 1048576, 8388608],
+                        help="工具结果大小（字节）")
+    parser.add_argument("--requests", type=int, default=30,
+                        help="每种大小的请求次数，默认 30")
+    args = parser.parse_args()
+
+    mcp_logger.setLevel(logging.WARNING)
+    logging.getLogger("mcp").setLevel(logging.WARNING)
+    print(f"{'size':>10}{'case':>14}{'ttfb p50(ms)':>15}"
+          f"{'total p50(ms)':>16}{'MB/s':>10}")
+    for size in args.sizes:
+        for name in ("relay", "passthrough"):
+            r = await run_case(name, size, args.requests)
+            print(f"{size:>10}{r['case']:>14}{r['ttfb']:>15.2f}"
+                  f"{r['total']:>16.2f}{r['mbps']:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+"""
+模板代码加载基准
+
+对比两种执行模板代码的方式（每种方式在独立子进程中运行）：
+
+- tempfile：旧实现，每次 `tempfile.mkdtemp` 写模块文件、把目录插到
+  `sys.path[0]`，再 `spec_from_file_location` 执行；
+- loader：`app.utils.template_loader`，按代码内容缓存编译结果，在内存中
+  执行，不写文件、不修改 `sys.path`。
+
+同一模板加载 `--loads` 次（模拟同一模板发布 N 个服务），输出单次加载
+耗时，以及加载完成后 `sys.path` 长度和一次未命中 import（需要扫描全部
+`sys.path` 条目）的耗时。
+
+用法（在 backend 目录的 Python 环境中执行）：
+
+    python ../scripts/benchmarks/template_loader.py
+    python ../scripts/benchmarks/template_loader.py --loads 1000
+"""
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+)
+sys.path.insert(0, BACKEND_DIR)
+
+# 约 200 行的模板代码
+TOOL_CODE = "import json\nimport datetime\n\n" + "\n".join(
+    f'''
+def tool_{index}(value: str, count: int = 1) -> str:
+    """工具 {index}"""
+    data = {{"value": value, "count": count, "index": {index}}}
+    if count > 10:
+        data["large"] = True
+    return json.dumps(data) + datetime.date.today().isoformat()
+''' for index in range(25))
+
+
+def load_tempfile(name: str, source: str):
+    """旧实现：写临时文件并插入 sys.path"""
+    temp_dir = tempfile.mkdtemp(prefix="mcp_module_bench_")
+    if temp_dir not in sys.path:
+        sys.path.insert(0, temp_dir)
+    module_path = os.path.join(temp_dir, f"{name}.py")
+    with open(module_path, "w", encoding="utf-8") as f:
+        f.write(source)
+    spec = importlib.util.spec_from_file_location(name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def missing_import_ms(rounds: int = 20) -> float:
+    """未命中 import 的平均耗时（毫秒）"""
+    importlib.invalidate_caches()
+    started = time.perf_counter()
+    for index in range(rounds):
+        try:
+            importlib.import_module(f"mcp_bench_missing_{index}")
+        except ModuleNotFoundError:
+            pass
+    return (time.perf_counter() - started) * 1000 / rounds
+
+
+def run_mode(mode: str, loads: int) -> None:
+    """子进程：按指定方式加载并输出结果（JSON）"""
+    if mode == "loader":
+        from app.utils.template_loader import template_loader
+
+        def load(name, source):
+            return template_loader.load(name, source)
+    else:
+        load = load_tempfile
+    baseline_import_ms = missing_import_ms()
+    timings = []
+    for _ in range(loads):
+        started = time.perf_counter()
+        module = load("bench_tools", TOOL_CODE)
+        timings.append((time.perf_counter() - started) * 1000)
+    assert module.tool_1("x")
+    import_ms = missing_import_ms()
+    # 清理旧实现留下的临时目录
+    for path in [p for p in sys.path if "mcp_module_bench_" in p]:
+        shutil.rmtree(path, ignore_errors=True)
+    print(json.dumps({
+        "first_ms": timings[0],
+        "median_ms": statistics.median(timings),
+        "total_ms": sum(timings),
+        "sys_path": len(sys.path),
+        "baseline_import_ms": baseline_import_ms,
+        "import_ms": import_ms,
+    }))
+
+
+def main() -> None:
+    if len(sys.argv) == 4 and sys.argv[1] == "--mode":
+        run_mode(sys.argv[2], int(sys.argv[3]))
+        return
+    parser = argparse.ArgumentParser(description="模板代码加载基准")
+    parser.add_argument("--loads", type=int, default=300,
+                        help="同一模板的加载次数，默认 300")
+    args = parser.parse_args()
+
+    print(f"加载次数: {args.loads}，模板代码 {len(TOOL_CODE)} 字节")
+    print(f"{'mode':<10}{'first(ms)':>10}{'median(ms)':>12}{'total(ms)':>11}"
+          f"{'sys.path':>10}{'miss import(ms)':>17}")
+    for mode in ("tempfile", "loader"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, str(args.loads)],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+        r = json.loads(output.stdout.strip().splitlines()[-1])
+        print(f"{mode:<10}{r['first_ms']:>10.2f}{r['median_ms']:>12.3f}"
+              f"{r['total_ms']:>11.1f}{r['sys_path']:>10}"
+              f"{r['baseline_import_ms']:>8.3f} -> {r['import_ms']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
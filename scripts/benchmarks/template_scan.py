@@ -0,0 +1,167 @@
+"""
+模板扫描基准
+
+在临时 SQLite 数据库中创建 N 个模板，对比 `scan_repository_modules`：
+
+- legacy：旧实现，逐个模板写临时文件并执行，`inspect` 取函数信息，
+  每个函数一次 SELECT + 一次 UPDATE/INSERT；
+- full：`force=True` 全量扫描（静态解析，每个模板一次批量写入），
+  分别以 1 个进程和 `--processes` 个进程解析；
+- unchanged：代码未变化时的重复扫描；
+- changed：修改 `--changed` 个模板后的增量扫描。
+
+用法（在 backend 目录的 Python 环境中执行）：
+
+    python ../scripts/benchmarks/template_scan.py
+    python ../scripts/benchmarks/template_scan.py --modules 500 --processes 4
+"""
+import argparse
+import importlib.util
+import inspect
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+)
+sys.path.insert(0, BACKEND_DIR)
+
+
+def build_code(index: int, tools: int = 12) -> str:
+    header = (
+        "import json\nimport datetime\nimport decimal\n"
+        "from typing import List, Optional\n\n"
+        f"TABLE = {{str(i): i * i for i in range(200)}}\n"
+    )
+    return header + "\n".join(f'''
+def tool_{index}_{number}(value: str, items: List[str] = None,
+                          limit: Optional[int] = 10) -> str:
+    """模板 {index} 工具 {number}"""
+    data = {{"value": value, "items": items or [], "limit": limit}}
+    return json.dumps(data)
+''' for number in range(tools))
+
+
+def legacy_scan() -> float:
+    """旧实现（执行模板代码，逐个函数查询和写入），返回耗时毫秒"""
+    from sqlalchemy import select, update
+    from app.core.utils import now_beijing
+    from app.models.engine import get_db
+    from app.models.modules.mcp_template import McpModule
+    from app.models.modules.mcp_template_tool import McpTool
+
+    started = time.perf_counter()
+    temp_dir = tempfile.mkdtemp(prefix="mcp_templates_")
+    sys.path.insert(0, temp_dir)
+    with get_db() as db:
+        for module in db.execute(select(McpModule)).scalars().all():
+            module_file = os.path.join(temp_dir, f"{module.name}.py")
+            with open(module_file, "w", encoding="utf-8") as f:
+                f.write(module.code)
+            spec = importlib.util.spec_from_file_location(
+                module.name, module_file)
+            module_obj = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module_obj)
+            for name, func in inspect.getmembers(module_obj,
+                                                 inspect.isfunction):
+                if func.__module__ != module.name:
+                    continue
+                parameters = {
+                    key: {"type": str(param.annotation)}
+                    for key, param in inspect.signature(
+                        func).parameters.items()}
+                existing = db.execute(select(McpTool).where(
+                    McpTool.module_id == module.id,
+                    McpTool.function_name == name)).scalar_one_or_none()
+                if existing:
+                    db.execute(update(McpTool).where(
+                        McpTool.id == existing.id).values(
+                            description=inspect.getdoc(func),
+                            parameters=str(parameters),
+                            updated_at=now_beijing()))
+                else:
+                    db.add(McpTool(
+                        module_id=module.id, name=name, function_name=name,
+                        description=inspect.getdoc(func),
+                        parameters=str(parameters), is_enabled=True))
+        db.commit()
+    sys.path.remove(temp_dir)
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="模板扫描基准")
+    parser.add_argument("--modules", type=int, default=300,
+                        help="模板数，默认 300")
+    parser.add_argument("--processes", type=int, default=4,
+                        help="并行解析的进程数，默认 4")
+    parser.add_argument("--changed", type=int, default=5,
+                        help="增量扫描前修改的模板数，默认 5")
+    args = parser.parse_args()
+
+    state_dir = tempfile.mkdtemp(prefix="mcp-bench-scan-")
+    from app.core.config import settings
+    settings.DATABASE_TYPE = "sqlite"
+    settings.DATABASE_FILE = os.path.join(state_dir, "mcp.db")
+    settings.DEBUG = False
+    from sqlalchemy import delete, select
+    from app.models.engine import get_db, init_db
+    from app.models.modules.mcp_template import McpModule
+    from app.models.modules.mcp_template_tool import McpTool
+    from app.services.mcp_template.service import mcp_template_service
+    from app.utils.logging import mcp_logger
+
+    mcp_logger.setLevel(logging.ERROR)
+    init_db()
+    with get_db() as db:
+        # 只保留基准生成的模板
+        db.execute(delete(McpModule))
+        for index in range(args.modules):
+            db.add(McpModule(name=f"bench_{index}", code=build_code(index)))
+        db.commit()
+
+    def scan(processes: int, force: bool) -> dict:
+        settings.TEMPLATE_SCAN_PROCESSES = processes
+        return mcp_template_service.scan_repository_modules(force=force)
+
+    try:
+        print(f"模板数: {args.modules}，每个模板 12 个工具")
+        print(f"{'mode':<24}{'elapsed(ms)':>12}{'parsed':>8}{'skipped':>9}")
+        results = [("legacy", legacy_scan(), args.modules, 0)]
+        for processes in (1, args.processes):
+            result = scan(processes, True)
+            results.append((f"full (processes={processes})",
+                            result["elapsed_ms"], result["updated"],
+                            result["skipped"]))
+        result = scan(args.processes, False)
+        results.append(("unchanged", result["elapsed_ms"], result["updated"],
+                        result["skipped"]))
+        with get_db() as db:
+            for module in db.execute(select(McpModule).limit(
+                    args.changed)).scalars().all():
+                module.code += "\n\ndef extra() -> None:\n    pass\n"
+            db.commit()
+        result = scan(args.processes, False)
+        results.append((f"changed ({args.changed})", result["elapsed_ms"],
+                        result["updated"], result["skipped"]))
+        for mode, elapsed, parsed, skipped in results:
+            print(f"{mode:<24}{elapsed:>12.1f}{parsed:>8}{skipped:>9}")
+        slowest = sorted(result["modules"], key=lambda entry: (
+            entry["parse_ms"] + entry["write_ms"]), reverse=True)[:3]
+        print("增量扫描最慢模板: " + ", ".join(
+            f"{entry['name']}={entry['parse_ms']}+{entry['write_ms']}ms"
+            for entry in slowest))
+        with get_db() as db:
+            tools = db.query(McpTool).count()
+        print(f"工具行数: {tools}")
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+工具索引基准
+
+在临时目录中生成 `repository/` 工具模块（`--files` 个文件，每个
+`--functions` 个函数），全部注册到 FastMCP 实例后对比：
+
+- legacy：旧 `scan_tools`，`os.walk` + import 每个文件 + `inspect`，
+  `execute_tool` 每次调用都要走一遍；
+- refresh：`tool_index.refresh()`，文件未变化时只 stat；
+- get：`tool_index.get(name)`，`execute_tool` 取工具信息的开销。
+
+用法（在 backend 目录的 Python 环境中执行）：
+
+    python ../scripts/benchmarks/tool_index.py
+    python ../scripts/benchmarks/tool_index.py --files 200 --functions 10
+"""
+import argparse
+import importlib.util
+import inspect
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+)
+sys.path.insert(0, BACKEND_DIR)
+
+
+def legacy_scan(base_dir: str, registered: set) -> dict:
+    """旧实现：遍历并 import 每个文件，inspect 取已注册函数的信息"""
+    tools = {}
+    repository_path = os.path.join(base_dir, "repository")
+    for root, _, files in os.walk(repository_path):
+        for file in files:
+            if not file.endswith(".py") or file == "__init__.py":
+                continue
+            py_file = os.path.join(root, file)
+            module_key = "repository." + os.path.relpath(
+                py_file, repository_path)[:-3].replace(os.sep, ".")
+            module = sys.modules.get(module_key)
+            if module is None:
+                spec = importlib.util.spec_from_file_location(
+                    module_key, py_file)
+                module = importlib.util.module_from_spec(spec)
+                sys.modules[module_key] = module
+                spec.loader.exec_module(module)
+            for name, obj in inspect.getmembers(module):
+                if inspect.isfunction(obj) and name in registered:
+                    sig = inspect.signature(obj)
+                    tools[name] = {
+                        "doc": inspect.getdoc(obj) or "",
+                        "parameters": {
+                            key: str(param.annotation)
+                            for key, param in sig.parameters.items()},
+                        "module": module_key,
+                    }
+    return tools
+
+
+def measure(func, rounds: int) -> list:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="工具索引基准")
+    parser.add_argument("--files", type=int, default=100,
+                        help="工具文件数，默认 100")
+    parser.add_argument("--functions", type=int, default=10,
+                        help="每个文件的函数数，默认 10")
+    parser.add_argument("--rounds", type=int, default=20,
+                        help="每种方式的执行次数，默认 20")
+    args = parser.parse_args()
+
+    base_dir = tempfile.mkdtemp(prefix="mcp-bench-tools-")
+    package_dir = os.path.join(base_dir, "repository", "bench")
+    os.makedirs(package_dir)
+    for index in range(args.files):
+        with open(os.path.join(package_dir, f"tools_{index}.py"), "w",
+                  encoding="utf-8") as f:
+            f.write("import json\n\n" + "\n".join(f'''
+def tool_{index}_{number}(value: str, limit: int = 10) -> str:
+    """工具 {index}-{number}"""
+    return json.dumps({{"value": value, "limit": limit}})
+''' for number in range(args.functions)))
+
+    from app.core.config import settings
+    settings.MCP_BASE_DIR = base_dir
+    from mcp.server.fastmcp import FastMCP
+    from app.server import mcp_runtime_server
+    from app.services.tools.tool_index import ToolIndex
+    from app.utils.logging import mcp_logger
+
+    mcp_logger.setLevel(logging.ERROR)
+    server = FastMCP(name="bench")
+    mcp_runtime_server.server_instance = server
+    registered = set()
+    for index in range(args.files):
+        for number in range(args.functions):
+            name = f"tool_{index}_{number}"
+            server.tool(name=name)(lambda: None)
+            registered.add(name)
+    index = ToolIndex(base_dir)
+    lookup = f"tool_{args.files // 2}_0"
+
+    try:
+        started = time.perf_counter()
+        index.refresh()
+        build_ms = (time.perf_counter() - started) * 1000
+        results = {
+            "legacy": measure(lambda: legacy_scan(base_dir, registered),
+                              args.rounds),
+            "refresh": measure(index.refresh, args.rounds),
+            "get": measure(lambda: index.get(lookup), args.rounds * 100),
+        }
+        assert index.get(lookup)["doc"] == legacy_scan(
+            base_dir, registered)[lookup]["doc"]
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+    print(f"文件数: {args.files}，每个文件 {args.functions} 个函数，"
+          f"已注册工具 {len(registered)} 个")
+    print(f"索引首次建立: {build_ms:.1f}ms")
+    print(f"{'mode':<10}{'first(ms)':>10}{'median(ms)':>12}")
+    for mode, timings in results.items():
+        print(f"{mode:<10}{timings[0]:>10.3f}"
+              f"{statistics.median(timings):>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
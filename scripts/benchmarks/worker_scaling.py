@@ -0,0 +1,237 @@
+"""
+服务工作进程模式吞吐基准
+
+测量 CPU 密集的工具调用在不同工作进程数下的吞吐：
+
+- 每轮启动一个 `ServiceWorkerPool`，发布 `--services` 个流式HTTP服务，
+  服务的工具是纯 Python 计算（`--work` 次循环）；服务均匀分配到各
+  工作进程（基准挑选 UUID 保证均匀，生产环境按 UUID 哈希分配）；
+- 主进程按 `_create_worker_service` 的方式登记转发路由，直接在进程内
+  调用 Starlette Router，请求经 Unix socket 转发到工作进程；
+- 以 `--concurrency` 个并发调用在各服务间轮询发起 `--calls` 次
+  tools/call，统计吞吐（calls/s）、延迟中位数和相对第一行（默认 1 个工作进程）的加速比。
+
+工作进程数为 1 时，全部服务共享一个 GIL，相当于改造前所有服务运行在
+主进程中的情况。加速比受 CPU 核数限制，单核机器上不会有提升。
+
+工具执行记录会照常写入配置的数据库；工作进程的日志输出被丢弃。
+
+用法（在 backend 目录的 Python 环境中执行）：
+
+    python ../scripts/benchmarks/worker_scaling.py
+    python ../scripts/benchmarks/worker_scaling.py --workers 1 2 4 --services 8 --calls 400
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+BACKEND_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+)
+sys.path.insert(0, BACKEND_DIR)
+
+from starlette.requests import Request  # noqa: E402
+from starlette.routing import Route, Router  # noqa: E402
+
+from app.services.published_service.worker_pool import (  # noqa: E402
+    ServiceWorkerPool
+)
+from app.utils.logging import mcp_logger  # noqa: E402
+
+TOOL_CODE = '''
+def burn(n: int) -> int:
+    """CPU 密集计算"""
+    total = 0
+    for i in range(n):
+        total += i * i
+    return total
+'''
+
+
+def pick_service_uuids(pool: ServiceWorkerPool, count: int) -> list:
+    """挑选在工作进程间均匀分布的服务UUID"""
+    per_worker = -(-count // pool.size)
+    assigned = {index: 0 for index in range(pool.size)}
+    uuids = []
+    while len(uuids) < count:
+        service_uuid = str(uuid.uuid4())
+        index = pool.shard(service_uuid)
+        if assigned[index] < per_worker:
+            assigned[index] += 1
+            uuids.append(service_uuid)
+    return uuids
+
+
+async def call(app, path: str, body: dict, session_id: str = None):
+    """发起一次 POST，返回 (响应头, 响应体)"""
+    raw = json.dumps(body).encode()
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"accept", b"application/json, text/event-stream"),
+    ]
+    if session_id:
+        headers.append((b"mcp-session-id", session_id.encode()))
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": headers,
+        "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 8000),
+    }
+    body_sent = False
+    finished = asyncio.Event()
+    result = {"headers": {}, "body": b""}
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": raw, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["headers"] = {
+                k.decode(): v.decode() for k, v in message["headers"]
+            }
+        elif message["type"] == "http.response.body":
+            result["body"] += message.get("body", b"")
+            if not message.get("more_body", False):
+                finished.set()
+
+    await app(scope, receive, send)
+    return result["headers"], result["body"]
+
+
+async def open_session(app, path: str) -> str:
+    """完成 initialize 握手，返回会话ID"""
+    headers, _ = await call(app, path, {
+        "jsonrpc": "2.0", "id": 0, "method": "initialize",
+        "params": {
+            "protocolVersion": "2025-03-26", "capabilities": {},
+            "clientInfo": {"name": "bench", "version": "1.0"},
+        },
+    })
+    session_id = headers["mcp-session-id"]
+    await call(app, path, {
+        "jsonrpc": "2.0", "method": "notifications/initialized"
+    }, session_id)
+    return session_id
+
+
+async def run_case(workers: int, args) -> dict:
+    """测量一种工作进程数"""
+    socket_dir = tempfile.mkdtemp(prefix="mcp-bench-workers-")
+    pool = ServiceWorkerPool(workers, socket_dir=socket_dir,
+                             output=subprocess.DEVNULL)
+    pool.start()
+    try:
+        routes, paths = [], []
+        for service_uuid in pick_service_uuids(pool, args.services):
+            path = f"/mcp-{service_uuid}/stream"
+            pool.assign(service_uuid, {
+                "service": {
+                    "id": 0, "service_uuid": service_uuid,
+                    "name": "bench", "sse_url": path, "protocol_type": 2,
+                    "config_params": None, "service_type": 1,
+                },
+                "module": {"id": 0, "name": "bench_burn",
+                           "code": TOOL_CODE},
+            })
+
+            async def forward(request: Request, service_uuid=service_uuid):
+                return await pool.forward(request, service_uuid)
+
+            routes.append(Route(path, endpoint=forward,
+                                methods=["GET", "POST", "DELETE"]))
+            paths.append(path)
+        app = Router(routes=routes)
+
+        deadline = time.monotonic() + 120
+        while pool.get_stats()["ready"] < workers:
+            if time.monotonic() > deadline:
+                raise RuntimeError("工作进程启动超时")
+            await asyncio.sleep(0.2)
+
+        sessions = [await open_session(app, path) for path in paths]
+        latencies = []
+        next_call = 0
+
+        async def client():
+            nonlocal next_call
+            while next_call < args.calls + args.warmup:
+                index = next_call
+                next_call += 1
+                target = index % len(paths)
+                started = time.perf_counter()
+                _, body = await call(app, paths[target], {
+                    "jsonrpc": "2.0", "id": index + 1,
+                    "method": "tools/call",
+                    "params": {"name": "burn",
+                               "arguments": {"n": args.work}},
+                }, sessions[target])
+                if b'"isError":true' in body:
+                    raise RuntimeError(body.decode()[:200])
+                if index >= args.warmup:
+                    latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        stats = pool.get_stats()
+    finally:
+        pool.close()
+
+    return {
+        "workers": workers,
+        # 预热调用也计入总耗时，吞吐按全部调用计算
+        "throughput": (args.calls + args.warmup) / elapsed,
+        "p50": statistics.median(latencies),
+        "rss": sum(w["rss"] or 0 for w in stats["workers"]) / 1024 / 1024,
+    }
+
+
+async def main() -> None:
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="服务工作进程模式吞吐基准")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, cpus} - {0}),
+                        help=f"工作进程数，默认 1 2 4 {cpus}")
+    parser.add_argument("--services", type=int, default=0,
+                        help="服务数，默认最大工作进程数的 2 倍")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="并发调用数，默认服务数的 2 倍")
+    parser.add_argument("--calls", type=int, default=200,
+                        help="每种工作进程数的调用次数，默认 200")
+    parser.add_argument("--warmup", type=int, default=10,
+                        help="预热调用次数，默认 10")
+    parser.add_argument("--work", type=int, default=200000,
+                        help="每次工具调用的循环次数，默认 200000")
+    args = parser.parse_args()
+    args.services = args.services or max(args.workers) * 2
+    args.concurrency = args.concurrency or args.services * 2
+
+    mcp_logger.setLevel(logging.WARNING)
+    logging.getLogger("mcp").setLevel(logging.WARNING)
+    print(f"CPU 核数: {cpus}，服务数: {args.services}，"
+          f"并发: {args.concurrency}，调用: {args.calls}，循环: {args.work}")
+    print(f"{'workers':>8}{'calls/s':>10}{'p50(ms)':>10}"
+          f"{'speedup':>9}{'RSS(MB)':>10}")
+    baseline = None
+    for workers in args.workers:
+        r = await run_case(workers, args)
+        baseline = baseline or r["throughput"]
+        print(f"{r['workers']:>8}{r['throughput']:>10.1f}{r['p50']:>10.1f}"
+              f"{r['throughput'] / baseline:>9.2f}{r['rss']:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())